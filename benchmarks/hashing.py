@@ -0,0 +1,89 @@
+"""Event loop stall benchmark for the hashes osfstorage computes on uploads.
+
+Reads ``--size`` MiB in ``--chunk`` KiB reads, arriving at ``--rate`` MiB/s like an upload from
+a client would, from a stream with md5, sha1, sha256 and sha512 writers attached, while a ticker
+task measures how late the loop wakes it up.  The time the
+ticker lost is time the loop couldn't spend on other requests.  Compares the synchronous
+HashStreamWriter with ThreadedHashStreamWriter.
+
+Usage::
+
+    $ python -m benchmarks.hashing [--size 256] [--chunk 64] [--rate 100]
+"""
+import os
+import time
+import asyncio
+import hashlib
+import argparse
+
+from waterbutler.core import streams
+from benchmarks.streams import PieceStream
+
+ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512')
+TICK = 0.001
+
+
+async def ticker(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def upload(writer_class, data, size, chunk_size, rate):
+    stream = PieceStream(data, size, chunk_size)
+    writers = [writer_class(getattr(hashlib, name)) for name in ALGORITHMS]
+    for name, writer in zip(ALGORITHMS, writers):
+        stream.add_writer(name, writer)
+
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.ensure_future(ticker(stop, lags))
+
+    start = time.perf_counter()
+    received = 0
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        received += len(chunk)
+        # Wait for the next chunk to "arrive" over the network
+        await asyncio.sleep(max(start + received / rate - time.perf_counter(), 0))
+    for writer in writers:
+        if hasattr(writer, 'flush'):
+            await writer.flush()
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    return elapsed, lags, writers[2].hexdigest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=int, default=256, help='MiB to hash')
+    parser.add_argument('--chunk', type=int, default=64, help='KiB per read')
+    parser.add_argument('--rate', type=int, default=100, help='MiB/s the upload arrives at')
+    args = parser.parse_args()
+
+    size, chunk_size = args.size * 1024 * 1024, args.chunk * 1024
+    data = os.urandom(1024 * 1024)
+
+    loop = asyncio.get_event_loop()
+    digests = set()
+    for label, writer_class in (('HashStreamWriter', streams.HashStreamWriter),
+                                ('ThreadedHashStreamWriter', streams.ThreadedHashStreamWriter)):
+        elapsed, lags, digest = loop.run_until_complete(
+            upload(writer_class, data, size, chunk_size, args.rate * 1024 * 1024)
+        )
+        digests.add(digest)
+        lags.sort()
+        print('{:<26} {:>7.1f} MiB/s  stalled {:>6.0f} ms  p99 tick lag {:>6.2f} ms'.format(
+            label, size / elapsed / 1024 / 1024, sum(lags) * 1000,
+            lags[int(len(lags) * .99)] * 1000 if lags else 0,
+        ))
+
+    assert len(digests) == 1, 'hashes differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Microbenchmark for :func:`waterbutler.core.utils.make_provider`.
+
+Compares the per-call cost of resolving the provider through a fresh stevedore
+``DriverManager`` (what every request used to pay) with the cached class lookup.
+
+Usage::
+
+    $ python -m benchmarks.make_provider [--number 2000] [--provider filesystem]
+"""
+import timeit
+import argparse
+import tempfile
+
+from stevedore import driver
+
+from waterbutler.core import utils
+
+
+def make_provider_uncached(name, auth, credentials, settings, **kwargs):
+    manager = driver.DriverManager(
+        namespace='waterbutler.providers',
+        name=name,
+        invoke_on_load=True,
+        invoke_args=(auth, credentials, settings),
+        invoke_kwds=kwargs,
+    )
+    return manager.driver
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=2000)
+    parser.add_argument('--provider', default='filesystem')
+    args = parser.parse_args()
+
+    provider_args = (args.provider, {}, {}, {'folder': tempfile.gettempdir()})
+    utils.load_provider_classes()
+
+    results = {}
+    for label, func in (('stevedore per call', make_provider_uncached),
+                        ('cached class', utils.make_provider)):
+        elapsed = min(timeit.repeat(lambda: func(*provider_args), number=args.number, repeat=3))
+        results[label] = elapsed / args.number * 1e6
+        print('{:<20} {:>10.1f} us/call'.format(label, results[label]))
+
+    saved = results['stevedore per call'] - results['cached class']
+    print('{:<20} {:>10.1f} us/call ({:.1f}x faster)'.format(
+        'saved per request', saved, results['stevedore per call'] / results['cached class']
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Requests per second of the work done by an s3compatsigv4 metadata request before it goes out.
+
+Each request makes a provider and presigns a ``head_object`` URL for it.  Compares making a new
+boto3 resource for every provider and presigning through botocore, what every request used to
+pay, with the pooled connection and :class:`.SigV4Presigner`.  No requests are sent.
+
+Usage::
+
+    $ python -m benchmarks.s3compatsigv4_presign [--number 200] [--host minio.example.com:9000]
+"""
+import timeit
+import argparse
+
+from waterbutler.providers.s3compatsigv4 import provider as sigv4
+
+
+class UnpooledProvider(sigv4.S3CompatSigV4Provider):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection = sigv4.S3CompatSigV4Connection(
+            aws_access_key_id=self.credentials['access_key'],
+            aws_secret_access_key=self.credentials['secret_key'],
+            endpoint_url=self.connection.endpoint_url,
+            region_name=self.region,
+            use_ssl=self.connection.use_ssl,
+            verify_ssl=self.connection.verify_ssl,
+        )
+        self._bucket = self.connection.s3.Bucket(self.bucket_name)
+
+    def presign(self, *args, **kwargs):
+        return self.connection.s3.meta.client.generate_presigned_url(*args, **kwargs)
+
+
+class PooledProvider(sigv4.S3CompatSigV4Provider):
+
+    def presign(self, *args, **kwargs):
+        return self.connection.generate_presigned_url(*args, **kwargs)
+
+
+def request(provider_class, credentials, settings):
+    provider = provider_class({}, credentials, settings)
+    return provider.presign('head_object', Params={'Bucket': provider.bucket_name,
+                                                   'Key': 'dir/file.txt'}, HttpMethod='HEAD')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--number', type=int, default=200)
+    parser.add_argument('--host', default='minio.example.com:9000')
+    args = parser.parse_args()
+
+    credentials = {'host': args.host, 'access_key': 'access', 'secret_key': 'secret'}
+    settings = {'bucket': 'bucket'}
+
+    results = {}
+    for label, provider_class in (('boto3 per request', UnpooledProvider),
+                                  ('pooled + SigV4Presigner', PooledProvider)):
+        elapsed = min(timeit.repeat(lambda: request(provider_class, credentials, settings),
+                                    number=args.number, repeat=3))
+        results[label] = args.number / elapsed
+        print('{:<24} {:>10.0f} requests/s'.format(label, results[label]))
+
+    print('{:<24} {:>10.1f}x'.format(
+        'speedup', results['pooled + SigV4Presigner'] / results['boto3 per request']
+    ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Throughput benchmark for chunk assembly in :mod:`waterbutler.core.streams`.
+
+Reads ``--size`` MiB through MultiStream, CutoffStream and ZipStreamReader in ``--chunk`` KiB
+reads, from a source that hands out ``--piece`` byte pieces, the way a socket often does.  The
+MultiStream and CutoffStream results are compared with the ``chunk +=`` assembly they used to do.
+
+Usage::
+
+    $ python -m benchmarks.streams [--size 64] [--chunk 1024] [--piece 4096]
+"""
+import os
+import time
+import asyncio
+import argparse
+
+from waterbutler.core import streams
+from waterbutler.core.streams.base import BaseStream
+
+
+class PieceStream(BaseStream):
+    """Serves ``size`` bytes of ``data``, at most ``piece`` bytes per read."""
+
+    def __init__(self, data, size, piece):
+        super().__init__()
+        self.data = data
+        self.piece = piece
+        self._size = size
+        self._left = size
+
+    @property
+    def size(self):
+        return self._size
+
+    async def _read(self, n=-1):
+        n = self.piece if n < 0 else min(n, self.piece)
+        n = min(n, self._left)
+        self._left -= n
+        if not self._left:
+            self.feed_eof()
+        offset = self._left % (len(self.data) - n) if len(self.data) > n else 0
+        return self.data[offset:offset + n]
+
+
+class LegacyMultiStream(streams.MultiStream):
+
+    async def read(self, n=-1):
+        chunk = b''
+        while self.stream and len(chunk) < n:
+            chunk += await self.stream.read(n - len(chunk))
+            if self.stream.at_eof():
+                self._cycle()
+        return chunk
+
+
+class LegacyCutoffStream(streams.CutoffStream):
+
+    async def read(self, n=-1):
+        n = min(n, self._cutoff - self._thus_far)
+        chunk = b''
+        while self.stream and (len(chunk) < n):
+            subchunk = await self.stream.read(n - len(chunk))
+            chunk += subchunk
+            self._thus_far += len(subchunk)
+        return chunk
+
+
+async def drain(stream, chunk_size):
+    total = 0
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            return total
+        total += len(chunk)
+
+
+async def zip_source(data, size, piece):
+    yield 'random.bin', PieceStream(data, size, piece)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size', type=int, default=64, help='MiB to stream')
+    parser.add_argument('--chunk', type=int, default=1024, help='KiB per read')
+    parser.add_argument('--piece', type=int, default=4096, help='bytes per source read')
+    args = parser.parse_args()
+
+    size, chunk_size = args.size * 1024 * 1024, args.chunk * 1024
+    # Random data, so the zip case measures deflate at its worst
+    data = os.urandom(1024 * 1024)
+
+    cases = (
+        ('MultiStream (+=)', lambda: LegacyMultiStream(PieceStream(data, size, args.piece))),
+        ('MultiStream', lambda: streams.MultiStream(PieceStream(data, size, args.piece))),
+        ('CutoffStream (+=)', lambda: LegacyCutoffStream(PieceStream(data, size, args.piece), size)),
+        ('CutoffStream', lambda: streams.CutoffStream(PieceStream(data, size, args.piece), size)),
+        ('ZipStreamReader', lambda: streams.ZipStreamReader(zip_source(data, size, args.piece))),
+    )
+
+    loop = asyncio.get_event_loop()
+    for label, build in cases:
+        start = time.perf_counter()
+        total = loop.run_until_complete(drain(build(), chunk_size))
+        elapsed = time.perf_counter() - start
+        print('{:<20} {:>8.1f} MiB/s'.format(label, total / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Throughput and event loop stall benchmark for zip archive compression.
+
+Zips ``--files`` files of ``--size`` MiB each, alternating log-like text and random binary data
+served in ``--piece`` KiB pieces, in 64 KiB reads, while a ticker task measures how late the loop
+wakes it up.  The archive is written out chunk by chunk, yielding to the loop like a socket write
+would.  Compares compressing on the loop with a sync flush after every chunk, the way
+ZipLocalFileData used to, with compressing in :func:`.deflate_executor`.
+
+Usage::
+
+    $ python -m benchmarks.zipping [--files 8] [--size 16] [--piece 64]
+"""
+import io
+import os
+import time
+import zlib
+import random
+import asyncio
+import zipfile
+import argparse
+import binascii
+
+from waterbutler.core import streams
+from waterbutler.core.streams import zip as zip_streams
+from waterbutler.core.utils import AsyncIterator
+
+from benchmarks.hashing import ticker
+from benchmarks.streams import PieceStream
+
+CHUNK_SIZE = 64 * 1024
+
+
+class LegacyZipLocalFileData(zip_streams.ZipLocalFileData):
+
+    async def _read(self, n=-1, *args, **kwargs):
+        while (n == -1 or len(self._pending) < n) and not self.stream.at_eof():
+            chunk = await self.stream.read(n, *args, **kwargs)
+            self.file.original_size += len(chunk)
+            self.file.zinfo.CRC = binascii.crc32(chunk, self.file.zinfo.CRC)
+            if self.file.compressor:
+                compressed = (
+                    self.file.compressor.compress(chunk),
+                    self.file.compressor.flush(
+                        zlib.Z_FINISH if self.stream.at_eof() else zlib.Z_SYNC_FLUSH
+                    ),
+                )
+            else:
+                compressed = (chunk, )
+            for part in compressed:
+                self.file.compressed_size += len(part)
+                self._pending.append(part)
+
+        ret = self._pending.take(n)
+        if not self._pending and self.stream.at_eof():
+            self.feed_eof()
+        return ret
+
+
+def text_data(size=1024 * 1024):
+    """Log lines of random words from a small vocabulary"""
+    rnd = random.Random(0)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rnd.choice(letters) for _ in range(rnd.randint(2, 10))) for _ in range(2000)]
+    lines, total = [], 0
+    while total < size:
+        line = '{} INFO {}\n'.format(rnd.randint(10 ** 9, 10 ** 10),
+                                     ' '.join(rnd.choice(words) for _ in range(12))).encode()
+        lines.append(line)
+        total += len(line)
+    return b''.join(lines)[:size]
+
+
+async def archive(files, size, piece):
+    text, binary = text_data(), os.urandom(1024 * 1024)
+    source = AsyncIterator(
+        ('file{}.{}'.format(i, 'log' if i % 2 == 0 else 'bin'),
+         PieceStream(text if i % 2 == 0 else binary, size, piece))
+        for i in range(files)
+    )
+    stream = streams.ZipStreamReader(source)
+
+    stop, lags = asyncio.Event(), []
+    tick = asyncio.ensure_future(ticker(stop, lags))
+
+    start = time.perf_counter()
+    parts = []
+    while True:
+        chunk = await stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        parts.append(chunk)
+        # Hand the chunk to the "socket"
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    return elapsed, lags, b''.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--files', type=int, default=8, help='number of files to zip')
+    parser.add_argument('--size', type=int, default=16, help='MiB per file')
+    parser.add_argument('--piece', type=int, default=64, help='KiB per source read')
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    total = args.files * size
+
+    loop = asyncio.get_event_loop()
+    for label, data_class in (('on loop, sync flush', LegacyZipLocalFileData),
+                              ('deflate_executor', zip_streams.ZipLocalFileData)):
+        zip_streams.ZipLocalFileData, original = data_class, zip_streams.ZipLocalFileData
+        try:
+            elapsed, lags, data = loop.run_until_complete(
+                archive(args.files, size, args.piece * 1024)
+            )
+        finally:
+            zip_streams.ZipLocalFileData = original
+
+        assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+        lags.sort()
+        print('{:<20} {:>7.1f} MiB/s  {:>5.1f}% of input  stalled {:>6.0f} ms  '
+              'p99 tick lag {:>6.2f} ms'.format(
+                  label, total / elapsed / 1024 / 1024, len(data) / total * 100,
+                  sum(lags) * 1000, lags[int(len(lags) * .99)] * 1000 if lags else 0,
+              ))
+
+
+if __name__ == '__main__':
+    main()
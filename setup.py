@@ -21,7 +21,7 @@ setup(
     author='Center for Open Science',
     author_email='contact@cos.io',
     url='https://github.com/CenterForOpenScience/waterbutler',
-    packages=find_packages(exclude=("tests*", )),
+    packages=find_packages(exclude=("tests*", "benchmarks*", )),
     package_dir={'waterbutler': 'waterbutler'},
     include_package_data=True,
     # install_requires=requirements,
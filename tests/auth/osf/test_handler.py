@@ -8,8 +8,9 @@ from tests.server.api.v1.utils import ServerTestCase
 
 from waterbutler.auth.osf import settings
 from waterbutler.core.auth import AuthType
-from waterbutler.auth.osf.handler import OsfAuthHandler, EXPORT_DATA_FAKE_NODE_ID
-from waterbutler.core.exceptions import (UnsupportedHTTPMethodError,
+from waterbutler.auth.osf.handler import OsfAuthHandler, EXPORT_DATA_FAKE_NODE_ID, auth_cache
+from waterbutler.core.exceptions import (AuthError,
+                                            UnsupportedHTTPMethodError,
                                             UnsupportedActionError)
 from waterbutler.settings import MFR_IDENTIFYING_HEADER
 
@@ -199,3 +200,75 @@ class TestActionMapping:
         request.headers = {settings.MFR_ACTION_HEADER: 'bad-action'}
         with pytest.raises(UnsupportedActionError):
             await handler.get('test', 'test', request)
+
+
+class TestAuthCache:
+
+    @pytest.fixture
+    def cache_enabled(self, monkeypatch):
+        monkeypatch.setattr(settings, 'AUTH_CACHE_ENABLED', True)
+        monkeypatch.setattr(settings, 'AUTH_CACHE_ACTIONS', ['metadata'])
+        auth_cache.clear()
+        yield
+        auth_cache.clear()
+
+    def make_request(self, query_args, authorization='Bearer token'):
+        request = mock.Mock()
+        request.method = 'get'
+        request.headers = {'Authorization': authorization}
+        request.query_arguments = query_args
+        request.cookies = {}
+        return request
+
+    @pytest.mark.asyncio
+    async def test_cache_hit(self, cache_enabled):
+        handler = OsfAuthHandler()
+        handler.make_request = utils.MockCoroutine(
+            return_value={'auth': {}, 'callback_url': 'dummy'}
+        )
+
+        first = await handler.get('test', 'test', self.make_request({'meta': 1}))
+        first['auth']['mutated'] = True
+        second = await handler.get('test', 'test', self.make_request({'meta': 1}))
+
+        assert handler.make_request.call_count == 1
+        assert second == {'auth': {'callback_url': 'dummy'}, 'callback_url': 'dummy'}
+        assert auth_cache.hits == 1
+        assert auth_cache.misses == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_keyed_by_credentials(self, cache_enabled):
+        handler = OsfAuthHandler()
+        handler.make_request = utils.MockCoroutine(
+            return_value={'auth': {}, 'callback_url': 'dummy'}
+        )
+
+        await handler.get('test', 'test', self.make_request({'meta': 1}))
+        await handler.get('test', 'test', self.make_request({'meta': 1}, authorization='other'))
+
+        assert handler.make_request.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_uncached_action(self, cache_enabled):
+        handler = OsfAuthHandler()
+        handler.make_request = utils.MockCoroutine(
+            return_value={'auth': {}, 'callback_url': 'dummy'}
+        )
+
+        await handler.get('test', 'test', self.make_request({}))
+        await handler.get('test', 'test', self.make_request({}))
+
+        assert handler.make_request.call_count == 2
+        assert len(auth_cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_not_cached(self, cache_enabled):
+        handler = OsfAuthHandler()
+        handler.make_request = utils.MockCoroutine(side_effect=AuthError('nope', code=403))
+
+        for _ in range(2):
+            with pytest.raises(AuthError):
+                await handler.get('test', 'test', self.make_request({'meta': 1}))
+
+        assert handler.make_request.call_count == 2
+        assert len(auth_cache) == 0
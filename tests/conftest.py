@@ -8,6 +8,9 @@ settings.config['TASKS_CONFIG'] = {
 
 import aiohttpretty
 
+from waterbutler.core import ratelimit
+from waterbutler.core import circuitbreaker
+
 
 def pytest_configure(config):
     config.addinivalue_line(
@@ -17,6 +20,10 @@ def pytest_configure(config):
 
 
 def pytest_runtest_setup(item):
+    # Rate limit buckets and circuit breakers are process-wide; don't let one test's requests
+    # slow down or trip the next
+    ratelimit.limiter.clear()
+    circuitbreaker.breakers.clear()
     if 'aiohttpretty' in item.keywords:
         aiohttpretty.clear()
         aiohttpretty.activate()
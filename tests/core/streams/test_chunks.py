@@ -0,0 +1,55 @@
+import pytest
+
+from waterbutler.core.streams.base import ChunkQueue, join_chunks
+
+
+class TestJoinChunks:
+
+    def test_single_bytes_chunk_is_not_copied(self):
+        chunk = b'x' * 1024
+
+        assert join_chunks([chunk]) is chunk
+
+    @pytest.mark.parametrize('parts,expected', [
+        ([], b''),
+        ([bytearray(b'abc')], b'abc'),
+        ([b'ab', bytearray(b'cd'), memoryview(b'ef')], b'abcdef'),
+    ])
+    def test_join(self, parts, expected):
+        joined = join_chunks(parts)
+
+        assert type(joined) is bytes
+        assert joined == expected
+
+
+class TestChunkQueue:
+
+    def test_take_exact_sizes(self):
+        queue = ChunkQueue()
+        queue.append(b'hello')
+        queue.append(b'')
+        queue.append(b'world')
+
+        assert len(queue) == 10
+        assert queue.take(3) == b'hel'
+        assert queue.take(4) == b'lowo'
+        assert len(queue) == 3
+        assert queue.take(10) == b'rld'
+        assert queue.take(10) == b''
+        assert not queue
+
+    def test_take_all(self):
+        queue = ChunkQueue()
+        queue.append(b'foo')
+        queue.append(b'bar')
+
+        assert queue.take() == b'foobar'
+        assert len(queue) == 0
+
+    def test_whole_chunk_is_not_copied(self):
+        chunk = b'x' * 1024
+        queue = ChunkQueue()
+        queue.append(chunk)
+        queue.append(b'y')
+
+        assert queue.take(1024) is chunk
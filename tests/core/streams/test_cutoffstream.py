@@ -70,3 +70,13 @@ class TestCutoffStream:
         stream = streams.StringStream(blob)
         with pytest.raises(TypeError):
             streams.CutoffStream(stream)
+
+    @pytest.mark.asyncio
+    async def test_stream_shorter_than_cutoff(self, blob):
+        stream = streams.StringStream(blob)
+        cutoff_stream = streams.CutoffStream(stream, 100)
+
+        data = await cutoff_stream.read(100)
+
+        assert data == blob
+        assert await cutoff_stream.read(100) == b''
@@ -1,3 +1,4 @@
+import io
 import os
 
 import pytest
@@ -75,6 +76,51 @@ class TestFileStreamReader:
             at_eof = reader.at_eof()
             assert at_eof
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('read_ahead', [True, False])
+    async def test_file_stream_reader_mixed_sizes(self, read_ahead, monkeypatch):
+        monkeypatch.setattr('waterbutler.core.streams.settings.FILE_READ_AHEAD', read_ahead)
+        content = bytes(range(256)) * 64
+        reader = streams.FileStreamReader(io.BytesIO(content))
+
+        chunks, sizes = [], [100, 1000, 100, 7]
+        while True:
+            chunk = await reader.read(sizes[len(chunks) % len(sizes)])
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        assert b''.join(chunks) == content
+        assert [len(chunk) for chunk in chunks[:4]] == sizes
+        assert reader.at_eof()
+
+    def test_size_is_measured_once(self):
+        fp = io.BytesIO(b'abc')
+        reader = streams.FileStreamReader(fp)
+        fp.write(b'def')
+
+        assert reader.size == 3
+
+    @pytest.mark.asyncio
+    async def test_sendfile_range(self):
+        with open(DUMMY_FILE, 'rb') as fp:
+            reader = streams.FileStreamReader(fp)
+            assert reader.sendfile_range() == (fp.fileno(), 0, 27)
+
+            await reader.read(1)
+            assert reader.sendfile_range() is None
+
+    def test_sendfile_range_unavailable(self):
+        with open(DUMMY_FILE, 'r') as fp:
+            assert streams.FileStreamReader(fp).sendfile_range() is None
+
+        assert streams.FileStreamReader(io.BytesIO(b'abc')).sendfile_range() is None
+
+        with open(DUMMY_FILE, 'rb') as fp:
+            reader = streams.FileStreamReader(fp)
+            reader.add_writer('md5', object())
+            assert reader.sendfile_range() is None
+
 
 class TestPartialFileStreamReader:
 
@@ -133,3 +179,9 @@ class TestPartialFileStreamReader:
             assert data == b''
             at_eof = reader.at_eof()
             assert at_eof
+
+    def test_sendfile_range(self):
+        with open(DUMMY_FILE, 'rb') as fp:
+            reader = streams.PartialFileStreamReader(fp, (2, 10))
+
+            assert reader.sendfile_range() == (fp.fileno(), 2, 9)
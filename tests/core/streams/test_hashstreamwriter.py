@@ -0,0 +1,70 @@
+import asyncio
+import hashlib
+import threading
+
+import pytest
+
+from waterbutler.core import streams
+
+
+DATA = bytes(range(256)) * 1024
+
+
+class TestThreadedHashStreamWriter:
+
+    @pytest.mark.asyncio
+    async def test_matches_hashlib(self):
+        stream = streams.StringStream(DATA)
+        stream.add_writer('md5', streams.ThreadedHashStreamWriter(hashlib.md5))
+        stream.add_writer('sha256', streams.ThreadedHashStreamWriter(hashlib.sha256))
+
+        while await stream.read(1000):
+            pass
+        await stream.writers['md5'].flush()
+        await stream.writers['sha256'].flush()
+
+        assert stream.writers['md5'].hexdigest == hashlib.md5(DATA).hexdigest()
+        assert stream.writers['sha256'].digest == hashlib.sha256(DATA).digest()
+
+    def test_hexdigest_waits_for_hashing(self):
+        writer = streams.ThreadedHashStreamWriter(hashlib.sha1)
+        for offset in range(0, len(DATA), 4096):
+            writer.write(DATA[offset:offset + 4096])
+
+        assert writer.hexdigest == hashlib.sha1(DATA).hexdigest()
+
+    def test_copies_mutable_chunks(self):
+        writer = streams.ThreadedHashStreamWriter(hashlib.md5)
+        chunk = bytearray(b'abc')
+
+        writer.write(chunk)
+        chunk[:] = b'xyz'
+
+        assert writer.hexdigest == hashlib.md5(b'abc').hexdigest()
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_when_too_far_behind(self, monkeypatch):
+        monkeypatch.setattr('waterbutler.core.streams.settings.HASH_MAX_PENDING', 10)
+        release = threading.Event()
+
+        class SlowHash:
+            def __init__(self):
+                self.seen = b''
+
+            def update(self, data):
+                release.wait()
+                self.seen += data
+
+        writer = streams.ThreadedHashStreamWriter(SlowHash)
+        writer.write(b'01234')
+        await writer.drain()
+
+        writer.write(b'56789')
+        drain = asyncio.ensure_future(writer.drain())
+        await asyncio.sleep(0.05)
+        assert not drain.done()
+
+        release.set()
+        await asyncio.wait_for(drain, 1)
+        await writer.flush()
+        assert writer.hash.seen == b'0123456789'
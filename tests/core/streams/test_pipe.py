@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from waterbutler.core import streams
+
+
+@pytest.fixture
+def pipe():
+    return streams.StreamPipe(high_water=10)
+
+
+class TestStreamPipe:
+
+    @pytest.mark.asyncio
+    async def test_read(self, pipe):
+        pipe.write(b'abc')
+        pipe.write(b'def')
+
+        assert await pipe.read(4) == b'abcd'
+        assert await pipe.read(4) == b'ef'
+        assert not pipe.at_eof()
+
+        pipe.write_eof()
+        assert pipe.at_eof()
+        assert await pipe.read(4) == b''
+
+    @pytest.mark.asyncio
+    async def test_read_all_waits_for_eof(self, pipe):
+        reader = asyncio.ensure_future(pipe.read())
+        pipe.write(b'abc')
+        await asyncio.sleep(0)
+        assert not reader.done()
+
+        pipe.write(b'def')
+        pipe.write_eof()
+
+        assert await reader == b'abcdef'
+
+    @pytest.mark.asyncio
+    async def test_readexactly(self, pipe):
+        reader = asyncio.ensure_future(pipe.readexactly(5))
+        pipe.write(b'abc')
+        await asyncio.sleep(0)
+        assert not reader.done()
+
+        pipe.write(b'defg')
+
+        assert await reader == b'abcde'
+        assert len(pipe) == 2
+
+    @pytest.mark.asyncio
+    async def test_readexactly_incomplete(self, pipe):
+        pipe.write(b'abc')
+        pipe.write_eof()
+
+        with pytest.raises(asyncio.IncompleteReadError) as exc:
+            await pipe.readexactly(5)
+
+        assert exc.value.partial == b'abc'
+
+    @pytest.mark.asyncio
+    async def test_drain_waits_for_reader(self, pipe):
+        pipe.write(b'0123456789')
+        drain = asyncio.ensure_future(pipe.drain())
+        await asyncio.sleep(0)
+        assert not drain.done()
+
+        await pipe.read(5)
+        await asyncio.wait_for(drain, 1)
+
+    @pytest.mark.asyncio
+    async def test_drain_lets_large_reads_fill(self, pipe):
+        reader = asyncio.ensure_future(pipe.readexactly(25))
+        for _ in range(5):
+            pipe.write(b'01234')
+            await asyncio.wait_for(pipe.drain(), 1)
+
+        assert await reader == b'01234' * 5
+
+    @pytest.mark.asyncio
+    async def test_close_stops_drain_and_drops_writes(self, pipe):
+        pipe.write(b'0123456789')
+        drain = asyncio.ensure_future(pipe.drain())
+        await asyncio.sleep(0)
+
+        pipe.close()
+        await asyncio.wait_for(drain, 1)
+        pipe.write(b'dropped')
+
+        assert await pipe.read() == b'0123456789'
+        assert pipe.at_eof()
+
+    @pytest.mark.asyncio
+    async def test_memory_stays_flat_on_large_uploads(self):
+        """Push 4GB through the pipe to a slower reader; the buffer never grows beyond the high
+        water mark plus one chunk.
+        """
+        chunk, total = b'x' * (1024 * 1024), 4 * 1024 ** 3
+        pipe = streams.StreamPipe(high_water=4 * len(chunk))
+        stream = streams.RequestStreamReader(None, pipe)
+        peak = 0
+
+        async def client():
+            nonlocal peak
+            for _ in range(total // len(chunk)):
+                pipe.write(chunk)
+                peak = max(peak, len(pipe))
+                await pipe.drain()
+            pipe.write_eof()
+
+        async def upload():
+            received = 0
+            while True:
+                data = await stream.read(256 * 1024)
+                if not data:
+                    return received
+                received += len(data)
+                await asyncio.sleep(0)
+
+        _, received = await asyncio.gather(client(), upload())
+
+        assert received == total
+        assert peak <= pipe.high_water + len(chunk)
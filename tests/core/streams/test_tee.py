@@ -0,0 +1,66 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from waterbutler.core import streams
+
+
+async def read_all(stream, n=4):
+    parts = []
+    while True:
+        chunk = await stream.read(n)
+        if not chunk:
+            return b''.join(parts)
+        parts.append(chunk)
+
+
+class TestTeeStream:
+
+    @pytest.mark.asyncio
+    async def test_branches_see_every_chunk(self):
+        source = streams.StringStream('abcdefghijklmnopqrstuvwxyz')
+        first = streams.TeeStream(source, 'first', limit=8)
+        second = streams.TeeStream(source, 'second', limit=8)
+
+        results = await asyncio.gather(read_all(source), read_all(first, 3), read_all(second, 5))
+
+        assert results == [b'abcdefghijklmnopqrstuvwxyz'] * 3
+        assert first.at_eof() and second.at_eof()
+        assert first.size == second.size == 26
+
+    @pytest.mark.asyncio
+    async def test_source_waits_for_slowest_branch(self):
+        source = streams.StringStream('x' * 100)
+        branch = streams.TeeStream(source, 'branch', limit=10)
+        reading = asyncio.ensure_future(read_all(source))
+
+        await asyncio.sleep(0.01)
+
+        # Stuck until the branch catches up, with no more than the limit and a chunk buffered
+        assert not reading.done()
+        assert 10 <= len(branch.pipe) < 10 + 4
+
+        assert await read_all(branch, 100) == b'x' * 100
+        assert await reading == b'x' * 100
+
+    @pytest.mark.asyncio
+    async def test_closed_branch_detached(self):
+        source = streams.StringStream('x' * 100)
+        branch = streams.TeeStream(source, 'branch', limit=10)
+
+        branch.close()
+
+        assert 'branch' not in source.writers
+        assert await asyncio.wait_for(read_all(source), 1) == b'x' * 100
+        assert await branch.read() == b''
+
+    @pytest.mark.asyncio
+    async def test_writer_still_fed(self):
+        source = streams.StringStream('abcdef')
+        branch = streams.TeeStream(source, 'branch')
+        source.add_writer('md5', streams.HashStreamWriter(hashlib.md5))
+
+        await asyncio.gather(read_all(source), read_all(branch))
+
+        assert source.writers['md5'].hexdigest == hashlib.md5(b'abcdef').hexdigest()
@@ -1,11 +1,16 @@
 import io
 import os
+import zlib
 import zipfile
+import threading
 
 import pytest
 
 from waterbutler.core import streams
+from waterbutler.core import exceptions
+from waterbutler.core.metrics import MetricsRecord
 from waterbutler.core.utils import AsyncIterator
+from waterbutler.core.streams.zip import ZipCRCStore, choose_compression
 
 from tests.utils import temp_files
 
@@ -164,3 +169,290 @@ class TestZipStreamReader:
                 assert compression_type == zipfile.ZIP_STORED
             else:
                 assert compression_type != zipfile.ZIP_STORED
+
+    @pytest.mark.asyncio
+    async def test_deflate_not_flushed_per_chunk(self):
+        contents = b''.join(b'line %d of a very repetitive text file\n' % i for i in range(100000))
+
+        stream = streams.ZipStreamReader(
+            AsyncIterator([('file.txt', streams.ByteStream(contents))])
+        )
+
+        parts = []
+        while True:
+            chunk = await stream.read(1024)
+            if not chunk:
+                break
+            parts.append(chunk)
+        zip = zipfile.ZipFile(io.BytesIO(b''.join(parts)))
+
+        assert zip.testzip() is None
+        assert zip.open('file.txt').read() == contents
+
+        # As small as compressing the whole file at once
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        whole = compressor.compress(contents) + compressor.flush()
+        assert zip.getinfo('file.txt').compress_size == len(whole)
+
+    @pytest.mark.asyncio
+    async def test_deflates_in_executor(self, monkeypatch):
+        deflated = []
+        deflate = streams.zip.ZipLocalFileData._deflate
+
+        def record(self, chunk, crc, final):
+            deflated.append(threading.current_thread())
+            return deflate(self, chunk, crc, final)
+
+        monkeypatch.setattr(streams.zip.ZipLocalFileData, '_deflate', record)
+        stream = streams.ZipStreamReader(
+            AsyncIterator([('file.txt', streams.ByteStream(b'compressible\n' * 2 ** 16))])
+        )
+
+        zip = zipfile.ZipFile(io.BytesIO(await stream.read()))
+
+        assert zip.testzip() is None
+        assert deflated
+        assert threading.main_thread() not in deflated
+
+    @pytest.mark.asyncio
+    async def test_empty_file(self):
+        stream = streams.ZipStreamReader(
+            AsyncIterator([('empty.txt', streams.ByteStream(b''))])
+        )
+
+        zip = zipfile.ZipFile(io.BytesIO(await stream.read()))
+
+        assert zip.testzip() is None
+        assert zip.open('empty.txt').read() == b''
+
+    @pytest.mark.asyncio
+    async def test_stores_incompressible_entries(self):
+        text = b'some very compressible text\n' * 10000
+        noise = os.urandom(2 ** 18)
+        metrics = MetricsRecord('provider')
+        stream = streams.ZipStreamReader(AsyncIterator([
+            ('text.txt', streams.ByteStream(text)),
+            ('noise.dat', streams.ByteStream(noise)),
+            ('photo', streams.ByteStream(text), 'image/jpeg'),
+            ('folder/', streams.EmptyStream()),
+        ]), metrics=metrics)
+
+        zip = zipfile.ZipFile(io.BytesIO(await stream.read()))
+
+        assert zip.testzip() is None
+        assert zip.getinfo('text.txt').compress_type == zipfile.ZIP_DEFLATED
+        assert zip.getinfo('noise.dat').compress_type == zipfile.ZIP_STORED
+        assert zip.getinfo('photo').compress_type == zipfile.ZIP_STORED
+        assert zip.open('noise.dat').read() == noise
+        assert zip.open('photo').read() == text
+
+        stats = metrics.serialize()['zip']
+        assert stats['entries'] == {
+            'compressible': 1, 'incompressible': 1, 'content_type': 1, 'folder': 1
+        }
+        assert stats['bytes']['stored'] == len(noise) + len(text)
+        assert stats['bytes']['deflated'] == len(text)
+        assert stats['bytes']['deflated_to'] == zip.getinfo('text.txt').compress_size
+
+
+class TestChooseCompression:
+
+    TEXT = b'0123456789 abcdefghij\n' * 1000
+
+    @pytest.mark.parametrize('filename,content_type,head,reason', [
+        ('folder/', None, None, 'folder'),
+        ('archive.zip', 'application/octet-stream', TEXT, 'extension'),
+        ('photo', 'image/jpeg', TEXT, 'content_type'),
+        ('movie.mp4', None, TEXT, 'content_type'),
+        ('movie.mp4', 'application/octet-stream', TEXT, 'content_type'),
+        ('clip', 'video/x-anything', TEXT, 'content_type'),
+        ('data.bin', None, os.urandom(2 ** 16), 'incompressible'),
+        ('data.bin', None, os.urandom(100), 'compressible'),
+        ('notes.txt', 'text/plain', TEXT, 'compressible'),
+        ('notes.txt', None, None, 'compressible'),
+    ])
+    def test_reason(self, filename, content_type, head, reason):
+        compression = choose_compression(filename, content_type, head)
+
+        assert compression.reason == reason
+        if reason == 'compressible':
+            assert compression.compress_type == zipfile.ZIP_DEFLATED
+        else:
+            assert compression.compress_type == zipfile.ZIP_STORED
+
+    def test_large_files_deflated_faster(self, monkeypatch):
+        monkeypatch.setattr(streams.settings, 'ZIP_FAST_COMPRESSION_SIZE', 1000)
+        monkeypatch.setattr(streams.settings, 'ZIP_FAST_COMPRESSION_LEVEL', 1)
+
+        assert choose_compression('notes.txt', size=999).level == \
+            streams.settings.ZIP_COMPRESSION_LEVEL
+        assert choose_compression('notes.txt', size=1000) == \
+            (zipfile.ZIP_DEFLATED, 1, 'large')
+
+
+class StoredEntry:
+
+    def __init__(self, name, data=b'', crc=None, version=None, crc_key=None):
+        self.name = name
+        self.data = data
+        self.size = len(data)
+        self.date_time = (2019, 6, 1, 12, 30, 0)
+        self.version = version
+        self.crc = crc
+        self.crc_key = crc_key
+        self.opened = []
+
+    async def open(self, start, end):
+        self.opened.append((start, end))
+        return streams.ByteStream(self.data[start:end + 1])
+
+
+class TestStoredZipStreamReader:
+
+    @staticmethod
+    def entries():
+        return [
+            StoredEntry('a.txt', b'some text\n' * 500),
+            StoredEntry('empty/'),
+            StoredEntry('empty.txt'),
+            StoredEntry('noise.dat', os.urandom(2 ** 16)),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_size_matches_archive(self):
+        entries = self.entries()
+        stream = streams.StoredZipStreamReader(entries)
+
+        data = await stream.read()
+
+        assert len(data) == stream.size == stream.total_size
+        assert not stream.partial
+        zip = zipfile.ZipFile(io.BytesIO(data))
+        assert zip.testzip() is None
+        assert zip.namelist() == ['a.txt', 'empty/', 'empty.txt', 'noise.dat']
+        assert zip.getinfo('a.txt').compress_type == zipfile.ZIP_STORED
+        assert zip.getinfo('a.txt').date_time == (2019, 6, 1, 12, 30, 0)
+        assert zip.open('noise.dat').read() == entries[3].data
+        assert entries[0].crc == zlib.crc32(entries[0].data)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('start,end', [(0, 99), (40, 5100), (5100, None), (7000, 9000)])
+    async def test_ranges_match_archive(self, start, end):
+        entries = self.entries()
+        whole = await streams.StoredZipStreamReader(entries).read()
+        expected = whole[start:None if end is None else end + 1]
+
+        # Nothing is known about the files when resuming in another process
+        stream = streams.StoredZipStreamReader(
+            [StoredEntry(entry.name, entry.data) for entry in entries], byte_range=(start, end)
+        )
+
+        assert stream.partial
+        assert stream.size == len(expected)
+        assert stream.content_range == 'bytes {}-{}/{}'.format(
+            start, start + len(expected) - 1, len(whole))
+        assert await stream.read() == expected
+
+    @pytest.mark.asyncio
+    async def test_known_crcs_not_hashed(self):
+        entries = self.entries()
+        whole = await streams.StoredZipStreamReader(entries).read()
+        resumed = [StoredEntry(entry.name, entry.data, crc=entry.crc) for entry in entries]
+
+        stream = streams.StoredZipStreamReader(resumed, byte_range=(5100, None))
+
+        assert await stream.read() == whole[5100:]
+        assert resumed[0].opened == []
+        assert resumed[3].opened == [(0, 2 ** 16 - 1)]
+
+    @pytest.mark.asyncio
+    async def test_crcs_shared_through_store(self, tmpdir):
+        entries = [StoredEntry(entry.name, entry.data, crc_key=entry.name)
+                   for entry in self.entries()]
+        stream = streams.StoredZipStreamReader(entries, crc_store=ZipCRCStore(str(tmpdir), 60))
+        whole = await stream.read()
+        stream.close()
+        await stream._saving
+
+        # Resumed in another process started on the same directory
+        resumed = [StoredEntry(entry.name, entry.data, crc_key=entry.crc_key)
+                   for entry in entries]
+        stream = streams.StoredZipStreamReader(resumed, byte_range=(5100, None),
+                                               crc_store=ZipCRCStore(str(tmpdir), 60))
+
+        assert await stream.read() == whole[5100:]
+        assert resumed[0].opened == []
+        assert resumed[3].opened == [(0, 2 ** 16 - 1)]
+        assert stream.stats['loaded'] == 2
+        assert stream.stats['hashed'] == 0
+
+    @pytest.mark.asyncio
+    async def test_stats_without_store(self):
+        entries = self.entries()
+        stream = streams.StoredZipStreamReader(entries, byte_range=(5100, None))
+
+        await stream.read()
+
+        assert stream.stats['entries'] == 4
+        assert stream.stats['known'] == 2
+        assert stream.stats['loaded'] == 0
+        assert stream.stats['hashed'] == 1
+        assert stream.stats['hashed_bytes'] == entries[0].size
+
+    @pytest.mark.asyncio
+    async def test_short_entry(self):
+        entry = StoredEntry('a.txt', b'abc')
+        entry.size = 10
+        stream = streams.StoredZipStreamReader([entry])
+
+        with pytest.raises(exceptions.DownloadError):
+            await stream.read()
+
+    def test_range_past_end(self):
+        stream = streams.StoredZipStreamReader(self.entries())
+
+        with pytest.raises(exceptions.InvalidParameters) as e:
+            stream.select_range((stream.total_size, None))
+
+        assert e.value.code == 416
+
+    def test_etag(self):
+        entries = self.entries()
+        etag = streams.StoredZipStreamReader(entries).etag
+
+        assert streams.StoredZipStreamReader(self.entries()).etag == etag
+        entries[0].version = 'v2'
+        assert streams.StoredZipStreamReader(entries).etag != etag
+
+
+class TestZipCRCStore:
+
+    @pytest.mark.asyncio
+    async def test_save_and_load(self, tmpdir):
+        store = ZipCRCStore(str(tmpdir), 60)
+        assert await store.load('"etag"') == {}
+
+        await store.save('"etag"', {'a': 1})
+        await ZipCRCStore(str(tmpdir), 60).save('"etag"', {'b': 2})
+
+        assert await store.load('"etag"') == {'a': 1, 'b': 2}
+        assert await store.load('"other"') == {}
+
+    @pytest.mark.asyncio
+    async def test_unreadable_ignored(self, tmpdir):
+        store = ZipCRCStore(str(tmpdir), 60)
+        with open(store._path('"etag"'), 'w') as fp:
+            fp.write('not json')
+
+        assert await store.load('"etag"') == {}
+
+    @pytest.mark.asyncio
+    async def test_old_archives_removed(self, tmpdir):
+        store = ZipCRCStore(str(tmpdir), 60)
+        await store.save('"old"', {'a': 1})
+        os.utime(store._path('"old"'), (1, 1))
+        store._pruned = 0
+
+        await store.save('"new"', {'b': 2})
+
+        assert os.listdir(str(tmpdir)) == [os.path.basename(store._path('"new"'))]
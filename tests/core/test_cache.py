@@ -0,0 +1,84 @@
+from unittest import mock
+
+from waterbutler.core import cache
+
+
+class TestLRUCache:
+
+    def test_get_set(self):
+        lru = cache.LRUCache('test_get_set', max_size=2)
+        lru.set('foo', 1)
+
+        assert lru.get('foo') == 1
+        assert lru.get('bar') is None
+        assert lru.get('bar', 'default') == 'default'
+        assert 'foo' in lru
+        assert lru.stats['hits'] == 1
+        assert lru.stats['misses'] == 2
+        assert lru.stats['hit_ratio'] == 1 / 3
+
+    def test_evicts_least_recently_used(self):
+        lru = cache.LRUCache('test_evicts', max_size=2)
+        lru.set('foo', 1)
+        lru.set('bar', 2)
+        lru.get('foo')
+        lru.set('baz', 3)
+
+        assert 'bar' not in lru
+        assert 'foo' in lru
+        assert 'baz' in lru
+        assert lru.evictions == 1
+
+    def test_ttl(self):
+        lru = cache.LRUCache('test_ttl', ttl=10)
+
+        with mock.patch('waterbutler.core.cache.time.monotonic', return_value=100):
+            lru.set('foo', 1)
+            lru.set('bar', 2, ttl=60)
+
+        with mock.patch('waterbutler.core.cache.time.monotonic', return_value=120):
+            assert lru.get('foo') is None
+            assert lru.get('bar') == 2
+
+        assert lru.expirations == 1
+        assert len(lru) == 1
+
+    def test_invalidate_and_clear(self):
+        lru = cache.LRUCache('test_invalidate')
+        lru.set('foo', 1)
+        lru.set('bar', 2)
+
+        lru.invalidate('foo')
+        lru.invalidate('missing')
+        assert 'foo' not in lru
+
+        lru.clear()
+        assert len(lru) == 0
+        assert lru.stats['hits'] == 0
+
+    def test_max_weight(self):
+        lru = cache.LRUCache('test_max_weight', max_weight=10, weigh=len)
+        lru.set('foo', 'aaaa')
+        lru.set('bar', 'bbbb')
+        lru.get('foo')
+        lru.set('baz', 'cccc')
+
+        assert 'bar' not in lru
+        assert lru.weight == 8
+        assert lru.stats['max_weight'] == 10
+
+        lru.set('foo', 'a')
+        assert lru.weight == 5
+
+        lru.set('huge', 'x' * 11)
+        assert 'huge' not in lru
+        assert lru.weight == 5
+
+        lru.invalidate('foo')
+        assert lru.weight == 4
+
+    def test_cache_stats(self):
+        lru = cache.LRUCache('test_cache_stats')
+        lru.get('foo')
+
+        assert cache.cache_stats()['test_cache_stats']['misses'] == 1
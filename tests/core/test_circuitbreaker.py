@@ -0,0 +1,216 @@
+import asyncio
+from unittest import mock
+
+import pytest
+import aiohttp
+import aiohttpretty
+
+from tests import utils
+from waterbutler import settings
+from waterbutler.core import streams
+from waterbutler.core import exceptions
+from waterbutler.core.provider import REQUEST_TIMEOUT, STREAM_UPLOAD_TIMEOUT
+from waterbutler.core.circuitbreaker import (CircuitBreaker, CircuitBreakerRegistry,
+                                             CLOSED, OPEN, HALF_OPEN)
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker('example.com', failure_threshold=3, recovery_timeout=30)
+
+
+@pytest.fixture
+def clock():
+    with mock.patch('waterbutler.core.circuitbreaker.time.monotonic', return_value=1000.0) as clock:
+        yield clock
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_consecutive_failures(self, breaker, clock):
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.before_request()
+        assert breaker.state == CLOSED
+
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.times_opened == 1
+        with pytest.raises(exceptions.ProviderUnavailableError) as exc:
+            breaker.before_request()
+        assert exc.value.code == 503
+        assert exc.value.retry_in == 30
+        assert 'example.com' not in exc.value.message
+        assert exc.value.host == 'example.com'
+
+    def test_success_resets_failures(self, breaker, clock):
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_response(200)
+        breaker.record_failure()
+
+        assert breaker.state == CLOSED
+
+    def test_client_errors_are_not_failures(self, breaker, clock):
+        for _ in range(5):
+            breaker.record_response(404)
+
+        assert breaker.state == CLOSED
+
+    def test_throttled_responses_are_not_failures(self, breaker, clock):
+        for _ in range(5):
+            assert not breaker.record_response(503, {'Retry-After': '10'})
+            assert not breaker.record_response(429, {})
+
+        assert breaker.state == CLOSED
+        assert breaker.stats['failures'] == 0
+        assert breaker.record_response(503, {})
+        assert breaker.stats['failures'] == 1
+
+    def test_half_open_allows_one_trial(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_response(503)
+        clock.return_value += 30
+
+        assert breaker.state == HALF_OPEN
+        breaker.before_request()
+        with pytest.raises(exceptions.ProviderUnavailableError):
+            breaker.before_request()
+
+    def test_successful_trial_closes(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.return_value += 30
+        breaker.before_request()
+
+        breaker.record_success()
+
+        assert breaker.state == CLOSED
+        breaker.before_request()
+
+    def test_failed_trial_reopens(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.return_value += 30
+        breaker.before_request()
+
+        breaker.record_failure()
+
+        assert breaker.state == OPEN
+        assert breaker.times_opened == 2
+
+    def test_released_trial_can_be_retried(self, breaker, clock):
+        for _ in range(3):
+            breaker.record_failure()
+        clock.return_value += 30
+        assert breaker.before_request()
+
+        breaker.release()
+
+        assert breaker.before_request()
+
+
+class TestCircuitBreakerRegistry:
+
+    def test_one_breaker_per_host(self):
+        registry = CircuitBreakerRegistry(failure_threshold=2)
+
+        breaker = registry.get('example.com')
+
+        assert registry.get('example.com') is breaker
+        assert registry.get('example.org') is not breaker
+        assert breaker.failure_threshold == 2
+
+    def test_stats_only_report_troubled_hosts(self):
+        registry = CircuitBreakerRegistry(failure_threshold=1)
+        registry.get('example.org').record_success()
+        registry.get('example.com').record_failure()
+
+        assert registry.stats() == {
+            'example.com': {'state': OPEN, 'failures': 1, 'times_opened': 1},
+        }
+
+
+class StalledSession:
+    """A session to a host that accepts connections but never answers."""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def __getattr__(self, method):
+        async def request(url, *args, timeout=None, **kwargs):
+            self.timeouts.append(timeout)
+            raise aiohttp.ServerTimeoutError('Timeout on reading data from socket')
+        return request
+
+
+class TestMakeRequest:
+
+    @pytest.fixture
+    def registry(self, monkeypatch):
+        registry = CircuitBreakerRegistry(failure_threshold=2, recovery_timeout=30)
+        monkeypatch.setattr('waterbutler.core.circuitbreaker.breakers', registry)
+        return registry
+
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_fails_fast_once_open(self, registry):
+        provider = utils.MockProvider1({}, {}, {})
+        url = 'https://example.com/broken'
+        aiohttpretty.register_uri('GET', url, status=502)
+
+        for _ in range(2):
+            with pytest.raises(exceptions.UnhandledProviderError):
+                await provider.make_request('GET', url, expects=(200, ), retry=0)
+
+        with pytest.raises(exceptions.ProviderUnavailableError):
+            await provider.make_request('GET', url, expects=(200, ), retry=0)
+
+        assert aiohttpretty.has_call(method='GET', uri=url)
+        metrics = provider.provider_metrics.serialize()['requests']
+        assert metrics['count'] == 2
+        assert metrics['circuit_open'] == 1
+        assert metrics['circuit'] == {'host': 'example.com', 'state': OPEN, 'failures': 2,
+                                      'times_opened': 1}
+
+    @pytest.mark.asyncio
+    async def test_stalled_host_opens_circuit(self, registry):
+        provider = utils.MockProvider1({}, {}, {})
+        session = StalledSession()
+        provider.get_or_create_session = lambda url, connector=None: session
+
+        for method in ('HEAD', 'DELETE'):
+            with pytest.raises(asyncio.TimeoutError):
+                await provider.make_request(method, 'https://stalled.example.com/', retry=0)
+
+        assert registry.get('stalled.example.com').state == OPEN
+        assert session.timeouts == [REQUEST_TIMEOUT, REQUEST_TIMEOUT]
+        assert REQUEST_TIMEOUT.sock_read == settings.AIOHTTP_READ_TIMEOUT
+
+    @pytest.mark.asyncio
+    async def test_streamed_upload_has_no_read_timeout(self, registry):
+        provider = utils.MockProvider1({}, {}, {})
+        session = StalledSession()
+        provider.get_or_create_session = lambda url, connector=None: session
+
+        with pytest.raises(asyncio.TimeoutError):
+            await provider.make_request('PUT', 'https://upload.example.com/', retry=0,
+                                        data=streams.StringStream('data'))
+
+        assert session.timeouts == [STREAM_UPLOAD_TIMEOUT]
+        assert STREAM_UPLOAD_TIMEOUT.sock_read is None
+
+    @pytest.mark.asyncio
+    async def test_trial_released_when_request_is_not_sent(self, registry, clock):
+        provider = utils.MockProvider1({}, {}, {})
+        breaker = registry.get('example.com')
+        for _ in range(2):
+            breaker.record_failure()
+        clock.return_value += 30
+
+        with pytest.raises(exceptions.WaterButlerError):
+            await provider.make_request('TRACE', 'https://example.com/', retry=0)
+
+        assert breaker.state == HALF_OPEN
+        assert breaker.before_request()
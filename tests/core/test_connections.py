@@ -0,0 +1,97 @@
+from unittest import mock
+
+import pytest
+import aiohttp
+
+from tests import utils
+from waterbutler.core.connections import ConnectionPool
+
+
+@pytest.fixture
+def pool():
+    return ConnectionPool(limit=10, limit_per_host=2, keepalive_timeout=5, dns_cache_ttl=60)
+
+
+class TestConnectionPool:
+
+    @pytest.mark.asyncio
+    async def test_same_host_shares_session(self, pool):
+        first = pool.get_session('https://example.com/foo')
+        second = pool.get_session('https://example.com/bar?baz=1')
+
+        assert first is second
+        assert isinstance(first.cookie_jar, aiohttp.DummyCookieJar)
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_different_hosts_get_own_sessions(self, pool):
+        first = pool.get_session('https://example.com/foo')
+        second = pool.get_session('https://example.org/foo')
+        third = pool.get_session('http://example.com/foo')
+
+        assert len({id(first), id(second), id(third)}) == 3
+        assert len(pool.sessions()) == 3
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_connector_settings(self, pool):
+        session = pool.get_session('https://example.com/')
+
+        assert session.connector.limit == 10
+        assert session.connector.limit_per_host == 2
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_custom_connector_adopted_then_closed(self, pool):
+        connector = aiohttp.TCPConnector(ssl=False)
+        session = pool.get_session('https://example.com/', connector=connector)
+        assert session.connector is connector
+
+        duplicate = aiohttp.TCPConnector(ssl=False)
+        assert pool.get_session('https://example.com/', connector=duplicate) is session
+        assert duplicate.closed
+
+        default = pool.get_session('https://example.com/')
+        assert default is not session
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_close(self, pool):
+        session = pool.get_session('https://example.com/')
+        await pool.close()
+
+        assert session.closed
+        assert pool.sessions() == []
+        assert pool.get_session('https://example.com/') is not session
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_session_timeout(self):
+        timeout = aiohttp.ClientTimeout(total=60, connect=10)
+        pool = ConnectionPool(timeout=timeout)
+
+        assert pool.get_session('https://example.com/').timeout is timeout
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_request_uses_pooled_session(self, pool):
+        session = pool.get_session('https://example.com/')
+        with mock.patch.object(session, 'request') as mock_request:
+            pool.request('GET', 'https://example.com/foo', params={'a': 'b'})
+
+        mock_request.assert_called_once_with('GET', 'https://example.com/foo', params={'a': 'b'})
+        await pool.close()
+
+
+class TestProviderSessions:
+
+    @pytest.mark.asyncio
+    async def test_providers_share_pooled_session(self, monkeypatch, pool):
+        monkeypatch.setattr('waterbutler.core.connections.provider_pool', pool)
+        provider1 = utils.MockProvider1({'user': 'name'}, {'pass': 'word'}, {})
+        provider2 = utils.MockProvider1({'user': 'name'}, {'pass': 'phrase'}, {})
+
+        assert (provider1.get_or_create_session('https://example.com/') is
+                provider2.get_or_create_session('https://example.com/'))
+        await pool.close()
+
@@ -1,9 +1,13 @@
+import asyncio
+
 import pytest
 
 from tests import utils
 from unittest import mock
 from waterbutler.core import metadata
 from waterbutler.core import exceptions
+from waterbutler import settings
+from waterbutler.core.path import WaterButlerPath
 
 @pytest.fixture
 def provider1():
@@ -103,6 +107,30 @@ class TestBaseProvider:
         assert str(path) == str(new_path.parent)
         assert new_path.name == 'text_file.txt'
 
+    @pytest.mark.asyncio
+    async def test_folder_tree_not_supported(self, provider1):
+        assert await provider1.folder_tree(WaterButlerPath('/folder/')) is None
+
+    def test_folder_tree_entries(self, provider1):
+        items = [mock.Mock(path=path) for path in (
+            '/folder/', '/folder/a.txt', '/folder/sub/deep/b.txt', '/folder/sub/', '/folder/empty/',
+        )]
+
+        entries = provider1._folder_tree_entries(WaterButlerPath('/folder/'), items)
+
+        assert [(str(parent), item.path) for parent, item in entries] == [
+            ('/folder/', '/folder/a.txt'),
+            ('/folder/sub/deep/', '/folder/sub/deep/b.txt'),
+            ('/folder/', '/folder/sub/'),
+            ('/folder/', '/folder/empty/'),
+        ]
+        assert str(entries[1][0].parent) == '/folder/sub/'
+
+    def test_folder_tree_entries_outside_folder(self, provider1):
+        items = [mock.Mock(path='/folder/a.txt'), mock.Mock(path='/other/b.txt')]
+
+        assert provider1._folder_tree_entries(WaterButlerPath('/folder/'), items) is None
+
 
 class TestHandleNameConflict:
 
@@ -315,6 +343,7 @@ class TestCopy:
             provider1,
             src_path,
             dest_path.child('path', folder=True),
+            can_intra=provider1.can_intra_copy,
         )
 
     @pytest.mark.asyncio
@@ -331,6 +360,174 @@ class TestCopy:
         provider1.download.assert_called_once_with(src_path, version=None, revision=None)
         provider1.upload.assert_called_once_with('Download return', dest_path)
 
+    @pytest.mark.asyncio
+    async def test_copies_large_files_in_parts(self, provider1, provider2, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_MIN_SIZE', 1000)
+        src_path = await provider1.validate_path('/source/path')
+        dest_path = await provider2.validate_path('/destination/path')
+        metadata = utils.MockFileMetadata()
+        upload = mock.Mock(part_size=500)
+
+        provider1.can_download_ranges = lambda: True
+        provider1.metadata = utils.MockCoroutine(return_value=metadata)
+        provider2.can_upload_parts = lambda: True
+        provider2.create_part_upload = utils.MockCoroutine(return_value=upload)
+        provider2.upload = utils.MockCoroutine()
+
+        with mock.patch('waterbutler.core.transfer.parallel_copy',
+                        new=utils.MockCoroutine(return_value='Parts return')) as parallel_copy:
+            ret = await provider1.copy(provider2, src_path, dest_path, handle_naming=False)
+
+        assert ret == 'Parts return'
+        provider2.create_part_upload.assert_called_once_with(dest_path, 1337)
+        parallel_copy.assert_called_once_with(provider1, src_path, upload, 1337, version=None)
+        assert not provider2.upload.called
+
+    @pytest.mark.asyncio
+    async def test_listed_small_files_not_looked_up(self, provider1, provider2, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_MIN_SIZE', 2000)
+        src_path = await provider1.validate_path('/source/path')
+        dest_path = await provider2.validate_path('/destination/path')
+
+        provider1.can_download_ranges = lambda: True
+        provider1.metadata = utils.MockCoroutine()
+        provider1.download = utils.MockCoroutine(return_value='Download return')
+        provider2.can_upload_parts = lambda: True
+        provider2.upload = utils.MockCoroutine(return_value='Upload return')
+
+        ret = await provider1.copy(provider2, src_path, dest_path, handle_naming=False, size=1999)
+
+        assert ret == 'Upload return'
+        assert not provider1.metadata.called
+
+    @pytest.mark.asyncio
+    async def test_streams_small_files(self, provider1, provider2, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_MIN_SIZE', 2000)
+        src_path = await provider1.validate_path('/source/path')
+        dest_path = await provider2.validate_path('/destination/path')
+
+        provider1.can_download_ranges = lambda: True
+        provider1.metadata = utils.MockCoroutine(return_value=utils.MockFileMetadata())
+        provider1.download = utils.MockCoroutine(return_value='Download return')
+        provider2.can_upload_parts = lambda: True
+        provider2.create_part_upload = utils.MockCoroutine()
+        provider2.upload = utils.MockCoroutine(return_value='Upload return')
+
+        ret = await provider1.copy(provider2, src_path, dest_path, handle_naming=False)
+
+        assert ret == 'Upload return'
+        assert not provider2.create_part_upload.called
+        provider2.upload.assert_called_once_with('Download return', dest_path)
+
+
+class TreeItem:
+
+    def __init__(self, name, node):
+        self.name = name
+        self.is_folder = isinstance(node, dict)
+        self.size_as_int = None if self.is_folder else len(name)
+
+
+class TestFolderFileOp:
+
+    TREE = {
+        'a.txt': 0.02,
+        'slow.txt': 0.1,
+        'sub': {
+            'b.txt': 0.02,
+            'deep': {'c.txt': 0.02, 'empty': {}},
+        },
+    }
+
+    def tree_providers(self, provider1, provider2):
+        """Serve TREE from provider1, and copy its files to provider2 taking as many seconds as
+        given for the file, noting what happened when.
+        """
+        events, running = [], []
+
+        async def metadata(path, **kwargs):
+            node = self.TREE
+            for part in path.path.strip('/').split('/')[1:]:
+                node = node[part]
+            return [TreeItem(name, child) for name, child in node.items()]
+
+        async def create_folder(path, **kwargs):
+            events.append(('folder', str(path)))
+            return utils.MockFolderMetadata()
+
+        async def copy(dest_provider, src_path, dest_path, handle_naming=True, size=None):
+            events.append(('size', (src_path.name, size)))
+            running.append(src_path.name)
+            events.append(('max', len(running)))
+            node = self.TREE
+            for part in src_path.path.strip('/').split('/')[1:]:
+                node = node[part]
+            await asyncio.sleep(0 if isinstance(node, dict) else node)
+            running.remove(src_path.name)
+            events.append(('file', str(dest_path)))
+            return utils.MockFileMetadata(), True
+
+        provider1.metadata = metadata
+        provider1.copy = copy
+        provider2.create_folder = create_folder
+        provider2.delete = utils.MockCoroutine(
+            side_effect=exceptions.ProviderError('not found', code=404))
+        return events
+
+    @pytest.mark.asyncio
+    async def test_whole_tree(self, provider1, provider2, monkeypatch):
+        monkeypatch.setattr(settings, 'OP_CONCURRENCY', 3)
+        events = self.tree_providers(provider1, provider2)
+
+        folder, created = await provider1._folder_file_op(
+            provider1.copy, provider2, WaterButlerPath('/src/'), WaterButlerPath('/dest/'))
+
+        assert created
+        assert len(folder.children) == 3
+        sub = [child for child in folder.children if hasattr(child, 'children')][0]
+        assert len(sub.children) == 2
+        deep = [child for child in sub.children if hasattr(child, 'children')][0]
+        assert len(deep.children) == 2
+
+        files = [path for kind, path in events if kind == 'file']
+        assert sorted(files) == ['/dest/a.txt', '/dest/slow.txt', '/dest/sub/b.txt',
+                                 '/dest/sub/deep/c.txt']
+        # Subfolders are created and copied while the slow file is still going
+        assert files[-1] == '/dest/slow.txt'
+        assert max(count for kind, count in events if kind == 'max') <= 3
+        assert ('folder', '/dest/sub/deep/empty/') in events
+        # Files are handed their size from the listing
+        assert ('size', ('slow.txt', 8)) in events
+
+    @pytest.mark.asyncio
+    async def test_intra_subfolders_handed_over_whole(self, provider1, provider2):
+        events = self.tree_providers(provider1, provider2)
+
+        def can_intra(dest_provider, path):
+            return path.name == 'sub'
+
+        folder, created = await provider1._folder_file_op(
+            provider1.copy, provider2, WaterButlerPath('/src/'), WaterButlerPath('/dest/'),
+            can_intra=can_intra)
+
+        files = sorted(path for kind, path in events if kind == 'file')
+        assert files == ['/dest/a.txt', '/dest/slow.txt', '/dest/sub/']
+        assert events.count(('folder', '/dest/sub/')) == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_the_rest(self, provider1, provider2, monkeypatch):
+        events = self.tree_providers(provider1, provider2)
+        provider2.create_folder = utils.MockCoroutine(side_effect=[
+            utils.MockFolderMetadata(), exceptions.CreateFolderError('nope', code=500),
+        ])
+
+        with pytest.raises(exceptions.CreateFolderError):
+            await provider1._folder_file_op(
+                provider1.copy, provider2, WaterButlerPath('/src/'), WaterButlerPath('/dest/'))
+        await asyncio.sleep(0.15)
+
+        assert ('file', '/dest/slow.txt') not in events
+
 
 class TestMove:
     @pytest.mark.asyncio
@@ -434,6 +631,7 @@ class TestMove:
             provider1,
             src_path,
             dest_path.child('path', folder=True),
+            can_intra=provider1.can_intra_move,
         )
 
     @pytest.mark.asyncio
@@ -452,7 +650,8 @@ class TestMove:
             provider1,
             src_path,
             dest_path,
-            handle_naming=False
+            handle_naming=False,
+            size=None,
         )
 
     @pytest.mark.asyncio
@@ -472,7 +671,8 @@ class TestMove:
             provider1,
             src_path,
             dest_path,
-            handle_naming=False
+            handle_naming=False,
+            size=None,
         )
 
     def test_build_range_header(self, provider1):
@@ -0,0 +1,199 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from tests import utils
+from waterbutler.core import ratelimit
+from waterbutler.core.ratelimit import TokenBucket, RateLimiter
+
+
+@pytest.fixture
+def bucket():
+    return TokenBucket(rate=10, burst=2, max_wait=30)
+
+
+class TestTokenBucket:
+
+    def test_burst_is_free(self, bucket):
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+
+    def test_empty_bucket_waits_in_turn(self, bucket):
+        bucket.reserve()
+        bucket.reserve()
+
+        first = bucket.reserve()
+        second = bucket.reserve()
+
+        assert first == pytest.approx(0.1, abs=0.01)
+        assert second == pytest.approx(0.2, abs=0.01)
+
+    @pytest.mark.asyncio
+    async def test_acquire(self, bucket):
+        bucket.reserve()
+        bucket.reserve()
+
+        waited = await bucket.acquire()
+
+        assert waited == pytest.approx(0.1, abs=0.01)
+
+    def test_pause(self, bucket):
+        bucket.pause(5)
+
+        assert bucket.paused_for == pytest.approx(5, abs=0.1)
+        assert bucket.reserve() == pytest.approx(5.1, abs=0.1)
+
+    def test_pause_is_capped(self, bucket):
+        bucket.pause(3600)
+
+        assert bucket.paused_for == pytest.approx(30, abs=0.1)
+
+    def test_throttled_status_halves_rate(self, bucket):
+        bucket.observe(429, {})
+        assert bucket.rate == 5
+
+        bucket.observe(503, {})
+        assert bucket.rate == 2.5
+
+    def test_rate_never_below_min(self, bucket):
+        for _ in range(10):
+            bucket.slow_down()
+
+        assert bucket.rate == bucket.min_rate == 10 / 16
+
+    def test_success_recovers_rate(self, bucket):
+        bucket.slow_down()
+        bucket.observe(200, {})
+
+        assert bucket.rate == 5.5
+
+        for _ in range(20):
+            bucket.observe(200, {})
+
+        assert bucket.rate == 10
+
+    def test_retry_after_pauses(self, bucket):
+        bucket.observe(429, {'Retry-After': '3'})
+
+        assert bucket.paused_for == pytest.approx(3, abs=0.1)
+        assert bucket.rate == 5
+
+    def test_rate_limit_remaining_shrinks_rate(self, bucket):
+        reset = int(time.time()) + 100
+        bucket.observe(200, {'X-RateLimit-Remaining': '200', 'X-RateLimit-Reset': str(reset)})
+
+        assert bucket.rate == pytest.approx(2, abs=0.1)
+        assert bucket.paused_for == 0
+
+    def test_rate_limit_remaining_raises_rate_again(self):
+        bucket = TokenBucket(rate=5000 / 3600, burst=100)
+
+        bucket.observe(200, {'X-RateLimit-Remaining': '50', 'X-RateLimit-Reset': '3000'})
+        assert bucket.rate == pytest.approx(bucket.min_rate)
+
+        for _ in range(100):
+            bucket.observe(200, {'X-RateLimit-Remaining': '4999', 'X-RateLimit-Reset': '3600'})
+        assert bucket.rate == pytest.approx(4999 / 3600)
+
+    def test_rate_limit_remaining_never_above_max(self, bucket):
+        bucket.observe(200, {'X-RateLimit-Remaining': '5000', 'X-RateLimit-Reset': '10'})
+
+        assert bucket.rate == 10
+
+    def test_rate_restored_when_window_resets(self, bucket, monkeypatch):
+        bucket.observe(200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '5'})
+        assert bucket.rate == 2
+
+        later = time.monotonic() + 6
+        monkeypatch.setattr(ratelimit.time, 'monotonic', lambda: later)
+        bucket.reserve()
+
+        assert bucket.rate == 10
+
+    def test_rate_limit_exhausted_pauses_until_reset(self, bucket):
+        reset = int(time.time()) + 10
+        bucket.observe(403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+
+        assert bucket.paused_for == pytest.approx(10, abs=1.1)
+
+
+class TestParseHeaders:
+
+    @pytest.mark.parametrize('value,expected', [
+        (None, None),
+        ('garbage', None),
+        ('120', 120),
+        ('-5', 0),
+    ])
+    def test_retry_after(self, value, expected):
+        assert ratelimit.parse_retry_after(value) == expected
+
+    def test_retry_after_http_date(self):
+        value = formatdate(time.time() + 60, usegmt=True)
+
+        assert ratelimit.parse_retry_after(value) == pytest.approx(60, abs=1.1)
+
+    @pytest.mark.parametrize('value,expected', [
+        (None, None),
+        ('soon', None),
+        ('30', 30),
+    ])
+    def test_rate_limit_reset(self, value, expected):
+        assert ratelimit.parse_rate_limit_reset(value) == expected
+
+    def test_rate_limit_reset_timestamp(self):
+        value = str(int(time.time()) + 60)
+
+        assert ratelimit.parse_rate_limit_reset(value) == pytest.approx(60, abs=1.1)
+
+    @pytest.mark.parametrize('status,headers,expected', [
+        (429, {}, True),
+        (503, {'Retry-After': '10'}, True),
+        (403, {'X-RateLimit-Remaining': '0'}, True),
+        (503, {}, False),
+        (502, {'Retry-After': '10'}, False),
+        (200, {'X-RateLimit-Remaining': '0'}, False),
+    ])
+    def test_is_throttled(self, status, headers, expected):
+        assert ratelimit.is_throttled(status, headers) == expected
+
+
+class TestProviderBuckets:
+
+    @pytest.fixture
+    def limiter(self, monkeypatch):
+        limiter = RateLimiter(max_buckets=10)
+        monkeypatch.setattr('waterbutler.core.ratelimit.limiter', limiter)
+        return limiter
+
+    def test_bucket_per_host(self, limiter):
+        provider = utils.MockProvider1({}, {'token': 'a'}, {})
+
+        first = provider.rate_limit_bucket('https://example.com/foo')
+
+        assert provider.rate_limit_bucket('https://example.com/bar') is first
+        assert provider.rate_limit_bucket('https://example.org/foo') is not first
+        assert utils.MockProvider1({}, {'token': 'b'}, {}).rate_limit_bucket(
+            'https://example.com/foo'
+        ) is first
+
+    def test_bucket_per_credential(self, limiter, monkeypatch):
+        monkeypatch.setattr(utils.MockProvider1, 'RATE_LIMIT', (2, 4))
+        monkeypatch.setattr(utils.MockProvider1, 'RATE_LIMIT_PER_CREDENTIAL', True)
+        provider_a = utils.MockProvider1({}, {'token': 'a'}, {})
+        provider_b = utils.MockProvider1({}, {'token': 'b'}, {})
+
+        bucket = provider_a.rate_limit_bucket('https://example.com/')
+
+        assert bucket.max_rate == 2
+        assert bucket.burst == 4
+        assert provider_b.rate_limit_bucket('https://example.com/') is not bucket
+        assert utils.MockProvider1({}, {'token': 'a'}, {}).rate_limit_bucket(
+            'https://example.com/'
+        ) is bucket
+
+    def test_disabled(self, limiter, monkeypatch):
+        monkeypatch.setattr('waterbutler.core.provider.wb_settings.RATE_LIMIT_ENABLED', False)
+
+        assert utils.MockProvider1({}, {}, {}).rate_limit_bucket('https://example.com/') is None
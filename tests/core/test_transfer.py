@@ -0,0 +1,378 @@
+import asyncio
+
+import pytest
+import aiohttp
+
+from tests import utils
+from waterbutler import settings
+from waterbutler.core import streams
+from waterbutler.core import transfer
+from waterbutler.core import exceptions
+from waterbutler.core.path import WaterButlerPath
+
+
+DATA = bytes(range(256)) * 40
+
+
+class RangeProvider(utils.MockProvider1):
+    """Serves DATA, cutting the first ``short`` responses off halfway."""
+
+    short = 0
+
+    def can_download_ranges(self):
+        return True
+
+    async def download(self, path, range=None, **kwargs):
+        start, end = range
+        data = DATA[start:end + 1]
+        if self.short:
+            self.short -= 1
+            data = data[:len(data) // 2]
+        return streams.StringStream(data)
+
+
+class StalledStream(streams.BaseStream):
+    """Serves DATA, stopping after ``stall_at`` bytes until ``resume`` is set."""
+
+    def __init__(self, stall_at):
+        super().__init__()
+        self.stall_at = stall_at
+        self.offset = 0
+        self.resume = asyncio.Event()
+
+    @property
+    def size(self):
+        return len(DATA)
+
+    async def _read(self, n=-1):
+        if self.offset >= self.stall_at:
+            await self.resume.wait()
+        end = len(DATA) if n < 0 else self.offset + n
+        if self.offset < self.stall_at:
+            end = min(end, self.stall_at)
+        data = DATA[self.offset:end]
+        self.offset += len(data)
+        return data
+
+
+class WatchedBudget(transfer.MemoryBudget):
+    """Keeps track of the most bytes part uploads took at once."""
+
+    most_used = 0
+
+    def try_acquire(self, nbytes):
+        held = super().try_acquire(nbytes)
+        self.most_used = max(self.most_used, self.used)
+        return held
+
+
+class RecordingUpload(transfer.PartUpload):
+    """Keeps the parts it is sent, and the numbers of those sent as they were read from the
+    stream, raising the exceptions listed in ``failures`` for a part number first.
+    """
+
+    def __init__(self, part_size, failures=None):
+        super().__init__(part_size)
+        self.failures = failures or {}
+        self.parts = {}
+        self.streamed = []
+        self.running = self.most_running = 0
+        self.completed = None
+        self.aborted = False
+
+    async def upload_part(self, number, data):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures.get(number):
+                raise self.failures[number].pop(0)
+            self.parts[number] = data
+            return 'part-{}'.format(number)
+        finally:
+            self.running -= 1
+
+    async def upload_part_stream(self, number, stream, size):
+        self.streamed.append(number)
+        return await super().upload_part_stream(number, stream, size)
+
+    async def complete(self, parts):
+        self.completed = parts
+        return utils.MockFileMetadata(), True
+
+    async def abort(self):
+        self.aborted = True
+
+
+@pytest.fixture
+def source():
+    return RangeProvider({}, {}, {})
+
+
+@pytest.fixture
+def src_path():
+    return WaterButlerPath('/big.bin')
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(transfer.utils, 'backoff_delay', lambda attempt: 0)
+
+
+class TestParallelCopy:
+
+    @pytest.mark.asyncio
+    async def test_copies_every_part(self, source, src_path, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_CONCURRENCY', 3)
+        upload = RecordingUpload(1000)
+
+        metadata, created = await transfer.parallel_copy(source, src_path, upload, len(DATA))
+
+        assert created
+        assert isinstance(metadata, utils.MockFileMetadata)
+        assert upload.completed == ['part-{}'.format(number) for number in range(1, 12)]
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert len(upload.parts[11]) == 240
+        assert upload.most_running == 3
+        assert not upload.aborted
+        assert source.provider_metrics.serialize()['copy']['parallel'] == {
+            'size': len(DATA), 'parts': 11, 'part_size': 1000, 'concurrency': 3, 'retries': 0,
+        }
+
+    @pytest.mark.asyncio
+    async def test_memory_budget_limits_concurrency(self, source, src_path, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_CONCURRENCY', 8)
+        monkeypatch.setattr(transfer, 'memory', transfer.MemoryBudget(2000))
+        upload = RecordingUpload(1000)
+
+        await transfer.parallel_copy(source, src_path, upload, len(DATA))
+
+        assert upload.most_running == 2
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert transfer.memory.used == 0
+
+    @pytest.mark.asyncio
+    async def test_memory_budget_is_shared_by_copies(self, source, src_path, monkeypatch):
+        monkeypatch.setattr(settings, 'PARALLEL_COPY_CONCURRENCY', 4)
+        monkeypatch.setattr(transfer, 'memory', transfer.MemoryBudget(3000))
+        first, second = RecordingUpload(1000), RecordingUpload(1000)
+        most_used = 0
+
+        async def watch():
+            nonlocal most_used
+            while True:
+                most_used = max(most_used, transfer.memory.used)
+                await asyncio.sleep(0.001)
+
+        watcher = asyncio.ensure_future(watch())
+        await asyncio.gather(
+            transfer.parallel_copy(source, src_path, first, len(DATA)),
+            transfer.parallel_copy(source, src_path, second, len(DATA)),
+        )
+        watcher.cancel()
+
+        # Either copy alone would hold up to 4000 bytes
+        assert most_used <= 3000
+        assert transfer.memory.used == 0
+        assert b''.join(first.parts[number] for number in range(1, 12)) == DATA
+        assert b''.join(second.parts[number] for number in range(1, 12)) == DATA
+
+    @pytest.mark.asyncio
+    async def test_retries_failed_parts(self, source, src_path):
+        source.short = 1
+        upload = RecordingUpload(1000, failures={
+            3: [exceptions.UploadError('busy', code=503), aiohttp.ClientOSError()],
+        })
+
+        await transfer.parallel_copy(source, src_path, upload, len(DATA))
+
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert not upload.aborted
+        assert source.provider_metrics.serialize()['copy']['parallel']['retries'] == 3
+
+    @pytest.mark.asyncio
+    async def test_gives_up_and_aborts(self, source, src_path, monkeypatch):
+        monkeypatch.setattr(settings, 'PART_RETRIES', 1)
+        upload = RecordingUpload(1000, failures={
+            2: [exceptions.UploadError('busy', code=503), exceptions.UploadError('busy', code=503)],
+        })
+
+        with pytest.raises(exceptions.UploadError):
+            await transfer.parallel_copy(source, src_path, upload, len(DATA))
+
+        assert upload.aborted
+        assert upload.completed is None
+        assert len(upload.parts) < 11
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self, source, src_path):
+        upload = RecordingUpload(1000, failures={
+            1: [exceptions.UploadError('denied', code=403)],
+        })
+
+        with pytest.raises(exceptions.UploadError):
+            await transfer.parallel_copy(source, src_path, upload, len(DATA))
+
+        assert upload.aborted
+        assert 1 not in upload.parts
+
+
+class TestMemoryBudget:
+
+    @pytest.mark.asyncio
+    async def test_waits_in_turn(self):
+        budget = transfer.MemoryBudget(100)
+        assert await budget.acquire(60) == 60
+
+        second = asyncio.ensure_future(budget.acquire(60))
+        third = asyncio.ensure_future(budget.acquire(10))
+        await asyncio.sleep(0.01)
+        assert not second.done() and not third.done()
+
+        budget.release(60)
+        await asyncio.sleep(0.01)
+
+        assert second.result() == 60 and third.result() == 10
+        assert budget.used == 70
+
+    @pytest.mark.asyncio
+    async def test_oversized_takes_everything(self):
+        budget = transfer.MemoryBudget(100)
+
+        assert await budget.acquire(500) == 100
+        assert budget.used == 100
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_gives_back(self):
+        budget = transfer.MemoryBudget(100)
+        await budget.acquire(100)
+        waiter = asyncio.ensure_future(budget.acquire(50))
+        await asyncio.sleep(0.01)
+
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        budget.release(100)
+
+        assert budget.used == 0
+        assert await budget.acquire(100) == 100
+
+
+class TestUploadStream:
+
+    @pytest.mark.asyncio
+    async def test_uploads_every_part(self, monkeypatch):
+        monkeypatch.setattr(settings, 'PART_UPLOAD_CONCURRENCY', 3)
+        upload = RecordingUpload(1000)
+
+        parts = await transfer.upload_stream(streams.StringStream(DATA), upload, len(DATA))
+
+        assert parts == ['part-{}'.format(number) for number in range(1, 12)]
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert upload.most_running == 3
+        assert upload.completed is None
+
+    @pytest.mark.asyncio
+    async def test_memory_budget_limits_buffers(self, monkeypatch):
+        monkeypatch.setattr(settings, 'PART_UPLOAD_CONCURRENCY', 8)
+        monkeypatch.setattr(transfer, 'memory', WatchedBudget(2000))
+        upload = RecordingUpload(1000)
+
+        await transfer.upload_stream(streams.StringStream(DATA), upload, len(DATA))
+
+        # Parts that didn't fit were sent as they were read instead of waiting for room
+        assert transfer.memory.most_used == 2000
+        assert 1 in upload.streamed and len(upload.streamed) > 1
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert transfer.memory.used == 0
+
+    @pytest.mark.asyncio
+    async def test_stalled_client_does_not_hold_up_others(self, monkeypatch):
+        monkeypatch.setattr(transfer, 'memory', transfer.MemoryBudget(1000))
+        # Stalls halfway through the second part, which is buffered and fills the budget
+        stalled, stalled_upload = StalledStream(1500), RecordingUpload(1000)
+        other_upload = RecordingUpload(1000)
+
+        stalled_task = asyncio.ensure_future(
+            transfer.upload_stream(stalled, stalled_upload, len(DATA)),
+        )
+        await asyncio.sleep(0.05)
+        parts = await asyncio.wait_for(
+            transfer.upload_stream(streams.StringStream(DATA), other_upload, len(DATA)),
+            timeout=1,
+        )
+
+        assert parts == ['part-{}'.format(number) for number in range(1, 12)]
+        assert not stalled_task.done()
+
+        stalled.resume.set()
+        await stalled_task
+
+        assert b''.join(stalled_upload.parts[number] for number in range(1, 12)) == DATA
+        assert transfer.memory.used == 0
+
+    @pytest.mark.asyncio
+    async def test_memory_budget_is_shared_with_copies(self, source, src_path, monkeypatch):
+        monkeypatch.setattr(transfer, 'memory', transfer.MemoryBudget(2000))
+        copy, upload = RecordingUpload(1000), RecordingUpload(1000)
+        most_used = 0
+
+        async def watch():
+            nonlocal most_used
+            while True:
+                most_used = max(most_used, transfer.memory.used)
+                await asyncio.sleep(0.001)
+
+        watcher = asyncio.ensure_future(watch())
+        await asyncio.gather(
+            transfer.parallel_copy(source, src_path, copy, len(DATA)),
+            transfer.upload_stream(streams.StringStream(DATA), upload, len(DATA)),
+        )
+        watcher.cancel()
+
+        assert most_used <= 2000
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+        assert transfer.memory.used == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_gives_memory_back(self, monkeypatch):
+        monkeypatch.setattr(transfer, 'memory', transfer.MemoryBudget(2000))
+        upload = RecordingUpload(1000, failures={
+            2: [exceptions.UploadError('denied', code=403)],
+        })
+
+        with pytest.raises(exceptions.UploadError):
+            await transfer.upload_stream(streams.StringStream(DATA), upload, len(DATA))
+
+        assert transfer.memory.used == 0
+
+    @pytest.mark.asyncio
+    async def test_retries_failed_parts_from_their_buffer(self):
+        upload = RecordingUpload(1000, failures={
+            4: [exceptions.UploadError('busy', code=500), asyncio.TimeoutError()],
+        })
+
+        await transfer.upload_stream(streams.StringStream(DATA), upload, len(DATA))
+
+        assert b''.join(upload.parts[number] for number in range(1, 12)) == DATA
+
+    @pytest.mark.asyncio
+    async def test_failure_stops_reading(self):
+        stream = streams.StringStream(DATA)
+        upload = RecordingUpload(1000, failures={
+            1: [exceptions.UploadError('denied', code=403)],
+        })
+
+        with pytest.raises(exceptions.UploadError):
+            await transfer.upload_stream(stream, upload, len(DATA))
+
+        assert not stream.at_eof()
+        assert not upload.aborted
+
+    @pytest.mark.asyncio
+    async def test_short_stream(self):
+        upload = RecordingUpload(1000)
+
+        with pytest.raises(exceptions.UploadError) as exc:
+            await transfer.upload_stream(streams.StringStream(DATA[:2500]), upload, len(DATA))
+
+        assert exc.value.code == 400
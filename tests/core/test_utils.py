@@ -4,6 +4,53 @@ from unittest import mock
 import pytest
 
 from waterbutler.core import utils
+from waterbutler.core import streams
+from waterbutler.core import exceptions
+from waterbutler.core.path import WaterButlerPath
+
+
+class TestMakeProvider:
+
+    def test_unknown_provider(self, monkeypatch):
+        monkeypatch.setattr(utils, '_PROVIDER_CLASSES', {})
+
+        with pytest.raises(exceptions.ProviderNotFound):
+            utils.make_provider('notarealprovider', {}, {}, {})
+
+    def test_provider_class_is_cached(self, monkeypatch):
+        monkeypatch.setattr(utils, '_PROVIDER_CLASSES', {})
+        provider_class = mock.Mock()
+        manager = mock.Mock(driver=provider_class)
+
+        with mock.patch('waterbutler.core.utils.driver.DriverManager',
+                        return_value=manager) as mock_manager:
+            first = utils.make_provider('mock', {'a': 1}, {'b': 2}, {'c': 3}, callback_url='x')
+            second = utils.make_provider('mock', {'a': 1}, {'b': 2}, {'c': 3})
+
+        mock_manager.assert_called_once_with(namespace='waterbutler.providers', name='mock',
+                                             invoke_on_load=False)
+        provider_class.assert_any_call({'a': 1}, {'b': 2}, {'c': 3}, callback_url='x')
+        assert first is second is provider_class.return_value
+
+    def test_load_provider_classes(self, monkeypatch):
+        monkeypatch.setattr(utils, '_PROVIDER_CLASSES', {})
+        loaded = utils.load_provider_classes()
+
+        assert 'osfstorage' in loaded
+        assert utils.get_provider_class('osfstorage').NAME == 'osfstorage'
+
+
+class TestBackoffDelay:
+
+    @pytest.mark.parametrize('attempt,upper', [(0, 2), (1, 4), (3, 16), (10, 30)])
+    def test_full_jitter_within_bounds(self, attempt, upper):
+        delays = [utils.backoff_delay(attempt, base=2, cap=30) for _ in range(200)]
+
+        assert all(0 <= delay <= upper for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_zero_base(self):
+        assert utils.backoff_delay(5, base=0) == 0
 
 
 class TestAsyncRetry:
@@ -128,6 +175,284 @@ class TestAsyncRetry:
         assert merk.call_count == 2
 
 
+class TreeMetadata:
+
+    def __init__(self, name, node):
+        self.name = name
+        self.is_folder = isinstance(node, dict)
+        self.size_as_int = None if self.is_folder else len(node)
+        self.content_type = None if self.is_folder else 'text/plain'
+        self.modified_utc = None if self.is_folder else '2019-06-01T12:30:00+00:00'
+
+
+class TreeProvider:
+    """Serves the contents of a dict of dicts (folders) and bytes (files), keeping track of how
+    many downloads and listings run at once.  ``delay`` is how long a download takes, for every
+    file or by file name, and ``list_delay`` how long listing a folder takes.  With ``recursive``
+    set, whole folders are listed at once through ``folder_tree``, and with ``ranges`` set,
+    ranged downloads send just the range.
+    """
+
+    NAME = 'tree'
+
+    def __init__(self, tree, delay=0, list_delay=0, recursive=False, ranges=True):
+        self.tree = tree
+        self.settings = {'tree': id(tree)}
+        self.ranges = ranges
+        self.delay = delay
+        self.list_delay = list_delay
+        self.recursive = recursive
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.downloaded = []
+        self.listing = 0
+        self.max_listing = 0
+        self.listed = []
+
+    def _node(self, path):
+        node = self.tree
+        for part in path.path.strip('/').split('/'):
+            if part:
+                node = node[part]
+        return node
+
+    def path_from_metadata(self, parent_path, metadata):
+        return parent_path.child(metadata.name, folder=metadata.is_folder)
+
+    async def _listing(self, path):
+        self.listing += 1
+        self.max_listing = max(self.listing, self.max_listing)
+        await asyncio.sleep(self.list_delay)
+        self.listing -= 1
+        self.listed.append(path.path)
+
+    async def metadata(self, path):
+        if not path.is_root:
+            await self._listing(path)
+        return [TreeMetadata(name, node) for name, node in self._node(path).items()]
+
+    async def folder_tree(self, path):
+        if not self.recursive:
+            return None
+        await self._listing(path)
+
+        def walk(parent, node):
+            for name, child in node.items():
+                yield parent, TreeMetadata(name, child)
+                if isinstance(child, dict):
+                    yield from walk(parent.child(name, folder=True), child)
+
+        return list(walk(path, self._node(path)))
+
+    async def download(self, path, range=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.in_flight, self.max_in_flight)
+        if isinstance(self.delay, dict):
+            await asyncio.sleep(self.delay.get(path.name, 0))
+        else:
+            await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        self.downloaded.append(path.path)
+        if range is not None and self.ranges:
+            return streams.ByteStream(self._node(path)[range[0]:range[1] + 1])
+        return streams.ByteStream(self._node(path))
+
+
+class TestZipStreamGenerator:
+
+    TREE = {
+        'a.txt': b'a' * 10,
+        'folder': {
+            'b.txt': b'b' * 20,
+            'empty': {},
+            'nested': {'c.txt': b'c' * 30},
+        },
+        'd.txt': b'd' * 40,
+    }
+
+    async def entries(self, provider):
+        root = WaterButlerPath('/')
+        generator = utils.ZipStreamGenerator(provider, root, *await provider.metadata(root))
+        entries = []
+        while True:
+            try:
+                name, stream, _ = await generator.__anext__()
+            except StopAsyncIteration:
+                return entries
+            entries.append((name, await stream.read()))
+
+    @pytest.mark.asyncio
+    async def test_entries_in_listing_order(self):
+        entries = await self.entries(TreeProvider(self.TREE))
+
+        assert entries == [
+            ('a.txt', b'a' * 10),
+            ('d.txt', b'd' * 40),
+            ('folder/b.txt', b'b' * 20),
+            ('folder/empty/', b''),
+            ('folder/nested/c.txt', b'c' * 30),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_content_types(self):
+        provider = TreeProvider({'a.txt': b'a', 'empty': {}})
+        root = WaterButlerPath('/')
+        generator = utils.ZipStreamGenerator(provider, root, *await provider.metadata(root))
+
+        assert (await generator.__anext__())[::2] == ('a.txt', 'text/plain')
+        assert (await generator.__anext__())[::2] == ('empty/', None)
+
+    @pytest.mark.asyncio
+    async def test_prefetches_concurrently(self, monkeypatch):
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_PREFETCH_CONCURRENCY', 4)
+        provider = TreeProvider(self.TREE, delay=0.01)
+
+        entries = await self.entries(provider)
+
+        assert provider.max_in_flight > 1
+        assert [name for name, _ in entries] == [
+            'a.txt', 'd.txt', 'folder/b.txt', 'folder/empty/', 'folder/nested/c.txt'
+        ]
+
+    @pytest.mark.asyncio
+    async def test_prefetch_stops_at_listed_size(self, monkeypatch):
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_PREFETCH_CONCURRENCY', 4)
+        provider = TreeProvider({'a.txt': b'a' * 10, 'b.txt': b'b' * 50})
+        downloads = {}
+        download = provider.download
+
+        async def keep_download(path, range=None):
+            downloads[path.name] = await download(path, range=range)
+            return downloads[path.name]
+
+        monkeypatch.setattr(provider, 'download', keep_download)
+        root = WaterButlerPath('/')
+        listing = await provider.metadata(root)
+        listing[1].size_as_int = 5  # the listing under-reports b.txt's size
+        generator = utils.ZipStreamGenerator(provider, root, *listing)
+
+        await generator.__anext__()
+        await asyncio.sleep(0.01)
+
+        assert len(downloads['b.txt']._buffer) == 45
+        name, stream, _ = await generator.__anext__()
+        assert name == 'b.txt'
+        assert await stream.read(3) == b'bbb'
+        assert await stream.read() == b'b' * 47
+        assert stream.at_eof()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('concurrency,buffer_size', [(1, 1024), (4, 5)])
+    async def test_no_prefetch(self, concurrency, buffer_size, monkeypatch):
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_PREFETCH_CONCURRENCY', concurrency)
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_PREFETCH_BUFFER_SIZE', buffer_size)
+        provider = TreeProvider(self.TREE, delay=0.01)
+
+        entries = await self.entries(provider)
+
+        assert provider.max_in_flight == 1
+        assert len(entries) == 5
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_prefetch(self, monkeypatch):
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_PREFETCH_CONCURRENCY', 4)
+        provider = TreeProvider({'a.txt': b'a', 'b.txt': b'b', 'c.txt': b'c'},
+                                delay={'b.txt': 0.01, 'c.txt': 0.01})
+        root = WaterButlerPath('/')
+        generator = utils.ZipStreamGenerator(provider, root, *await provider.metadata(root))
+
+        await generator.__anext__()
+        generator.close()
+        await asyncio.sleep(0.05)
+
+        assert provider.downloaded == ['a.txt']
+        with pytest.raises(StopAsyncIteration):
+            await generator.__anext__()
+
+    @pytest.mark.asyncio
+    async def test_lists_folders_concurrently(self, monkeypatch):
+        monkeypatch.setattr(utils.streams_settings, 'ZIP_LIST_CONCURRENCY', 3)
+        tree = {'folder{}'.format(i): {'file.txt': b'x'} for i in range(10)}
+        provider = TreeProvider(tree, list_delay=0.01)
+
+        entries = await self.entries(provider)
+
+        assert provider.max_listing == 3
+        assert [name for name, _ in entries] == [
+            'folder{}/file.txt'.format(i) for i in range(10)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_folder_tree(self):
+        provider = TreeProvider(self.TREE, recursive=True)
+
+        entries = await self.entries(provider)
+
+        # A folder listed in one go is archived as a whole, in the provider's order
+        assert provider.listed == ['folder/']
+        assert entries == [
+            ('a.txt', b'a' * 10),
+            ('folder/b.txt', b'b' * 20),
+            ('folder/empty/', b''),
+            ('folder/nested/c.txt', b'c' * 30),
+            ('d.txt', b'd' * 40),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_deep_empty_folders(self):
+        tree = {}
+        node = tree
+        for _ in range(1200):
+            node['sub'] = {}
+            node = node['sub']
+
+        entries = await self.entries(TreeProvider(tree))
+
+        assert entries == [('sub/' * 1200, b'')]
+
+
+class TestStoredZipEntry:
+
+    TREE = {'b.txt': b'0123456789', 'a': {'empty': {}}}
+
+    async def entries(self, provider):
+        root = WaterButlerPath('/')
+        generator = utils.ZipStreamGenerator(provider, root, *await provider.metadata(root))
+        return [utils.StoredZipEntry(provider, *entry) for entry in await generator.list_entries()]
+
+    @pytest.mark.asyncio
+    async def test_listed_without_downloading(self):
+        provider = TreeProvider(self.TREE)
+
+        file, folder = await self.entries(provider)
+
+        assert provider.downloaded == []
+        assert (file.name, file.size, file.date_time) == ('b.txt', 10, (2019, 6, 1, 12, 30, 0))
+        assert (folder.name, folder.size, folder.crc) == ('a/empty/', 0, 0)
+        assert folder.date_time == (1980, 1, 1, 0, 0, 0)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('ranges', [True, False])
+    async def test_open(self, ranges):
+        file, _ = await self.entries(TreeProvider(self.TREE, ranges=ranges))
+
+        stream = await file.open(3, 5)
+
+        assert (await stream.read(3)) == b'345'
+
+    @pytest.mark.asyncio
+    async def test_crc_remembered(self):
+        file, _ = await self.entries(TreeProvider(self.TREE))
+        assert file.crc is None
+        file.crc = 1234
+
+        provider = TreeProvider(self.TREE)
+        assert (await self.entries(provider))[0].crc == 1234
+
+        provider.settings = {'tree': 'another one'}
+        assert (await self.entries(provider))[0].crc is None
+
+
 class TestContentDisposition:
 
     @pytest.mark.parametrize("filename,expected", [
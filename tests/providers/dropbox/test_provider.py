@@ -772,6 +772,40 @@ class TestMetadata:
         with pytest.raises(core_exceptions.NotFoundError):
             await provider.metadata(path)
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree(self, provider):
+        path = WaterButlerPath('/folder/', prepend=provider.folder)
+        url = provider.build_url('files', 'list_folder')
+        aiohttpretty.register_json_uri(
+            'POST',
+            url,
+            data={'path': '/Photos/folder', 'recursive': True},
+            body={'has_more': True, 'cursor': 'more', 'entries': [
+                {'.tag': 'folder', 'name': 'folder', 'path_display': '/Photos/folder'},
+                {'.tag': 'file', 'name': 'a.txt', 'path_display': '/Photos/folder/a.txt'},
+            ]}
+        )
+        aiohttpretty.register_json_uri(
+            'POST',
+            url + '/continue',
+            data={'cursor': 'more'},
+            body={'has_more': False, 'cursor': 'done', 'entries': [
+                {'.tag': 'folder', 'name': 'sub', 'path_display': '/Photos/folder/sub'},
+                {'.tag': 'file', 'name': 'b.txt', 'path_display': '/Photos/folder/sub/b.txt'},
+                {'.tag': 'deleted', 'name': 'c.txt', 'path_display': '/Photos/folder/c.txt'},
+            ]}
+        )
+
+        result = await provider.folder_tree(path)
+
+        assert [(str(parent), item.path) for parent, item in result] == [
+            ('/folder/', '/folder/a.txt'),
+            ('/folder/', '/folder/sub/'),
+            ('/folder/sub/', '/folder/sub/b.txt'),
+        ]
+        assert result[1][1].kind == 'folder'
+
 
 class TestCreateFolder:
 
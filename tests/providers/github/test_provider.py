@@ -14,6 +14,7 @@ import aiohttpretty
 from waterbutler.core import streams, exceptions
 from waterbutler.providers.github import GitHubProvider
 from waterbutler.providers.github.path import GitHubPath
+from waterbutler.providers.github.tree_index import TreeIndex, tree_indexes
 from waterbutler.providers.github.metadata import (GitHubRevision,
                                                    GitHubFileTreeMetadata,
                                                    GitHubFolderTreeMetadata,
@@ -83,6 +84,11 @@ def file_stream(file_like):
     return streams.FileStreamReader(file_like)
 
 
+@pytest.fixture(autouse=True)
+def clear_tree_indexes():
+    tree_indexes.clear()
+
+
 @pytest.fixture
 def provider(auth, credentials, settings, provider_fixtures):
     provider = GitHubProvider(auth, credentials, settings)
@@ -204,6 +210,48 @@ class TestValidatePath:
 
         assert exc.value.code == HTTPStatus.NOT_FOUND
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_validate_v1_path_reuses_tree_index(self, provider, other_provider,
+                                                      provider_fixtures):
+        branch_metadata = provider_fixtures['branch_metadata']
+        tree_sha = branch_metadata['commit']['commit']['tree']['sha']
+
+        branch_url = provider.build_repo_url('branches', provider.default_branch)
+        tree_url = provider.build_repo_url('git', 'trees', tree_sha, recursive=1)
+        aiohttpretty.register_json_uri('GET', branch_url, body=branch_metadata)
+        aiohttpretty.register_json_uri('GET', tree_url,
+                                       body=provider_fixtures['repo_tree_metadata_root'])
+
+        await provider.validate_v1_path('/file.txt')
+
+        assert tree_sha in tree_indexes
+        assert provider._tree_shas == {provider.default_branch: tree_sha}
+
+        # Another provider, e.g. of the next request, doesn't fetch the tree again
+        other_provider._fetch_tree = utils.MockCoroutine()
+        other_branch_url = other_provider.build_repo_url('branches', provider.default_branch)
+        aiohttpretty.register_json_uri('GET', other_branch_url, body=branch_metadata)
+
+        result = await other_provider.validate_v1_path('/level1/')
+
+        assert result.is_dir
+        assert not other_provider._fetch_tree.called
+        with pytest.raises(exceptions.NotFoundError):
+            await other_provider.validate_v1_path('/missing.txt')
+
+    @pytest.mark.asyncio
+    async def test_tree_index_only_caches_shas(self, provider, provider_fixtures):
+        provider._fetch_tree = utils.MockCoroutine(
+            return_value=provider_fixtures['repo_tree_metadata_root']
+        )
+
+        await provider._fetch_tree_index('master')
+        await provider._fetch_tree_index('master')
+
+        assert provider._fetch_tree.call_count == 2
+        assert len(tree_indexes) == 0
+
     @pytest.mark.asyncio
     async def test_reject_multiargs(self, provider):
 
@@ -1011,6 +1059,78 @@ class TestMetadata:
 
         assert result == expected
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree(self, provider):
+        path = GitHubPath('/folder/', _ids=[('master', ''), ('master', '')])
+        url = provider.build_repo_url('git', 'trees') + '/master:folder?recursive=1'
+        aiohttpretty.register_json_uri('GET', url, body={'truncated': False, 'tree': [
+            {'path': 'a.txt', 'type': 'blob', 'sha': 'aaa', 'size': 1},
+            {'path': 'sub', 'type': 'tree', 'sha': 'bbb'},
+            {'path': 'sub/b.txt', 'type': 'blob', 'sha': 'ccc', 'size': 2},
+            {'path': 'module', 'type': 'commit', 'sha': 'ddd'},
+        ]})
+
+        result = await provider.folder_tree(path)
+
+        assert [(str(parent), item.path) for parent, item in result] == [
+            ('/folder/', '/folder/a.txt'),
+            ('/folder/', '/folder/sub/'),
+            ('/folder/sub/', '/folder/sub/b.txt'),
+        ]
+        assert isinstance(result[0][1], GitHubFileTreeMetadata)
+        assert result[0][1].ref == 'master'
+        assert result[2][0].branch_ref == 'master'
+
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree_quotes_ref(self, provider):
+        ref = 'fix/#1?%'
+        path = GitHubPath('/folder/', _ids=[(ref, ''), (ref, '')])
+        url = provider.build_repo_url('git', 'trees') + '/fix%2F%231%3F%25:folder?recursive=1'
+        aiohttpretty.register_json_uri('GET', url, body={'truncated': False, 'tree': [
+            {'path': 'a.txt', 'type': 'blob', 'sha': 'aaa', 'size': 1},
+        ]})
+
+        result = await provider.folder_tree(path)
+
+        assert aiohttpretty.has_call(method='GET', uri=url)
+        assert [item.path for _, item in result] == ['/folder/a.txt']
+        assert result[0][1].ref == ref
+
+    @pytest.mark.asyncio
+    async def test_folder_tree_from_tree_index(self, provider):
+        tree_sha = 'a' * 40
+        provider._tree_shas['master'] = tree_sha
+        tree_indexes.set(tree_sha, TreeIndex([
+            {'path': 'folder', 'type': 'tree', 'sha': 'fff'},
+            {'path': 'folder/a.txt', 'type': 'blob', 'sha': 'aaa', 'size': 1},
+            {'path': 'folder/sub', 'type': 'tree', 'sha': 'bbb'},
+            {'path': 'folder/sub/b.txt', 'type': 'blob', 'sha': 'ccc', 'size': 2},
+            {'path': 'folder/module', 'type': 'commit', 'sha': 'ddd'},
+            {'path': 'folder-b.txt', 'type': 'blob', 'sha': 'eee', 'size': 3},
+        ]))
+        path = GitHubPath('/folder/', _ids=[('master', ''), ('master', '')])
+
+        result = await provider.folder_tree(path)
+
+        assert [(str(parent), item.path) for parent, item in result] == [
+            ('/folder/', '/folder/a.txt'),
+            ('/folder/', '/folder/sub/'),
+            ('/folder/sub/', '/folder/sub/b.txt'),
+        ]
+        assert result[0][1].extra['fileSha'] == 'aaa'
+        assert result[0][1].ref == 'master'
+
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree_truncated(self, provider):
+        path = GitHubPath('/folder/', _ids=[('master', ''), ('master', '')])
+        url = provider.build_repo_url('git', 'trees') + '/master:folder?recursive=1'
+        aiohttpretty.register_json_uri('GET', url, body={'truncated': True, 'tree': []})
+
+        assert await provider.folder_tree(path) is None
+
 
 class TestIntra:
 
@@ -1390,6 +1510,9 @@ class TestCreateFolder:
 
 class TestRateLimit:
 
+    def test_no_shared_token_bucket(self, provider):
+        assert provider.rate_limit_bucket('https://api.github.com/repos') is None
+
     def test_add_tokens_min_rate(self, mock_time, rate_limit_provider):
         mock_provider = rate_limit_provider
         mock_provider.rl_reserved = 600
@@ -0,0 +1,65 @@
+import pytest
+
+from waterbutler.providers.github import tree_index
+from waterbutler.providers.github.tree_index import TreeIndex
+
+
+@pytest.fixture
+def tree():
+    return [
+        {'path': 'a.txt', 'mode': '100644', 'type': 'blob', 'sha': 'aaa', 'size': 1,
+         'url': 'https://api.github.com/repos/owner/repo/git/blobs/aaa'},
+        {'path': 'sub', 'mode': '040000', 'type': 'tree', 'sha': 'bbb'},
+        {'path': 'sub/b.txt', 'mode': '100644', 'type': 'blob', 'sha': 'ccc', 'size': 2},
+        {'path': 'sub-file', 'mode': '100644', 'type': 'blob', 'sha': 'ddd', 'size': 3},
+        {'path': 'sub/deeper', 'mode': '040000', 'type': 'tree', 'sha': 'eee'},
+        {'path': 'sub/deeper/c.txt', 'mode': '100644', 'type': 'blob', 'sha': 'fff', 'size': 4},
+        {'path': 'module', 'mode': '160000', 'type': 'commit', 'sha': 'ggg'},
+    ]
+
+
+class TestTreeIndex:
+
+    def test_get(self, tree):
+        index = TreeIndex(tree)
+
+        assert len(index) == 7
+        assert index.get('a.txt') == {'path': 'a.txt', 'mode': '100644', 'type': 'blob',
+                                      'sha': 'aaa', 'size': 1}
+        assert index.get('sub', type='tree') == {'path': 'sub', 'mode': '040000', 'type': 'tree',
+                                                 'sha': 'bbb'}
+        assert index.get('sub', type='blob') is None
+        assert index.get('missing') is None
+
+    def test_subtree(self, tree):
+        index = TreeIndex(tree)
+
+        assert [entry['path'] for entry in index.subtree('sub/')] == [
+            'sub/b.txt', 'sub/deeper', 'sub/deeper/c.txt',
+        ]
+        assert [entry['path'] for entry in index.subtree('sub/deeper/')] == ['sub/deeper/c.txt']
+        assert index.subtree('nope/') == []
+        assert len(index.subtree('')) == 7
+
+    def test_entries_without_mode(self):
+        index = TreeIndex([{'path': 'a.txt', 'type': 'blob', 'sha': 'aaa', 'size': 1}])
+
+        assert index.get('a.txt') == {'path': 'a.txt', 'type': 'blob', 'sha': 'aaa', 'size': 1}
+
+    def test_nbytes_grows_with_the_tree(self, tree):
+        small, large = TreeIndex(tree[:1]), TreeIndex(tree)
+
+        assert 0 < small.nbytes < large.nbytes
+
+    def test_cache_is_bounded_by_bytes(self, tree, monkeypatch):
+        index = TreeIndex(tree)
+        monkeypatch.setattr(tree_index.tree_indexes, 'max_weight', index.nbytes * 2)
+        tree_index.tree_indexes.clear()
+
+        for sha in ('a' * 40, 'b' * 40, 'c' * 40):
+            tree_index.tree_indexes.set(sha, TreeIndex(tree))
+
+        assert 'a' * 40 not in tree_index.tree_indexes
+        assert 'c' * 40 in tree_index.tree_indexes
+        assert tree_index.tree_indexes.weight <= index.nbytes * 2
+        tree_index.tree_indexes.clear()
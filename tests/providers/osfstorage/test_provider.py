@@ -863,6 +863,7 @@ class TestCrossRegionMove:
                                                              dst_provider,
                                                              WaterButlerPath('/foo/'),
                                                              WaterButlerPath('/'),
+                                                             can_intra=src_provider.can_intra_move,
                                                              rename=None,
                                                              conflict='replace')
         src_provider.delete.assert_called_once_with(WaterButlerPath('/foo/'))
@@ -885,7 +886,7 @@ class TestCrossRegionMove:
         await src_provider.move(dst_provider, src_path, dest_path, handle_naming=False);
 
         core_move.assert_called_once_with(dst_provider, src_path, dest_path, rename=None,
-                                          conflict='replace', handle_naming=False);
+                                          conflict='replace', handle_naming=False, size=None);
         src_provider.download.assert_not_called()
 
     @pytest.mark.asyncio
@@ -967,6 +968,7 @@ class TestCrossRegionCopy:
                                                              dst_provider,
                                                              WaterButlerPath('/foo/'),
                                                              WaterButlerPath('/'),
+                                                             can_intra=src_provider.can_intra_copy,
                                                              rename=None,
                                                              conflict='replace')
 
@@ -988,7 +990,8 @@ class TestCrossRegionCopy:
         await src_provider.copy(dst_provider, src_path, dest_path, handle_naming=False);
 
         core_copy.assert_called_once_with(dst_provider, src_path, dest_path, rename=None,
-                                          conflict='replace', handle_naming=False, version=None);
+                                          conflict='replace', handle_naming=False, version=None,
+                                          size=None);
         src_provider.download.assert_not_called()
 
     @pytest.mark.asyncio
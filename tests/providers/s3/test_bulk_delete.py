@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from waterbutler import settings
+from waterbutler.core import exceptions
+from waterbutler.providers.s3 import bulk_delete
+
+
+class RecordingDeleter:
+    """Records the batches it is sent, failing the objects listed in ``failures`` with the codes
+    given for them, one code per attempt.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.batches = []
+        self.running = self.most_running = 0
+
+    async def __call__(self, objects):
+        self.running += 1
+        self.most_running = max(self.most_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            self.batches.append(list(objects))
+            errors = []
+            for key, version_id in objects:
+                if self.failures.get(key):
+                    errors.append((key, version_id, self.failures[key].pop(0), 'nope'))
+            return errors
+        finally:
+            self.running -= 1
+
+
+def objects(count, start=0):
+    return [('folder/{}'.format(number), str(number)) for number in range(start, start + count)]
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(bulk_delete.utils, 'backoff_delay', lambda attempt: 0)
+
+
+class TestBatchDeleter:
+
+    @pytest.mark.asyncio
+    async def test_batches_across_pages(self, monkeypatch):
+        monkeypatch.setattr(settings, 'DELETE_BATCH_CONCURRENCY', 3)
+        delete_batch = RecordingDeleter()
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        for page in range(5):
+            await deleter.add(objects(7, start=page * 7))
+        progress = await deleter.finish()
+
+        assert [len(batch) for batch in delete_batch.batches] == [10, 10, 10, 5]
+        assert sorted(obj for batch in delete_batch.batches for obj in batch) == sorted(objects(35))
+        assert delete_batch.most_running == 3
+        assert progress == {'listed': 35, 'deleted': 35, 'failed': 0, 'batches': 4, 'retries': 0}
+
+    @pytest.mark.asyncio
+    async def test_listing_waits_for_batches(self, monkeypatch):
+        monkeypatch.setattr(settings, 'DELETE_BATCH_CONCURRENCY', 2)
+        delete_batch = RecordingDeleter()
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        await deleter.add(objects(30))
+
+        # The third batch can't be sent until one of the first two is done
+        assert len(delete_batch.batches) >= 1
+        await deleter.finish()
+        assert delete_batch.most_running == 2
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors(self):
+        delete_batch = RecordingDeleter(failures={
+            'folder/3': ['SlowDown', 'InternalError'],
+            'folder/5': ['ServiceUnavailable'],
+        })
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        await deleter.add(objects(10))
+        progress = await deleter.finish()
+
+        assert delete_batch.batches[1:] == [
+            [('folder/3', '3'), ('folder/5', '5')],
+            [('folder/3', '3')],
+        ]
+        assert progress == {'listed': 10, 'deleted': 10, 'failed': 0, 'batches': 3, 'retries': 3}
+
+    @pytest.mark.asyncio
+    async def test_gives_up_on_retries(self, monkeypatch):
+        monkeypatch.setattr(settings, 'DELETE_BATCH_RETRIES', 1)
+        delete_batch = RecordingDeleter(failures={'folder/0': ['SlowDown', 'SlowDown']})
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        await deleter.add(objects(3))
+        with pytest.raises(exceptions.DeleteError):
+            await deleter.finish()
+
+        assert len(delete_batch.batches) == 2
+        assert deleter.progress['failed'] == 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_stop_deleting(self, monkeypatch):
+        monkeypatch.setattr(settings, 'DELETE_BATCH_CONCURRENCY', 1)
+        delete_batch = RecordingDeleter(failures={'folder/0': ['AccessDenied']})
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        with pytest.raises(exceptions.DeleteError):
+            await deleter.add(objects(50))
+        await deleter.cancel()
+
+        assert delete_batch.batches == [objects(10)]
+
+    @pytest.mark.asyncio
+    async def test_request_errors(self):
+        async def delete_batch(objects):
+            raise exceptions.DeleteError('denied', code=403)
+
+        deleter = bulk_delete.BatchDeleter(delete_batch, 'folder/', batch_size=10)
+
+        await deleter.add(objects(5))
+        with pytest.raises(exceptions.DeleteError):
+            await deleter.finish()
+
+
+class TestHelpers:
+
+    def test_versioned_objects(self):
+        items = [
+            {'Key': 'a', 'VersionId': '1'},
+            {'Key': 'b', 'VersionId': '2'},
+            {'Key': 'c'},
+            {'Key': 'a', 'VersionId': '3'},
+        ]
+
+        assert bulk_delete.versioned_objects(items) == [('a', '1'), ('a', '3'), ('b', '2')]
+        assert bulk_delete.versioned_objects(items, unversioned=True) == [
+            ('a', '1'), ('a', '3'), ('b', '2'), ('c', None),
+        ]
+
+    def test_delete_payload(self):
+        assert bulk_delete.delete_payload([('a&b', '1'), ('c', None)]) == (
+            b'<?xml version="1.0" encoding="UTF-8"?><Delete>'
+            b'<Object><Key>a&amp;b</Key><VersionId>1</VersionId></Object>'
+            b'<Object><Key>c</Key></Object></Delete>'
+        )
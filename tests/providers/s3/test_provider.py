@@ -15,6 +15,9 @@ from boto.compat import BytesIO
 from boto.utils import compute_md5
 
 from waterbutler.providers.s3 import S3Provider
+from waterbutler.providers.s3 import multipart
+from waterbutler.providers.s3 import bulk_delete
+from waterbutler.providers.s3.provider import bucket_regions
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.core import streams, metadata, exceptions
 from waterbutler.providers.s3 import settings as pd_settings
@@ -54,6 +57,11 @@ def mock_time(monkeypatch):
     monkeypatch.setattr(time, 'time', mock_time)
 
 
+@pytest.fixture(autouse=True)
+def clear_bucket_regions():
+    bucket_regions.clear()
+
+
 @pytest.fixture
 def provider(auth, credentials, settings):
     provider = S3Provider(auth, credentials, settings)
@@ -222,6 +230,40 @@ class TestRegionDetection:
         await provider._check_region()
         assert provider.connection.host == host
 
+    @pytest.mark.asyncio
+    async def test_region_is_shared_between_providers(self, auth, credentials, settings):
+        first = S3Provider(auth, credentials, settings)
+        first._get_bucket_region = MockCoroutine(return_value='us-west-2')
+        await first._check_region()
+
+        second = S3Provider(auth, credentials, settings)
+        second._get_bucket_region = MockCoroutine()
+        await second._check_region()
+
+        assert second.region == 'us-west-2'
+        assert second.connection.host == 's3-us-west-2.amazonaws.com'
+        assert not second._get_bucket_region.called
+
+    @pytest.mark.asyncio
+    async def test_redirect_forgets_region(self, auth, credentials, settings):
+        provider = S3Provider(auth, credentials, settings)
+        provider._get_bucket_region = MockCoroutine(return_value='us-west-2')
+        await provider._check_region()
+
+        moved = MockCoroutine(side_effect=exceptions.MetadataError('moved', code=301))
+        with mock.patch('waterbutler.core.provider.BaseProvider.make_request', new=moved):
+            with pytest.raises(exceptions.MetadataError):
+                await provider.make_request('GET', 'https://example.com')
+
+        assert provider.region is None
+        assert provider.connection.host == 's3.amazonaws.com'
+
+        provider._get_bucket_region = MockCoroutine(return_value='eu-west-2')
+        await provider._check_region()
+
+        assert provider.connection.host == 's3-eu-west-2.amazonaws.com'
+        provider._get_bucket_region.assert_called_once_with()
+
 
 class TestValidatePath:
 
@@ -501,6 +543,44 @@ class TestCRUD:
         provider.CONTIGUOUS_UPLOAD_SIZE_LIMIT = pd_settings.CONTIGUOUS_UPLOAD_SIZE_LIMIT
         provider.CHUNK_SIZE = pd_settings.CHUNK_SIZE
 
+    @pytest.mark.asyncio
+    async def test_create_part_upload(self, provider, monkeypatch):
+        provider.CHUNK_SIZE = 2
+        monkeypatch.setattr(multipart, 'MAX_UPLOAD_PARTS', 4)
+
+        path = WaterButlerPath('/foobah')
+        provider.handle_name_conflict = MockCoroutine(return_value=(path, True))
+        provider._create_upload_session = MockCoroutine(return_value='upload-id')
+
+        assert await provider.create_part_upload(path, 2) is None
+        upload = await provider.create_part_upload(path, 10)
+
+        assert upload.part_size == 3
+        assert upload.session_upload_id == 'upload-id'
+        provider._create_upload_session.assert_called_once_with(path)
+
+        provider.CHUNK_SIZE = pd_settings.CHUNK_SIZE
+
+    @pytest.mark.asyncio
+    async def test_part_upload(self, provider):
+        path = WaterButlerPath('/foobah')
+        part = {'ETAG': '"etag"'}
+        provider.handle_name_conflict = MockCoroutine(return_value=(path, False))
+        provider._create_upload_session = MockCoroutine(return_value='upload-id')
+        provider._upload_part = MockCoroutine(return_value=part)
+        provider._complete_multipart_upload = MockCoroutine()
+        provider.metadata = MockCoroutine(return_value='metadata')
+
+        upload = await provider.create_part_upload(path, provider.CHUNK_SIZE + 1)
+
+        assert await upload.upload_part(2, b'ab') == part
+        stream, *args = provider._upload_part.call_args[0]
+        assert isinstance(stream, streams.ByteStream)
+        assert args == [path, 'upload-id', 2, 2]
+
+        assert await upload.complete([part]) == ('metadata', True)
+        provider._complete_multipart_upload.assert_called_once_with(path, 'upload-id', [part])
+
     @pytest.mark.asyncio
     @pytest.mark.aiohttpretty
     async def test_chunked_upload_create_upload_session_no_encryption(self, provider,
@@ -592,11 +672,13 @@ class TestCRUD:
         parts_metadata = await provider._upload_parts(file_stream, path, upload_id)
 
         assert provider._upload_part.call_count == 3
-        provider._upload_part.assert_has_calls([
-            mock.call(file_stream, path, upload_id, 1, 9),
-            mock.call(file_stream, path, upload_id, 2, 9),
-            mock.call(file_stream, path, upload_id, 3, 2),
-        ])
+        calls = provider._upload_part.call_args_list
+        assert [call[0][1:] for call in calls] == [
+            (path, upload_id, 1, 9),
+            (path, upload_id, 2, 9),
+            (path, upload_id, 3, 2),
+        ]
+        assert [await call[0][0].read() for call in calls] == [b'abcdefghi', b'jklmnopqr', b'st']
         assert len(parts_metadata) == 3
         assert parts_metadata == side_effect
 
@@ -1118,6 +1200,65 @@ class TestCRUD:
         assert aiohttpretty.has_call(method='GET', uri=versions_url, params=params)
         assert aiohttpretty.has_call(method='POST', uri=delete_url)
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_delete_folder_retries_failed_objects(self, provider, mock_time, monkeypatch):
+        monkeypatch.setattr(bulk_delete.utils, 'backoff_delay', lambda attempt: 0)
+        path = WaterButlerPath('/busy-folder/')
+
+        versions_url = provider.bucket.generate_url(100, 'GET', query_parameters={'versions': ''})
+        params = {'prefix': path.path, 'versions': ''}
+        list_versions_body = '''<?xml version="1.0" encoding="UTF-8"?>
+            <ListVersionsResult>
+                <Version>
+                    <Key>busy-folder/file1.txt</Key>
+                    <VersionId>111</VersionId>
+                </Version>
+                <Version>
+                    <Key>busy-folder/file2.txt</Key>
+                    <VersionId>222</VersionId>
+                </Version>
+            </ListVersionsResult>'''
+        aiohttpretty.register_uri('GET', versions_url, params=params, body=list_versions_body, status=200)
+
+        query_params = {'delete': ''}
+        delete_urls = []
+        for version_ids in ({'busy-folder/file1.txt': ['111'], 'busy-folder/file2.txt': ['222']},
+                            {'busy-folder/file2.txt': ['222']}):
+            payload_xml = prepare_xml_body(version_ids)
+            headers = {
+                'Content-Length': str(len(payload_xml)),
+                'Content-MD5': compute_md5(BytesIO(payload_xml))[1],
+                'Content-Type': 'text/xml',
+            }
+            delete_urls.append(provider.bucket.generate_url(
+                100, 'POST', query_parameters=query_params, headers=headers,
+            ))
+        partial_failure = '''<?xml version="1.0" encoding="UTF-8"?>
+            <DeleteResult>
+                <Deleted>
+                    <Key>busy-folder/file1.txt</Key>
+                    <VersionId>111</VersionId>
+                </Deleted>
+                <Error>
+                    <Key>busy-folder/file2.txt</Key>
+                    <VersionId>222</VersionId>
+                    <Code>SlowDown</Code>
+                    <Message>Please reduce your request rate.</Message>
+                </Error>
+            </DeleteResult>'''
+        aiohttpretty.register_uri('POST', delete_urls[0], params=query_params, status=200,
+                                  body=partial_failure)
+        aiohttpretty.register_uri('POST', delete_urls[1], params=query_params, status=200)
+
+        await provider._delete_folder(path)
+
+        assert aiohttpretty.has_call(method='POST', uri=delete_urls[0], params=query_params)
+        assert aiohttpretty.has_call(method='POST', uri=delete_urls[1], params=query_params)
+        assert provider.provider_metrics.serialize()['delete']['folder'] == {
+            'listed': 2, 'deleted': 2, 'failed': 0, 'batches': 2, 'retries': 1,
+        }
+
     @pytest.mark.asyncio
     @pytest.mark.aiohttpretty
     async def test_accepts_url(self, provider, mock_time):
@@ -1345,6 +1486,42 @@ class TestMetadata:
         assert aiohttpretty.has_call(method='PUT', uri=url)
         assert aiohttpretty.has_call(method='HEAD', uri=metadata_url)
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree(self, provider, mock_time):
+        path = WaterButlerPath('/darp/')
+        url = provider.bucket.generate_url(100)
+        params = {'prefix': path.path, 'max-keys': '1000'}
+        keys = ['darp/', 'darp/a.txt', 'darp/empty/', 'darp/sub/b.txt']
+        aiohttpretty.register_uri('GET', url, params=params, body=list_objects_response(keys),
+                                  headers={'Content-Type': 'application/xml'})
+
+        result = await provider.folder_tree(path)
+
+        assert [(str(parent), item.path) for parent, item in result] == [
+            ('/darp/', '/darp/a.txt'),
+            ('/darp/', '/darp/empty/'),
+            ('/darp/sub/', '/darp/sub/b.txt'),
+        ]
+        assert result[1][1].is_folder
+
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_folder_tree_pages(self, provider, mock_time):
+        path = WaterButlerPath('/darp/')
+        url = provider.bucket.generate_url(100)
+        params = {'prefix': path.path, 'max-keys': '1000'}
+        aiohttpretty.register_uri('GET', url, params=params,
+                                  body=list_objects_response(['darp/a.txt'], truncated=True),
+                                  headers={'Content-Type': 'application/xml'})
+        aiohttpretty.register_uri('GET', url, params=dict(params, marker='darp/a.txt'),
+                                  body=list_objects_response(['darp/b.txt']),
+                                  headers={'Content-Type': 'application/xml'})
+
+        result = await provider.folder_tree(path)
+
+        assert [item.path for _, item in result] == ['/darp/a.txt', '/darp/b.txt']
+
 
 class TestCreateFolder:
 
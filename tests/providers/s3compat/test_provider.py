@@ -1207,11 +1207,13 @@ class TestCRUD:
         parts_metadata = await provider._upload_parts(file_stream, path, upload_id)
 
         assert provider._upload_part.call_count == 3
-        provider._upload_part.assert_has_calls([
-            mock.call(file_stream, path, upload_id, 1, 9),
-            mock.call(file_stream, path, upload_id, 2, 9),
-            mock.call(file_stream, path, upload_id, 3, 2),
-        ])
+        calls = provider._upload_part.call_args_list
+        assert [call[0][1:] for call in calls] == [
+            (path, upload_id, 1, 9),
+            (path, upload_id, 2, 9),
+            (path, upload_id, 3, 2),
+        ]
+        assert [await call[0][0].read() for call in calls] == [b'abcdefghi', b'jklmnopqr', b'st']
         assert len(parts_metadata) == 3
         assert parts_metadata == side_effect
 
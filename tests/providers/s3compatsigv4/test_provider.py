@@ -19,6 +19,8 @@ from waterbutler.core import streams, metadata, exceptions
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.providers.s3compatsigv4 import S3CompatSigV4Provider
 from waterbutler.providers.s3compatsigv4 import settings as pd_settings
+from waterbutler.providers.s3 import bulk_delete
+from waterbutler.providers.s3compatsigv4.provider import connections
 
 from tests.utils import MockCoroutine
 from collections import OrderedDict
@@ -84,6 +86,11 @@ def mock_time(monkeypatch):
     monkeypatch.setattr(datetime, 'datetime', MockDateTime)
 
 
+@pytest.fixture(autouse=True)
+def clear_connections():
+    connections.clear()
+
+
 @pytest.fixture
 def provider(auth, credentials, settings):
     return S3CompatSigV4Provider(auth, credentials, settings)
@@ -810,6 +817,20 @@ class TestProviderConstruction:
         assert not provider.connection.use_ssl
         assert provider.connection.endpoint_url == 'http://normalhost:8080'
 
+    def test_connections_are_shared(self, auth, credentials, settings):
+        provider = S3CompatSigV4Provider(auth, credentials, settings)
+        other = S3CompatSigV4Provider(auth, credentials, dict(settings, bucket='other'))
+
+        assert other.connection is provider.connection
+        assert other.bucket.name == 'other'
+
+        other = S3CompatSigV4Provider(auth, dict(credentials, access_key='someone else'),
+                                      settings)
+        assert other.connection is not provider.connection
+
+        other = S3CompatSigV4Provider(auth, credentials, dict(settings, region='eu-west-1'))
+        assert other.connection is not provider.connection
+
 
 class TestValidatePath:
 
@@ -1313,11 +1334,13 @@ class TestCRUD:
         parts_metadata = await provider._upload_parts(file_stream, path, upload_id)
 
         assert provider._upload_part.call_count == 3
-        provider._upload_part.assert_has_calls([
-            mock.call(file_stream, path, upload_id, 1, 9),
-            mock.call(file_stream, path, upload_id, 2, 9),
-            mock.call(file_stream, path, upload_id, 3, 2),
-        ])
+        calls = provider._upload_part.call_args_list
+        assert [call[0][1:] for call in calls] == [
+            (path, upload_id, 1, 9),
+            (path, upload_id, 2, 9),
+            (path, upload_id, 3, 2),
+        ]
+        assert [await call[0][0].read() for call in calls] == [b'abcdefghi', b'jklmnopqr', b'st']
         assert len(parts_metadata) == 3
         assert parts_metadata == side_effect
 
@@ -2028,6 +2051,55 @@ class TestCRUD:
         assert aiohttpretty.has_call(method='GET', uri=versions_url, params=params)
         provider.bucket.delete_objects.assert_called_once()
 
+    @pytest.mark.asyncio
+    @pytest.mark.aiohttpretty
+    async def test_delete_folder_retries_failed_objects(self, provider, mock_time,
+                                                        generate_url_helper, monkeypatch):
+        monkeypatch.setattr(bulk_delete.utils, 'backoff_delay', lambda attempt: 0)
+        path = WaterButlerPath('/busy-folder/')
+
+        query_params = {'Prefix': path.path}
+        versions_url = generate_url_helper(method='GET', expires=100, headers={}, query_parameters={'versions': '', **query_params})
+        params = {'prefix': path.path, 'versions': ''}
+        list_versions_body = '''<?xml version="1.0" encoding="UTF-8"?>
+            <ListVersionsResult>
+                <Version>
+                    <Key>busy-folder/file1.txt</Key>
+                    <VersionId>111</VersionId>
+                </Version>
+                <Version>
+                    <Key>busy-folder/file2.txt</Key>
+                    <VersionId>222</VersionId>
+                </Version>
+            </ListVersionsResult>'''
+        aiohttpretty.register_uri('GET', versions_url, params=params, body=list_versions_body, status=200)
+
+        prefix_check_url = generate_url_helper(method='GET', expires=100, headers={}, query_parameters={'Prefix': 'busy-folder', 'Delimiter': '/'})
+        prefix_check_body = '''<?xml version="1.0" encoding="UTF-8"?>
+            <ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">
+                <IsTruncated>false</IsTruncated>
+            </ListBucketResult>'''
+        aiohttpretty.register_uri('GET', prefix_check_url, params={'prefix': 'busy-folder', 'delimiter': '/'},
+                                  body=prefix_check_body, status=200)
+
+        provider.bucket.delete_objects = mock.Mock(side_effect=[
+            {'Errors': [{'Key': 'busy-folder/file2.txt', 'VersionId': '222',
+                         'Code': 'SlowDown', 'Message': 'Please reduce your request rate.'}]},
+            {},
+        ])
+
+        await provider._delete_folder(path)
+
+        calls = provider.bucket.delete_objects.call_args_list
+        assert [call[1]['Delete']['Objects'] for call in calls] == [
+            [{'Key': 'busy-folder/file1.txt', 'VersionId': '111'},
+             {'Key': 'busy-folder/file2.txt', 'VersionId': '222'}],
+            [{'Key': 'busy-folder/file2.txt', 'VersionId': '222'}],
+        ]
+        assert provider.provider_metrics.serialize()['delete']['folder'] == {
+            'listed': 2, 'deleted': 2, 'failed': 0, 'batches': 2, 'retries': 1,
+        }
+
 
 class TestMetadata:
 
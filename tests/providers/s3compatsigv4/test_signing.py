@@ -0,0 +1,101 @@
+import datetime
+from urllib import parse
+
+import pytest
+
+from waterbutler.providers.s3compatsigv4.provider import get_connection, connections
+from waterbutler.providers.s3compatsigv4.signing import SigV4Presigner
+
+
+@pytest.fixture(autouse=True)
+def clear_connections():
+    connections.clear()
+
+
+@pytest.fixture
+def fixed_time(monkeypatch):
+    # botocore reads the time through the same datetime module
+    now = datetime.datetime(2016, 2, 5, 15, 8, 50)
+
+    class MockDateTime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    monkeypatch.setattr(datetime, 'datetime', MockDateTime)
+
+
+@pytest.fixture(params=[
+    ('https://minio.example.com:9000', None),
+    ('https://securehost', 'ap-northeast-1'),
+    ('http://normalhost', None),
+])
+def connection(request):
+    endpoint_url, region = request.param
+    return get_connection('Dont dead', 'open inside', endpoint_url, region_name=region,
+                          use_ssl=endpoint_url.startswith('https'))
+
+
+class TestSigV4Presigner:
+
+    @pytest.mark.parametrize('client_method,params,http_method', [
+        ('list_objects_v2', {'Prefix': 'a b/ä+', 'Delimiter': '/',
+                             'ContinuationToken': 'x/y=z', 'MaxKeys': 1000}, 'GET'),
+        ('list_object_versions', {'Prefix': 'p', 'KeyMarker': 'k', 'VersionIdMarker': 'v'}, 'GET'),
+        ('head_object', {'Key': "dir/ä x+y~!*'().txt", 'VersionId': '3/L4'}, 'HEAD'),
+        ('get_object', {'Key': 'a',
+                        'ResponseContentDisposition': 'attachment; filename="a b.txt"'}, 'GET'),
+        ('put_object', {'Key': 'a/b c'}, 'PUT'),
+        ('create_multipart_upload', {'Key': 'a'}, 'POST'),
+        ('upload_part', {'Key': 'a', 'PartNumber': 3, 'UploadId': 'u/+='}, 'PUT'),
+        ('complete_multipart_upload', {'Key': 'a', 'UploadId': 'u'}, 'POST'),
+        ('abort_multipart_upload', {'Key': 'a', 'UploadId': 'u'}, 'DELETE'),
+    ])
+    def test_matches_botocore(self, connection, fixed_time, client_method, params, http_method):
+        params = dict(params, Bucket='that_kerning')
+
+        url = connection.generate_presigned_url(client_method, Params=params,
+                                                ExpiresIn=100, HttpMethod=http_method)
+
+        assert url == connection.s3.meta.client.generate_presigned_url(
+            client_method, Params=params, ExpiresIn=100, HttpMethod=http_method,
+        )
+
+    def test_unknown_operations_go_to_botocore(self, connection, fixed_time):
+        params = {'Bucket': 'that_kerning', 'Key': 'a', 'SSECustomerAlgorithm': 'AES256'}
+
+        assert SigV4Presigner.unsigned_url('https://host/bucket', 'head_object', params) is None
+        assert SigV4Presigner.unsigned_url('https://host/bucket', 'delete_objects',
+                                           {'Bucket': 'that_kerning'}) is None
+        assert connection.generate_presigned_url('head_object', Params=params, HttpMethod='HEAD')
+
+    def test_object_url(self):
+        url, query = SigV4Presigner.unsigned_url(
+            'https://host/bucket', 'upload_part',
+            {'Bucket': 'bucket', 'Key': 'a b/c', 'PartNumber': 2, 'UploadId': 'u'},
+        )
+
+        assert url == 'https://host/bucket/a%20b/c'
+        assert query == [('partNumber', '2'), ('uploadId', 'u')]
+
+    def test_signing_key_is_kept_for_the_day(self):
+        presigner = SigV4Presigner('access', 'secret', 'us-east-1')
+
+        key = presigner.signing_key('20160205')
+
+        assert presigner.signing_key('20160205') is key
+        assert presigner.signing_key('20160206') != key
+        assert list(presigner._signing_keys) == ['20160206']
+
+    def test_presigned_url(self, fixed_time):
+        presigner = SigV4Presigner('access', 'secret', 'us-east-1')
+
+        url = presigner.presign('GET', 'https://host:443/bucket/key', [], 100)
+
+        parsed = parse.urlsplit(url)
+        query = parse.parse_qs(parsed.query)
+        assert parsed.netloc == 'host:443'
+        assert query['X-Amz-Credential'] == ['access/20160205/us-east-1/s3/aws4_request']
+        assert query['X-Amz-Date'] == ['20160205T150850Z']
+        assert query['X-Amz-Expires'] == ['100']
+        assert len(query['X-Amz-Signature'][0]) == 64
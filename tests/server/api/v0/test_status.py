@@ -5,6 +5,8 @@ from tornado import testing
 
 from tests import utils
 from waterbutler.version import __version__
+from waterbutler.core.cache import cache_stats
+from waterbutler.core.circuitbreaker import breakers
 
 
 class TestStatusHandler(utils.HandlerTestCase):
@@ -14,6 +16,8 @@ class TestStatusHandler(utils.HandlerTestCase):
         expected = {
             'status': 'up',
             'version': __version__,
+            'caches': cache_stats(),
+            'circuit_breakers': breakers.stats(),
         }
         resp = yield self.http_client.fetch(
             self.get_url('/status'),
@@ -280,7 +280,6 @@ class TestUploadFile:
 
         await handler.upload_file()
 
-        assert handler.wsock.close.called
         assert handler.writer.close.called
         handler.set_status.assert_called_once_with(201)
         handler.write.assert_called_once_with({
@@ -297,7 +296,6 @@ class TestUploadFile:
 
         await handler.upload_file()
 
-        assert handler.wsock.close.called
         assert handler.writer.close.called
         assert handler.set_status.called is False
         handler.write.assert_called_once_with({
@@ -17,7 +17,7 @@ class TestServerFuzzing(ServerTestCase):
 
     @testing.gen_test
     def test_head_no_auth_server(self):
-        with mock.patch('waterbutler.auth.osf.handler.aiohttp.request') as mock_auth:
+        with mock.patch('waterbutler.auth.osf.handler.connections.service_pool.request') as mock_auth:
             mock_auth.side_effect = ClientError
 
             with pytest.raises(httpclient.HTTPError) as exc:
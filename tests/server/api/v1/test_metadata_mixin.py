@@ -1,10 +1,14 @@
 import json
+import asyncio
 
 import mock
 import pytest
 
 from tests.utils import MockCoroutine
+from waterbutler.core import streams
 from waterbutler.core.path import WaterButlerPath
+from waterbutler.server import download_cache
+from waterbutler.server.download_cache import DownloadCache
 
 from tests.server.api.v1.utils import mock_handler
 from tests.server.api.v1.fixtures import (http_request, handler_auth, mock_stream,
@@ -174,6 +178,85 @@ class TestMetadataMixin:
 
         handler.write_stream.assert_awaited_once()
 
+    @pytest.mark.asyncio
+    async def test_download_file_from_cache(self, http_request, mock_file_metadata, tmpdir,
+                                            monkeypatch):
+        cache = DownloadCache(str(tmpdir), max_size=1024, max_file_size=1024)
+        monkeypatch.setattr(download_cache, 'get_download_cache', lambda: cache)
+        handler = mock_handler(http_request)
+        handler.path = WaterButlerPath('/test_file')
+        handler.provider.metadata = MockCoroutine(return_value=mock_file_metadata)
+        handler.provider.download = MockCoroutine(
+            side_effect=lambda *args, **kwargs: streams.ByteStream(b'cached data')
+        )
+
+        async def write_stream(stream):
+            await stream.read(1024)
+        handler.write_stream = write_stream
+
+        # The first download fills the cache, the second is served from it
+        await handler.download_file()
+        while cache._filling:
+            await asyncio.sleep(0.01)
+        await handler.download_file()
+
+        assert handler.provider.download.call_count == 1
+        assert handler._headers['Content-Length'] == str(len(b'cached data'))
+        assert cache.stats['hits'] == 1
+        assert cache.stats['bytes_saved'] == len(b'cached data')
+        assert handler.provider.provider_metrics.serialize()['download_cache']['result'] == 'hit'
+
+    @pytest.mark.asyncio
+    async def test_download_file_caches_version_from_before(self, http_request, tmpdir,
+                                                           mock_file_metadata, monkeypatch):
+        cache = DownloadCache(str(tmpdir), max_size=1024, max_file_size=1024)
+        monkeypatch.setattr(download_cache, 'get_download_cache', lambda: cache)
+        handler = mock_handler(http_request)
+        handler.path = WaterButlerPath('/test_file')
+        calls = []
+
+        async def metadata(*args, **kwargs):
+            calls.append('metadata')
+            return mock_file_metadata
+
+        async def download(*args, **kwargs):
+            calls.append('download')
+            return streams.ByteStream(b'cached data')
+
+        async def write_stream(stream):
+            await stream.read(1024)
+
+        handler.provider.metadata = metadata
+        handler.provider.download = download
+        handler.write_stream = write_stream
+
+        await handler.download_file()
+        while cache._filling:
+            await asyncio.sleep(0.01)
+
+        assert calls == ['metadata', 'download']
+        location = cache.location(handler.provider, handler.path)
+        stream = await cache.open(location, cache.version(mock_file_metadata))
+        assert await stream.read() == b'cached data'
+        stream.close()
+
+    @pytest.mark.asyncio
+    async def test_download_file_not_cached_skips_metadata(self, http_request, tmpdir,
+                                                           mock_partial_stream, monkeypatch):
+        cache = DownloadCache(str(tmpdir), max_size=1024, max_file_size=1024)
+        monkeypatch.setattr(download_cache, 'get_download_cache', lambda: cache)
+        handler = mock_handler(http_request)
+        handler.request.headers['Range'] = 'bytes=10-100'
+        handler.path = WaterButlerPath('/test_file')
+        handler.provider.metadata = MockCoroutine()
+        handler.provider.download = MockCoroutine(return_value=mock_partial_stream)
+
+        await handler.download_file()
+
+        handler.provider.metadata.assert_not_called()
+        handler.provider.download.assert_called_once()
+        assert handler.provider.provider_metrics.serialize()['download_cache']['result'] == 'miss'
+
     @pytest.mark.asyncio
     @pytest.mark.parametrize("given_arg,expected_name,filtered_name", [
         (['résumé.doc'], 'r%C3%A9sum%C3%A9.doc', 'resume.doc'),
@@ -292,6 +375,40 @@ class TestMetadataMixin:
 
         handler.write_stream.assert_called_once_with(mock_stream)
 
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('if_range,status', [(None, 206), ('"stale"', 200)])
+    async def test_download_folder_as_stored_zip_range(self, http_request, if_range, status):
+
+        class Entry:
+            name, size, date_time, version, crc = 'a.txt', 3, (2019, 1, 1, 0, 0, 0), None, None
+
+            async def open(self, start, end):
+                return streams.ByteStream(b'abc'[start:end + 1])
+
+        stream = streams.StoredZipStreamReader([Entry()])
+        handler = mock_handler(http_request)
+        handler.provider.zip = MockCoroutine(return_value=stream)
+        handler.path = WaterButlerPath('/test_folder/')
+        handler.request.query_arguments['store'] = [b'1']
+        handler.request.headers['Range'] = 'bytes=10-'
+        if if_range:
+            handler.request.headers['If-Range'] = if_range
+
+        await handler.download_folder_as_zip()
+
+        handler.provider.zip.assert_awaited_once_with(handler.path, store=True)
+        assert handler.get_status() == status
+        assert handler._headers['Etag'] == stream.etag
+        assert handler._headers['Accept-Ranges'] == 'bytes'
+        if status == 206:
+            assert handler._headers['Content-Range'] == \
+                'bytes 10-{0}/{1}'.format(stream.total_size - 1, stream.total_size)
+            assert handler._headers['Content-Length'] == str(stream.total_size - 10)
+        else:
+            assert handler._headers['Content-Length'] == str(stream.total_size)
+        handler.write_stream.assert_called_once_with(stream)
+        assert handler.provider.provider_metrics.serialize()['zip_store'] == stream.stats
+
     @pytest.mark.asyncio
     async def test_download_folder_as_zip_root(self, http_request, mock_stream):
 
@@ -3,6 +3,7 @@ import pytest
 from waterbutler.core import exceptions
 from waterbutler.core.path import WaterButlerPath
 
+from tests.utils import MockCoroutine, MockProvider
 from tests.server.api.v1.utils import mock_handler
 from tests.server.api.v1.fixtures import (http_request, move_copy_args, handler_auth,
                                           patch_auth_handler, serialized_request,
@@ -189,3 +190,33 @@ class TestMoveOrCopy:
                                        conflict='warn',
                                        rename='renamed path',
                                        request=serialized_request)
+
+    @pytest.mark.asyncio
+    async def test_move_copy_records_timings(self, http_request, mock_inter):
+        handler = mock_handler(http_request)
+        handler._json = {'action': 'copy', 'path': '/test_path/', 'provider': 'MockProvider'}
+
+        await handler.move_or_copy()
+
+        timings = handler.provider.provider_metrics.serialize()['move_or_copy']['timings']
+        assert set(timings.keys()) == {'source_auth', 'source_validate', 'destination_auth',
+                                       'destination_validate', 'total'}
+        assert all(value >= 0 for value in timings.values())
+
+    @pytest.mark.asyncio
+    async def test_source_error_wins_over_destination_error(self, http_request, mock_inter):
+        mock_make_provider, _ = mock_inter
+        src_provider, dest_provider = MockProvider(), MockProvider()
+        src_provider.validate_v1_path = MockCoroutine(side_effect=exceptions.NotFoundError('/src'))
+        dest_provider.validate_path = MockCoroutine(
+            side_effect=exceptions.InvalidParameters('bad dest')
+        )
+        mock_make_provider.side_effect = [src_provider, dest_provider]
+
+        handler = mock_handler(http_request)
+        handler._json = {'action': 'move', 'path': '/test_path/', 'provider': 'MockProvider'}
+
+        with pytest.raises(exceptions.NotFoundError):
+            await handler.move_or_copy()
+
+        assert dest_provider.validate_path.called
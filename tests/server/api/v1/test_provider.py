@@ -4,6 +4,7 @@ from unittest import mock
 import pytest
 
 from waterbutler.auth.osf.handler import EXPORT_DATA_FAKE_NODE_ID
+from waterbutler.core.streams import StreamPipe
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.server.api.v1.provider import list_or_value
 
@@ -82,6 +83,9 @@ class TestProviderHandler:
         handler.target_path = WaterButlerPath('/file')
         await handler.prepare_stream()
 
+        assert isinstance(handler.writer, StreamPipe)
+        assert handler.stream.inner is handler.writer
+
     @pytest.mark.asyncio
     async def test_head(self, http_request):
 
@@ -0,0 +1,189 @@
+import os
+import asyncio
+
+import pytest
+
+from waterbutler.core import streams
+from waterbutler.core.path import WaterButlerPath
+from waterbutler.server import download_cache
+from waterbutler.server.download_cache import DownloadCache
+
+
+class MockProvider:
+    NAME = 'mock'
+
+    def __init__(self, settings=None):
+        self.settings = settings or {'bucket': 'one'}
+
+
+class MockMetadata:
+
+    def __init__(self, etag='etag'):
+        self.etag = etag
+
+
+@pytest.fixture
+def cache(tmpdir):
+    return DownloadCache(str(tmpdir), max_size=10, max_file_size=8)
+
+
+def location(name):
+    return DownloadCache.location(MockProvider(), WaterButlerPath('/' + name))
+
+
+VERSION = DownloadCache.version(MockMetadata())
+
+
+async def fill(cache, name, data, read=None, etag='etag'):
+    stream = streams.ByteStream(data)
+    branch = cache.fill(location(name), stream, DownloadCache.version(MockMetadata(etag)))
+    await stream.read(read if read is not None else -1)
+    if branch is not None:
+        branch.close()
+    while cache._filling:
+        await asyncio.sleep(0.001)
+    return branch
+
+
+def cached_files(tmpdir):
+    return sorted(
+        os.path.join(entry, name)
+        for entry in os.listdir(str(tmpdir))
+        for name in os.listdir(os.path.join(str(tmpdir), entry))
+    )
+
+
+class TestDownloadCache:
+
+    def test_keys(self):
+        path = WaterButlerPath('/file.txt')
+
+        assert DownloadCache.version(MockMetadata(None)) is None
+        assert DownloadCache.version(MockMetadata('changed')) != VERSION
+        assert location('file.txt') == DownloadCache.location(MockProvider(), path)
+        assert location('file.txt') != DownloadCache.location(MockProvider({'bucket': 'two'}),
+                                                              path)
+        assert location('file.txt') != DownloadCache.location(MockProvider(), path, version='2')
+
+    @pytest.mark.asyncio
+    async def test_read_through(self, cache):
+        assert not await cache.has(location('a'))
+
+        await fill(cache, 'a', b'abcdef')
+        assert await cache.has(location('a'))
+        stream = await cache.open(location('a'), VERSION)
+
+        assert await stream.read() == b'abcdef'
+        stream.close()
+        assert cache.stats['hits'] == 1
+        assert cache.stats['misses'] == 1
+        assert cache.stats['hit_ratio'] == 0.5
+        assert cache.stats['bytes_saved'] == 6
+
+    @pytest.mark.asyncio
+    async def test_range(self, cache):
+        await fill(cache, 'a', b'abcdef')
+
+        stream = await cache.open(location('a'), VERSION, (2, None))
+
+        assert stream.partial
+        assert stream.content_range == 'bytes 2-5/6'
+        assert await stream.read() == b'cdef'
+        stream.close()
+        assert await cache.open(location('a'), VERSION, (6, None)) is None
+
+    @pytest.mark.asyncio
+    async def test_new_version_replaces_old(self, cache, tmpdir):
+        await fill(cache, 'a', b'abcdef')
+        changed = DownloadCache.version(MockMetadata('changed'))
+
+        assert await cache.open(location('a'), changed) is None
+
+        await fill(cache, 'a', b'ghijkl', etag='changed')
+
+        assert cached_files(tmpdir) == [os.path.join(location('a'), changed)]
+
+    @pytest.mark.asyncio
+    async def test_incomplete_not_cached(self, cache, tmpdir):
+        await fill(cache, 'a', b'abcdef', read=3)
+
+        assert not await cache.has(location('a'))
+        assert os.listdir(str(tmpdir)) == []
+
+    @pytest.mark.asyncio
+    async def test_no_etag_not_cached(self, cache, tmpdir):
+        await fill(cache, 'a', b'abcdef', etag=None)
+
+        assert os.listdir(str(tmpdir)) == []
+
+    @pytest.mark.asyncio
+    async def test_too_large_not_cached(self, cache):
+        assert await fill(cache, 'a', b'x' * 9) is None
+        assert not await cache.has(location('a'))
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_evicted(self, cache, tmpdir):
+        await fill(cache, 'a', b'aaaa')
+        await fill(cache, 'b', b'bbbb')
+        # Modification times are the recency, make sure they differ
+        os.utime(os.path.join(str(tmpdir), location('a'), VERSION), (1, 1))
+        os.utime(os.path.join(str(tmpdir), location('b'), VERSION), (2, 2))
+        (await cache.open(location('a'), VERSION)).close()
+        await fill(cache, 'c', b'cccc')
+
+        assert not await cache.has(location('b'))
+        assert cache.size == 8
+        assert cache.stats['evictions'] == 1
+        assert cached_files(tmpdir) == sorted([os.path.join(location('a'), VERSION),
+                                               os.path.join(location('c'), VERSION)])
+
+    @pytest.mark.asyncio
+    async def test_counts_fills_without_scanning(self, cache, tmpdir, monkeypatch):
+        await fill(cache, 'a', b'aaaa')
+        scan = cache._scan
+        scans = []
+        monkeypatch.setattr(cache, '_scan', lambda: scans.append(1) or scan())
+
+        await fill(cache, 'b', b'bbbb')
+        await fill(cache, 'b', b'bbb', etag='changed')
+
+        assert scans == []
+        assert (cache.files, cache.size) == (2, 7)
+
+        await fill(cache, 'c', b'cccc')
+
+        assert scans == [1]
+        assert cache.size <= 10
+        assert cache.stats['evictions'] == 1
+
+    @pytest.mark.asyncio
+    async def test_shared_by_processes(self, cache, tmpdir, monkeypatch):
+        # Count what the other process added on every fill
+        monkeypatch.setattr(download_cache, 'SCAN_INTERVAL', 0)
+        other = DownloadCache(str(tmpdir), max_size=10, max_file_size=8)
+
+        await fill(cache, 'a', b'aaaa')
+        await fill(other, 'b', b'bbbb')
+        os.utime(os.path.join(str(tmpdir), location('a'), VERSION), (1, 1))
+        await fill(cache, 'c', b'cccc')
+
+        # The size limit covers what both filled
+        assert cache.size == 8
+        assert not await other.has(location('a'))
+        assert await (await other.open(location('c'), VERSION)).read() == b'cccc'
+
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, cache, tmpdir):
+        await fill(cache, 'a', b'abcdef')
+        unfinished = os.path.join(str(tmpdir), '.tmp-unfinished')
+        in_progress = os.path.join(str(tmpdir), '.tmp-in-progress')
+        open(unfinished, 'wb').close()
+        open(in_progress, 'wb').close()
+        os.utime(unfinished, (1, 1))
+
+        reloaded = DownloadCache(str(tmpdir), max_size=10, max_file_size=8)
+
+        assert reloaded.size == 6
+        assert await (await reloaded.open(location('a'), VERSION)).read() == b'abcdef'
+        # Another process may still be writing the recent one
+        assert sorted(os.listdir(str(tmpdir))) == sorted([location('a'), '.tmp-in-progress'])
@@ -1,11 +1,18 @@
+import os
+import re
+import asyncio
 from unittest import mock
 
 import pytest
+import tornado.web
 from tornado import testing
+from tornado.httpserver import HTTPServer
 
 from tests.server.api.v1.utils import ServerTestCase
 
-from waterbutler.server.utils import CORsMixin, parse_request_range
+from waterbutler.server import utils
+from waterbutler.core.streams import FileStreamReader
+from waterbutler.server.utils import CORsMixin, UtilMixin, parse_request_range
 
 
 class MockHandler(CORsMixin):
@@ -189,3 +196,63 @@ class TestRangeParsing():
         result = parse_request_range(range_header)
         assert result == expected
 
+
+
+class SendfileHandler(UtilMixin, tornado.web.RequestHandler):
+
+    file_path = None
+
+    async def get(self):
+        stream = FileStreamReader(open(self.file_path, 'rb'))
+        self.set_header('Content-Length', str(stream.size))
+        try:
+            await self.write_stream(stream)
+        finally:
+            stream.close()
+
+
+class TestSendfile:
+    """Sends a file over a real socket, large enough for the socket's buffer to fill up, and
+    reads it back twice on the same keep-alive connection.
+    """
+
+    DATA = os.urandom(8 * 1024 * 1024)
+
+    @pytest.fixture
+    def sendfile(self, tmpdir):
+        path = tmpdir.join('file.bin')
+        path.write_binary(self.DATA)
+        with mock.patch.object(SendfileHandler, 'file_path', str(path)), \
+                mock.patch('waterbutler.server.utils.os.sendfile', wraps=os.sendfile) as sendfile:
+            yield sendfile
+
+    async def fetch_twice(self):
+        sock, port = testing.bind_unused_port()
+        server = HTTPServer(tornado.web.Application([(r'/file', SendfileHandler)]))
+        server.add_sockets([sock])
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        bodies = []
+        try:
+            for _ in range(2):
+                writer.write(b'GET /file HTTP/1.1\r\nHost: localhost\r\n\r\n')
+                head = await reader.readuntil(b'\r\n\r\n')
+                assert head.startswith(b'HTTP/1.1 200')
+                length = int(re.search(rb'Content-Length: (\d+)', head).group(1))
+                bodies.append(await reader.readexactly(length))
+        finally:
+            writer.close()
+            server.stop()
+            await server.close_all_connections()
+        return bodies
+
+    @pytest.mark.asyncio
+    async def test_sendfile(self, sendfile):
+        assert await self.fetch_twice() == [self.DATA, self.DATA]
+        assert sendfile.called
+
+    @pytest.mark.asyncio
+    async def test_unchecked_tornado_version(self, sendfile):
+        with mock.patch.object(utils, 'SENDFILE_TORNADO_VERSIONS', ()):
+            assert await self.fetch_twice() == [self.DATA, self.DATA]
+
+        assert not sendfile.called
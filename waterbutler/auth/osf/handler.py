@@ -1,14 +1,18 @@
+import copy
+import json
+import hashlib
 import inspect  # noqa
 import logging
 import datetime
 
 import jwe
 import jwt
-import aiohttp
 from aiohttp.client_exceptions import ClientError, ContentTypeError
 
 from waterbutler.core import exceptions
+from waterbutler.core import connections
 from waterbutler.auth.osf import settings
+from waterbutler.core.cache import LRUCache
 from waterbutler.utils import inspect_info  # noqa
 from waterbutler.core.auth import AuthType, BaseAuthHandler
 from waterbutler.settings import MFR_IDENTIFYING_HEADER
@@ -19,6 +23,8 @@ EXPORT_DATA_FAKE_NODE_ID = 'export_location'
 
 logger = logging.getLogger(__name__)
 
+auth_cache = LRUCache('osf_auth', max_size=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
 
 class OsfAuthHandler(BaseAuthHandler):
     """Identity lookup via the Open Science Framework"""
@@ -49,12 +55,29 @@ class OsfAuthHandler(BaseAuthHandler):
 
         return query_params
 
+    @staticmethod
+    def build_cache_key(resource, provider, osf_action, headers, cookies, cookie=None,
+                        view_only=None, callback_log=True, location_id=None):
+        """Build the ``auth_cache`` key for a v1 auth request.  Anything that identifies the user
+        (the Authorization and MFR headers, the ``cookie`` and ``view_only`` query parameters and
+        the request cookies) is hashed so that credentials are never held in the key itself.
+        """
+        identity = json.dumps([
+            headers.get('Authorization'),
+            headers.get(MFR_IDENTIFYING_HEADER),
+            cookie,
+            view_only,
+            sorted((key, morsel.value) for key, morsel in cookies.items()),
+        ]).encode('utf-8')
+        return (resource, provider, osf_action, callback_log, location_id,
+                hashlib.sha256(identity).hexdigest())
+
     async def make_request(self, params, headers, cookies):
         try:
             # Note: with simple request whose response is handled right afterwards without "being passed
-            #       further along", use the context manager so WB doesn't need to handle the sessions.
-            async with aiohttp.request(
-                'get',
+            #       further along", use the context manager so the connection goes back to the pool.
+            async with connections.service_pool.request(
+                'GET',
                 settings.API_URL,
                 params=params,
                 headers=headers,
@@ -171,11 +194,24 @@ class OsfAuthHandler(BaseAuthHandler):
         if resource == EXPORT_DATA_FAKE_NODE_ID:
             data['location_id'] = location_id
 
-        payload = await self.make_request(
-            self.build_payload(data, cookie=cookie, view_only=view_only),
-            headers,
-            dict(request.cookies)
-        )
+        cache_key = None
+        if settings.AUTH_CACHE_ENABLED and osf_action in settings.AUTH_CACHE_ACTIONS:
+            cache_key = self.build_cache_key(resource, provider, osf_action, headers,
+                                             request.cookies, cookie=cookie, view_only=view_only,
+                                             callback_log=callback_log, location_id=location_id)
+            payload = auth_cache.get(cache_key)
+            if payload is not None:
+                payload = copy.deepcopy(payload)
+
+        if cache_key is None or payload is None:
+            payload = await self.make_request(
+                self.build_payload(data, cookie=cookie, view_only=view_only),
+                headers,
+                dict(request.cookies)
+            )
+            # Errors are raised by `make_request`, so only successful responses are cached
+            if cache_key is not None:
+                auth_cache.set(cache_key, copy.deepcopy(payload))
 
         payload['auth']['callback_url'] = payload['callback_url'] if callback_log else ''
         return payload
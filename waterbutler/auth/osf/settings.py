@@ -21,3 +21,17 @@ JWE_SECRET = (JWE_SECRET or 'CirclesAre4Squares')
 JWT_SECRET = (JWT_SECRET or 'ILiekTrianglesALot')
 
 MFR_ACTION_HEADER = config.get('MFR_ACTION_HEADER', 'X-Cos-Mfr-Request-Action')
+
+# Opt-in, short-lived in-process cache of successful auth responses from the OSF.  Only actions in
+# AUTH_CACHE_ACTIONS are cached.  The OSF records download analytics during `download` auth calls,
+# so `download` is left out by default; cache hits never reach the OSF.
+auth_cache_config = config.child('AUTH_CACHE')
+AUTH_CACHE_ENABLED = auth_cache_config.get_bool('ENABLED', False)
+AUTH_CACHE_TTL = float(auth_cache_config.get('TTL', 30))  # seconds
+AUTH_CACHE_MAX_SIZE = int(auth_cache_config.get('MAX_SIZE', 1024))
+AUTH_CACHE_ACTIONS = auth_cache_config.get_object('ACTIONS', [
+    'metadata',
+    'revisions',
+    'render',
+    'export',
+])
@@ -0,0 +1,147 @@
+import time
+import typing
+import threading
+import collections
+
+# Every named cache in the process, so their counters can be reported together
+_CACHES = {}  # type: typing.Dict[str, LRUCache]
+
+
+class LRUCache:
+    """A small in-process cache with a bounded number of entries, least-recently-used eviction and
+    an optional time-to-live.  Entries are kept in an :class:`collections.OrderedDict` in recency
+    order, so lookups, inserts and evictions are all O(1).
+
+    The cache is shared between the tornado loop and the celery worker threads, so every
+    operation is done under a lock.  Values are stored as given; callers that hand out mutable
+    values must copy them themselves.
+
+    Caches of values that vary a lot in size can also be bounded by their total weight, e.g. an
+    estimate of each value's bytes given by ``weigh``.  Values heavier than the whole budget are
+    not cached.
+
+    Hit, miss, eviction and expiration counters are kept for every cache and can be fetched
+    for all named caches at once with :func:`cache_stats`.
+
+    :param str name: name to report the cache's counters under
+    :param int max_size: maximum number of entries before the least recently used is evicted
+    :param float ttl: seconds an entry stays valid for, or ``None`` for no expiry
+    :param int max_weight: maximum total weight of the entries, or ``None`` for no limit
+    :param weigh: callable giving the weight of a value, required with ``max_weight``
+    """
+
+    def __init__(self, name: str, max_size: int=1024, ttl: float=None, max_weight: int=None,
+                 weigh: typing.Callable[[typing.Any], int]=None) -> None:
+        if max_weight is not None and weigh is None:
+            raise ValueError('max_weight needs a weigh function')
+
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigh = weigh
+
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict
+        self.weight = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+        _CACHES[name] = self
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count: bool=True):
+        """Return the value cached under ``key`` and mark it as recently used.  Expired entries
+        are dropped and reported as a miss.
+        """
+        with self._lock:
+            try:
+                expires, value, weight = self._entries[key]
+            except KeyError:
+                self.misses += count
+                return default
+
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                self.weight -= weight
+                self.expirations += 1
+                self.misses += count
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += count
+            return value
+
+    def set(self, key, value, ttl: float=None) -> None:
+        """Cache ``value`` under ``key``, evicting the least recently used entries if the cache is
+        full.  ``ttl`` overrides the cache's default time-to-live for this entry.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.monotonic() + ttl
+        weight = 0 if self.max_weight is None else self.weigh(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.weight -= old[2]
+            if self.max_weight is not None and weight > self.max_weight:
+                return
+
+            self._entries[key] = (expires, value, weight)
+            self.weight += weight
+            while len(self._entries) > self.max_size or (self.max_weight is not None and
+                                                         self.weight > self.max_weight):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.weight -= evicted
+                self.evictions += 1
+
+    def items(self) -> list:
+        """Return a snapshot of the unexpired ``(key, value)`` pairs, oldest first, without
+        counting lookups or touching their recency.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (expires, value, _) in self._entries.items()
+                    if expires is None or expires > now]
+
+    def invalidate(self, key) -> None:
+        """Drop ``key`` from the cache, if present."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.weight -= entry[2]
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+        if self.max_weight is not None:
+            stats.update(weight=self.weight, max_weight=self.max_weight)
+        return stats
+
+
+_MISSING = object()
+
+
+def cache_stats() -> dict:
+    """Return the counters of every named cache in the process, keyed by cache name."""
+    return {name: cache.stats for name, cache in sorted(_CACHES.items())}
@@ -0,0 +1,183 @@
+import time
+import logging
+import threading
+
+from waterbutler.core import ratelimit
+from waterbutler.core import exceptions
+from waterbutler import settings as wb_settings
+from waterbutler.core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Responses that say the upstream itself is in trouble, as opposed to the request being bad
+FAILURE_STATUSES = {502, 503, 504}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Tracks the health of one upstream host and stops sending it requests while it is down.
+
+    The breaker starts *closed* and lets every request through.  After ``failure_threshold``
+    consecutive failures (connection errors, timeouts and 502/503/504 responses) it *opens*: for
+    the next ``recovery_timeout`` seconds every request fails fast with
+    :class:`.ProviderUnavailableError` instead of tying up a connection and a worker until the
+    request times out.  Once the timeout has passed the breaker is *half-open* and lets
+    ``half_open_max_calls`` trial requests through.  A successful trial closes the breaker again,
+    a failed one reopens it for another ``recovery_timeout``.
+
+    Responses throttling the client (see :func:`.ratelimit.is_throttled`), such as a 503 with
+    ``Retry-After``, are left to the rate limiter.  Breakers are per host and many accounts share
+    an API host, so one account being throttled mustn't cut off all the others.
+
+    Breakers are shared by every provider instance in the process and by the tornado and celery
+    loops, so their state is only changed under a lock.
+
+    :param str host: the upstream host, for logging and stats
+    :param int failure_threshold: consecutive failures that open the breaker
+    :param float recovery_timeout: seconds the breaker stays open before allowing a trial
+    :param int half_open_max_calls: trial requests allowed at once while half-open
+    """
+
+    def __init__(self, host: str, failure_threshold: int=5, recovery_timeout: float=30,
+                 half_open_max_calls: int=1) -> None:
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def before_request(self) -> bool:
+        """Let a request through or fail it fast.
+
+        :returns: whether the request took a trial slot, which must be given back with
+            :meth:`release` unless its outcome is recorded
+        :raises: :class:`.ProviderUnavailableError` if the breaker is open, or half-open with all
+            trial requests already in flight
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == CLOSED:
+                return False
+            if state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            retry_in = max(self._opened_at + self.recovery_timeout - now, 1)
+
+        raise exceptions.ProviderUnavailableError(self.host, retry_in)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info('Circuit for {} closed'.format(self.host))
+            self._state = CLOSED
+            self._failures = 0
+            self._trials = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            state = self._current_state(now)
+            if state == HALF_OPEN or (state == CLOSED and
+                                      self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = now
+                self._trials = 0
+                self.times_opened += 1
+                logger.warning('Circuit for {} opened after {} consecutive failure(s)'.format(
+                    self.host, self._failures
+                ))
+
+    def record_response(self, status: int, headers=None) -> bool:
+        """Record the outcome of a request from the status and headers of its response.
+
+        :returns: whether the response told anything about the upstream's health.  If not, as
+            for throttled responses, a trial slot the request took must still be released.
+        """
+        if headers is not None and ratelimit.is_throttled(status, headers):
+            return False
+        if status in FAILURE_STATUSES:
+            self.record_failure()
+        else:
+            self.record_success()
+        return True
+
+    def release(self) -> None:
+        """Give back a trial slot for a request that ended without telling us anything about the
+        upstream, e.g. because it was cancelled or failed before it was sent.
+        """
+        with self._lock:
+            if self._trials:
+                self._trials -= 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failures': self._failures,
+            'times_opened': self.times_opened,
+        }
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._trials = 0
+        return self._state
+
+
+class CircuitBreakerRegistry:
+    """The process-wide registry of :class:`CircuitBreaker` objects, one per upstream host.  The
+    registry is bounded; a breaker that falls out of it starts over as closed.
+
+    :param int max_hosts: maximum number of breakers to keep
+    :param \\*\\*breaker_kwargs: passed on to every new :class:`CircuitBreaker`
+    """
+
+    def __init__(self, max_hosts: int=4096, **breaker_kwargs) -> None:
+        self.breaker_kwargs = breaker_kwargs
+        self._lock = threading.Lock()
+        self._breakers = LRUCache('circuit_breakers', max_size=max_hosts)
+
+    def get(self, host: str) -> CircuitBreaker:
+        """Return the breaker for ``host``, creating it if needed."""
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(host, **self.breaker_kwargs)
+                self._breakers.set(host, breaker)
+            return breaker
+
+    def stats(self) -> dict:
+        """Return the stats of every breaker that has seen a failure, keyed by host."""
+        stats = {}
+        for host, breaker in self._breakers.items():
+            breaker_stats = breaker.stats
+            if breaker_stats['failures'] or breaker_stats['times_opened']:
+                stats[host] = breaker_stats
+        return stats
+
+    def clear(self) -> None:
+        self._breakers.clear()
+
+
+breakers = CircuitBreakerRegistry(
+    max_hosts=wb_settings.CIRCUIT_BREAKER_MAX_HOSTS,
+    failure_threshold=wb_settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=wb_settings.CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    half_open_max_calls=wb_settings.CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS,
+)
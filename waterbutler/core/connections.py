@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import weakref
+import threading
+
+import aiohttp
+from yarl import URL
+
+from waterbutler import settings as wb_settings
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """A process-wide pool of long-lived :class:`aiohttp.ClientSession` objects.  ``provider_pool``
+    is shared by every provider instance and ``service_pool`` by WB's own calls to the OSF and
+    Keen.  Providers are rebuilt for every request, so a session that lives and dies with the
+    provider means a new TCP and TLS handshake for nearly every upstream API call.  The pool keeps
+    sessions (and their keep-alive connections) around across requests instead.
+
+    Sessions are keyed first by event loop, since a session may only be used on the loop it was
+    created on and celery tasks run on their own loops.  Within a loop, sessions are keyed by the
+    upstream origin (scheme, host and port) and by the SSL settings of the connector.  Giving each
+    upstream host its own connector keeps one slow backend from exhausting the connection limit
+    for everyone else.
+
+    Quirks:
+
+    Providers such as nextcloud and owncloud build a customized connector for every request.  The
+    first such connector seen for a key is adopted by the new session and subsequent ones are
+    closed, the same way :meth:`.BaseProvider.get_or_create_session` used to handle them.  The SSL
+    settings of the connector are part of the key, so hosts with and without certificate checking
+    never share a session.  ``aiohttp`` doesn't expose the SSL settings publicly, so we have to
+    read ``connector._ssl``.
+
+    Sessions use a :class:`aiohttp.DummyCookieJar`.  A shared session must not carry cookies set
+    by one user's upstream over to another user's request.
+
+    :param int limit: maximum number of simultaneous connections per session
+    :param int limit_per_host: maximum number of simultaneous connections per endpoint
+    :param float keepalive_timeout: seconds to keep an idle connection open for reuse
+    :param int dns_cache_ttl: seconds to cache DNS lookups for
+    :param timeout: ( :class:`aiohttp.ClientTimeout` ) default timeouts for the pool's sessions,
+        ``aiohttp``'s defaults if not given
+    """
+
+    def __init__(self, limit: int=100, limit_per_host: int=0, keepalive_timeout: float=15,
+                 dns_cache_ttl: int=10, timeout: aiohttp.ClientTimeout=None) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._loop_sessions = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
+
+    def get_session(self, url, connector: aiohttp.BaseConnector=None) -> aiohttp.ClientSession:
+        """Return the shared session for the origin of ``url`` on the current event loop, creating
+        it if needed.
+
+        :param url: ( :class:`str` or :class:`yarl.URL` ) the url about to be requested
+        :param connector: ( :class:`aiohttp.BaseConnector` ) an optional customized connector
+        :rtype: :class:`aiohttp.ClientSession`
+        """
+        loop = asyncio.get_event_loop()
+        key = self._session_key(url, connector)
+
+        with self._lock:
+            sessions = self._loop_sessions.setdefault(loop, {})
+            session = sessions.get(key, None)
+            if session is None or session.closed:
+                session_kwargs = {}
+                if self.timeout is not None:
+                    session_kwargs['timeout'] = self.timeout
+                session = aiohttp.ClientSession(
+                    connector=connector or self._make_connector(),
+                    cookie_jar=aiohttp.DummyCookieJar(),
+                    **session_kwargs
+                )
+                sessions[key] = session
+                connector = None
+
+        if connector is not None:
+            # The existing session already has a connector with the same customizations
+            connector._close()
+
+        return session
+
+    def request(self, method: str, url, **kwargs):
+        """Make a request with the pooled session for ``url``.  Returns the same context manager
+        as :meth:`aiohttp.ClientSession.request`, so the response is released (and its connection
+        returned to the pool) on exit::
+
+            async with pool.request('GET', url, params=params) as response:
+                body = await response.json()
+        """
+        return self.get_session(url).request(method, url, **kwargs)
+
+    def sessions(self, loop: asyncio.AbstractEventLoop=None) -> list:
+        """Return the sessions that belong to ``loop``, defaulting to the current event loop."""
+        loop = loop or asyncio.get_event_loop()
+        with self._lock:
+            return list(self._loop_sessions.get(loop, {}).values())
+
+    async def close(self) -> None:
+        """Close every session that belongs to the current event loop.  Must be called before the
+        loop is stopped for good, e.g. on server shutdown or at the end of a celery worker.
+        """
+        loop = asyncio.get_event_loop()
+        with self._lock:
+            sessions = self._loop_sessions.pop(loop, {})
+
+        for session in sessions.values():
+            if not session.closed:
+                await session.close()
+
+        logger.debug('Closed {} pooled session(s)'.format(len(sessions)))
+
+    def _make_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            enable_cleanup_closed=True,
+        )
+
+    @staticmethod
+    def _session_key(url, connector: aiohttp.BaseConnector=None) -> tuple:
+        url = url if isinstance(url, URL) else URL(str(url))
+        if connector is None:
+            return (url.scheme, url.host, url.port, None, None)
+        return (url.scheme, url.host, url.port, type(connector).__name__,
+                getattr(connector, '_ssl', None))
+
+
+provider_pool = ConnectionPool(
+    limit=wb_settings.AIOHTTP_POOL_LIMIT,
+    limit_per_host=wb_settings.AIOHTTP_POOL_LIMIT_PER_HOST,
+    keepalive_timeout=wb_settings.AIOHTTP_POOL_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=wb_settings.AIOHTTP_POOL_DNS_CACHE_TTL,
+)
+
+service_pool = ConnectionPool(
+    limit=wb_settings.AIOHTTP_SERVICE_POOL_LIMIT,
+    limit_per_host=wb_settings.AIOHTTP_SERVICE_POOL_LIMIT_PER_HOST,
+    keepalive_timeout=wb_settings.AIOHTTP_SERVICE_POOL_KEEPALIVE_TIMEOUT,
+    dns_cache_ttl=wb_settings.AIOHTTP_SERVICE_POOL_DNS_CACHE_TTL,
+    timeout=aiohttp.ClientTimeout(
+        total=wb_settings.AIOHTTP_SERVICE_POOL_TIMEOUT,
+        connect=wb_settings.AIOHTTP_SERVICE_POOL_CONNECT_TIMEOUT,
+    ),
+)
@@ -208,6 +208,17 @@ class UploadFailedError(ProviderError):
         super().__init__(message, code=code)
 
 
+class ProviderUnavailableError(ProviderError):
+    """Raised without contacting the upstream while its circuit breaker is open.  See
+    :mod:`waterbutler.core.circuitbreaker`.  The upstream ``host`` is kept for logging only,
+    as the message is shown to clients."""
+    def __init__(self, host, retry_in, code=HTTPStatus.SERVICE_UNAVAILABLE):
+        super().__init__('The storage provider is temporarily unavailable. Please try again in '
+                         '{} seconds.'.format(int(retry_in + 0.5)), code=code)
+        self.host = host
+        self.retry_in = retry_in
+
+
 class NotFoundError(ProviderError):
     def __init__(self, path, code=HTTPStatus.NOT_FOUND, is_user_error=True):
         super().__init__(
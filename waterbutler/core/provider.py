@@ -1,11 +1,9 @@
 import abc
-import time
 import json
 import typing
 import asyncio
+import hashlib
 import logging
-import weakref
-import functools
 import itertools
 from urllib import parse
 
@@ -14,48 +12,36 @@ import aiohttp
 from aiohttp.client import _RequestContextManager
 from yarl import URL
 
+from waterbutler.core import utils
 from waterbutler.core import signing
+from waterbutler.core import transfer
 from waterbutler.core import streams
+from waterbutler.core import ratelimit
 from waterbutler.core import exceptions
+from waterbutler.core import connections
+from waterbutler.core import circuitbreaker
 from waterbutler.core import path as wb_path
 from waterbutler import settings as wb_settings
 from waterbutler.core.metrics import MetricsRecord
 from waterbutler.core import metadata as wb_metadata
+from waterbutler.core.utils import StoredZipEntry
 from waterbutler.core.utils import ZipStreamGenerator
 from waterbutler.core.utils import RequestHandlerContext
+from waterbutler.core.utils import get_stored_zip_crc_store
 
 
 logger = logging.getLogger(__name__)
-_THROTTLES = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
 NO_URL_ENCODED_PROVIDERS = ['nextcloud', 'owncloud', 'nextcloudinstitutions']
 QUERY_METHODS = ('GET', 'DELETE')
-
-
-def throttle(concurrency=10, interval=1):
-    def _throttle(func):
-        @functools.wraps(func)
-        async def wrapped(*args, **kwargs):
-            if asyncio.get_event_loop() not in _THROTTLES:
-                count, last_call, event = 0, time.time(), asyncio.Event()
-                _THROTTLES[asyncio.get_event_loop()] = (count, last_call, event)
-                event.set()
-            else:
-                count, last_call, event = _THROTTLES[asyncio.get_event_loop()]
-
-            await event.wait()
-            count += 1
-            if count > concurrency:
-                count = 0
-                if (time.time() - last_call) < interval:
-                    event.clear()
-                    await asyncio.sleep(interval - (time.time() - last_call))
-                    event.set()
-
-            last_call = time.time()
-            _THROTTLES[asyncio.get_event_loop()] = (count, last_call, event)
-            return await func(*args, **kwargs)
-        return wrapped
-    return _throttle
+# Upstreams get the whole ``AIOHTTP_TIMEOUT`` to finish a request, but must accept the connection
+# within ``AIOHTTP_CONNECT_TIMEOUT`` and never go quiet for longer than ``AIOHTTP_READ_TIMEOUT``,
+# so that unreachable and stalled hosts fail fast
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=wb_settings.AIOHTTP_TIMEOUT,
+                                        sock_connect=wb_settings.AIOHTTP_CONNECT_TIMEOUT,
+                                        sock_read=wb_settings.AIOHTTP_READ_TIMEOUT)
+# Streamed uploads get no answer until all of the stream is sent, however long that takes
+STREAM_UPLOAD_TIMEOUT = aiohttp.ClientTimeout(total=wb_settings.AIOHTTP_TIMEOUT,
+                                              sock_connect=wb_settings.AIOHTTP_CONNECT_TIMEOUT)
 
 
 def build_url(base, *segments, **query):
@@ -90,6 +76,12 @@ class BaseProvider(metaclass=abc.ABCMeta):
 
     BASE_URL = None
 
+    #: ( :class:`tuple` ) requests per second and burst size allowed against each upstream host,
+    #: the ``RATE_LIMIT_*`` settings if not set.  See :mod:`waterbutler.core.ratelimit`
+    RATE_LIMIT = None  # type: typing.Tuple[float, int]
+    #: Give every set of credentials its own budget, for upstreams that limit per user or token
+    RATE_LIMIT_PER_CREDENTIAL = False
+
     def __init__(self, auth: dict,
                  credentials: dict,
                  settings: dict,
@@ -114,40 +106,8 @@ class BaseProvider(metaclass=abc.ABCMeta):
         self.provider_metrics.add('auth', auth)
         self.metrics = self.provider_metrics.new_subrecord(self.NAME)
 
-        # The `.loop_session_map` ensures that only one session is created for one event loop per
-        # provider instance.  On one hand, we can't just have one session for each provider instance
-        # since actions such as move and copy are run in background probably with a different loop.
-        # On the other hand, we can't have one session for each request since sessions are only
-        # closed when the provider instance is destroyed. There would be too many for WB to handle.
-        self.loop_session_map = weakref.WeakKeyDictionary()  # type: weakref.WeakKeyDictionary
-        # The `.session_list` keeps track of all the sessions created for the provider instance so
-        # that they can be properly closed upon instance destroy.
-        self.session_list = []  # type: typing.List[aiohttp.ClientSession]
-
         self.nid = settings.get('nid', None)
 
-    def __del__(self):
-        """
-        Manually close all sessions created during the life of the provider instance.  Our code are
-        a slightly modified version of how ``aiohttp-3.5.4`` closes sessions and connectors.
-
-        1. sessions: https://github.com/aio-libs/aiohttp/blob/v3.5.4/aiohttp/client.py#L893
-        2. connectors: https://github.com/aio-libs/aiohttp/blob/v3.5.4/aiohttp/connector.py#L389
-            2.1 Update: https://github.com/aio-libs/aiohttp/pull/3417/files.
-
-        Our implementation tries to avoid accessing protected members unless we can't.  For example,
-        we use ``session.connector`` instead of ``session._connector``, and use ``session.detach()``
-        instead of calling ``session._connector = None``.  We have to ``session._connector_owner``
-        since it doesn't have an public property. We have to call ``connector._close()`` instead of
-        ``connector.close()`` since ``aiohttp`` decided to make ``.close()`` async recently. Here is
-        the PR: https://github.com/aio-libs/aiohttp/pull/3417/files.
-        """
-        for session in self.session_list:
-            if not session.closed:
-                if session.connector is not None and session._connector_owner:
-                    session.connector._close()
-                session.detach()
-
     @property
     @abc.abstractmethod
     def NAME(self) -> str:
@@ -195,39 +155,65 @@ class BaseProvider(metaclass=abc.ABCMeta):
             if value is not None
         }
 
-    def get_or_create_session(self, connector=None):
+    def get_or_create_session(self, url, connector=None):
         """
-        Obtain an existing session or create a new one for making requests.
+        Obtain the pooled session for the upstream host of ``url`` on the current event loop.
 
         Quirks:
 
-        Sessions must be carefully managed by WB.  On one hand, we can't just have one session for
-        each provider instance since actions such as move and copy are run in background probably
-        with a different loop.  On the other hand, we can't have one session for each request since
-        sessions are only closed when the provider instance is destroyed.
+        Sessions are no longer owned by provider instances.  Providers are rebuilt for every
+        request, so a per-instance session meant a new TCP and TLS handshake for nearly every API
+        call and idle connectors lingering until garbage collection.  Sessions now live in the
+        process-wide :data:`waterbutler.core.connections.provider_pool`, which keys them by event
+        loop (move and copy may run in the background with a different loop), upstream host and
+        SSL settings, and closes them on shutdown.
 
         For providers that use a customized connector such as owncloud, the new session is created
         with the given connector; while an existing session simply ignores (and closes) the new
-        connector.  Given that the session is per event loop and instance, the existing session if
-        found must already have a connector with qualified customizations.
+        connector.  The connector's SSL settings are part of the pool key, so the existing session
+        if found must already have a connector with qualified customizations.
 
+        :param url: ( :class:`str` or :class:`yarl.URL` ) the url about to be requested
         :param connector: a customized connector
-        :return: the one session that belongs to the current event loop
+        :return: the one session that belongs to the current event loop and upstream host
         :rtype: :class:`aiohttp.ClientSession`
         """
-        loop = asyncio.get_event_loop()
-        session = self.loop_session_map.get(loop, None)
-        if not session:
-            session = aiohttp.ClientSession(connector=connector)
-            self.loop_session_map[loop] = session
-            self.session_list.append(session)
-        elif connector:
-            # Ignore and close the kwarg connector if an existing session exists.
-            connector._close()
+        return connections.provider_pool.get_session(url, connector=connector)
+
+    def rate_limit_bucket(self, url) -> typing.Optional[ratelimit.TokenBucket]:
+        """Return the token bucket that paces requests to the upstream host of ``url``, or ``None``
+        if rate limiting is disabled.  Buckets are shared by every provider instance in the
+        process, so the budget holds across concurrent requests.  With
+        ``RATE_LIMIT_PER_CREDENTIAL``, each set of credentials gets a bucket of its own.
+
+        :param url: ( :class:`str` or :class:`yarl.URL` ) the url about to be requested
+        :rtype: :class:`.TokenBucket`
+        """
+        if not wb_settings.RATE_LIMIT_ENABLED:
+            return None
 
-        return session
+        url = url if isinstance(url, URL) else URL(str(url))
+        key = (url.host, )  # type: tuple
+        if self.RATE_LIMIT_PER_CREDENTIAL:
+            credentials = json.dumps(self.credentials, sort_keys=True, default=str)
+            key += (hashlib.sha256(credentials.encode('utf-8')).hexdigest(), )
+
+        rate, burst = self.RATE_LIMIT or (wb_settings.RATE_LIMIT_RATE, wb_settings.RATE_LIMIT_BURST)
+        return ratelimit.limiter.bucket(key, rate, burst)
+
+    def circuit_breaker(self, url) -> typing.Optional[circuitbreaker.CircuitBreaker]:
+        """Return the circuit breaker that tracks the health of the upstream host of ``url``, or
+        ``None`` if circuit breaking is disabled.  Like rate limit buckets, breakers are shared by
+        every provider instance in the process.
+
+        :param url: ( :class:`str` or :class:`yarl.URL` ) the url about to be requested
+        :rtype: :class:`.CircuitBreaker`
+        """
+        if not wb_settings.CIRCUIT_BREAKER_ENABLED:
+            return None
+        url = url if isinstance(url, URL) else URL(str(url))
+        return circuitbreaker.breakers.get(url.host)
 
-    @throttle()
     async def make_request(self, method, url, *args, **kwargs):
         r"""
         A wrapper around seven HTTP request methods in :class:`aiohttp.ClientSession`.  It replaces
@@ -248,12 +234,21 @@ class BaseProvider(metaclass=abc.ABCMeta):
         By taking a look at the source code of ``aiohttp3``, it is discovered that requests can be
         made without CM although we are not sure why the documentation does not mention it at all.
         The trick / hack of this non-CM approach is that sessions must be carefully managed by WB.
-        Please take a look at the following methods for detailed implementation.
+        Please take a look at the following for detailed implementation.
 
-        :func:`__init__()`: session list and event loop map initialization
-        :func:`__del__()`: session and connection closing
-        :func:`get_or_create_session()`: either get the current session or create a new one if not
-        found when making a request
+        :func:`get_or_create_session()`: get the pooled session for the upstream host, creating
+        it if not found when making a request
+        :class:`waterbutler.core.connections.ConnectionPool`: session sharing and closing
+
+        Every attempt first takes a token from the upstream's :func:`rate_limit_bucket()`, which
+        also learns from 429/503 responses and ``Retry-After`` / ``X-RateLimit-*`` headers.  When
+        the upstream said how long to back off, retries wait for that.  Otherwise they back off
+        exponentially with full jitter, see :func:`waterbutler.core.utils.backoff_delay`.
+
+        Attempts also go through the upstream's :func:`circuit_breaker()`.  While a host keeps
+        failing, requests to it fail fast with :class:`.ProviderUnavailableError` instead of
+        waiting for the upstream to time out.  Connection errors and timeouts, including an
+        upstream going quiet for ``AIOHTTP_READ_TIMEOUT``, count as failures.
 
         :param method: ( :class:`str` ) The HTTP method
         :param url: The URL or URL-to-be to send the request to
@@ -273,10 +268,13 @@ class BaseProvider(metaclass=abc.ABCMeta):
         :keyword force_retry_on: ( :class:`set` ) An optional set of integer that determines
             status codes of failed requests that need to be retried
         :keyword throws: ( :class:`Exception` ) The exception to be raised from expects
+        :keyword timeout: ( :class:`aiohttp.ClientTimeout` ) An optional timeout replacing
+            ``REQUEST_TIMEOUT``, or ``STREAM_UPLOAD_TIMEOUT`` for streamed uploads
         :return: The HTTP response
         :rtype: :class:`aiohttp.ClientResponse`
         :raises: :class:`.UnhandledProviderError` Raised if expects is defined
         :raises: :class:`.WaterButlerError` Raised if invalid HTTP method is provided
+        :raises: :class:`.ProviderUnavailableError` Raised if the upstream's circuit is open
         """
 
         force_retry_on = kwargs.pop('force_retry_on', set())
@@ -291,7 +289,10 @@ class BaseProvider(metaclass=abc.ABCMeta):
         if byte_range:
             kwargs['headers']['Range'] = self._build_range_header(byte_range)
         connector = kwargs.pop('connector', None)
-        session = self.get_or_create_session(connector=connector)
+        timeout = kwargs.pop('timeout', None) or (
+            STREAM_UPLOAD_TIMEOUT if hasattr(kwargs.get('data'), '__aiter__') else REQUEST_TIMEOUT
+        )
+        session = None
 
         method = method.upper()
         while retry >= 0:
@@ -300,40 +301,64 @@ class BaseProvider(metaclass=abc.ABCMeta):
             if self.NAME not in NO_URL_ENCODED_PROVIDERS:
                 # Fix storage 'nextcloud', 'owncloud', 'nextcloudinstitutions' return HTTP 400 bad request
                 non_callable_url = URL(non_callable_url, encoded=True)
+            if session is None:
+                # Retries of refreshed signed URLs always go to the same upstream host
+                session = self.get_or_create_session(non_callable_url, connector=connector)
+                bucket = self.rate_limit_bucket(non_callable_url)
+                breaker = self.circuit_breaker(non_callable_url)
+            if bucket is not None and await bucket.acquire():
+                self.provider_metrics.incr('requests.rate_limited')
+            # Whether this attempt holds a half-open trial slot its outcome hasn't given back yet
+            trial = False
+            if breaker is not None:
+                try:
+                    trial = breaker.before_request()
+                except exceptions.ProviderUnavailableError as exc:
+                    logger.info('Failing request to {} fast, its circuit is open for another '
+                                '{:.0f}s'.format(exc.host, exc.retry_in))
+                    self.provider_metrics.incr('requests.circuit_open')
+                    self._record_circuit(breaker)
+                    raise
             try:
                 self.provider_metrics.incr('requests.count')
                 # TODO: use a `dict` to select methods with either `lambda` or `functools.partial`
                 if method == 'GET':
-                    response = await session.get(non_callable_url,
-                                                 timeout=wb_settings.AIOHTTP_TIMEOUT,
-                                                 *args, **kwargs)
+                    response = await session.get(non_callable_url, *args,
+                                                 timeout=timeout, **kwargs)
                 elif method == 'PUT':
-                    response = await session.put(non_callable_url,
-                                                 timeout=wb_settings.AIOHTTP_TIMEOUT,
-                                                 *args, **kwargs)
+                    response = await session.put(non_callable_url, *args,
+                                                 timeout=timeout, **kwargs)
                 elif method == 'POST':
-                    response = await session.post(non_callable_url,
-                                                  timeout=wb_settings.AIOHTTP_TIMEOUT,
-                                                  *args, **kwargs)
+                    response = await session.post(non_callable_url, *args,
+                                                  timeout=timeout, **kwargs)
                 elif method == 'HEAD':
-                    response = await session.head(non_callable_url, *args, **kwargs)
+                    response = await session.head(non_callable_url, *args,
+                                                  timeout=timeout, **kwargs)
                 elif method == 'DELETE':
-                    response = await session.delete(non_callable_url, **kwargs)
+                    response = await session.delete(non_callable_url, timeout=timeout, **kwargs)
                 elif method == 'PATCH':
-                    response = await session.patch(non_callable_url, *args, **kwargs)
+                    response = await session.patch(non_callable_url, *args,
+                                                   timeout=timeout, **kwargs)
                 elif method == 'OPTIONS':
-                    response = await session.options(non_callable_url, *args, **kwargs)
+                    response = await session.options(non_callable_url, *args,
+                                                     timeout=timeout, **kwargs)
                 elif method in wb_settings.WEBDAV_METHODS:
                     # `aiohttp.ClientSession` only has functions available for native HTTP methods.
                     # For WebDAV (a protocol that extends HTTP) ones, WB lets the `ClientSession`
                     # instance call `_request()` directly and then wraps the return object with
                     # `aiohttp.client._RequestContextManager`.
                     response = await _RequestContextManager(
-                        session._request(method, url, *args, **kwargs)
+                        session._request(method, url, *args, timeout=timeout, **kwargs)
                     )
                 else:
                     raise exceptions.WaterButlerError('Unsupported HTTP method ...')
                 self.provider_metrics.incr('requests.tally.ok')
+                if bucket is not None:
+                    bucket.observe(response.status, response.headers)
+                if breaker is not None and breaker.record_response(response.status,
+                                                                   response.headers):
+                    self._record_circuit(breaker)
+                    trial = False
                 if (retry > 0 and response.status in force_retry_on) or (expects and response.status not in expects):
                     unexpected = await exceptions.exception_from_response(response,
                                                                           error=throws, **kwargs)
@@ -343,10 +368,26 @@ class BaseProvider(metaclass=abc.ABCMeta):
                 self.provider_metrics.incr('requests.tally.nok')
                 if retry <= 0 or e.code not in force_retry_on.union(self._retry_on):
                     raise
-                # Seconds equals twice the 'n' attempt
-                sleep_seconds = (1 + _retry - retry) * 2
-                await asyncio.sleep(sleep_seconds)
+                # The bucket already holds the next attempt back if the upstream said for how long
+                if bucket is None or not bucket.paused_for:
+                    await asyncio.sleep(utils.backoff_delay(_retry - retry,
+                                                            base=wb_settings.RETRY_BACKOFF_BASE,
+                                                            cap=wb_settings.RETRY_BACKOFF_CAP))
                 retry -= 1
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # The upstream could not be reached or did not answer in time
+                if breaker is not None:
+                    breaker.record_failure()
+                    self._record_circuit(breaker)
+                    trial = False
+                raise
+            finally:
+                # Cancelled, or failed before the upstream answered for some other reason
+                if trial:
+                    breaker.release()
+
+    def _record_circuit(self, breaker: circuitbreaker.CircuitBreaker) -> None:
+        self.provider_metrics.add('requests.circuit', dict(breaker.stats, host=breaker.host))
 
     def request(self, *args, **kwargs):
         return RequestHandlerContext(self.make_request(*args, **kwargs))
@@ -357,7 +398,8 @@ class BaseProvider(metaclass=abc.ABCMeta):
                    dest_path: wb_path.WaterButlerPath,
                    rename: str=None,
                    conflict: str='replace',
-                   handle_naming: bool=True) -> typing.Tuple[wb_metadata.BaseMetadata, bool]:
+                   handle_naming: bool=True,
+                   size: int=None) -> typing.Tuple[wb_metadata.BaseMetadata, bool]:
         """Moves a file or folder from the current provider to the specified one
         Performs a copy and then a delete.
         Calls :func:`BaseProvider.intra_move` if possible.
@@ -368,6 +410,7 @@ class BaseProvider(metaclass=abc.ABCMeta):
         :param rename: ( :class:`str` ) The desired name of the resulting path, may be incremented
         :param conflict: ( :class:`str` ) What to do in the event of a name conflict, ``replace`` or ``keep``
         :param handle_naming: ( :class:`bool` ) If a naming conflict is detected, should it be automatically handled?
+        :param size: ( :class:`int` ) The file's size, if already known, see :func:`copy`
         """
         args = (dest_provider, src_path, dest_path)
         kwargs = {'rename': rename, 'conflict': conflict}
@@ -401,9 +444,12 @@ class BaseProvider(metaclass=abc.ABCMeta):
             return await self.intra_move(*args)
 
         if src_path.is_dir:
-            meta_data, created = await self._folder_file_op(self.move, *args, **kwargs)  # type: ignore
+            meta_data, created = await self._folder_file_op(  # type: ignore
+                self.move, *args, can_intra=self.can_intra_move, **kwargs
+            )
         else:
-            meta_data, created = await self.copy(*args, handle_naming=False, **kwargs)  # type: ignore
+            meta_data, created = await self.copy(*args, handle_naming=False,  # type: ignore
+                                                 size=size, **kwargs)
 
         try:
             await self.delete(src_path)
@@ -418,8 +464,10 @@ class BaseProvider(metaclass=abc.ABCMeta):
                    src_path: wb_path.WaterButlerPath,
                    dest_path: wb_path.WaterButlerPath,
                    rename: str=None, conflict: str='replace',
-                   handle_naming: bool=True, version=None) \
+                   handle_naming: bool=True, version=None, size: int=None) \
             -> typing.Tuple[wb_metadata.BaseMetadata, bool]:
+        # ``size`` is the file's size if the caller already knows it, e.g. from its folder's
+        # listing, which spares small files a metadata request to decide on a parallel copy
         args = (dest_provider, src_path, dest_path)
         kwargs = {'rename': rename, 'conflict': conflict, 'handle_naming': handle_naming}
 
@@ -451,7 +499,15 @@ class BaseProvider(metaclass=abc.ABCMeta):
             return await self.intra_copy(*args)
 
         if src_path.is_dir:
-            return await self._folder_file_op(self.copy, *args, **kwargs)  # type: ignore
+            return await self._folder_file_op(  # type: ignore
+                self.copy, *args, can_intra=self.can_intra_copy, **kwargs
+            )
+
+        if self.can_download_ranges() and dest_provider.can_upload_parts():
+            result = await self._parallel_copy(dest_provider, src_path, dest_path,
+                                               version=version, size=size)
+            if result is not None:
+                return result
 
         download_stream = await self.download(src_path, version=version, revision=version)
 
@@ -463,11 +519,40 @@ class BaseProvider(metaclass=abc.ABCMeta):
 
         return await dest_provider.upload(download_stream, dest_path)
 
+    async def _parallel_copy(self,
+                             dest_provider: 'BaseProvider',
+                             src_path: wb_path.WaterButlerPath,
+                             dest_path: wb_path.WaterButlerPath,
+                             version=None,
+                             size: int=None) \
+            -> typing.Optional[typing.Tuple[wb_metadata.BaseFileMetadata, bool]]:
+        """Copy a file of at least ``PARALLEL_COPY_MIN_SIZE`` bytes in parts with
+        :func:`.transfer.parallel_copy`.  Returns ``None`` if the file is smaller, its size isn't
+        known, or ``dest_provider`` won't take it in parts, so it is streamed across instead.
+        Files whose listed ``size`` is already too small aren't looked up.  Larger ones are, so
+        that the parts are cut from the size of the version actually copied.
+        """
+        if size is not None and size < wb_settings.PARALLEL_COPY_MIN_SIZE:
+            return None
+        metadata = await self.metadata(src_path, version=version, revision=version)
+        try:
+            size = int(metadata.size)  # type: ignore
+        except (AttributeError, TypeError, ValueError):
+            return None
+        if size < wb_settings.PARALLEL_COPY_MIN_SIZE:
+            return None
+
+        upload = await dest_provider.create_part_upload(dest_path, size)
+        if upload is None:
+            return None
+        return await transfer.parallel_copy(self, src_path, upload, size, version=version)
+
     async def _folder_file_op(self,
                               func: typing.Callable,
                               dest_provider: 'BaseProvider',
                               src_path: wb_path.WaterButlerPath,
                               dest_path: wb_path.WaterButlerPath,
+                              can_intra: typing.Callable=None,
                               **kwargs) -> typing.Tuple[wb_metadata.BaseFolderMetadata, bool]:
         """Recursively apply func to src/dest path.
 
@@ -478,10 +563,21 @@ class BaseProvider(metaclass=abc.ABCMeta):
                func: dest_provider.revalidate_path
                func: self.metadata
 
+        The whole tree is worked through by a pool of ``OP_CONCURRENCY`` workers sharing one
+        queue, breadth first.  A worker takes an item, revalidates its source and destination
+        paths, and either applies ``func`` to it (files, and folders ``can_intra`` says can be
+        moved or copied within the provider) or creates the folder at the destination, lists it
+        and queues its contents.  Folders are thus created and listed while files elsewhere in the
+        tree are transferred, and one slow file only holds up one worker.  Each result is added to
+        the ``children`` of its parent folder's metadata as soon as it is done.
+
         :param coroutine func: to be applied to src/dest path
         :param *Provider dest_provider: Destination provider
         :param *ProviderPath src_path: Source path
         :param *ProviderPath dest_path: Destination path
+        :param can_intra: the ``can_intra_move`` or ``can_intra_copy`` that goes with ``func``,
+            telling which subfolders ``func`` can be applied to whole.  Without it, every subfolder
+            is worked through here.
         """
         assert src_path.is_dir, 'src_path must be a directory'
         assert asyncio.iscoroutinefunction(func), 'func must be a coroutine'
@@ -501,32 +597,54 @@ class BaseProvider(metaclass=abc.ABCMeta):
         folder.children = []
         items = await self.metadata(src_path)  # type: ignore
 
-        # Metadata returns a union, which confuses mypy
-        self.provider_metrics.append('_folder_file_ops.item_counts', len(items))  # type: ignore
-
-        for i in range(0, len(items), wb_settings.OP_CONCURRENCY):  # type: ignore
-            futures = []
-            for item in items[i:i + wb_settings.OP_CONCURRENCY]:  # type: ignore
-                futures.append(asyncio.ensure_future(
-                    func(
-                        dest_provider,
-                        # TODO figure out a way to cut down on all the requests made here
-                        (await self.revalidate_path(src_path, item.name, folder=item.is_folder)),
-                        (await dest_provider.revalidate_path(dest_path, item.name, folder=item.is_folder)),
-                        handle_naming=False,
-                    )
-                ))
-
-                if item.is_folder:
-                    await futures[-1]
-
-            if not futures:
-                continue
-
-            done, _ = await asyncio.wait(futures, return_when=asyncio.FIRST_EXCEPTION)
-
-            for fut in done:
-                folder.children.append(fut.result()[0])
+        # (source parent, destination parent, item, parent's children) for every item to do
+        queue = asyncio.Queue()  # type: asyncio.Queue
+
+        def enqueue(src_parent, dest_parent, items, children):
+            # Metadata returns a union, which confuses mypy
+            self.provider_metrics.append('_folder_file_ops.item_counts', len(items))  # type: ignore
+            for item in items:  # type: ignore
+                queue.put_nowait((src_parent, dest_parent, item, children))
+
+        async def worker():
+            while True:
+                src_parent, dest_parent, item, children = await queue.get()
+                src_item, dest_item = await asyncio.gather(
+                    self.revalidate_path(src_parent, item.name, folder=item.is_folder),
+                    dest_provider.revalidate_path(dest_parent, item.name, folder=item.is_folder),
+                )
+                # Subfolders are only handed to func when they won't come back here
+                if not item.is_folder:
+                    # The listing already tells the file's size
+                    children.append((await func(dest_provider, src_item, dest_item,
+                                                handle_naming=False,
+                                                size=getattr(item, 'size_as_int', None)))[0])
+                elif can_intra is not None and can_intra(dest_provider, src_item):
+                    children.append((await func(dest_provider, src_item, dest_item,
+                                                handle_naming=False))[0])
+                else:
+                    # The destination folder was just created, so there's nothing to replace
+                    subfolder = await dest_provider.create_folder(dest_item, folder_precheck=False)
+                    dest_item = await dest_provider.revalidate_path(dest_parent, item.name,
+                                                                    folder=True)
+                    subfolder.children = []
+                    children.append(subfolder)
+                    enqueue(src_item, dest_item, await self.metadata(src_item), subfolder.children)
+                queue.task_done()
+
+        enqueue(src_path, dest_path, items, folder.children)
+        workers = [asyncio.ensure_future(worker())
+                   for _ in range(max(wb_settings.OP_CONCURRENCY, 1))]
+        finished = asyncio.ensure_future(queue.join())
+        try:
+            # Workers only ever stop by failing
+            await asyncio.wait(workers + [finished], return_when=asyncio.FIRST_COMPLETED)
+            for task in workers:
+                if task.done():
+                    task.result()
+        finally:
+            for task in workers + [finished]:
+                task.cancel()
 
         return folder, created
 
@@ -600,6 +718,41 @@ class BaseProvider(metaclass=abc.ABCMeta):
         """
         return False
 
+    def can_download_ranges(self) -> bool:
+        """Indicates if :meth:`download` honours its ``range`` argument, so that large files can be
+        copied out of this provider in parts fetched concurrently.
+
+        .. note::
+            Defaults to False
+
+        :rtype: :class:`bool`
+        """
+        return False
+
+    def can_upload_parts(self) -> bool:
+        """Indicates if :meth:`create_part_upload` may accept files, so that large files can be
+        copied into this provider in parts uploaded concurrently.
+
+        .. note::
+            Defaults to False
+
+        :rtype: :class:`bool`
+        """
+        return False
+
+    async def create_part_upload(self,
+                                 path: wb_path.WaterButlerPath,
+                                 size: int) -> typing.Optional[transfer.PartUpload]:
+        """Start an upload of ``size`` bytes to ``path`` made of parts which can be uploaded
+        concurrently, replacing any file already there.  Providers for which
+        :meth:`can_upload_parts` returns ``True`` must implement this.
+
+        :param path: ( :class:`.WaterButlerPath` ) Where to upload the file to
+        :param int size: The file's size in bytes
+        :rtype: :class:`.transfer.PartUpload`, or ``None`` if the file can't be uploaded in parts
+        """
+        return None
+
     async def intra_copy(self,
                          dest_provider: 'BaseProvider',
                          source_path: wb_path.WaterButlerPath,
@@ -706,10 +859,18 @@ class BaseProvider(metaclass=abc.ABCMeta):
         """
         return base.child(path, folder=folder)
 
-    async def zip(self, path: wb_path.WaterButlerPath, **kwargs) -> asyncio.StreamReader:
+    async def zip(self, path: wb_path.WaterButlerPath, store: bool=False,
+                  **kwargs) -> asyncio.StreamReader:
         """Streams a Zip archive of the given folder
 
+        With ``store``, nothing is compressed and the archive is laid out from the folder's
+        listing before anything is sent, so its size is known and byte ranges of it can be served
+        (see :class:`.StoredZipStreamReader`).  Entries are sorted by name so that the same
+        folder always gives the same archive.  If the size of any file isn't known, the usual
+        compressed archive is streamed instead.
+
         :param  path: ( :class:`.WaterButlerPath` ) The folder to compress
+        :param  store: ( :class:`bool` ) Build a stored, pre-sized archive
         """
 
         meta_data = await self.metadata(path)  # type: ignore
@@ -717,7 +878,20 @@ class BaseProvider(metaclass=abc.ABCMeta):
             meta_data = [meta_data]  # type: ignore
             path = path.parent
 
-        return streams.ZipStreamReader(ZipStreamGenerator(self, path, *meta_data))  # type: ignore
+        generator = ZipStreamGenerator(self, path, *meta_data)  # type: ignore
+        if store:
+            entries = await generator.list_entries()
+            if all(metadata is None or metadata.size_as_int is not None
+                   for _, _, metadata in entries):
+                return streams.StoredZipStreamReader(sorted(
+                    (StoredZipEntry(self, *entry) for entry in entries),
+                    key=lambda entry: entry.name,
+                ), crc_store=get_stored_zip_crc_store())
+            logger.info('Some files under {} have no size, zipping them compressed '
+                        'instead'.format(path))
+            generator = ZipStreamGenerator(self, path, *meta_data)  # type: ignore
+
+        return streams.ZipStreamReader(generator, metrics=self.metrics)
 
     def shares_storage_root(self, other: 'BaseProvider') -> bool:
         """Returns True if ``self`` and ``other`` both point to the same storage root.  Used to
@@ -843,6 +1017,47 @@ class BaseProvider(metaclass=abc.ABCMeta):
         return parent_path.child(meta_data.name, _id=meta_data.path.strip('/'),
                                  folder=meta_data.is_folder)
 
+    async def folder_tree(self, path: wb_path.WaterButlerPath) \
+            -> typing.Optional[typing.List[typing.Tuple[wb_path.WaterButlerPath,
+                                                        wb_metadata.BaseMetadata]]]:
+        """List everything below the folder ``path``, at any depth, in as few requests as the
+        provider allows.  Returns a list of ``(parent path, metadata)`` tuples, where ``parent
+        path`` is the folder the item is in, or ``None`` if the provider can only list one folder
+        at a time.  Used to build zip archives, see :class:`.ZipStreamGenerator`.
+
+        :param  path: ( :class:`.WaterButlerPath` ) The folder to list
+        :rtype: `list` or `None`
+        """
+        return None
+
+    def _folder_tree_entries(self, path: wb_path.WaterButlerPath,
+                             items: typing.Iterable[wb_metadata.BaseMetadata]) \
+            -> typing.Optional[typing.List[typing.Tuple[wb_path.WaterButlerPath,
+                                                        wb_metadata.BaseMetadata]]]:
+        """Pair each item of a recursive listing of ``path`` with its parent folder, for
+        :meth:`folder_tree`.  Parents are built from the items' ``path``, so this only works for
+        providers whose paths are their identifiers.  Returns ``None`` if an item is not below
+        ``path`` after all, rather than leaving it out.
+        """
+        root = path.materialized_path
+        parents = {root: path}
+
+        def parent_of(item_path):
+            parent = item_path.rstrip('/').rsplit('/', 1)[0] + '/'
+            if parent not in parents:
+                parents[parent] = parent_of(parent).child(parent.rstrip('/').rsplit('/', 1)[1],
+                                                          folder=True)
+            return parents[parent]
+
+        entries = []
+        for item in items:
+            if item.path == root:
+                continue
+            if not item.path.startswith(root):
+                return None
+            entries.append((parent_of(item.path), item))
+        return entries
+
     async def revisions(self, path: wb_path.WaterButlerPath, **kwargs):
         """Return a list of :class:`.BaseFileRevisionMetadata` objects representing the revisions
         available for the file at ``path``.
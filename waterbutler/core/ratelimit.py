@@ -0,0 +1,246 @@
+import time
+import asyncio
+import logging
+import threading
+import email.utils
+
+from waterbutler import settings as wb_settings
+from waterbutler.core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Statuses upstreams use to say "slow down"
+THROTTLED_STATUSES = {429, 503}
+
+
+class TokenBucket:
+    """A token bucket that paces the requests made to one upstream.  The bucket holds up to
+    ``burst`` tokens and is refilled at ``rate`` tokens per second.  Each request takes a token;
+    when the bucket runs dry the request waits until its token has been refilled.
+
+    Tokens are reserved rather than polled for: :meth:`reserve` takes the token immediately (the
+    count may go negative) and returns how long the caller must wait before using it.  Concurrent
+    callers thus queue up in arrival order without waking each other, and the bucket works the
+    same from the tornado loop and the celery loops since it only depends on the clock.
+
+    The bucket adapts to what the upstream reports (see :meth:`observe`):
+
+    * ``429`` and ``503`` responses halve the rate, down to ``min_rate``.  Every successful
+      response then gives back a twentieth of the configured rate until it is fully recovered.
+    * ``Retry-After`` pauses the bucket for the given time, so queued requests wait it out instead
+      of spending their retries on a backend that already told us when to come back.
+    * ``X-RateLimit-Remaining`` and ``X-RateLimit-Reset`` set the rate to what is left of the
+      upstream's budget for the current window, between ``min_rate`` and the configured rate, and
+      pause the bucket until the reset once it's exhausted.  The configured rate is restored when
+      the window resets.
+
+    :param float rate: tokens added per second
+    :param int burst: maximum number of tokens the bucket can hold
+    :param float min_rate: lowest rate the bucket slows down to, ``rate / 16`` if not given
+    :param float max_wait: longest pause the upstream's headers may impose, in seconds
+    """
+
+    def __init__(self, rate: float, burst: int, min_rate: float=None,
+                 max_wait: float=60) -> None:
+        self.max_rate = self.rate = float(rate)
+        self.burst = float(max(burst, 1))
+        self.min_rate = float(min_rate or rate / 16)
+        self.max_wait = max_wait
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        # Tokens are refilled from this point in time on.  Pausing the bucket moves it forward.
+        self._updated = time.monotonic()
+        # When the upstream's current rate limit window resets, if its headers set the rate
+        self._window_resets = None  # type: float
+
+    def reserve(self) -> float:
+        """Take one token and return the number of seconds to wait before it may be used."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._window_resets is not None and now >= self._window_resets:
+                self.rate, self._window_resets = self.max_rate, None
+            self._tokens -= 1
+            wait = max(self._updated - now, 0.0)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    async def acquire(self) -> float:
+        """Wait for a token.  Returns the number of seconds waited."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    @property
+    def paused_for(self) -> float:
+        """Seconds left before a pause requested by the upstream is over."""
+        return max(self._updated - time.monotonic(), 0.0)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds``, capped at ``max_wait``."""
+        seconds = min(seconds, self.max_wait)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated = max(self._updated, now + seconds)
+
+    def slow_down(self, rate: float=None) -> None:
+        """Lower the rate to ``rate``, or halve it if not given, but never below ``min_rate``."""
+        with self._lock:
+            self._refill(time.monotonic())
+            rate = self.rate / 2 if rate is None else rate
+            self.rate = max(min(rate, self.rate), self.min_rate)
+
+    def set_budget(self, remaining: float, reset_in: float) -> None:
+        """Spread the ``remaining`` requests of the upstream's window over the ``reset_in`` seconds
+        left of it, at a rate between ``min_rate`` and the configured rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(min(remaining / reset_in, self.max_rate), self.min_rate)
+            self._window_resets = now + reset_in
+
+    def recover(self) -> None:
+        """Raise a lowered rate back towards the configured one."""
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.rate + self.max_rate / 20, self.max_rate)
+
+    def observe(self, status: int, headers) -> None:
+        """Adjust the bucket to an upstream response.
+
+        :param int status: the response status
+        :param headers: ( :class:`multidict.CIMultiDictProxy` ) the response headers
+        """
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        remaining = _parse_number(headers.get('X-RateLimit-Remaining'))
+        reset_in = parse_rate_limit_reset(headers.get('X-RateLimit-Reset'))
+
+        if remaining is not None and reset_in is not None:
+            if remaining < 1:
+                self.pause(reset_in)
+            elif reset_in > 0:
+                self.set_budget(remaining, reset_in)
+            else:
+                # The window has just reset
+                self.recover()
+
+        if status in THROTTLED_STATUSES:
+            self.slow_down()
+        if retry_after is not None:
+            self.pause(retry_after)
+
+        if status < 400 and retry_after is None and remaining is None:
+            self.recover()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'rate': self.rate,
+            'max_rate': self.max_rate,
+            'burst': self.burst,
+            'paused_for': self.paused_for,
+        }
+
+    def _refill(self, now: float) -> None:
+        if now > self._updated:
+            self._tokens = min(self._tokens + (now - self._updated) * self.rate, self.burst)
+            self._updated = now
+
+
+class RateLimiter:
+    """The process-wide registry of :class:`TokenBucket` objects, one per key.  Providers key their
+    buckets by upstream host and optionally by credentials, see
+    :meth:`.BaseProvider.rate_limit_bucket`.  The registry is bounded; the state of a bucket that
+    falls out of it is simply forgotten.
+
+    :param int max_buckets: maximum number of buckets to keep
+    :param float max_wait: longest pause the upstream's headers may impose on a bucket
+    """
+
+    def __init__(self, max_buckets: int=4096, max_wait: float=60) -> None:
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = LRUCache('rate_limit_buckets', max_size=max_buckets)
+
+    def bucket(self, key, rate: float, burst: int) -> TokenBucket:
+        """Return the bucket for ``key``, creating it with ``rate`` and ``burst`` if needed.  An
+        existing bucket keeps the budget it was created with.
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rate, burst, max_wait=self.max_wait)
+                self._buckets.set(key, bucket)
+            return bucket
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+def is_throttled(status: int, headers) -> bool:
+    """Whether a response is the upstream throttling this client rather than failing: a ``429``,
+    a ``503`` that says when to retry, or any response saying no requests are left.
+
+    :param int status: the response status
+    :param headers: ( :class:`multidict.CIMultiDictProxy` ) the response headers
+    """
+    if status == 429:
+        return True
+    if status in THROTTLED_STATUSES and headers.get('Retry-After') is not None:
+        return True
+    remaining = _parse_number(headers.get('X-RateLimit-Remaining'))
+    return status >= 400 and remaining is not None and remaining < 1
+
+
+def parse_retry_after(value) -> float:
+    """Parse a ``Retry-After`` header, given either in seconds or as an HTTP date, into a number
+    of seconds.  Returns ``None`` if the header is missing or malformed.
+    """
+    if value is None:
+        return None
+    seconds = _parse_number(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date is None:
+        return None
+    return max(date.timestamp() - time.time(), 0.0)
+
+
+def parse_rate_limit_reset(value) -> float:
+    """Parse an ``X-RateLimit-Reset`` header into the number of seconds until the reset.  GitHub
+    and most others send a unix timestamp, some send the number of seconds left.  Returns ``None``
+    if the header is missing or malformed.
+    """
+    reset = _parse_number(value)
+    if reset is None:
+        return None
+    if reset > 1e9:  # a unix timestamp rather than a delta
+        reset -= time.time()
+    return max(reset, 0.0)
+
+
+def _parse_number(value) -> float:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+limiter = RateLimiter(
+    max_buckets=wb_settings.RATE_LIMIT_MAX_BUCKETS,
+    max_wait=wb_settings.RATE_LIMIT_MAX_WAIT,
+)
@@ -5,10 +5,10 @@ import inspect  # noqa
 import logging
 
 import furl
-import aiohttp
 
 from waterbutler import settings
 from waterbutler.core import utils
+from waterbutler.core import connections
 from waterbutler.utils import inspect_info  # noqa
 from waterbutler.sizes import KBs, MBs, GBs
 from waterbutler.version import __version__
@@ -203,7 +203,8 @@ async def _send_to_keen(payload, collection, project_id, write_key, action, doma
                                                    settings.KEEN_API_VERSION,
                                                    project_id, collection)
 
-    async with aiohttp.request('POST', url, headers=headers, data=serialized) as resp:
+    async with connections.service_pool.request('POST', url, headers=headers,
+                                                data=serialized) as resp:
         if resp.status == 201:
             logger.info('Successfully logged {} to {} collection in {} Keen'.format(action, collection, domain))
         else:
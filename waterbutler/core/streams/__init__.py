@@ -13,9 +13,14 @@ from waterbutler.core.streams.http import FormDataStream  # noqa
 from waterbutler.core.streams.http import RequestStreamReader  # noqa
 from waterbutler.core.streams.http import ResponseStreamReader  # noqa
 
+from waterbutler.core.streams.pipe import StreamPipe  # noqa
+from waterbutler.core.streams.pipe import TeeStream  # noqa
+
 from waterbutler.core.streams.metadata import HashStreamWriter  # noqa
+from waterbutler.core.streams.metadata import ThreadedHashStreamWriter  # noqa
 
 from waterbutler.core.streams.zip import ZipStreamReader  # noqa
+from waterbutler.core.streams.zip import StoredZipStreamReader  # noqa
 
 from waterbutler.core.streams.base64 import Base64EncodeStream  # noqa
 
@@ -1,9 +1,68 @@
 import abc
 import asyncio
+import collections
 
 from waterbutler.server.settings import CHUNK_SIZE
 
 
+def join_chunks(parts):
+    """Join a list of byte chunks into a single ``bytes`` object, copying each byte once.  A lone
+    ``bytes`` chunk is returned as is.  Building the result with ``chunk += part`` instead copies
+    everything read so far on every append, which is quadratic when the source hands out small
+    pieces.
+    """
+    if len(parts) == 1 and type(parts[0]) is bytes:
+        return parts[0]
+    return b''.join(parts)
+
+
+class ChunkQueue:
+    """A FIFO of byte chunks that exact-size chunks can be taken from.  Chunks are queued as they
+    are, and split with :class:`memoryview` slices when a read ends in the middle of one, so the
+    only copy is the one :func:`join_chunks` makes of the bytes being returned.
+
+    Queued chunks are referenced, not copied, so they must not be modified after being appended.
+    """
+
+    def __init__(self):
+        self._chunks = collections.deque()  # type: collections.deque
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, data):
+        if data:
+            self._chunks.append(data)
+            self._size += len(data)
+
+    def take(self, n=-1):
+        """Remove and return up to ``n`` bytes from the front of the queue, or all of them if
+        ``n`` is negative.
+        """
+        if n < 0 or n >= self._size:
+            parts = list(self._chunks)
+            self._chunks.clear()
+            self._size = 0
+            return join_chunks(parts)
+
+        parts = []
+        remaining = n
+        while remaining:
+            chunk = self._chunks[0]
+            if len(chunk) <= remaining:
+                parts.append(self._chunks.popleft())
+                remaining -= len(chunk)
+            else:
+                view = memoryview(chunk)
+                parts.append(view[:remaining])
+                self._chunks[0] = view[remaining:]
+                remaining = 0
+
+        self._size -= n
+        return join_chunks(parts)
+
+
 class BaseStream(asyncio.StreamReader, metaclass=abc.ABCMeta):
     """A wrapper class around an existing stream that supports teeing to multiple reader and writer
     objects.  Though it inherits from `asyncio.StreamReader` it does not implement/augment all of
@@ -65,6 +124,14 @@ class BaseStream(asyncio.StreamReader, metaclass=abc.ABCMeta):
                 reader.feed_data(data)
             for writer in self.writers.values():
                 writer.write(data)
+            # Readers and writers that buffer or work in the background may ask us to wait for
+            # them to catch up
+            for consumer in list(self.readers.values()) + list(self.writers.values()):
+                if hasattr(consumer, 'drain'):
+                    await consumer.drain()
+            # Streams fed their EOF before anyone was listening don't announce it again
+            if self.at_eof() or (not data and size != 0):
+                self.feed_eof()
         return data
 
     @abc.abstractmethod
@@ -119,18 +186,18 @@ class MultiStream(asyncio.StreamReader):
         if n < 0:
             return (await super().read(n))
 
-        chunk = b''
+        parts = []
+        remaining = n
 
-        while self.stream and (len(chunk) < n or n == -1):
-            if n == -1:
-                chunk += await self.stream.read(-1)
-            else:
-                chunk += await self.stream.read(n - len(chunk))
+        while self.stream and remaining > 0:
+            part = await self.stream.read(remaining)
+            parts.append(part)
+            remaining -= len(part)
 
             if self.stream.at_eof():
                 self._cycle()
 
-        return chunk
+        return join_chunks(parts)
 
     def _cycle(self):
         try:
@@ -189,15 +256,18 @@ class CutoffStream(asyncio.StreamReader):
         if n < 0:
             return await self.stream.read(self._cutoff)
 
-        n = min(n, self._cutoff - self._thus_far)
+        remaining = min(n, self._cutoff - self._thus_far)
 
-        chunk = b''
-        while self.stream and (len(chunk) < n):
-            subchunk = await self.stream.read(n - len(chunk))
-            chunk += subchunk
+        parts = []
+        while self.stream and remaining > 0:
+            subchunk = await self.stream.read(remaining)
+            if not subchunk:  # the wrapped stream ended before the cutoff
+                break
+            parts.append(subchunk)
+            remaining -= len(subchunk)
             self._thus_far += len(subchunk)
 
-        return chunk
+        return join_chunks(parts)
 
 
 class StringStream(BaseStream):
@@ -217,6 +287,9 @@ class StringStream(BaseStream):
         return self._size
 
     async def _read(self, n=-1):
+        # StreamReader.read(-1) reads through self.read(), which would tee every chunk twice
+        if n < 0:
+            n = len(self._buffer)
         return (await asyncio.StreamReader.read(self, n))
 
 
@@ -235,6 +308,9 @@ class ByteStream(BaseStream):
         return self._size
 
     async def _read(self, n=-1):
+        # StreamReader.read(-1) reads through self.read(), which would tee every chunk twice
+        if n < 0:
+            n = len(self._buffer)
         return (await asyncio.StreamReader.read(self, n))
 
 
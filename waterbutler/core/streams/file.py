@@ -1,48 +1,154 @@
 import os
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+from waterbutler.core.streams import settings
 from waterbutler.core.streams.base import BaseStream
 
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def file_io_executor() -> ThreadPoolExecutor:
+    """The bounded thread pool that blocking file I/O is handed to, so that a slow disk never
+    stalls the event loop.  Shared by every loop in the process and sized by
+    ``STREAMS_CONFIG.FILE_IO_THREADS``.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.FILE_IO_THREADS,
+                                           thread_name_prefix='wb-file-io')
+        return _executor
+
+
+async def run_file_io(func, *args):
+    """Run the blocking ``func(*args)`` in :func:`file_io_executor` and return its result."""
+    return await asyncio.get_event_loop().run_in_executor(file_io_executor(), func, *args)
+
 
 class FileStreamReader(BaseStream):
+    """Streams the contents of an open file, always from its first byte.
+
+    Reads are done in :func:`file_io_executor`.  While the consumer deals with a chunk, the next
+    one of the same size is already being read (read-ahead, see ``STREAMS_CONFIG.FILE_READ_AHEAD``)
+    so the disk and the network are kept busy at the same time.  Only one read is ever in flight,
+    so the file pointer is never used by two threads at once.  The file is measured once, when the
+    reader is built.
+
+    When nothing transforms the data on its way out, :meth:`sendfile_range` lets the server send
+    the file straight from the page cache to the socket with ``os.sendfile``.
+    """
 
     def __init__(self, file_pointer):
         super().__init__()
-        self.file_gen = None
         self.file_pointer = file_pointer
-        self.read_size = None
         self.content_type = 'application/octet-stream'
 
-    @property
-    def size(self):
         cursor = self.file_pointer.tell()
         self.file_pointer.seek(0, os.SEEK_END)
-        ret = self.file_pointer.tell()
+        self._total_size = self.file_pointer.tell()
         self.file_pointer.seek(cursor)
-        return ret
+
+        self._started = False
+        self._exhausted = False
+        self._leftover = None
+        self._read_ahead = None  # type: tuple
+
+    @property
+    def size(self):
+        return self._total_size
+
+    @property
+    def start(self):
+        """Offset of the first byte to stream"""
+        return 0
 
     def close(self):
+        if self._read_ahead is not None:
+            self._read_ahead[1].cancel()
+            self._read_ahead = None
         self.file_pointer.close()
         self.feed_eof()
 
-    async def chunk_reader(self):
-        self.file_pointer.seek(0)
-        while True:
-            chunk = self.file_pointer.read(self.read_size)
-            if not chunk:
-                self.feed_eof()
-                yield b''
+    def sendfile_range(self):
+        """Return ``(fileno, offset, count)`` for sending the rest of the stream with
+        ``os.sendfile``, or ``None`` if that isn't possible: the stream has already been read from,
+        somebody is listening in on the data, or the file is not a real binary file.
+        """
+        if self._started or self.readers or self.writers:
+            return None
+        if 'b' not in getattr(self.file_pointer, 'mode', ''):
+            return None
+        try:
+            fileno = self.file_pointer.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None
+        return fileno, self.start, self.size
+
+    def _remaining(self):
+        """Bytes left to read from the file, or ``None`` to read to its end."""
+        return None
+
+    def _read_file(self, size, seek_to):
+        if seek_to is not None:
+            self.file_pointer.seek(seek_to)
+        return self.file_pointer.read(size)
+
+    async def _read_chunk(self, size):
+        """Read up to ``size`` bytes from the file, picking up the read-ahead if there is one."""
+        if self._read_ahead is not None:
+            ahead_size, future = self._read_ahead
+            self._read_ahead = None
+            chunk = await future
+            if ahead_size == size:
+                return chunk
+            self._leftover = chunk if self._leftover is None else self._leftover + chunk
+
+        if self._leftover is not None:
+            chunk, self._leftover = self._leftover, None
+            if size != -1 and len(chunk) > size:
+                chunk, self._leftover = chunk[:size], chunk[size:]
+            elif (size == -1 or len(chunk) < size) and not self._exhausted:
+                more = await self._submit(-1 if size == -1 else size - len(chunk))
+                self._exhausted = self._exhausted or not more
+                chunk += more
+            return chunk
+
+        if self._exhausted:
+            return b''
+        return await self._submit(size)
 
-            yield chunk
+    def _submit(self, size):
+        remaining = self._remaining()
+        if remaining is not None:
+            size = remaining if size == -1 else min(size, remaining)
+        seek_to = None if self._started else self.start
+        self._started = True
+        return asyncio.get_event_loop().run_in_executor(file_io_executor(), self._read_file,
+                                                        size, seek_to)
 
     async def _read(self, size):
-        self.file_gen = self.file_gen or self.chunk_reader()
-        self.read_size = size
-        # add sleep of 0 so read will yield and continue in next io loop iteration
-        # asyncio.sleep(0) yields None by default, which displeases tornado
-        await asyncio.sleep(0.001)
-        async for chunk in self.file_gen:
-            return chunk
+        chunk = await self._read_chunk(size)
+
+        if not chunk:
+            self._exhausted = True
+            self.feed_eof()
+            return b''
+
+        if size == -1:
+            self._exhausted = True
+        self._count(chunk)
+
+        if (settings.FILE_READ_AHEAD and self._leftover is None and not self._exhausted and
+                self._remaining() != 0):
+            self._read_ahead = (size, self._submit(size))
+
+        return chunk
+
+    def _count(self, chunk):
+        pass
 
 
 class PartialFileStreamReader(FileStreamReader):
@@ -52,10 +158,15 @@ class PartialFileStreamReader(FileStreamReader):
     """
 
     def __init__(self, file_pointer, byte_range):
-        super().__init__(file_pointer)
-        self.start = byte_range[0]
+        self._start = byte_range[0]
         self.end = byte_range[1]
         self.bytes_read = 0
+        self._requested = 0
+        super().__init__(file_pointer)
+
+    @property
+    def start(self):
+        return self._start
 
     @property
     def size(self):
@@ -63,11 +174,7 @@ class PartialFileStreamReader(FileStreamReader):
 
     @property
     def total_size(self):
-        cursor = self.file_pointer.tell()
-        self.file_pointer.seek(0, os.SEEK_END)
-        ret = self.file_pointer.tell()
-        self.file_pointer.seek(cursor)
-        return ret
+        return self._total_size
 
     @property
     def partial(self):
@@ -77,23 +184,14 @@ class PartialFileStreamReader(FileStreamReader):
     def content_range(self):
         return 'bytes {}-{}/{}'.format(self.start, self.end, self.total_size)
 
-    async def chunk_reader(self):
-        self.file_pointer.seek(self.start)
-        while True:
-            chunk = self.file_pointer.read(self.read_size)
-            self.bytes_read += self.read_size
-            if not chunk:
-                self.feed_eof()
-                yield b''
+    def _remaining(self):
+        return self.size - self._requested
 
-            yield chunk
+    def _submit(self, size):
+        future = super()._submit(size)
+        remaining = self._remaining()
+        self._requested += remaining if size == -1 else min(size, remaining)
+        return future
 
-    async def _read(self, size):
-        self.file_gen = self.file_gen or self.chunk_reader()
-        bytes_remaining = self.size - self.bytes_read
-        self.read_size = bytes_remaining if size == -1 else min(size, bytes_remaining)
-        # add sleep of 0 so read will yield and continue in next io loop iteration
-        # asyncio.sleep(0) yields None by default, which displeases tornado
-        await asyncio.sleep(0.001)
-        async for chunk in self.file_gen:
-            return chunk
+    def _count(self, chunk):
+        self.bytes_read += len(chunk)
@@ -1,3 +1,27 @@
+import asyncio
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from waterbutler.core.streams import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def hash_executor() -> ThreadPoolExecutor:
+    """The thread pool :class:`ThreadedHashStreamWriter` objects hash in, sized by
+    ``STREAMS_CONFIG.HASH_THREADS``.  hashlib releases the GIL while hashing, so the writers of a
+    stream run in parallel with each other and with the event loop.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.HASH_THREADS,
+                                           thread_name_prefix='wb-hash')
+        return _executor
+
+
 class HashStreamWriter:
     """Stream-like object that hashes and discards its input."""
 
@@ -20,3 +44,92 @@ class HashStreamWriter:
 
     def close(self):
         pass
+
+
+class ThreadedHashStreamWriter(HashStreamWriter):
+    """A :class:`HashStreamWriter` that hashes in :func:`hash_executor` instead of on the event
+    loop.  Chunks are queued by :meth:`write` and hashed in order by one job at a time, so several
+    writers on the same stream each use their own thread.  :meth:`drain`, which
+    :meth:`.BaseStream.read` awaits after every chunk, holds the stream back while more than
+    ``STREAMS_CONFIG.HASH_MAX_PENDING`` bytes are waiting to be hashed.
+
+    Await :meth:`flush` once the stream has been read to wait for the hashing to finish without
+    blocking the loop.  ``digest`` and ``hexdigest`` also wait for it, but block while doing so.
+    """
+
+    def __init__(self, hasher):
+        super().__init__(hasher)
+        self._pending = collections.deque()  # type: collections.deque
+        self._pending_bytes = 0
+        self._condition = threading.Condition()
+        self._job = None
+        self._drain_waiter = None  # type: tuple
+
+    @property
+    def digest(self):
+        self.join()
+        return self.hash.digest()
+
+    @property
+    def hexdigest(self):
+        self.join()
+        return self.hash.hexdigest()
+
+    def write(self, data):
+        if not data:
+            return
+        if not isinstance(data, bytes):
+            # The caller may reuse its buffer once we return
+            data = bytes(data)
+        with self._condition:
+            self._pending.append(data)
+            self._pending_bytes += len(data)
+            if self._job is None:
+                self._job = hash_executor().submit(self._hash_pending)
+
+    async def drain(self):
+        """Wait until the hashing is less than ``HASH_MAX_PENDING`` bytes behind."""
+        with self._condition:
+            if self._pending_bytes < settings.HASH_MAX_PENDING:
+                return
+            loop = asyncio.get_event_loop()
+            waiter = loop.create_future()
+            self._drain_waiter = (loop, waiter)
+        await waiter
+
+    def join(self):
+        """Block until every chunk written so far has been hashed."""
+        with self._condition:
+            while self._job is not None:
+                self._condition.wait()
+
+    async def flush(self):
+        """Wait until every chunk written so far has been hashed."""
+        while True:
+            with self._condition:
+                job = self._job
+            if job is None:
+                return
+            await asyncio.wrap_future(job)
+
+    def _hash_pending(self):
+        while True:
+            with self._condition:
+                if not self._pending:
+                    self._job = None
+                    self._condition.notify_all()
+                    return
+                data = self._pending.popleft()
+            self.hash.update(data)
+            with self._condition:
+                self._pending_bytes -= len(data)
+                if (self._drain_waiter is not None and
+                        self._pending_bytes < settings.HASH_MAX_PENDING):
+                    loop, waiter = self._drain_waiter
+                    self._drain_waiter = None
+                    loop.call_soon_threadsafe(_wake, waiter)
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
@@ -0,0 +1,169 @@
+import asyncio
+
+from waterbutler.core.streams import settings
+from waterbutler.core.streams.base import BaseStream, ChunkQueue
+
+
+class StreamPipe:
+    """An in-memory, bounded byte channel between a producer and a consumer on the same event
+    loop.  The server uses it to hand request bodies from ``data_received`` to the provider's
+    upload, which reads them through a :class:`.RequestStreamReader`.
+
+    The writing end has the ``write``/``drain``/``write_eof``/``close`` API of
+    :class:`asyncio.StreamWriter`, the reading end the ``read``/``readexactly``/``at_eof`` API of
+    :class:`asyncio.StreamReader`.  Chunks are queued as they are written and only copied when a
+    read has to join or split them.
+
+    :meth:`drain` waits while ``high_water`` bytes or more are buffered, or while the buffer holds
+    less than a pending ``readexactly`` needs, so the upload sets the pace of the client and the
+    buffer never grows much beyond the larger of the two.  Once the pipe is closed, e.g. because
+    the upload failed, writes are dropped and :meth:`drain` no longer waits.
+
+    :param int high_water: number of buffered bytes :meth:`drain` starts waiting at
+    """
+
+    def __init__(self, high_water: int) -> None:
+        self.high_water = high_water
+        self._chunks = ChunkQueue()
+        self._eof = False
+        self._closed = False
+        self._wanted = 0
+        self._read_waiter = None  # type: asyncio.Future
+        self._drain_waiter = None  # type: asyncio.Future
+
+    def __len__(self):
+        """Number of bytes buffered"""
+        return len(self._chunks)
+
+    def write(self, data: bytes) -> None:
+        if self._closed:
+            return
+        if self._eof:
+            raise RuntimeError('Cannot write to a pipe after write_eof()')
+        self._chunks.append(data)
+        self._wake_reader()
+
+    async def drain(self) -> None:
+        """Wait until the reading end has caught up with the writes."""
+        while not self._closed and len(self._chunks) >= max(self.high_water, self._wanted, 1):
+            self._drain_waiter = asyncio.get_event_loop().create_future()
+            await self._drain_waiter
+
+    def write_eof(self) -> None:
+        self._eof = True
+        self._wake_reader()
+
+    def close(self) -> None:
+        """Close the pipe.  Data that has already been written can still be read."""
+        self._closed = True
+        self._eof = True
+        self._wake_reader()
+        self._wake_writer()
+
+    def at_eof(self) -> bool:
+        return self._eof and not self._chunks
+
+    async def read(self, n: int=-1) -> bytes:
+        """Read up to ``n`` bytes, or everything until EOF if ``n`` is negative."""
+        if n == 0:
+            return b''
+        if n < 0:
+            await self._wait_for(lambda: self._eof)
+        else:
+            await self._wait_for(lambda: self._chunks or self._eof)
+        return self._take(n)
+
+    async def readexactly(self, n: int) -> bytes:
+        """Read exactly ``n`` bytes.
+
+        :raises: :class:`asyncio.IncompleteReadError` if EOF is reached first
+        """
+        self._wanted = n
+        try:
+            await self._wait_for(lambda: len(self._chunks) >= n or self._eof)
+        finally:
+            self._wanted = 0
+        if len(self._chunks) < n:
+            raise asyncio.IncompleteReadError(self._take(-1), n)
+        return self._take(n)
+
+    async def _wait_for(self, predicate) -> None:
+        while not predicate():
+            # The writer may be waiting for the buffer to drain below what we now want
+            self._wake_writer()
+            self._read_waiter = asyncio.get_event_loop().create_future()
+            try:
+                await self._read_waiter
+            finally:
+                self._read_waiter = None
+
+    def _take(self, n: int) -> bytes:
+        data = self._chunks.take(n)
+        if len(self._chunks) < self.high_water:
+            self._wake_writer()
+        return data
+
+    def _wake_reader(self) -> None:
+        if self._read_waiter is not None and not self._read_waiter.done():
+            self._read_waiter.set_result(None)
+
+    def _wake_writer(self) -> None:
+        waiter, self._drain_waiter = self._drain_waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+
+class TeeStream(BaseStream):
+    """A branch of ``source``: every chunk read from ``source`` from now on can also be read from
+    here, so one download can feed an upload, a checksum and a local copy at once.  Branches
+    are registered as writers of the source, whose reads wait (see :meth:`.BaseStream.read`)
+    while a branch has ``limit`` bytes or more buffered.  The source is therefore read at the
+    pace of its slowest branch, and holds at most ``limit`` bytes per branch, plus the chunk
+    being read, in memory.
+
+    A branch must be read concurrently with the source, or closed once nobody is going to read
+    it, or reads of the source wait for it forever.  Closing a branch detaches it from the
+    source.
+
+    :param source: the :class:`.BaseStream` to branch off
+    :param str name: the name to register the branch as a writer of ``source`` under
+    :param int limit: bytes a branch may fall behind by, defaults to
+        ``STREAMS_CONFIG.TEE_BUFFER_SIZE``
+    """
+
+    def __init__(self, source: BaseStream, name: str, limit: int=None) -> None:
+        super().__init__()
+        self.source = source
+        self.name = name
+        self.pipe = StreamPipe(settings.TEE_BUFFER_SIZE if limit is None else limit)
+        source.add_writer(name, self)
+
+    @property
+    def size(self):
+        return self.source.size
+
+    def write(self, data: bytes) -> None:
+        self.pipe.write(data)
+
+    async def drain(self) -> None:
+        await self.pipe.drain()
+
+    def can_write_eof(self) -> bool:
+        return True
+
+    def write_eof(self) -> None:
+        self.pipe.write_eof()
+
+    def close(self) -> None:
+        self.pipe.close()
+        if self.source.writers.get(self.name) is self:
+            self.source.remove_writer(self.name)
+
+    def at_eof(self) -> bool:
+        return self.pipe.at_eof()
+
+    async def _read(self, n=-1):
+        data = await self.pipe.read(n)
+        if self.pipe.at_eof():
+            self.feed_eof()
+        return data
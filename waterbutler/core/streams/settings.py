@@ -1,4 +1,6 @@
+import os
 import zlib
+import tempfile
 
 from waterbutler import settings
 
@@ -13,3 +15,75 @@ ZIP_EXTENSIONS = config.get('ZIP_EXTENSIONS', '.zip .gz .bzip .bzip2 .rar .xz .b
 # (approximately equivalent to a 6).  See the zlib docs for more:
 # https://docs.python.org/3/library/zlib.html#zlib.compressobj
 ZIP_COMPRESSION_LEVEL = int(config.get('ZIP_COMPRESSION_LEVEL', zlib.Z_DEFAULT_COMPRESSION))
+
+# Content types that are already compressed, so zip entries of these types are stored rather
+# than deflated.  Entries ending in "/" match every subtype.
+ZIP_STORED_CONTENT_TYPES = config.get(
+    'ZIP_STORED_CONTENT_TYPES',
+    'image/jpeg image/png image/gif image/webp image/heic image/avif video/ audio/mpeg audio/mp4 '
+    'audio/aac audio/ogg audio/flac audio/opus application/zip application/gzip '
+    'application/x-gzip application/x-bzip2 application/x-xz application/x-7z-compressed '
+    'application/x-rar-compressed application/vnd.rar application/zstd '
+    'application/vnd.apache.parquet'
+).split(' ')
+
+# Number of bytes read from the start of a file to decide whether it is worth compressing.  A
+# probe of at least ZIP_PROBE_MIN_SIZE bytes that compresses to more than ZIP_PROBE_MAX_RATIO of
+# its size at the fastest level is taken to be incompressible, and the file is stored.
+ZIP_PROBE_SIZE = int(config.get('ZIP_PROBE_SIZE', 64 * 1024))  # 64KB
+ZIP_PROBE_MIN_SIZE = int(config.get('ZIP_PROBE_MIN_SIZE', 1024))  # 1KB
+ZIP_PROBE_MAX_RATIO = float(config.get('ZIP_PROBE_MAX_RATIO', 0.95))
+
+# Files at least this large are deflated at ZIP_FAST_COMPRESSION_LEVEL instead of
+# ZIP_COMPRESSION_LEVEL.  0 turns this off.
+ZIP_FAST_COMPRESSION_SIZE = int(config.get('ZIP_FAST_COMPRESSION_SIZE', 256 * 1024 * 1024))  # 256MB
+ZIP_FAST_COMPRESSION_LEVEL = int(config.get('ZIP_FAST_COMPRESSION_LEVEL', 1))
+
+# Threads zip entries are compressed in.  Each entry uses one thread at a time, so this bounds the
+# number of zip downloads that compress in parallel.
+ZIP_DEFLATE_THREADS = int(config.get('ZIP_DEFLATE_THREADS', 4))
+
+# Number of threads blocking file reads and writes are handed to, so that slow disks don't stall
+# the event loop.  Shared by every file stream in the process.
+FILE_IO_THREADS = int(config.get('FILE_IO_THREADS', 8))
+
+# Read the next chunk of a file while the current one is being sent.
+FILE_READ_AHEAD = config.get_bool('FILE_READ_AHEAD', True)
+
+# Threads uploads are hashed in, see ThreadedHashStreamWriter.  Each hash of a stream runs in its
+# own thread, so four covers the md5/sha1/sha256/sha512 set osfstorage computes.
+HASH_THREADS = int(config.get('HASH_THREADS', 4))
+
+# Bytes a threaded hash may fall behind the stream it hashes before reads wait for it.
+HASH_MAX_PENDING = int(config.get('HASH_MAX_PENDING', 16 * 1024 * 1024))  # 16MB
+
+# Number of upcoming files a folder zip keeps in its download window, and the number of bytes
+# that window may hold in memory.  Files that fit are downloaded concurrently while the current
+# file is compressed.  A concurrency of 1 turns prefetching off.
+ZIP_PREFETCH_CONCURRENCY = int(config.get('ZIP_PREFETCH_CONCURRENCY', 8))
+ZIP_PREFETCH_BUFFER_SIZE = int(config.get('ZIP_PREFETCH_BUFFER_SIZE', 32 * 1024 * 1024))  # 32MB
+
+# Number of folders a folder zip lists at once.
+ZIP_LIST_CONCURRENCY = int(config.get('ZIP_LIST_CONCURRENCY', 4))
+
+# Number of files a stored (``?zip&store=1``) archive download hashes at once in the background,
+# to get the CRCs of files a resumed download starts after or in the middle of.
+ZIP_STORE_HASH_CONCURRENCY = int(config.get('ZIP_STORE_HASH_CONCURRENCY', 4))
+
+# Number of file CRCs remembered for stored archives, so resuming one needn't hash the files
+# it already sent again.
+ZIP_STORE_CRC_CACHE_SIZE = int(config.get('ZIP_STORE_CRC_CACHE_SIZE', 100000))
+
+# Directory the CRCs of stored archives' files are kept in on disk, see ZipCRCStore, so that a
+# download resumed on another process or after a restart needn't hash the files it already sent.
+# Only processes sharing the directory share the CRCs: point every worker at the same volume.
+# Empty turns it off.  CRCs are saved at most every ZIP_STORE_CRC_SAVE_INTERVAL seconds while an
+# archive is sent, and when it ends, and kept for ZIP_STORE_CRC_MAX_AGE seconds.
+ZIP_STORE_CRC_DIR = config.get('ZIP_STORE_CRC_DIR',
+                               os.path.join(tempfile.gettempdir(), 'waterbutler-zip-crcs'))
+ZIP_STORE_CRC_SAVE_INTERVAL = float(config.get('ZIP_STORE_CRC_SAVE_INTERVAL', 10))
+ZIP_STORE_CRC_MAX_AGE = int(config.get('ZIP_STORE_CRC_MAX_AGE', 7 * 24 * 60 * 60))  # 7 days
+
+# Bytes a TeeStream branch may fall behind the stream it branches off before reads of that
+# stream wait for it.
+TEE_BUFFER_SIZE = int(config.get('TEE_BUFFER_SIZE', 4 * 1024 * 1024))  # 4MB
@@ -1,13 +1,25 @@
+import os
 import zlib
+import json
 import time
+import uuid
 import struct
+import hashlib
 import asyncio
 import logging
 import zipfile
 import binascii
+import mimetypes
+import threading
+import collections
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
 
+from waterbutler.core import exceptions
 from waterbutler.core.streams import settings
-from waterbutler.core.streams.base import BaseStream, MultiStream, StringStream
+from waterbutler.core.streams.file import run_file_io
+from waterbutler.core.streams.base import (CHUNK_SIZE, BaseStream, ChunkQueue, EmptyStream,
+                                           MultiStream, StringStream, join_chunks)
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +27,72 @@ logger = logging.getLogger(__name__)
 # for some reason python3.5 has this as (1 << 31) - 1, which is 0x7fffffff
 ZIP64_LIMIT = 0xffffffff - 1
 
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def deflate_executor() -> ThreadPoolExecutor:
+    """The thread pool zip entries are compressed in, sized by
+    ``STREAMS_CONFIG.ZIP_DEFLATE_THREADS``.  zlib releases the GIL while it works, so compressing
+    a large archive doesn't hold up the other requests on the event loop.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ZIP_DEFLATE_THREADS,
+                                           thread_name_prefix='wb-deflate')
+        return _executor
+
+
+ZipCompression = collections.namedtuple('ZipCompression', ['compress_type', 'level', 'reason'])
+
+
+def choose_compression(filename, content_type=None, head=None, size=None):
+    """Decide whether a zip entry is worth compressing, and how hard.  Files already compressed
+    in a format of their own (images, video, archives, ...) barely shrink, so deflating them is
+    wasted CPU.  Checks, in order:
+
+    * folders are stored
+    * names ending in one of ``STREAMS_CONFIG.ZIP_EXTENSIONS`` are stored
+    * content types in ``STREAMS_CONFIG.ZIP_STORED_CONTENT_TYPES`` are stored.  ``content_type``
+      is used if given, else the type guessed from the name.
+    * if ``head``, the start of the file, compresses to more than ``ZIP_PROBE_MAX_RATIO`` of its
+      size at the fastest level, the file is stored
+    * files of ``ZIP_FAST_COMPRESSION_SIZE`` bytes or more are deflated at
+      ``ZIP_FAST_COMPRESSION_LEVEL``, everything else at ``ZIP_COMPRESSION_LEVEL``
+
+    Probing takes about a millisecond for the default probe size, so run this in
+    :func:`deflate_executor` when ``head`` is given.
+
+    :param str filename: the entry's name in the archive
+    :param str content_type: the file's content type, if known
+    :param bytes head: the first bytes of the file
+    :param int size: the file's size, if known
+    :rtype: :class:`ZipCompression`
+    """
+    if filename.endswith('/'):
+        return ZipCompression(zipfile.ZIP_STORED, None, 'folder')
+
+    if any(filename.endswith(ext) for ext in settings.ZIP_EXTENSIONS):
+        return ZipCompression(zipfile.ZIP_STORED, None, 'extension')
+
+    if not content_type or content_type == 'application/octet-stream':
+        content_type = mimetypes.guess_type(filename)[0]
+    if content_type and any(
+        content_type == stored or (stored.endswith('/') and content_type.startswith(stored))
+        for stored in settings.ZIP_STORED_CONTENT_TYPES
+    ):
+        return ZipCompression(zipfile.ZIP_STORED, None, 'content_type')
+
+    if head and len(head) >= settings.ZIP_PROBE_MIN_SIZE:
+        if len(zlib.compress(head, 1)) > len(head) * settings.ZIP_PROBE_MAX_RATIO:
+            return ZipCompression(zipfile.ZIP_STORED, None, 'incompressible')
+
+    if size is not None and 0 < settings.ZIP_FAST_COMPRESSION_SIZE <= size:
+        return ZipCompression(zipfile.ZIP_DEFLATED, settings.ZIP_FAST_COMPRESSION_LEVEL, 'large')
+
+    return ZipCompression(zipfile.ZIP_DEFLATED, settings.ZIP_COMPRESSION_LEVEL, 'compressible')
+
 
 # Basic structure of .zip:
 
@@ -68,15 +146,25 @@ class ZipLocalFileData(BaseStream):
     """A thin stream wrapper. Update the original_size, compressed_size, and CRC of a ZipLocalFile
     as chunks are read and compressed.
 
+    Compression and the CRC are computed in :func:`deflate_executor`, one chunk at a time, while
+    the next chunk is read from the source.  The compressor is only flushed at the end of the
+    file, so its output comes out in whatever pieces zlib hands back once its buffers fill.
+
     See section 4.3.8 of the PKZIP APPNOTE.TXT.
 
     Note: This class is tightly coupled to ZipStreamReader and should not be used separately.
     """
-    def __init__(self, file, stream, *args, **kwargs):
+    def __init__(self, file, stream, *args, head=None, **kwargs):
         self.file = file
         self.stream = stream
-        self._buffer = bytearray()
         super().__init__(*args, **kwargs)
+        # Data already read from the stream, to be compressed before anything else
+        self._head = head
+        # Compressed output not handed out yet.  Not `_buffer`, that's the StreamReader's own.
+        self._pending = ChunkQueue()
+        # The chunk being compressed, and whether the source's last chunk has been read
+        self._deflating = None  # type: asyncio.Future
+        self._source_done = False
 
     @property
     def size(self):
@@ -84,40 +172,60 @@ class ZipLocalFileData(BaseStream):
 
     async def _read(self, n=-1, *args, **kwargs):
 
-        ret = self._buffer
+        while (n == -1 or len(self._pending) < n) and not self._finished:
+            # Read the next chunk while the previous one is being compressed
+            chunk = None
+            if not self._source_done:
+                if self._head is not None:
+                    chunk, self._head = self._head, None
+                else:
+                    chunk = await self.stream.read(n, *args, **kwargs)
+                self._source_done = self.stream.at_eof()
 
-        while (n == -1 or len(ret) < n) and not self.stream.at_eof():
-            chunk = await self.stream.read(n, *args, **kwargs)
+            if self._deflating is not None:
+                deflating, self._deflating = self._deflating, None
+                self.file.zinfo.CRC, compressed = await deflating
+                self._queue(compressed)
 
-            # Update file info
-            self.file.original_size += len(chunk)
-            self.file.zinfo.CRC = binascii.crc32(chunk, self.file.zinfo.CRC)
+            if chunk is None:
+                continue
 
-            # compress
+            self.file.original_size += len(chunk)
             if self.file.compressor:
-                compressed = self.file.compressor.compress(chunk)
-                compressed += self.file.compressor.flush(
-                    zlib.Z_FINISH if self.stream.at_eof() else zlib.Z_SYNC_FLUSH
+                self._deflating = asyncio.get_event_loop().run_in_executor(
+                    deflate_executor(), self._deflate, chunk, self.file.zinfo.CRC,
+                    self._source_done,
                 )
             else:
-                compressed = chunk
+                self.file.zinfo.CRC = binascii.crc32(chunk, self.file.zinfo.CRC)
+                self._queue(chunk)
 
-            # Update file info
-            self.file.compressed_size += len(compressed)
-            ret += compressed
-
-        # buffer any overages
-        if n != -1 and len(ret) > n:
-            self._buffer = ret[n:]
-            ret = ret[:n]
-        else:
-            self._buffer = bytearray()
+        ret = self._pending.take(n)
 
         # EOF is the buffer and stream are both empty
-        if not self._buffer and self.stream.at_eof():
+        if not self._pending and self._finished:
             self.feed_eof()
 
-        return bytes(ret)
+        return ret
+
+    @property
+    def _finished(self):
+        return self._source_done and self._deflating is None
+
+    def _deflate(self, chunk, crc, final):
+        """Compress ``chunk``, finishing the compressed stream if it is the last one.  Runs in
+        :func:`deflate_executor`, never for two chunks of the same file at once.
+        """
+        crc = zlib.crc32(chunk, crc)
+        compressed = self.file.compressor.compress(chunk)
+        if final:
+            compressed += self.file.compressor.flush(zlib.Z_FINISH)
+        return crc, compressed
+
+    def _queue(self, data):
+        """Update file info and queue output, any overage is kept for the next read"""
+        self.file.compressed_size += len(data)
+        self._pending.append(data)
 
 
 class ZipLocalFile(MultiStream):
@@ -126,44 +234,37 @@ class ZipLocalFile(MultiStream):
 
     Note: This class is tightly coupled to ZipStreamReader and should not be
     used separately.
+
+    :param tuple file_tuple: the entry's name and stream
+    :param ZipCompression compression: how to compress the entry.  Defaults to what
+        :func:`choose_compression` picks from the name alone.
+    :param bytes head: data already read from the stream
+    :param tuple date_time: the entry's modification time.  Defaults to now.
     """
-    def __init__(self, file_tuple):
+    def __init__(self, file_tuple, compression=None, head=None, date_time=None):
 
         filename, stream = file_tuple
         # Build a ZipInfo instance to use for the file's header and footer
         self.zinfo = zipfile.ZipInfo(
             filename=filename,
-            date_time=time.localtime(time.time())[:6],
+            date_time=date_time or time.localtime(time.time())[:6],
         )
 
-        already_zipped = False
-        for zip_ext in settings.ZIP_EXTENSIONS:
-            if self.zinfo.filename.endswith(zip_ext):
-                already_zipped = True
-                logger.info('   DONE!')
-                break
+        self.compression = compression or choose_compression(filename)
+        logger.debug('compression for {}: {}'.format(filename, self.compression))
 
-        logger.debug('file is already compressed: {}'.format(already_zipped))
-        # If the file is a `.zip`, set permission and turn off compression
-        if already_zipped:
-            self.zinfo.external_attr = 0o600 << 16      # -rw-------
-            self.zinfo.compress_type = zipfile.ZIP_STORED
-            self.compressor = None
-        # If the file is a directory, set the directory flag and turn off compression
-        elif self.zinfo.filename[-1] == '/':
+        # If the file is a directory, set the directory flag
+        if self.zinfo.filename[-1] == '/':
             self.zinfo.external_attr = 0o40775 << 16    # drwxrwxr-x
             self.zinfo.external_attr |= 0x10            # Directory flag
-            self.zinfo.compress_type = zipfile.ZIP_STORED
-            self.compressor = None
-        # For other types, set permission and define a compressor
         else:
             self.zinfo.external_attr = 0o600 << 16      # -rw-------
-            self.zinfo.compress_type = zipfile.ZIP_DEFLATED
-            self.compressor = zlib.compressobj(
-                settings.ZIP_COMPRESSION_LEVEL,
-                zlib.DEFLATED,
-                -15,
-            )
+
+        self.zinfo.compress_type = self.compression.compress_type
+        if self.compression.compress_type == zipfile.ZIP_DEFLATED:
+            self.compressor = zlib.compressobj(self.compression.level, zlib.DEFLATED, -15)
+        else:
+            self.compressor = None
 
         self.zinfo.header_offset = 0
         self.zinfo.flag_bits |= 0x08
@@ -178,7 +279,7 @@ class ZipLocalFile(MultiStream):
 
         super().__init__(
             StringStream(self.local_header),
-            ZipLocalFileData(self, stream),
+            ZipLocalFileData(self, stream, head=head),
             ZipLocalFileDataDescriptor(self),
         )
 
@@ -367,34 +468,440 @@ class ZipArchiveCentralDirectory(StringStream):
 
 
 class ZipStreamReader(asyncio.StreamReader):
-    """Combines one or more streams into a single, Zip-compressed stream"""
-    def __init__(self, stream_gen):
+    """Combines one or more streams into a single, Zip-compressed stream.
+
+    ``stream_gen`` yields ``(name, stream)`` or ``(name, stream, content_type)`` tuples.  The
+    start of each stream is read before its entry is written so that :func:`choose_compression`
+    can look at it.  The decisions, and the bytes stored and deflated, are added to ``metrics``
+    under ``zip`` as entries finish.
+
+    :param stream_gen: an async iterator of entries
+    :param metrics: a :class:`.MetricsRecord` to report to
+    """
+    def __init__(self, stream_gen, metrics=None):
         self._eof = False
         self.stream = None
         self.streams = stream_gen
         self.finished_streams = []
+        self.metrics = metrics
+        self.stats = {
+            'entries': collections.Counter(),
+            'bytes': collections.Counter(),
+        }
         # Each incoming stream should be wrapped in a _ZipFile instance
         super().__init__()
 
+    def close(self):
+        """Stop the source from prefetching downloads that will never be read."""
+        if hasattr(self.streams, 'close'):
+            self.streams.close()
+
     async def read(self, n=-1):
         if n < 0:
             # Parent class will handle auto chunking for us
             return await super().read(n)
 
-        if not self.stream:
-            try:
-                self.stream = ZipLocalFile(await self.streams.__anext__())
-            except StopAsyncIteration:
-                if self._eof:
-                    return b''
-                self._eof = True
-                # Append a stream for the archive's footer (central directory)
-                self.stream = ZipArchiveCentralDirectory(self.finished_streams)
-
-        chunk = await self.stream.read(n)
-        if len(chunk) < n and self.stream.at_eof():
+        parts = []
+        remaining = n
+
+        while remaining > 0:
+            if not self.stream:
+                try:
+                    self.stream = await self._open_entry(await self.streams.__anext__())
+                except StopAsyncIteration:
+                    if self._eof:
+                        break
+                    self._eof = True
+                    # Append a stream for the archive's footer (central directory)
+                    self.stream = ZipArchiveCentralDirectory(self.finished_streams)
+
+            chunk = await self.stream.read(remaining)
+            parts.append(chunk)
+            remaining -= len(chunk)
+
+            if remaining <= 0 or not self.stream.at_eof():
+                break
+            # The current entry is done, carry on with the next one
+            if isinstance(self.stream, ZipLocalFile):
+                self._record(self.stream)
             self.finished_streams.append(self.stream)
             self.stream = None
-            chunk += await self.read(n - len(chunk))
 
-        return chunk
+        return join_chunks(parts)
+
+    async def _open_entry(self, entry):
+        filename, stream = entry[:2]
+        content_type = entry[2] if len(entry) > 2 else None
+
+        if filename.endswith('/'):
+            return ZipLocalFile((filename, stream))
+
+        head = await stream.read(settings.ZIP_PROBE_SIZE)
+        size = getattr(stream, 'size', None)
+        compression = await asyncio.get_event_loop().run_in_executor(
+            deflate_executor(), choose_compression, filename,
+            content_type or getattr(stream, 'content_type', None), head,
+            size if isinstance(size, int) else None,
+        )
+        return ZipLocalFile((filename, stream), compression=compression, head=head)
+
+    def _record(self, file):
+        self.stats['entries'][file.compression.reason] += 1
+        if file.compressor:
+            self.stats['bytes']['deflated'] += file.original_size
+            self.stats['bytes']['deflated_to'] += file.compressed_size
+        else:
+            self.stats['bytes']['stored'] += file.original_size
+
+        if self.metrics is not None:
+            self.metrics.add('zip', {key: dict(value) for key, value in self.stats.items()})
+
+
+STORED = ZipCompression(zipfile.ZIP_STORED, None, 'store')
+
+
+class ZipCRCStore:
+    """The CRC-32s of the files in stored archives, kept on disk so that a download resumed on
+    another process, or after a restart, needn't hash again the files the client already has.
+
+    Each archive's CRCs are kept in a file named after the archive's etag, mapping each entry's
+    ``crc_key`` to its CRC.  Every process started on the same directory (e.g. on a shared volume)
+    shares them.  Files nobody has written to for ``max_age`` seconds are removed.
+
+    :param str directory: where to keep the CRCs
+    :param int max_age: seconds an archive's CRCs are kept after they last changed
+    """
+
+    # Prefix of the files CRCs are written to before they replace an archive's file
+    TEMP_PREFIX = '.tmp-'
+
+    def __init__(self, directory: str, max_age: int) -> None:
+        self.directory = directory
+        self.max_age = max_age
+        self._pruned = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+
+    async def load(self, etag: str) -> dict:
+        """The CRCs known for the archive with ``etag``, by entry ``crc_key``."""
+        return await run_file_io(self._load, self._path(etag))
+
+    async def save(self, etag: str, crcs: dict) -> None:
+        """Add ``crcs``, by entry ``crc_key``, to those known for the archive with ``etag``."""
+        await run_file_io(self._save, self._path(etag), crcs)
+
+    def _path(self, etag):
+        return os.path.join(self.directory, hashlib.sha256(etag.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, 'r') as fp:
+                crcs = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        return crcs if isinstance(crcs, dict) else {}
+
+    def _save(self, path, crcs):
+        # Keep what other processes saved for the archive meanwhile
+        merged = dict(self._load(path), **crcs)
+        temp_path = os.path.join(self.directory, '{}{}'.format(self.TEMP_PREFIX, uuid.uuid4().hex))
+        try:
+            with open(temp_path, 'w') as fp:
+                json.dump(merged, fp)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+        now = time.time()
+        if now - self._pruned > min(self.max_age, 60 * 60):
+            self._pruned = now
+            self._prune(now)
+
+    def _prune(self, now):
+        for entry in os.scandir(self.directory):
+            try:
+                if now - entry.stat().st_mtime > self.max_age:
+                    os.remove(entry.path)
+            except OSError:
+                # Removed by another process meanwhile
+                continue
+
+
+class StoredZipStreamReader(BaseStream):
+    """An uncompressed zip archive whose layout is worked out before anything is sent, so that
+    its size is known up front and any byte range of it can be served on its own.
+
+    ``entries`` are objects with a ``name``, a ``size`` in bytes, a ``date_time`` tuple, a
+    ``version`` string (or ``None``) that changes whenever the content does, a ``crc`` that is
+    ``None`` until known and may be assigned to, and an ``async open(start, end)`` that returns a
+    stream of exactly the inclusive byte range ``start``-``end`` of the entry.  Entries are
+    written in the order given.
+
+    A byte range is served by opening just the part of each entry it covers.  The CRC-32 of an
+    entry is needed after its data, in its data descriptor and in the central directory, so
+    entries whose CRC is unknown and whose data isn't wholly inside the range are downloaded and
+    hashed in the background, ``STREAMS_CONFIG.ZIP_STORE_HASH_CONCURRENCY`` at a time, while the
+    rest of the range is sent.  Entries that are sent whole get their CRC set as they go.
+
+    Entries with a ``crc_key`` have their CRC kept in ``crc_store``, if given, and taken from it
+    when the archive is resumed, by whichever process serves the resumed download.  Processes
+    that don't share the store's directory hash every entry before the range again, so a resumed
+    download may stall before the central directory for as long as downloading those entries
+    takes.  ``stats`` tells how many CRCs were known, loaded and hashed, and how long sending
+    waited for them.
+
+    :param list entries: the archive's entries
+    :param tuple byte_range: the inclusive ``(start, end)`` byte range to send, ``end`` may be
+        ``None``.  Defaults to the whole archive.
+    :param ZipCRCStore crc_store: where to keep the entries' CRCs, if anywhere
+    """
+
+    def __init__(self, entries, byte_range=None, crc_store=None):
+        super().__init__()
+        self.entries = list(entries)
+        self.crc_store = crc_store
+        self.files = []
+        # (offset, length, kind, entry index) for every part of the archive, in order
+        self._segments = []  # type: list
+
+        offset = 0
+        for index, entry in enumerate(self.entries):
+            file = ZipLocalFile((entry.name, EmptyStream()), compression=STORED,
+                                date_time=entry.date_time)
+            file.original_size = file.compressed_size = entry.size
+            file.need_zip64_data_descriptor = entry.size > ZIP64_LIMIT
+            if entry.crc is not None:
+                file.zinfo.CRC = entry.crc
+            self.files.append(file)
+
+            for kind, length in (('header', len(file.local_header)), ('data', entry.size),
+                                 ('descriptor', len(file.descriptor))):
+                self._segments.append((offset, length, kind, index))
+                offset += length
+
+        # The central directory is the same length whatever the CRCs turn out to be
+        directory_size = len(ZipArchiveCentralDirectory(self.files).build_content())
+        self._segments.append((offset, directory_size, 'directory', None))
+        self.total_size = offset + directory_size
+
+        self.start, self.end = 0, self.total_size - 1
+        if byte_range is not None:
+            self.select_range(byte_range)
+
+        self._known = [entry.crc is not None or entry.size == 0 for entry in self.entries]
+        self.stats = {
+            'entries': len(self.entries),
+            'known': sum(self._known),
+            'loaded': 0,
+            'hashed': 0,
+            'hashed_bytes': 0,
+            'crc_wait': 0.0,
+        }
+        # CRCs found since they were last saved to the store, and the save in progress
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._saving = None
+        self._hashing = {}  # type: dict
+        self._hash_slots = None
+        self._chunks = None
+        self._produced = False
+        self._pending = ChunkQueue()
+
+    @property
+    def size(self):
+        return self.end - self.start + 1
+
+    @property
+    def partial(self):
+        return self.size < self.total_size
+
+    @property
+    def content_range(self):
+        return 'bytes {}-{}/{}'.format(self.start, self.end, self.total_size)
+
+    @property
+    def etag(self):
+        """Changes whenever the archive's content would, so a client resuming a download can tell
+        whether the bytes it already has still belong to it.
+        """
+        digest = hashlib.sha256()
+        for entry in self.entries:
+            digest.update('{}\0{}\0{}\0{}\n'.format(
+                entry.name, entry.size, entry.date_time, entry.version
+            ).encode('utf-8'))
+        return '"{}"'.format(digest.hexdigest()[:32])
+
+    def select_range(self, byte_range):
+        """Send only the inclusive ``(start, end)`` byte range of the archive.  Must be called
+        before the first read.
+
+        :raises: :class:`.InvalidParameters` with a 416 status if the range starts past the end
+        """
+        start, end = byte_range
+        if start >= self.total_size:
+            raise exceptions.InvalidParameters(
+                'Range start {} is beyond the end of the {} byte archive'.format(
+                    start, self.total_size),
+                code=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+            )
+        if end is None or end >= self.total_size:
+            end = self.total_size - 1
+        self.start, self.end = start, end
+
+    def close(self):
+        """Stop hashing entries nobody is waiting for anymore, and save the CRCs found."""
+        for task in self._hashing.values():
+            task.cancel()
+        self._save_crcs()
+
+    async def _read(self, n=-1):
+        if self._chunks is None:
+            await self._load_crcs()
+            self._start_hashing()
+            self._chunks = self._produce()
+
+        while (n < 0 or len(self._pending) < n) and not self._produced:
+            try:
+                self._pending.append(await self._chunks.__anext__())
+            except StopAsyncIteration:
+                self._produced = True
+
+        ret = self._pending.take(n)
+        if not self._pending and self._produced:
+            self.feed_eof()
+        return ret
+
+    def _covered(self):
+        """The ``(offset, length, kind, index, first, last)`` of every segment overlapping the
+        range, where ``first`` and ``last`` are the range's bounds within the segment.
+        """
+        for offset, length, kind, index in self._segments:
+            if offset > self.end:
+                return
+            if length and offset + length > self.start:
+                yield (offset, length, kind, index,
+                       max(self.start - offset, 0), min(self.end - offset, length - 1))
+
+    def _start_hashing(self):
+        """Hash, in the background, the entries whose CRC is needed but won't be seen whole."""
+        whole, needed = set(), set()
+        for offset, length, kind, index, first, last in self._covered():
+            if kind == 'data' and first == 0 and last == length - 1:
+                whole.add(index)
+            elif kind == 'descriptor':
+                needed.add(index)
+            elif kind == 'directory':
+                needed.update(range(len(self.entries)))
+
+        self._hash_slots = asyncio.Semaphore(max(settings.ZIP_STORE_HASH_CONCURRENCY, 1))
+        for index in sorted(needed - whole):
+            if not self._known[index]:
+                self._hashing[index] = asyncio.ensure_future(self._hash(index))
+
+    async def _hash(self, index):
+        async with self._hash_slots:
+            crc = 0
+            async for chunk in self._entry_data(index, 0, self.entries[index].size - 1):
+                crc = zlib.crc32(chunk, crc)
+        self.stats['hashed'] += 1
+        self.stats['hashed_bytes'] += self.entries[index].size
+        self._set_crc(index, crc)
+
+    async def _crc(self, index):
+        if not self._known[index]:
+            started = time.monotonic()
+            await self._hashing[index]
+            self.stats['crc_wait'] += time.monotonic() - started
+
+    def _set_crc(self, index, crc):
+        self.files[index].zinfo.CRC = crc
+        self.entries[index].crc = crc
+        self._known[index] = True
+        if getattr(self.entries[index], 'crc_key', None):
+            self._unsaved += 1
+            if time.monotonic() - self._saved_at >= settings.ZIP_STORE_CRC_SAVE_INTERVAL:
+                self._save_crcs()
+
+    async def _load_crcs(self):
+        """Take the CRCs of the entries that aren't known yet from the store."""
+        if self.crc_store is None or all(
+            self._known[index] or not getattr(entry, 'crc_key', None)
+            for index, entry in enumerate(self.entries)
+        ):
+            return
+        try:
+            crcs = await self.crc_store.load(self.etag)
+        except Exception as exc:
+            logger.warning('Failed to load the CRCs of archive {}: {!r}'.format(self.etag, exc))
+            return
+        for index, entry in enumerate(self.entries):
+            key = getattr(entry, 'crc_key', None)
+            if not self._known[index] and key and isinstance(crcs.get(key), int):
+                self._set_crc(index, crcs[key])
+                self.stats['loaded'] += 1
+        # They are in the store already
+        self._unsaved = 0
+
+    def _save_crcs(self):
+        """Save the CRCs found since the last save to the store, in the background."""
+        if self.crc_store is None or not self._unsaved:
+            return
+        self._saved_at = time.monotonic()
+        if self._saving is None or self._saving.done():
+            self._saving = asyncio.ensure_future(self._save())
+
+    async def _save(self):
+        while self._unsaved:
+            self._unsaved = 0
+            crcs = {
+                entry.crc_key: entry.crc for entry in self.entries
+                if getattr(entry, 'crc_key', None) and entry.crc is not None
+            }
+            try:
+                await self.crc_store.save(self.etag, crcs)
+            except Exception as exc:
+                logger.warning('Failed to save the CRCs of archive {}: {!r}'.format(self.etag,
+                                                                                   exc))
+                return
+
+    async def _produce(self):
+        for offset, length, kind, index, first, last in self._covered():
+            if kind == 'header':
+                yield self.files[index].local_header[first:last + 1]
+            elif kind == 'data':
+                hashed = first == 0 and last == length - 1 and not self._known[index]
+                crc = 0
+                async for chunk in self._entry_data(index, first, last):
+                    if hashed:
+                        crc = zlib.crc32(chunk, crc)
+                    yield chunk
+                if hashed:
+                    self._set_crc(index, crc)
+            elif kind == 'descriptor':
+                await self._crc(index)
+                yield self.files[index].descriptor[first:last + 1]
+            else:
+                for i in range(len(self.files)):
+                    await self._crc(i)
+                yield ZipArchiveCentralDirectory(self.files).build_content()[first:last + 1]
+        self._save_crcs()
+
+    async def _entry_data(self, index, first, last):
+        """Yield bytes ``first`` through ``last`` of an entry, checking that all of them came."""
+        entry = self.entries[index]
+        stream = await entry.open(first, last)
+        remaining = last - first + 1
+        while remaining:
+            chunk = await stream.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                raise exceptions.DownloadError(
+                    '{} ended {} bytes short of its listed size of {}'.format(
+                        entry.name, remaining, entry.size),
+                )
+            remaining -= len(chunk)
+            yield chunk
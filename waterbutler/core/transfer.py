@@ -0,0 +1,399 @@
+import abc
+import math
+import typing
+import asyncio
+import logging
+import threading
+import collections
+
+import aiohttp
+
+from waterbutler.core import utils
+from waterbutler.core import exceptions
+from waterbutler import settings as wb_settings
+from waterbutler.core.streams.base import CHUNK_SIZE, CutoffStream
+
+logger = logging.getLogger(__name__)
+
+# Status codes of provider errors worth fetching or uploading a part again for
+RETRYABLE_CODES = (408, 429)
+
+
+class MemoryBudget:
+    """Bytes of part data that the transfers of the whole process may hold in memory at once.
+    A part takes its size from the budget before its data is read and gives it back once the part
+    is uploaded, so concurrent copies share the budget rather than each getting one of their own.
+    Parts that don't fit wait in arrival order, or are sent without a buffer if they can
+    (see :meth:`try_acquire`).  Like the rate limiter's buckets, the budget is
+    shared by the tornado loop and the celery loops, so its state is only changed under a lock.
+
+    :param int limit: bytes the budget holds
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(limit, 1)
+        self.used = 0
+        self._lock = threading.Lock()
+        # ``(nbytes, loop, future)`` of the parts waiting for room, in arrival order
+        self._waiters = collections.deque()  # type: collections.deque
+
+    async def acquire(self, nbytes: int) -> int:
+        """Wait until ``nbytes`` fit in the budget and take them.  A part larger than the whole
+        budget takes all of it.
+
+        :returns: the bytes taken, to give back with :meth:`release`
+        """
+        nbytes = min(nbytes, self.limit)
+        loop = asyncio.get_event_loop()
+        with self._lock:
+            if not self._waiters and self.used + nbytes <= self.limit:
+                self.used += nbytes
+                return nbytes
+            waiter = (nbytes, loop, loop.create_future())
+            self._waiters.append(waiter)
+
+        try:
+            await waiter[2]
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove(waiter)
+                    granted = False
+                except ValueError:
+                    # Granted; a cancelled future gives its bytes back in `_grant`
+                    granted = waiter[2].done() and not waiter[2].cancelled()
+            if granted:
+                self.release(nbytes)
+            raise
+        return nbytes
+
+    def try_acquire(self, nbytes: int) -> typing.Optional[int]:
+        """Take ``nbytes`` if they fit in the budget right away, without waiting or jumping
+        ahead of the parts already waiting.
+
+        :returns: the bytes taken, to give back with :meth:`release`, or ``None`` if they didn't
+            fit
+        """
+        nbytes = min(nbytes, self.limit)
+        with self._lock:
+            if not self._waiters and self.used + nbytes <= self.limit:
+                self.used += nbytes
+                return nbytes
+        return None
+
+    def release(self, nbytes: int) -> None:
+        """Give back bytes taken with :meth:`acquire` and let waiting parts in."""
+        with self._lock:
+            self.used -= nbytes
+            while self._waiters and self.used + self._waiters[0][0] <= self.limit:
+                waiting, loop, future = self._waiters.popleft()
+                self.used += waiting
+                loop.call_soon_threadsafe(self._grant, waiting, future)
+
+    def _grant(self, nbytes: int, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release(nbytes)
+        else:
+            future.set_result(None)
+
+
+# The budget shared by every parallel copy and part upload in the process
+memory = MemoryBudget(wb_settings.TRANSFER_MEMORY)
+
+
+class PartUpload(metaclass=abc.ABCMeta):
+    """An upload to a destination provider made of separately uploaded parts, which may be sent
+    concurrently and in any order, e.g. an S3 multipart upload or an Azure block blob.  Returned
+    by :meth:`.BaseProvider.create_part_upload`.
+
+    :param int part_size: bytes in every part but the last
+    """
+
+    def __init__(self, part_size: int) -> None:
+        self.part_size = part_size
+
+    @abc.abstractmethod
+    async def upload_part(self, number: int, data: bytes) -> typing.Any:
+        """Upload part ``number`` (counting from one).  May be called again for the same part if
+        an attempt fails.
+
+        :returns: what :meth:`complete` needs to know about the part
+        """
+        raise NotImplementedError
+
+    async def upload_part_stream(self, number: int, stream, size: int) -> typing.Any:
+        """Upload part ``number`` from the next ``size`` bytes of ``stream`` as they are read,
+        without holding them in memory.  Called at most once per part, as the stream can't be
+        read again.  Uploads that can't send a stream read the part and pass it to
+        :meth:`upload_part`.
+
+        :returns: what :meth:`complete` needs to know about the part
+        """
+        return await self.upload_part(number, await _read_part(stream, size))
+
+    @abc.abstractmethod
+    async def complete(self, parts: list) -> typing.Tuple[typing.Any, bool]:
+        """Assemble the uploaded parts into the destination file.
+
+        :param list parts: what :meth:`upload_part` returned for each part, in order
+        :returns: the file's metadata, and whether it was created rather than overwritten
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def abort(self) -> None:
+        """Discard the parts uploaded so far."""
+        raise NotImplementedError
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, exceptions.WaterButlerError):
+        return exc.code >= 500 or exc.code in RETRYABLE_CODES
+    return False
+
+
+async def _with_retries(func: typing.Callable, number: int,
+                        what) -> typing.Tuple[typing.Any, int]:
+    """Await ``func()`` until it succeeds, retrying network errors and server-side statuses up to
+    ``PART_RETRIES`` times with jittered back-off.  Returns the result and the number of retries.
+    """
+    attempt = 0
+    while True:
+        try:
+            return (await func()), attempt
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if attempt >= wb_settings.PART_RETRIES or not _is_retryable(exc):
+                raise
+            logger.info('Retrying part {} of {} after {!r}'.format(number, what, exc))
+            await asyncio.sleep(utils.backoff_delay(attempt))
+            attempt += 1
+
+
+async def _fetch_range(src_provider, src_path, start: int, end: int, version=None) -> bytes:
+    stream = await src_provider.download(src_path, range=(start, end),
+                                         version=version, revision=version)
+    chunks, received, expected = [], 0, end - start + 1
+    try:
+        if stream.size not in (None, expected):
+            raise exceptions.DownloadError(
+                'Asked {} for bytes {}-{} of {}, got {} bytes'.format(
+                    src_provider.NAME, start, end, src_path, stream.size,
+                ),
+            )
+        while received <= expected:
+            chunk = await stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+    finally:
+        if hasattr(stream, 'response'):
+            # Don't leave the rest of an unexpected body on the connection
+            if not stream.at_eof():
+                stream.response.close()
+        elif callable(getattr(stream, 'close', None)):
+            stream.close()
+
+    if received != expected:
+        raise exceptions.DownloadError(
+            'Asked {} for bytes {}-{} of {}, got {} bytes'.format(
+                src_provider.NAME, start, end, src_path, received,
+            ),
+        )
+    return b''.join(chunks)
+
+
+async def parallel_copy(src_provider, src_path, upload: PartUpload, size: int,
+                        version=None) -> typing.Tuple[typing.Any, bool]:
+    """Copy ``size`` bytes from ``src_path`` into ``upload`` a part at a time.  Each part's byte
+    range is downloaded into memory and then uploaded, by up to ``PARALLEL_COPY_CONCURRENCY``
+    parts at once, fewer while the process-wide :data:`memory` budget is spent.  A part
+    that fails on a network error or a server-side status is downloaded and uploaded again, up
+    to ``PART_RETRIES`` times with jittered back-off.  If any part fails for good,
+    or the parts can't be assembled, the others are cancelled and the upload aborted.
+
+    :param src_provider: the provider to download from, which must honour ``range``
+    :param src_path: the file to copy
+    :param upload: the destination's :class:`PartUpload`
+    :param int size: the file's size in bytes
+    :param version: the version of the file to copy, if not the latest
+    :returns: what :meth:`PartUpload.complete` returns
+    """
+    part_size = upload.part_size
+    count = max(math.ceil(size / part_size), 1)
+    concurrency = max(min(wb_settings.PARALLEL_COPY_CONCURRENCY, count), 1)
+    parts = [None] * count  # type: typing.List[typing.Any]
+    numbers = iter(range(1, count + 1))
+    retries = 0
+
+    async def copy_part(number):
+        nonlocal retries
+        start = (number - 1) * part_size
+        end = min(start + part_size, size) - 1
+
+        async def attempt():
+            data = await _fetch_range(src_provider, src_path, start, end, version=version)
+            return await upload.upload_part(number, data)
+
+        held = await memory.acquire(end - start + 1)
+        try:
+            parts[number - 1], tries = await _with_retries(attempt, number, src_path)
+        finally:
+            memory.release(held)
+        retries += tries
+
+    async def worker():
+        # Parts are handed out in order, so the source is read roughly front to back
+        for number in numbers:
+            await copy_part(number)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*workers)
+        result = await upload.complete(parts)
+    except BaseException:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        try:
+            await upload.abort()
+        except Exception as exc:
+            logger.warning('Failed to abort the part upload of {}: {!r}'.format(src_path, exc))
+        raise
+
+    src_provider.provider_metrics.add('copy.parallel', {
+        'size': size,
+        'parts': count,
+        'part_size': part_size,
+        'concurrency': concurrency,
+        'retries': retries,
+    })
+    return result
+
+
+async def _read_part(stream, size: int) -> bytes:
+    chunks, received = [], 0
+    while received < size:
+        chunk = await stream.read(size - received)
+        if not chunk:
+            raise exceptions.UploadError(
+                'Expected {} more bytes of the upload, the stream ended'.format(size - received),
+                code=400,
+            )
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+class _StreamedPart(CutoffStream):
+    """The next ``size`` bytes of a stream being uploaded, sent as they are read.
+    ``read_through`` is resolved once all of them have been read, when the parts after it can
+    be read from the stream.
+    """
+
+    def __init__(self, stream, size: int) -> None:
+        super().__init__(stream, size)
+        self.read_through = asyncio.get_event_loop().create_future()
+        if not size:
+            self.read_through.set_result(None)
+
+    async def read(self, n=-1):
+        expected = self._cutoff - self._thus_far
+        if n >= 0:
+            expected = min(n, expected)
+        data = await super().read(expected)
+        if len(data) < expected:
+            raise exceptions.UploadError(
+                'Expected {} more bytes of the upload, the stream ended'.format(
+                    self._cutoff - self._thus_far,
+                ),
+                code=400,
+            )
+        if self._thus_far >= self._cutoff and not self.read_through.done():
+            self.read_through.set_result(None)
+        return data
+
+
+async def upload_stream(stream, upload: PartUpload, size: int) -> list:
+    """Upload ``size`` bytes of ``stream`` through ``upload`` a part at a time, up to
+    ``PART_UPLOAD_CONCURRENCY`` parts at once.  Parts are read from the stream in order.  While
+    another part of the upload is being sent, the next one is read ahead into a buffer taken
+    from the process-wide :data:`memory` budget, and uploaded once full.  A part that fails on
+    a network error or a server-side status is uploaded again from its buffer, up to
+    ``PART_RETRIES`` times, without restarting the upload.
+
+    A part with nothing to be read ahead of, or for which the budget has no room right away, is
+    instead sent as it is read from the stream (see :meth:`PartUpload.upload_part_stream`) and
+    can't be retried.  So a client that sends its body slowly holds no memory while it does,
+    and doesn't keep other transfers waiting for the budget.
+
+    If a part fails for good, the others are cancelled; completing or aborting the upload is
+    left to the caller.
+
+    :param stream: the stream to upload
+    :param upload: the destination's :class:`PartUpload`
+    :param int size: bytes to upload from ``stream``
+    :returns: what :meth:`PartUpload.upload_part` returned for each part, in order
+    """
+    part_size = upload.part_size
+    count = max(math.ceil(size / part_size), 1)
+    buffers = max(min(wb_settings.PART_UPLOAD_CONCURRENCY, count), 1)
+    free_buffers = asyncio.Semaphore(buffers)
+    parts = [None] * count  # type: typing.List[typing.Any]
+    tasks = []  # type: typing.List[asyncio.Future]
+
+    async def send_part(number, data):
+        parts[number - 1], _ = await _with_retries(
+            lambda: upload.upload_part(number, data), number, upload,
+        )
+
+    async def send_streamed_part(number, part_stream, part):
+        parts[number - 1] = await upload.upload_part_stream(number, part_stream, part)
+
+    def free_buffer(held):
+        memory.release(held)
+        free_buffers.release()
+
+    try:
+        for number in range(1, count + 1):
+            await free_buffers.acquire()
+            # Stop reading as soon as a part has failed for good
+            for task in tasks:
+                if task.done() and task.exception() is not None:
+                    raise task.exception()
+            part = min(part_size, size - (number - 1) * part_size)
+            held = None
+            if any(not task.done() for task in tasks):
+                held = memory.try_acquire(part)
+            if held is None:
+                part_stream = _StreamedPart(stream, part)
+                task = asyncio.ensure_future(send_streamed_part(number, part_stream, part))
+                task.add_done_callback(lambda _: free_buffers.release())
+                tasks.append(task)
+                # The next part starts where this one ends
+                await asyncio.wait([task, part_stream.read_through],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if task.done() and task.exception() is not None:
+                    raise task.exception()
+                continue
+            try:
+                data = await _read_part(stream, part)
+            except BaseException:
+                memory.release(held)
+                raise
+            task = asyncio.ensure_future(send_part(number, data))
+            # Also frees the buffer of a task cancelled before it started
+            task.add_done_callback(lambda _, held=held: free_buffer(held))
+            tasks.append(task)
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    return parts
@@ -1,21 +1,27 @@
 import re
 import json
 import pytz
+import random
 import asyncio
+import hashlib
 import logging
 import functools
+import collections
 import unicodedata
 import dateutil.parser
 from urllib import parse
 # from concurrent.futures import ProcessPoolExecutor  TODO Get this working
 
-import aiohttp
 import sentry_sdk
-from stevedore import driver
+from stevedore import driver, extension
 
 from waterbutler.core import exceptions
+from waterbutler.core import connections
+from waterbutler.core.cache import LRUCache
 from waterbutler.core.signing import Signer
-from waterbutler.core.streams import EmptyStream
+from waterbutler.core.streams import BaseStream, ByteStream, EmptyStream
+from waterbutler.core.streams import settings as streams_settings
+from waterbutler.core.streams.zip import ZipCRCStore
 from waterbutler.server import settings as server_settings
 
 logger = logging.getLogger(__name__)
@@ -23,31 +29,65 @@ logger = logging.getLogger(__name__)
 signer = Signer(server_settings.HMAC_SECRET, server_settings.HMAC_ALGORITHM)
 
 
-def make_provider(name: str, auth: dict, credentials: dict, settings: dict, **kwargs):
-    r"""Returns an instance of :class:`waterbutler.core.provider.BaseProvider`
+# Provider classes resolved from the `waterbutler.providers` entry points, keyed by name
+_PROVIDER_CLASSES = {}  # type: dict
 
-    :param str name: The name of the provider to instantiate. (s3, box, etc)
-    :param dict auth:
-    :param dict credentials:
-    :param dict settings:
-    :param dict \*\*kwargs: currently there to absorb ``callback_url``
 
-    :rtype: :class:`waterbutler.core.provider.BaseProvider`
+def get_provider_class(name: str):
+    """Returns the provider class registered under ``name`` in the ``waterbutler.providers`` entry
+    points.  Resolving an entry point scans every installed distribution and imports the plugin
+    module, so the result is cached and each provider is only looked up once per process.
+
+    :param str name: The name of the provider class to look up. (s3, box, etc)
+    :rtype: :class:`type`
+    :raises: :class:`waterbutler.core.exceptions.ProviderNotFound`
     """
+    try:
+        return _PROVIDER_CLASSES[name]
+    except KeyError:
+        pass
+
     try:
         manager = driver.DriverManager(
             namespace='waterbutler.providers',
             name=name,
-            invoke_on_load=True,
-            invoke_args=(auth, credentials, settings),
-            invoke_kwds=kwargs,
+            invoke_on_load=False,
         )
     except RuntimeError:
         raise exceptions.ProviderNotFound(name)
 
+    _PROVIDER_CLASSES[name] = manager.driver
     return manager.driver
 
 
+def load_provider_classes():
+    """Eagerly resolve and cache every provider class in the ``waterbutler.providers`` entry
+    points, so that the first request for each provider doesn't pay for the plugin import.
+    Providers that fail to load are logged and skipped; they will fail again in
+    :func:`make_provider` when requested.
+
+    :rtype: :class:`list` of the loaded provider names
+    """
+    manager = extension.ExtensionManager(namespace='waterbutler.providers', invoke_on_load=False)
+    for ext in manager.extensions:
+        _PROVIDER_CLASSES.setdefault(ext.name, ext.plugin)
+    return sorted(_PROVIDER_CLASSES)
+
+
+def make_provider(name: str, auth: dict, credentials: dict, settings: dict, **kwargs):
+    r"""Returns an instance of :class:`waterbutler.core.provider.BaseProvider`
+
+    :param str name: The name of the provider to instantiate. (s3, box, etc)
+    :param dict auth:
+    :param dict credentials:
+    :param dict settings:
+    :param dict \*\*kwargs: currently there to absorb ``callback_url``
+
+    :rtype: :class:`waterbutler.core.provider.BaseProvider`
+    """
+    return get_provider_class(name)(auth, credentials, settings, **kwargs)
+
+
 def as_task(func):
     if not asyncio.iscoroutinefunction(func):
         func = asyncio.coroutine(func)
@@ -59,6 +99,15 @@ def as_task(func):
     return wrapped
 
 
+def backoff_delay(attempt: int, base: float=1, cap: float=60) -> float:
+    """Seconds to wait before retry number ``attempt`` (counting from zero): exponential back-off
+    with full jitter, i.e. a random time between zero and ``base * 2 ** attempt``, capped at
+    ``cap``.  The jitter keeps the retries of many requests that failed together from hitting the
+    upstream together again.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
 def async_retry(retries=5, backoff=1, exceptions=(Exception, )):
 
     def _async_retry(func):
@@ -70,9 +119,9 @@ def async_retry(retries=5, backoff=1, exceptions=(Exception, )):
                 return await asyncio.coroutine(func)(*args, **kwargs)
             except exceptions as e:
                 if __retries < retries:
-                    wait_time = backoff * __retries
+                    wait_time = backoff_delay(__retries, backoff)
                     logger.warning('Task {0} failed with {1!r}, {2} / {3} retries. Waiting '
-                                   '{4} seconds before retrying'.format(func, e, __retries,
+                                   '{4:.1f} seconds before retrying'.format(func, e, __retries,
                                                                         retries, wait_time))
                     await asyncio.sleep(wait_time)
                     return await wrapped(*args, __retries=__retries + 1, **kwargs)
@@ -105,7 +154,7 @@ async def send_signed_request(method, url, payload):
 
     message, signature = signer.sign_payload(payload)
 
-    async with aiohttp.request(
+    async with connections.service_pool.request(
             method,
             url,
             data=json.dumps({
@@ -184,33 +233,304 @@ def make_disposition(filename):
 
 
 class ZipStreamGenerator:
+    """Yields a ``(name, stream, content type)`` tuple for every file and empty folder under
+    ``parent_path``, for :class:`.ZipStreamReader` to compress.  The content type comes from the
+    file's metadata and may be ``None``.
+
+    Downloads are prefetched.  Up to ``STREAMS_CONFIG.ZIP_PREFETCH_CONCURRENCY`` upcoming entries
+    are kept in a window, and those that fit in what is left of ``ZIP_PREFETCH_BUFFER_SIZE`` are
+    downloaded into memory concurrently while the current one is being compressed, so a folder of
+    many small files doesn't cost one round trip per file.  Larger files and files of unknown size
+    are only downloaded once they are reached.
+
+    Folders are listed ahead of time as well, up to ``ZIP_LIST_CONCURRENCY`` at once.  Providers
+    that can list a whole tree in one go (see :meth:`.BaseProvider.folder_tree`) are asked for
+    every subfolder's contents at once instead.  Entries are yielded breadth first, in the order
+    they are listed in, whichever listing or download finishes first.
+    """
+
     def __init__(self, provider, parent_path, *metadata_objs):
         self.provider = provider
         self.parent_path = parent_path
-        self.remaining = [
-            (parent_path, metadata)
-            for metadata in metadata_objs
-        ]
+        # Items still to be visited as (path, metadata, listing task) tuples.  The listing task of
+        # a folder is started as soon as the folder is queued.
+        self.remaining = collections.deque()  # type: collections.deque
+        self.listing_slots = asyncio.Semaphore(max(streams_settings.ZIP_LIST_CONCURRENCY, 1))
+        self._enqueue(parent_path, metadata_objs)
+        # Entries listed but not yet added to the window, as (name, path, metadata) tuples
+        self.listed = collections.deque()  # type: collections.deque
+        # Upcoming entries as (name, path, content type, prefetch task, bytes reserved) tuples
+        self.window = collections.deque()  # type: collections.deque
+        self.buffered = 0
 
     async def __aiter__(self):
         return self
 
     async def __anext__(self):
-        if not self.remaining:
+        await self._fill_window()
+        if not self.window:
             raise StopAsyncIteration
-        current = self.remaining.pop(0)
-        path = self.provider.path_from_metadata(*current)
-        if path.is_dir:
-            items = await self.provider.metadata(path)
-            if items:
-                self.remaining.extend([
-                    (path, item) for item in items
-                ])
-                return await self.__anext__()
+
+        name, path, content_type, prefetch, reserved = self.window.popleft()
+        try:
+            if prefetch is not None:
+                stream = await prefetch
+            elif path is None:
+                stream = EmptyStream()
             else:
-                return path.path.replace(self.parent_path.path, '', 1), EmptyStream()
+                stream = await self.provider.download(path)
+        except BaseException:
+            self.close()
+            raise
+        finally:
+            self.buffered -= reserved
+
+        # Get the next downloads going before this entry is compressed
+        await self._fill_window()
+        return name, stream, content_type
+
+    def close(self):
+        """Cancel the listings and downloads still running."""
+        for _, _, _, prefetch, _ in self.window:
+            if prefetch is not None:
+                prefetch.cancel()
+        for _, _, listing in self.remaining:
+            if listing is not None:
+                listing.cancel()
+        self.window.clear()
+        self.remaining.clear()
+        self.listed.clear()
+        self.buffered = 0
+
+    async def _fill_window(self):
+        while len(self.window) < max(streams_settings.ZIP_PREFETCH_CONCURRENCY, 1):
+            entry = await self._next_entry()
+            if entry is None:
+                return
+
+            name, path, metadata = entry
+            size = getattr(metadata, 'size_as_int', None)
+            prefetch, reserved = None, 0
+            budget = streams_settings.ZIP_PREFETCH_BUFFER_SIZE - self.buffered
+            if (path is not None and streams_settings.ZIP_PREFETCH_CONCURRENCY > 1 and
+                    size is not None and size <= budget):
+                prefetch, reserved = asyncio.ensure_future(self._prefetch(path, size)), size
+                self.buffered += size
+            self.window.append((name, path, _content_type(metadata), prefetch, reserved))
+
+    async def list_entries(self):
+        """List everything the archive would hold without downloading any of it.  Returns
+        ``(name, path, metadata)`` tuples, in the order they would be yielded in; ``path`` and
+        ``metadata`` are ``None`` for empty folders.
+        """
+        entries = []
+        while True:
+            entry = await self._next_entry()
+            if entry is None:
+                return entries
+            entries.append(entry)
+
+    async def _next_entry(self):
+        """Return ``(name, path, metadata)`` for the next file, ``(name, None, None)`` for the
+        next empty folder, or ``None`` once everything has been listed.
+        """
+        while not self.listed and self.remaining:
+            path, metadata, listing = self.remaining.popleft()
+            if listing is None:
+                self.listed.append((self._name(path), path, metadata))
+                continue
+
+            items, complete = await listing
+            if not items:
+                self.listed.append((self._name(path), None, None))
+            elif not complete:
+                self._enqueue(path, [item for _, item in items])
+            else:
+                # A whole tree: folders with something in them needn't be listed
+                nonempty = {str(item_parent) for item_parent, _ in items}
+                for item_parent, item in items:
+                    item_path = self.provider.path_from_metadata(item_parent, item)
+                    if not item_path.is_dir:
+                        self.listed.append((self._name(item_path), item_path, item))
+                    elif str(item_path) not in nonempty:
+                        self.listed.append((self._name(item_path), None, None))
+
+        return self.listed.popleft() if self.listed else None
+
+    def _name(self, path):
+        return path.path.replace(self.parent_path.path, '', 1)
+
+    def _enqueue(self, parent, items):
+        for item in items:
+            path = self.provider.path_from_metadata(parent, item)
+            listing = asyncio.ensure_future(self._list(path)) if path.is_dir else None
+            self.remaining.append((path, item, listing))
+
+    async def _list(self, path):
+        """List a folder.  Returns ``(items, complete)``, where ``items`` are ``(parent path,
+        metadata)`` tuples and ``complete`` tells whether they include all of the folder's
+        descendants or just its children.
+        """
+        async with self.listing_slots:
+            tree = await self.provider.folder_tree(path)
+            if tree is not None:
+                return tree, True
+            return [(path, item) for item in await self.provider.metadata(path)], False
+
+    async def _prefetch(self, path, limit):
+        """Download a file into memory, reading no more than the ``limit`` bytes reserved for
+        it.  Listings can under-report sizes, so if there is more to the file than that, the rest
+        is left in the download and read once the file is compressed.
+        """
+        stream = await self.provider.download(path)
+        parts = []
+        remaining = limit
+        while remaining > 0:
+            chunk = await stream.read(min(remaining, server_settings.CHUNK_SIZE))
+            if not chunk:
+                return ByteStream(b''.join(parts))
+            parts.append(bytes(chunk))
+            remaining -= len(chunk)
+        if stream.at_eof():
+            return ByteStream(b''.join(parts))
+        return _PrefetchedStream(b''.join(parts), stream)
+
+
+class _PrefetchedStream(BaseStream):
+    """The part of a download :class:`ZipStreamGenerator` read ahead, followed by the rest of
+    the download.
+    """
+
+    def __init__(self, head, stream):
+        super().__init__()
+        self._head = memoryview(head)
+        self.stream = stream
+
+    @property
+    def size(self):
+        return getattr(self.stream, 'size', None)
+
+    def at_eof(self):
+        return not self._head and self.stream.at_eof()
+
+    async def _read(self, n=-1):
+        if not self._head:
+            return await self.stream.read(n)
+        if n < 0:
+            head, self._head = self._head, memoryview(b'')
+            return bytes(head) + await self.stream.read()
+        head, self._head = self._head[:n], self._head[n:]
+        return bytes(head)
+
+
+def _metadata_attr(metadata, name):
+    """``getattr`` for metadata properties that some providers don't implement, or that fail for
+    some files.
+    """
+    try:
+        return getattr(metadata, name)
+    except (AttributeError, KeyError, TypeError, ValueError, NotImplementedError):
+        return None
 
-        return path.path.replace(self.parent_path.path, '', 1), await self.provider.download(path)
+
+def _content_type(metadata):
+    return _metadata_attr(metadata, 'content_type')
+
+
+def _zip_date_time(metadata):
+    """The modification time of a zip entry, from its metadata.  Zip can only hold times from
+    1980 to 2107, anything else, or no time at all, is written as the start of 1980.
+    """
+    modified = _metadata_attr(metadata, 'modified_utc')
+    if modified:
+        try:
+            date_time = tuple(dateutil.parser.parse(modified).timetuple()[:6])
+        except (ValueError, OverflowError):
+            pass
+        else:
+            if 1980 <= date_time[0] <= 2107:
+                return date_time
+    return (1980, 1, 1, 0, 0, 0)
+
+
+# CRC-32s of files sent in stored zip archives, see StoredZipEntry
+stored_zip_crcs = LRUCache('stored_zip_crcs', max_size=streams_settings.ZIP_STORE_CRC_CACHE_SIZE)
+
+_stored_zip_crc_store = None
+
+
+def get_stored_zip_crc_store():
+    """The process's :class:`.ZipCRCStore`, or ``None`` if ``STREAMS_CONFIG.ZIP_STORE_CRC_DIR``
+    is empty.
+    """
+    global _stored_zip_crc_store
+    if _stored_zip_crc_store is None and streams_settings.ZIP_STORE_CRC_DIR:
+        _stored_zip_crc_store = ZipCRCStore(streams_settings.ZIP_STORE_CRC_DIR,
+                                            streams_settings.ZIP_STORE_CRC_MAX_AGE)
+    return _stored_zip_crc_store
+
+
+class StoredZipEntry:
+    """A file or empty folder in a :class:`.StoredZipStreamReader`, downloaded from ``provider``.
+
+    The file's CRC-32 is remembered in ``stored_zip_crcs`` once known, so resuming the archive
+    later in this process doesn't mean hashing the file again.  It is keyed by ``crc_key``, made
+    of the provider's name and settings, the path, and the size, etag and modification time from
+    the metadata, which the archive's :class:`.ZipCRCStore` keeps it under for other processes.
+    Files with neither an etag nor a modification time have no key and aren't remembered, as
+    there'd be no telling if they'd changed.
+
+    :param provider: the provider to download the file from
+    :param str name: the entry's name in the archive
+    :param path: the file's path, ``None`` for an empty folder
+    :param metadata: the file's metadata, ``None`` for an empty folder
+    """
+
+    def __init__(self, provider, name, path=None, metadata=None):
+        self.provider = provider
+        self.name = name
+        self.path = path
+        self.size = 0 if metadata is None else metadata.size_as_int
+        self.date_time = _zip_date_time(metadata)
+        self.version = _metadata_attr(metadata, 'etag')
+
+        modified = _metadata_attr(metadata, 'modified_utc')
+        self.crc_key = None
+        if path is not None and (self.version or modified):
+            self.crc_key = hashlib.sha256(json.dumps(
+                [provider.NAME, provider.settings, str(path), self.size, self.version, modified],
+                sort_keys=True, default=str,
+            ).encode('utf-8')).hexdigest()
+        self._crc = stored_zip_crcs.get(self.crc_key) if self.crc_key else None
+
+    @property
+    def crc(self):
+        return 0 if self.path is None else self._crc
+
+    @crc.setter
+    def crc(self, value):
+        self._crc = value
+        if self.crc_key:
+            stored_zip_crcs.set(self.crc_key, value)
+
+    async def open(self, start, end):
+        """Download bytes ``start`` through ``end`` of the file.  Providers that don't support
+        ranges send the whole file, in which case the bytes before ``start`` are skipped here.
+        """
+        stream = await self.provider.download(self.path, range=(start, end))
+        length = end - start + 1
+        ranged = getattr(stream, 'partial', False) or (
+            getattr(stream, 'size', None) == length and length != self.size
+        )
+        remaining = 0 if ranged else start
+        while remaining:
+            chunk = await stream.read(min(remaining, server_settings.CHUNK_SIZE))
+            if not chunk:
+                raise exceptions.DownloadError(
+                    '{} ended before byte {}'.format(self.name, start)
+                )
+            remaining -= len(chunk)
+        return stream
 
 
 class RequestHandlerContext:
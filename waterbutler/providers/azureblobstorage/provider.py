@@ -23,6 +23,7 @@ from waterbutler.core import streams
 from waterbutler.core import provider
 from waterbutler.core import exceptions
 from waterbutler.core.path import WaterButlerPath
+from waterbutler.core.transfer import PartUpload
 from waterbutler.core.streams import StringStream, ByteStream
 
 from waterbutler.providers.azureblobstorage.metadata import AzureBlobStorageFileMetadata
@@ -32,6 +33,7 @@ from waterbutler.providers.azureblobstorage.metadata import AzureBlobStorageFile
 MAX_UPLOAD_BLOCK_SIZE = 4 * 1024 * 1024  # 4MB
 MAX_UPLOAD_ONCE_SIZE = 64 * 1024 * 1024  # 64MB
 UPLOAD_PARALLEL_NUM = 2  # must be more than 1
+MAX_UPLOAD_BLOCKS = 50000
 
 
 class _Request(object):
@@ -69,6 +71,31 @@ def _update_request(request):
     request.path = url_quote(request.path, '/()$=\',~')
 
 
+class AzureBlobStorageBlockUpload(PartUpload):
+    """A block blob whose blocks are uploaded by :func:`.transfer.parallel_copy`.  Blocks that are
+    never committed are discarded by Azure a week later, so there is nothing to abort.
+    """
+
+    def __init__(self, provider, path, exists, block_id_prefix):
+        super().__init__(MAX_UPLOAD_BLOCK_SIZE)
+        self.provider = provider
+        self.path = path
+        self.exists = exists
+        self.block_id_prefix = block_id_prefix
+
+    async def upload_part(self, number, data):
+        block_id = self.provider._format_block_id(self.block_id_prefix, number - 1)
+        await self.provider._put_block(ByteStream(data), self.path, block_id)
+        return block_id
+
+    async def complete(self, parts):
+        await self.provider._put_block_list(self.path, parts)
+        return (await self.provider.metadata(self.path)), not self.exists
+
+    async def abort(self):
+        pass
+
+
 class AzureBlobStorageProvider(provider.BaseProvider):
     """Provider for Azure Blob Storage cloud storage service.
     """
@@ -103,7 +130,6 @@ class AzureBlobStorageProvider(provider.BaseProvider):
         hosts = self._get_host_locations(primary, secondary)
         return list(map(lambda h: "https://" + h + path, hosts))
 
-    @provider.throttle()
     async def make_signed_request(self, method, urls, *args, **kwargs):
         kwargs['headers'] = self.build_headers(**kwargs.get('headers', {}))
         retry = _retry = kwargs.pop('retry', 2)
@@ -120,10 +146,15 @@ class AzureBlobStorageProvider(provider.BaseProvider):
         _add_date_header(httpreq)
         self.connection.authentication.sign_request(httpreq)
 
+        bucket = self.rate_limit_bucket(urls[0])
         target_url = 0
         while retry >= 0:
+            if bucket is not None:
+                await bucket.acquire()
             try:
                 response = await aiohttp.request(method, urls[target_url % len(urls)], *args, **kwargs).__aenter__()
+                if bucket is not None:
+                    bucket.observe(response.status, response.headers)
                 if expects and response.status not in expects:
                     raise (await exceptions.exception_from_response(response, error=throws, **kwargs))
                 return response
@@ -183,6 +214,20 @@ class AzureBlobStorageProvider(provider.BaseProvider):
         # Not supported
         return False
 
+    def can_upload_parts(self):
+        return True
+
+    async def create_part_upload(self, path, size):
+        """Start a block blob for :func:`.transfer.parallel_copy`, for files that :meth:`upload`
+        wouldn't send at once and that fit in ``MAX_UPLOAD_BLOCKS`` blocks.
+        """
+        if size <= MAX_UPLOAD_ONCE_SIZE or size > MAX_UPLOAD_BLOCK_SIZE * MAX_UPLOAD_BLOCKS:
+            return None
+
+        path, exists = await self.handle_name_conflict(path, conflict='replace')
+        assert not path.path.startswith('/')
+        return AzureBlobStorageBlockUpload(self, path, exists, str(uuid.uuid4()))
+
     async def intra_copy(self, dest_provider, source_path, dest_path):
         # Not supported
         raise NotImplementedError()
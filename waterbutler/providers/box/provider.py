@@ -29,6 +29,8 @@ class BoxProvider(provider.BaseProvider):
 
     NAME = 'box'
     BASE_URL = pd_settings.BASE_URL
+    RATE_LIMIT = (pd_settings.RATE_LIMIT_RATE, pd_settings.RATE_LIMIT_BURST)
+    RATE_LIMIT_PER_CREDENTIAL = True
     NONCHUNKED_UPLOAD_LIMIT = pd_settings.NONCHUNKED_UPLOAD_LIMIT  # 50MB default
     TEMP_CHUNK_SIZE = pd_settings.TEMP_CHUNK_SIZE  # 32KiB default
     UPLOAD_COMMIT_RETRIES = pd_settings.UPLOAD_COMMIT_RETRIES
@@ -12,3 +12,8 @@ TEMP_CHUNK_SIZE = int(config.get('TEMP_CHUNK_SIZE', 32 * 1024))  # 32KiB
 
 # Number of times to retry upload commits before giving up
 UPLOAD_COMMIT_RETRIES = int(config.get('UPLOAD_COMMIT_RETRIES', 10))
+
+# Budget for the shared per-credential token bucket in `BaseProvider.make_request`.  Box allows
+# 1,000 API calls per minute per user.
+RATE_LIMIT_RATE = float(config.get('RATE_LIMIT_RATE', 1000 / 60))  # requests per second
+RATE_LIMIT_BURST = int(config.get('RATE_LIMIT_BURST', 40))
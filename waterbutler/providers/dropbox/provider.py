@@ -58,6 +58,8 @@ class DropboxProvider(provider.BaseProvider):
     """
     NAME = 'dropbox'
     BASE_URL = pd_settings.BASE_URL
+    RATE_LIMIT = (pd_settings.RATE_LIMIT_RATE, pd_settings.RATE_LIMIT_BURST)
+    RATE_LIMIT_PER_CREDENTIAL = True
     CONTIGUOUS_UPLOAD_SIZE_LIMIT = pd_settings.CONTIGUOUS_UPLOAD_SIZE_LIMIT
     CHUNK_SIZE = pd_settings.CHUNK_SIZE
     FORCE_RETRY_ON = {429}
@@ -616,6 +618,31 @@ class DropboxProvider(provider.BaseProvider):
 
         return DropboxFileMetadata(data, self.folder, self.NAME)
 
+    async def folder_tree(self, path: WaterButlerPath):  # type: ignore
+        """List the folder ``path`` with ``recursive`` set, which pages through everything below
+        it instead of just its children.
+        """
+        url = self.build_url('files', 'list_folder')
+        body = {'path': path.full_path.rstrip('/'), 'recursive': True}
+
+        items = []  # type: typing.List[BaseDropboxMetadata]
+        page_count = 0
+        while True:
+            page_count += 1
+            data = await self.dropbox_request(url, body, throws=core_exceptions.MetadataError)
+            for entry in data['entries']:
+                if entry['.tag'] == 'folder':
+                    items.append(DropboxFolderMetadata(entry, self.folder, self.NAME))
+                elif entry['.tag'] == 'file':
+                    items.append(DropboxFileMetadata(entry, self.folder, self.NAME))
+            if not data['has_more']:
+                break
+            url = self.build_url('files', 'list_folder', 'continue')
+            body = {'cursor': data['cursor']}
+
+        self.metrics.add('folder_tree.pages', page_count)
+        return self._folder_tree_entries(path, items)
+
     async def revisions(self, path: WaterButlerPath, **kwargs) -> typing.List[DropboxRevision]:
         # Dropbox v2 API limits the number of revisions returned to a maximum
         # of 100, default 10. Previously we had set the limit to 250.
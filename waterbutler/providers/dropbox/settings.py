@@ -15,3 +15,8 @@ CHUNK_SIZE = int(config.get('CHUNK_SIZE', 4000000))  # 4 MB
 # Specify usage for `DropboxProvider.dropbox_request()` and `BaseProvider.make_request()` usages
 # in the DropboxProvider and DropboxBusinessProvider
 RETRY = 5
+
+# Budget for the shared per-credential token bucket in `BaseProvider.make_request`.  Dropbox doesn't
+# publish its limits but answers bursts with 429 and a Retry-After header, which the bucket follows.
+RATE_LIMIT_RATE = float(config.get('RATE_LIMIT_RATE', 10))  # requests per second
+RATE_LIMIT_BURST = int(config.get('RATE_LIMIT_BURST', 20))
@@ -1,5 +1,6 @@
 import os
 import shutil
+import asyncio
 import logging
 import datetime
 import mimetypes
@@ -7,6 +8,7 @@ from typing import Tuple, Union
 
 from waterbutler.core import exceptions, provider
 from waterbutler.core.path import WaterButlerPath
+from waterbutler.core.streams.file import run_file_io
 from waterbutler.core.streams import FileStreamReader, PartialFileStreamReader
 
 from waterbutler.providers.filesystem import settings as pd_settings
@@ -46,6 +48,9 @@ class FileSystemProvider(provider.BaseProvider):
     def can_duplicate_names(self):
         return False
 
+    def can_download_ranges(self):
+        return True
+
     async def intra_copy(self, dest_provider, src_path, dest_path):
         exists = await self.exists(dest_path)
         shutil.copy(src_path.full_path, dest_path.full_path)
@@ -71,11 +76,20 @@ class FileSystemProvider(provider.BaseProvider):
 
         os.makedirs(os.path.split(path.full_path)[0], exist_ok=True)
 
+        # Writes go to the file I/O threads so a slow disk doesn't stall the event loop.  The next
+        # chunk is read from the client while the previous one is being written.
         with open(path.full_path, 'wb') as file_pointer:
-            chunk = await stream.read(pd_settings.CHUNK_SIZE)
-            while chunk:
-                file_pointer.write(chunk)
+            write = None
+            try:
                 chunk = await stream.read(pd_settings.CHUNK_SIZE)
+                while chunk:
+                    if write is not None:
+                        await write
+                    write = asyncio.ensure_future(run_file_io(file_pointer.write, chunk))
+                    chunk = await stream.read(pd_settings.CHUNK_SIZE)
+            finally:
+                if write is not None:
+                    await write
 
         metadata = await self.metadata(path)
         return metadata, created
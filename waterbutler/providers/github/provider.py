@@ -7,6 +7,7 @@ import hashlib
 import logging
 from typing import Tuple
 from http import HTTPStatus
+from urllib import parse
 
 import furl
 from aiohttp.client import ClientResponse
@@ -14,6 +15,7 @@ from aiohttp.client import ClientResponse
 from waterbutler.providers.github.path import GitHubPath
 from waterbutler.core import streams, provider, exceptions
 from waterbutler.providers.github import settings as pd_settings
+from waterbutler.providers.github.tree_index import TreeIndex, tree_indexes
 from waterbutler.providers.github.metadata import (GitHubRevision,
                                                    GitHubFileTreeMetadata,
                                                    GitHubFolderTreeMetadata,
@@ -112,6 +114,9 @@ class GitHubProvider(provider.BaseProvider):
         self.repo = self.settings['repo']
         self.metrics.add('repo', {'repo': self.repo, 'owner': self.owner})
 
+        # Root tree SHA of each ref validated by this provider, so later calls can use its index
+        self._tree_shas = {}  # type: dict
+
         # debugging parameters
         self._my_id = uuid.uuid4()
         self._request_count = 0
@@ -132,6 +137,13 @@ class GitHubProvider(provider.BaseProvider):
         # API response header "X-RateLimiting-Reset".
         self.rl_reset = 0
 
+    def rate_limit_bucket(self, url):
+        """GitHub requests are paced by the provider's own ``RL_*`` limiter below, which spends the
+        user's hourly budget as GitHub reports it and keeps a reserve for their other requests.  A
+        shared token bucket on top of it would only hold requests back further.
+        """
+        return None
+
     async def make_request(self, method: str, url: str, *args, **kwargs) -> ClientResponse:
         """Wrap the parent `make_request()` to handle GH rate limiting.  Only requests handled by
         WB Celery are affected.
@@ -247,6 +259,7 @@ class GitHubProvider(provider.BaseProvider):
         else:
             commit_data = await self._fetch_commit(ref)
             tree_sha = commit_data['tree']['sha']
+        self._tree_shas[ref] = tree_sha
 
         # throws Not Found if path not in tree
         await self._search_tree_for_path(path, tree_sha)
@@ -450,6 +463,48 @@ class GitHubProvider(provider.BaseProvider):
         else:
             return (await self._metadata_file(path, **kwargs))
 
+    async def folder_tree(self, path: GitHubPath):  # type: ignore
+        """Fetch the recursive tree of the folder ``path`` in one request.  Returns ``None`` if
+        GitHub truncated the tree, so that the caller falls back to listing each folder.  If the
+        ref's root tree was looked up while validating the path, the folder's entries are taken
+        from its cached index instead.
+        """
+        ref = path.branch_ref
+        if ref in self._tree_shas:
+            index = await self._fetch_tree_index(self._tree_shas[ref])
+            items = []
+            for entry in index.subtree(path.path):
+                if entry['type'] == 'tree':
+                    items.append(GitHubFolderTreeMetadata(entry, ref=ref))
+                elif entry['type'] == 'blob':
+                    items.append(GitHubFileTreeMetadata(entry, ref=ref))
+            return self._folder_tree_entries(path, items)
+
+        # Branch names may hold any of "#?%/", so the ref is quoted whole
+        resp = await self.make_request(
+            'GET',
+            self.build_repo_url('git', 'trees') + '/{}:{}?recursive=1'.format(
+                parse.quote(ref, safe=''), parse.quote(path.path.rstrip('/'))
+            ),
+            expects=(200, ),
+            throws=exceptions.MetadataError
+        )
+        tree = await resp.json()
+
+        if tree['truncated']:
+            return None
+
+        items = []
+        for entry in tree['tree']:
+            # Entry paths are relative to the folder's tree
+            entry = dict(entry, path=path.path + entry['path'])
+            if entry['type'] == 'tree':
+                items.append(GitHubFolderTreeMetadata(entry, ref=ref))
+            elif entry['type'] == 'blob':
+                items.append(GitHubFileTreeMetadata(entry, ref=ref))
+
+        return self._folder_tree_entries(path, items)
+
     async def revisions(self, path, **kwargs):
         resp = await self.make_request(
             'GET',
@@ -743,18 +798,32 @@ class GitHubProvider(provider.BaseProvider):
 
         return tree
 
+    async def _fetch_tree_index(self, tree_sha):
+        """Get the :class:`.TreeIndex` of the recursive tree ``tree_sha``, from the process-wide
+        cache if it's there.  Only trees named by a full SHA are cached, as other refs can move.
+        """
+        cacheable = self._looks_like_sha(tree_sha)
+        if cacheable:
+            index = tree_indexes.get(tree_sha)
+            if index is not None:
+                return index
+
+        index = TreeIndex((await self._fetch_tree(tree_sha, recursive=True))['tree'])
+        if cacheable:
+            tree_indexes.set(tree_sha, index)
+        return index
+
     async def _search_tree_for_path(self, path, tree_sha, recursive=True):
         """Search through the given tree for an entity matching the name and type of `path`.
         """
-        tree = await self._fetch_tree(tree_sha, recursive=True)
+        index = await self._fetch_tree_index(tree_sha)
 
         implicit_type = 'tree' if path.endswith('/') else 'blob'
 
-        for entity in tree['tree']:
-            if entity['path'] == path.strip('/') and entity['type'] == implicit_type:
-                return entity
-
-        raise exceptions.NotFoundError(str(path))
+        entity = index.get(path.strip('/'), type=implicit_type)
+        if entity is None:
+            raise exceptions.NotFoundError(str(path))
+        return entity
 
     async def _create_tree(self, tree):
         resp = await self.make_request(
@@ -853,14 +922,10 @@ class GitHubProvider(provider.BaseProvider):
             raise exceptions.NotFoundError(str(path))
 
         latest = commits[0]
-        tree = await self._fetch_tree(latest['commit']['tree']['sha'], recursive=True)
+        index = await self._fetch_tree_index(latest['commit']['tree']['sha'])
 
-        try:
-            data = next(
-                x for x in tree['tree']
-                if x['path'] == path.path
-            )
-        except StopIteration:
+        data = index.get(path.path)
+        if data is None:
             raise exceptions.NotFoundError(str(path))
 
         return GitHubFileTreeMetadata(
@@ -28,6 +28,13 @@ DELETE_FOLDER_MESSAGE = config.get('DELETE_FOLDER_MESSAGE', 'Folder deleted on b
 GITHUB_SHA_LENGTHS = [int(x) for x in config.get('GITHUB_SHA_LENGTHS', '40').split(' ')]
 
 
+# Process-wide cache of the indexes of recursive git trees, by tree SHA.  Trees never change, so
+# entries don't expire; the cache is bounded by the number of trees and their estimated memory.
+tree_index_cache_config = config.child('TREE_INDEX_CACHE')
+TREE_INDEX_CACHE_MAX_SIZE = int(tree_index_cache_config.get('MAX_SIZE', 1024))  # trees
+TREE_INDEX_CACHE_MAX_BYTES = int(tree_index_cache_config.get('MAX_BYTES', 128 * 1024 * 1024))  # 128MB
+
+
 # Config For GitHub Rate Limiting
 #
 # The time in seconds to wait before making another attempt to add more tokens
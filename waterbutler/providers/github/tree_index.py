@@ -0,0 +1,85 @@
+"""Indexes of GitHub's recursive git trees, cached for the whole process.
+
+A git tree is named by the SHA of its content, so the tree behind a SHA never changes and its
+index can be shared by every request and every provider instance without ever going stale.  Only
+tree SHAs that an authorized request for the repo returned (from a branch, commit or commit list)
+are looked up, so sharing the cache doesn't let a request see trees it couldn't fetch itself.
+"""
+import sys
+import bisect
+
+from waterbutler.core.cache import LRUCache
+from waterbutler.providers.github import settings
+
+# Estimated bytes of a dict slot, a list slot and an entry tuple, beyond the strings they hold
+ENTRY_OVERHEAD = 100 + 8 + sys.getsizeof((None, None, None, None))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class TreeIndex:
+    """The entries of a recursive git tree, by path.  Each entry keeps only its type, mode, SHA
+    and size (for blobs), and the paths are also kept sorted, so that the entries under a folder
+    are a contiguous slice.
+
+    :param list tree: the ``tree`` list of a recursive tree response
+    """
+
+    __slots__ = ('_entries', '_paths', 'nbytes')
+
+    def __init__(self, tree: list) -> None:
+        # Types and modes repeat throughout the tree, so they share one string each
+        self._entries = {
+            entry['path']: (sys.intern(entry['type']), _intern(entry.get('mode')), entry['sha'],
+                            entry.get('size'))
+            for entry in tree
+        }
+        self._paths = sorted(self._entries)
+        # An estimate of the memory the index holds, to bound the cache by
+        self.nbytes = sys.getsizeof(self._entries) + sys.getsizeof(self._paths) + sum(
+            sys.getsizeof(path) + sys.getsizeof(sha) + ENTRY_OVERHEAD
+            for path, (_, _, sha, _) in self._entries.items()
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path: str, type: str=None) -> dict:
+        """The tree entry at ``path`` (without leading or trailing slashes) in the form GitHub
+        returns it, or ``None`` if there isn't one of the given ``type`` ('blob' or 'tree').
+        """
+        try:
+            entry_type, mode, sha, size = self._entries[path]
+        except KeyError:
+            return None
+        if type is not None and entry_type != type:
+            return None
+        return self._entry(path, entry_type, mode, sha, size)
+
+    def subtree(self, folder: str) -> list:
+        """Every entry under ``folder`` (a path ending in a slash, or ``''`` for the whole tree),
+        with paths from the root of the tree, in path order.
+        """
+        entries = []
+        for position in range(bisect.bisect_left(self._paths, folder), len(self._paths)):
+            path = self._paths[position]
+            if not path.startswith(folder):
+                break
+            entries.append(self._entry(path, *self._entries[path]))
+        return entries
+
+    @staticmethod
+    def _entry(path, entry_type, mode, sha, size):
+        entry = {'path': path, 'type': entry_type, 'sha': sha}
+        if mode is not None:
+            entry['mode'] = mode
+        if size is not None:
+            entry['size'] = size
+        return entry
+
+
+tree_indexes = LRUCache('github_tree_indexes', max_size=settings.TREE_INDEX_CACHE_MAX_SIZE,
+                        max_weight=settings.TREE_INDEX_CACHE_MAX_BYTES,
+                        weigh=lambda index: index.nbytes)
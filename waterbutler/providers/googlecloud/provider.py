@@ -324,6 +324,9 @@ class GoogleCloudProvider(BaseProvider):
 
         return self.can_intra_copy(other, path)
 
+    def can_download_ranges(self) -> bool:
+        return True
+
     def can_duplicate_names(self):
         """Google Cloud Storage allows a file and a folder to share the same name.
         """
@@ -72,6 +72,8 @@ class GoogleDriveProvider(provider.BaseProvider):
     """
     NAME = 'googledrive'
     BASE_URL = pd_settings.BASE_URL
+    RATE_LIMIT = (pd_settings.RATE_LIMIT_RATE, pd_settings.RATE_LIMIT_BURST)
+    RATE_LIMIT_PER_CREDENTIAL = True
     FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
 
     # https://developers.google.com/drive/v2/web/about-permissions#roles
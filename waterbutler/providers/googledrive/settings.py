@@ -6,3 +6,8 @@ config = settings.child('GOOGLEDRIVE_PROVIDER_CONFIG')
 BASE_URL = config.get('BASE_URL', 'https://www.googleapis.com/drive/v2')
 BASE_UPLOAD_URL = config.get('BASE_UPLOAD_URL', 'https://www.googleapis.com/upload/drive/v2')
 DRIVE_IGNORE_VERSION = config.get('DRIVE_IGNORE_VERSION', '0000000000000000000000000000000000000')
+
+# Budget for the shared per-credential token bucket in `BaseProvider.make_request`.  The Drive API
+# allows 1,000 queries per 100 seconds per user by default.
+RATE_LIMIT_RATE = float(config.get('RATE_LIMIT_RATE', 10))  # requests per second
+RATE_LIMIT_BURST = int(config.get('RATE_LIMIT_BURST', 20))
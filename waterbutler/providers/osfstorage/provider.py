@@ -2,6 +2,7 @@ import os
 import json
 import uuid
 import typing
+import asyncio
 import hashlib
 import logging
 
@@ -307,7 +308,8 @@ class OSFStorageProvider(provider.BaseProvider):
                    dest_path: WaterButlerPath,
                    rename: str=None,
                    conflict: str='replace',
-                   handle_naming: bool=True) -> typing.Tuple[BaseMetadata, bool]:
+                   handle_naming: bool=True,
+                   size: int=None) -> typing.Tuple[BaseMetadata, bool]:
         """Override parent's move to support cross-region osfstorage moves while preserving guids
         and versions. Delegates to :meth:`.BaseProvider.move` when destination is not osfstorage.
         If both providers are in the same region (i.e. `.can_intra_move` is true), then calls that.
@@ -318,7 +320,7 @@ class OSFStorageProvider(provider.BaseProvider):
         # when moving to non-osfstorage, default move is fine
         if dest_provider.NAME != 'osfstorage':
             return await super().move(dest_provider, src_path, dest_path, rename=rename,
-                                      conflict=conflict, handle_naming=handle_naming)
+                                      conflict=conflict, handle_naming=handle_naming, size=size)
 
         args = (dest_provider, src_path, dest_path)
         kwargs = {'rename': rename, 'conflict': conflict}
@@ -352,7 +354,9 @@ class OSFStorageProvider(provider.BaseProvider):
             return await self.intra_move(*args)
 
         if src_path.is_dir:
-            meta_data, created = await self._folder_file_op(self.move, *args, **kwargs)  # type: ignore
+            meta_data, created = await self._folder_file_op(  # type: ignore
+                self.move, *args, can_intra=self.can_intra_move, **kwargs
+            )
             await self.delete(src_path)
         else:
             download_stream = await self.download(src_path)
@@ -372,7 +376,8 @@ class OSFStorageProvider(provider.BaseProvider):
                    rename: str=None,
                    conflict: str='replace',
                    handle_naming: bool=True,
-                   version=None) -> typing.Tuple[BaseMetadata, bool]:
+                   version=None,
+                   size: int=None) -> typing.Tuple[BaseMetadata, bool]:
         """Override parent's copy to support cross-region osfstorage copies. Delegates to
         :meth:`.BaseProvider.copy` when destination is not osfstorage. If both providers are in the
         same region (i.e. `.can_intra_copy` is true), call `.intra_copy`. Otherwise, grab a
@@ -386,7 +391,8 @@ class OSFStorageProvider(provider.BaseProvider):
         # when moving to non-osfstorage, default move is fine
         if dest_provider.NAME != 'osfstorage':
             return await super().copy(dest_provider, src_path, dest_path, rename=rename,
-                                      conflict=conflict, handle_naming=handle_naming, version=version)
+                                      conflict=conflict, handle_naming=handle_naming,
+                                      version=version, size=size)
 
         args = (dest_provider, src_path, dest_path)
         kwargs = {'rename': rename, 'conflict': conflict}
@@ -420,7 +426,9 @@ class OSFStorageProvider(provider.BaseProvider):
             return await self.intra_copy(*args)
 
         if src_path.is_dir:
-            meta_data, created = await self._folder_file_op(self.copy, *args, **kwargs)  # type: ignore
+            meta_data, created = await self._folder_file_op(  # type: ignore
+                self.copy, *args, can_intra=self.can_intra_copy, **kwargs
+            )
         else:
             download_stream = await self.download(src_path)
             if getattr(download_stream, 'name', None):
@@ -520,13 +528,19 @@ class OSFStorageProvider(provider.BaseProvider):
         remote_pending_path = await provider.validate_path('/' + pending_name)
         logger.debug('upload: remote_pending_path::{}'.format(remote_pending_path))
 
-        stream.add_writer('md5', streams.HashStreamWriter(hashlib.md5))
-        stream.add_writer('sha1', streams.HashStreamWriter(hashlib.sha1))
-        stream.add_writer('sha256', streams.HashStreamWriter(hashlib.sha256))
-        stream.add_writer('sha512', streams.HashStreamWriter(hashlib.sha512))
+        # Hash in worker threads so the four hashes don't hold up the event loop
+        hashers = {
+            'md5': streams.ThreadedHashStreamWriter(hashlib.md5),
+            'sha1': streams.ThreadedHashStreamWriter(hashlib.sha1),
+            'sha256': streams.ThreadedHashStreamWriter(hashlib.sha256),
+            'sha512': streams.ThreadedHashStreamWriter(hashlib.sha512),
+        }
+        for name, hasher in hashers.items():
+            stream.add_writer(name, hasher)
 
         await provider.upload(stream, remote_pending_path, check_created=False,
                               fetch_metadata=False, **kwargs)
+        await asyncio.gather(*(hasher.flush() for hasher in hashers.values()))
 
         complete_name = stream.writers['sha256'].hexdigest
         remote_complete_path = await provider.validate_path('/' + complete_name)
@@ -0,0 +1,163 @@
+"""Deleting the keys under a prefix for the S3 family of providers (``s3`` and ``s3compatsigv4``),
+through multi-object delete requests sent while the prefix is still being listed.
+"""
+import asyncio
+import logging
+import xml.sax.saxutils
+
+from waterbutler.core import utils
+from waterbutler.core import exceptions
+from waterbutler import settings as wb_settings
+
+logger = logging.getLogger(__name__)
+
+# Most objects one multi-object delete request may name
+MAX_DELETE_KEYS = 1000
+
+# Error codes in a DeleteResult worth sending the object again for
+RETRYABLE_CODES = ('InternalError', 'ServiceUnavailable', 'SlowDown')
+
+
+def versioned_objects(items: list, unversioned: bool=False):
+    """The ``(key, version_id)`` of the versions and delete markers of a listing page, grouped by
+    key.  Items without a version id are skipped, or named by key alone if ``unversioned``.
+    """
+    version_map = {}  # type: dict
+    for item in items:
+        key = item.get('Key')
+        if not key:
+            continue
+        version_id = item.get('VersionId')
+        if version_id or unversioned:
+            version_map.setdefault(key, []).append(version_id or None)
+    return [(key, version_id) for key, version_ids in version_map.items()
+            for version_id in version_ids]
+
+
+def delete_payload(objects: list) -> bytes:
+    """The body of a multi-object delete request for ``(key, version_id)`` pairs."""
+    return '<?xml version="1.0" encoding="UTF-8"?><Delete>{}</Delete>'.format(''.join(
+        '<Object><Key>{}</Key><VersionId>{}</VersionId></Object>'.format(
+            xml.sax.saxutils.escape(key), xml.sax.saxutils.escape(version_id),
+        ) if version_id else '<Object><Key>{}</Key></Object>'.format(xml.sax.saxutils.escape(key))
+        for key, version_id in objects
+    )).encode('utf-8')
+
+
+class BatchDeleter:
+    """Deletes objects in batches of ``MAX_DELETE_KEYS``, sending up to
+    ``DELETE_BATCH_CONCURRENCY`` batches at once while the caller goes on listing.  Objects a
+    batch failed to delete with a server-side error code are sent again, up to
+    ``DELETE_BATCH_RETRIES`` times with jittered back-off.  Once an object has failed for good
+    no more batches are sent, and :meth:`add` and :meth:`finish` raise :class:`.DeleteError`.
+
+    :param delete_batch: coroutine function that deletes a list of ``(key, version_id)`` and
+        returns the ``(key, version_id, code, message)`` of those it failed to delete
+    :param what: what is being deleted, for logs and errors
+    :param int batch_size: most objects per batch
+    """
+
+    def __init__(self, delete_batch, what, batch_size: int=MAX_DELETE_KEYS) -> None:
+        self.delete_batch = delete_batch
+        self.what = what
+        self.batch_size = batch_size
+
+        self.listed = self.deleted = self.batches = self.retries = 0
+        self.failed = []  # type: list
+        self._pending = []  # type: list
+        self._tasks = []  # type: list
+        self._slots = asyncio.Semaphore(max(wb_settings.DELETE_BATCH_CONCURRENCY, 1))
+
+    @property
+    def progress(self) -> dict:
+        return {
+            'listed': self.listed,
+            'deleted': self.deleted,
+            'failed': len(self.failed),
+            'batches': self.batches,
+            'retries': self.retries,
+        }
+
+    async def add(self, objects) -> None:
+        """Queue ``(key, version_id)`` pairs for deletion, sending each batch as it fills.  Waits
+        while ``DELETE_BATCH_CONCURRENCY`` batches are being sent, so listing stays only a batch
+        or so ahead of deleting.
+        """
+        for obj in objects:
+            self._pending.append(obj)
+            self.listed += 1
+            if len(self._pending) >= self.batch_size:
+                batch, self._pending = self._pending, []
+                await self._send(batch)
+
+    async def finish(self) -> dict:
+        """Send the last batch and wait for every batch to be deleted.
+
+        :returns: :attr:`progress`
+        :raises: :class:`.DeleteError` if an object could not be deleted
+        """
+        if self._pending:
+            batch, self._pending = self._pending, []
+            await self._send(batch)
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+        self._check()
+
+        logger.info('Deleted {deleted} of {listed} objects under {what} in {batches} batches, '
+                    '{retries} retried'.format(what=self.what, **self.progress))
+        return self.progress
+
+    async def cancel(self) -> None:
+        """Stop sending batches, e.g. because listing failed."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _check(self):
+        for task in self._tasks:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+        self._tasks = [task for task in self._tasks if not task.done()]
+
+        if self.failed:
+            codes = sorted({code for _, _, code, _ in self.failed})
+            logger.error('Failed to delete {} objects under {}, codes={}'.format(
+                len(self.failed), self.what, codes))
+            raise exceptions.DeleteError('Failed to delete some objects: {} error(s)'.format(
+                len(self.failed)))
+
+    async def _send(self, batch):
+        await self._slots.acquire()
+        try:
+            self._check()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._tasks.append(asyncio.ensure_future(self._delete(batch)))
+
+    async def _delete(self, batch):
+        attempt = 0
+        try:
+            while batch:
+                errors = await self.delete_batch(batch)
+                self.batches += 1
+                self.deleted += len(batch) - len(errors)
+
+                batch = []
+                for key, version_id, code, message in errors:
+                    if code in RETRYABLE_CODES and attempt < wb_settings.DELETE_BATCH_RETRIES:
+                        batch.append((key, version_id))
+                    else:
+                        self.failed.append((key, version_id, code, message))
+
+                if batch:
+                    logger.info('Retrying {} objects under {} after {}'.format(
+                        len(batch), self.what, sorted({error[2] for error in errors})))
+                    self.retries += len(batch)
+                    await asyncio.sleep(utils.backoff_delay(attempt))
+                    attempt += 1
+            logger.debug('Deleting {what}: {deleted} of {listed} objects deleted'.format(
+                what=self.what, **self.progress))
+        finally:
+            self._slots.release()
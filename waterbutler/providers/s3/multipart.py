@@ -0,0 +1,88 @@
+"""Multipart uploads for the S3 family of providers (``s3``, ``s3compat``, ``s3compatinstitutions``
+and ``s3compatsigv4``), which all talk to the S3 multipart API through the same
+``_create_upload_session``, ``_upload_part``, ``_complete_multipart_upload`` and
+``_abort_chunked_upload`` methods.
+"""
+import math
+import logging
+
+from waterbutler.core import streams
+from waterbutler.core import transfer
+
+logger = logging.getLogger(__name__)
+
+# Most parts an S3 multipart upload may have
+MAX_UPLOAD_PARTS = 10000
+
+
+def part_size(size: int, chunk_size: int) -> int:
+    """Bytes per part of a ``size`` byte upload: ``chunk_size``, or as much more as it takes to
+    stay within ``MAX_UPLOAD_PARTS``.
+    """
+    return max(chunk_size, math.ceil(size / MAX_UPLOAD_PARTS))
+
+
+class S3PartUpload(transfer.PartUpload):
+    """A multipart upload to an S3-family provider, whose parts are uploaded by
+    :func:`.transfer.upload_stream` or :func:`.transfer.parallel_copy`.
+
+    :param provider: the provider the upload goes to
+    :param path: the :class:`.WaterButlerPath` being uploaded to
+    :param str session_upload_id: the id of the multipart upload
+    :param int part_size: bytes in every part but the last
+    :param bool exists: whether ``path`` already existed, for :meth:`complete`
+    """
+
+    def __init__(self, provider, path, session_upload_id, part_size, exists=False):
+        super().__init__(part_size)
+        self.provider = provider
+        self.path = path
+        self.session_upload_id = session_upload_id
+        self.exists = exists
+
+    def __repr__(self):
+        return '<{} {} {}>'.format(type(self).__name__, self.provider.NAME, self.path)
+
+    async def upload_part(self, number, data):
+        return await self.provider._upload_part(streams.ByteStream(data), self.path,
+                                                self.session_upload_id, number, len(data))
+
+    async def upload_part_stream(self, number, stream, size):
+        return await self.provider._upload_part(stream, self.path, self.session_upload_id,
+                                                number, size)
+
+    async def complete(self, parts):
+        await self.provider._complete_multipart_upload(self.path, self.session_upload_id, parts)
+        return (await self.provider.metadata(self.path)), not self.exists
+
+    async def abort(self):
+        await self.provider._abort_chunked_upload(self.path, self.session_upload_id)
+
+
+async def create_part_upload(provider, path, size):
+    """Start a multipart upload to ``path`` for :func:`.transfer.parallel_copy`, replacing any
+    file there, or return ``None`` for files that fit in one part of ``provider.CHUNK_SIZE``.
+    """
+    if size <= provider.CHUNK_SIZE:
+        return None
+
+    path, exists = await provider.handle_name_conflict(path, conflict='replace')
+    session_upload_id = await provider._create_upload_session(path)
+    return S3PartUpload(provider, path, session_upload_id,
+                        part_size(size, provider.CHUNK_SIZE), exists=exists)
+
+
+async def upload_parts(provider, stream, path, session_upload_id):
+    """Upload ``stream`` as the parts of the multipart upload ``session_upload_id``, several parts
+    at once, and return the headers of each part's response in order.
+    """
+    upload = S3PartUpload(provider, path, session_upload_id,
+                          part_size(stream.size, provider.CHUNK_SIZE))
+    logger.debug('Multipart upload of {} bytes in parts of {}'.format(stream.size,
+                                                                      upload.part_size))
+    parts = await transfer.upload_stream(stream, upload, stream.size)
+    provider.provider_metrics.add('upload.parts', {
+        'count': len(parts),
+        'part_size': upload.part_size,
+    })
+    return parts
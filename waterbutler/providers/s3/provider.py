@@ -3,6 +3,7 @@ import hashlib
 import logging
 import functools
 from urllib import parse
+from http import HTTPStatus
 
 import xmltodict
 import xml.sax.saxutils
@@ -13,6 +14,9 @@ from boto import config as boto_config
 from boto.s3.connection import S3Connection, OrdinaryCallingFormat
 
 from waterbutler.providers.s3 import settings
+from waterbutler.providers.s3 import multipart
+from waterbutler.providers.s3 import bulk_delete
+from waterbutler.core.cache import LRUCache
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.core.utils import make_disposition
 from waterbutler.core import streams, provider, exceptions
@@ -25,6 +29,27 @@ from waterbutler.providers.s3.metadata import (S3Revision,
 
 logger = logging.getLogger(__name__)
 
+# Region and host of every bucket this process has looked up, by (default host, bucket name)
+bucket_regions = LRUCache('s3_bucket_regions', max_size=settings.REGION_CACHE_MAX_SIZE,
+                          ttl=settings.REGION_CACHE_TTL)
+# The auth handler class boto's get_auth_handler picks, by (host, required capabilities)
+_auth_handler_classes = {}  # type: dict
+
+
+def _auth_handler(connection):
+    """An auth handler for ``connection``'s current host, of the class ``get_auth_handler``
+    picked for the host before, without searching boto's auth plugins again.
+    """
+    capability = tuple(connection._required_auth_capability())
+    key = (connection.host, capability)
+    handler_class = _auth_handler_classes.get(key)
+    if handler_class is not None:
+        return handler_class(connection.host, boto_config, connection.provider)
+
+    handler = get_auth_handler(connection.host, boto_config, connection.provider, list(capability))
+    _auth_handler_classes[key] = type(handler)
+    return handler
+
 
 def prepare_xml_body_batches(object_dict, batch_size=1000):
     """
@@ -87,6 +112,16 @@ class S3Provider(provider.BaseProvider):
         self.bucket = self.connection.get_bucket(settings['bucket'], validate=False)
         self.encrypt_uploads = self.settings.get('encrypt_uploads', False)
         self.region = None
+        self._default_host = self.connection.host
+
+    async def make_request(self, *args, **kwargs):
+        try:
+            return await super().make_request(*args, **kwargs)
+        except exceptions.WaterButlerError as exc:
+            # S3 answers 301 PermanentRedirect when the bucket isn't in the region we think
+            if exc.code == HTTPStatus.MOVED_PERMANENTLY and self.region is not None:
+                self._forget_region()
+            raise
 
     async def validate_v1_path(self, path, **kwargs):
         await self._check_region()
@@ -132,6 +167,16 @@ class S3Provider(provider.BaseProvider):
     def can_intra_move(self, dest_provider, path=None):
         return False
 
+    def can_download_ranges(self):
+        return True
+
+    def can_upload_parts(self):
+        return True
+
+    async def create_part_upload(self, path, size):
+        await self._check_region()
+        return await multipart.create_part_upload(self, path, size)
+
     async def intra_copy(self, dest_provider, source_path, dest_path):
         """Copy key from one S3 bucket to another. The credentials specified in
         `dest_provider` must have read access to `source.bucket`.
@@ -314,19 +359,9 @@ class S3Provider(provider.BaseProvider):
         return session_data['InitiateMultipartUploadResult']['UploadId']
 
     async def _upload_parts(self, stream, path, session_upload_id):
-        """Uploads all parts/chunks of the given stream to S3 one by one.
+        """Uploads all parts/chunks of the given stream to S3, several at once.
         """
-
-        metadata = []
-        parts = [self.CHUNK_SIZE for i in range(0, stream.size // self.CHUNK_SIZE)]
-        if stream.size % self.CHUNK_SIZE:
-            parts.append(stream.size - (len(parts) * self.CHUNK_SIZE))
-        logger.debug('Multipart upload segment sizes: {}'.format(parts))
-        for chunk_number, chunk_size in enumerate(parts):
-            logger.debug('  uploading part {} with size {}'.format(chunk_number + 1, chunk_size))
-            metadata.append(await self._upload_part(stream, path, session_upload_id,
-                                                    chunk_number + 1, chunk_size))
-        return metadata
+        return await multipart.upload_parts(self, stream, path, session_upload_id)
 
     async def _upload_part(self, stream, path, session_upload_id, chunk_number, chunk_size):
         """Uploads a single part/chunk of the given stream to S3.
@@ -575,13 +610,14 @@ class S3Provider(provider.BaseProvider):
             await self._delete_folder(path, **kwargs)
 
     async def _delete_folder(self, path, **kwargs):
-        """Query for recursive contents of folder and delete in batches of 1000
+        """Query for recursive contents of folder and delete in batches of 1000, several batches
+        at once while the rest of the folder is listed (see :class:`.bulk_delete.BatchDeleter`)
 
         Called from: func: delete if not path.is_file
 
         Calls: func: self._check_region
-               func: self.make_request
-               func: self.bucket.generate_url
+               func: self.get_full_revision
+               func: self._delete_batch
 
         :param *ProviderPath path: Path to be deleted
 
@@ -595,57 +631,74 @@ class S3Provider(provider.BaseProvider):
         if not path.full_path.endswith('/'):
             raise exceptions.InvalidParameters('not a folder: {}'.format(str(path)))
 
-        # Aggregate ALL versions + delete markers for every key under the prefix using a
-        # single paginated traversal handled by get_full_revision(). Previous implementation
-        # attempted double pagination leading to incomplete deletions (stopping around ~500).
+        # Every version and delete marker under the prefix is deleted, a page of the listing at a
+        # time, while the next pages are listed
         prefix = path.full_path.lstrip('/')  # '/' -> '', '/A/B/' -> 'A/B/'
         list_query_params = {'prefix': prefix, 'versions': ''}
-        parsed, versions, delete_markers = await self.get_full_revision(dict(list_query_params))
+        deleter = bulk_delete.BatchDeleter(self._delete_batch, path)
+        found = False
 
-        # If the folder doesn't exist (no keys nor delete markers) raise NotFound
-        if not versions and not delete_markers:
-            raise exceptions.NotFoundError(str(path))
+        async def delete_page(versions, delete_markers):
+            nonlocal found
+            found = found or bool(versions or delete_markers)
+            await deleter.add(bulk_delete.versioned_objects(versions + delete_markers))
 
-        # Build mapping key -> [versionIds]
-        version_map = {}
-        for item in versions + delete_markers:
-            key = item.get('Key')
-            version_id = item.get('VersionId')
-            if not key or not version_id:
-                continue
-            version_map.setdefault(key, []).append(version_id)
-
-        # Execute batched multi-object deletes (<=1000 objects per request)
-        for payload_version in prepare_xml_body_batches(version_map):
-            md5 = compute_md5(BytesIO(payload_version))
-            del_query_params = {'delete': ''}
-            headers = {
-                'Content-Length': str(len(payload_version)),
-                'Content-MD5': md5[1],
-                'Content-Type': 'text/xml',
-            }
-            url = functools.partial(
-                self.bucket.generate_url,
-                settings.TEMP_URL_SECS,
-                'POST',
-                query_parameters=del_query_params,
-                headers=headers,
-            )
-            resp = await self.make_request(
-                'POST',
-                url,
-                params=del_query_params,
-                data=payload_version,
-                headers=headers,
-                expects=(200, 204,),
-                throws=exceptions.DeleteError,
-            )
-            await resp.release()
+        try:
+            await self.get_full_revision(dict(list_query_params), on_page=delete_page)
+            # If the folder doesn't exist (no keys nor delete markers) raise NotFound
+            if not found:
+                raise exceptions.NotFoundError(str(path))
+            progress = await deleter.finish()
+        except BaseException:
+            await deleter.cancel()
+            raise
+        self.provider_metrics.add('delete.folder', progress)
+
+    async def _delete_batch(self, objects):
+        """Delete ``objects`` (``(key, version_id)`` pairs) with one multi-object delete request.
+
+        :returns: the ``(key, version_id, code, message)`` of the objects that weren't deleted
+        """
+        payload = bulk_delete.delete_payload(objects)
+        md5 = compute_md5(BytesIO(payload))
+        del_query_params = {'delete': ''}
+        headers = {
+            'Content-Length': str(len(payload)),
+            'Content-MD5': md5[1],
+            'Content-Type': 'text/xml',
+        }
+        url = functools.partial(
+            self.bucket.generate_url,
+            settings.TEMP_URL_SECS,
+            'POST',
+            query_parameters=del_query_params,
+            headers=headers,
+        )
+        resp = await self.make_request(
+            'POST',
+            url,
+            params=del_query_params,
+            data=payload,
+            headers=headers,
+            expects=(200, 204,),
+            throws=exceptions.DeleteError,
+        )
+        body = await resp.read()
+        if b'<Error>' not in body:
+            return []
 
-    async def get_full_revision(self, query_params):
+        errors = xmltodict.parse(body, strip_whitespace=False)['DeleteResult'].get('Error', [])
+        if isinstance(errors, dict):
+            errors = [errors]
+        return [(error.get('Key'), error.get('VersionId'), error.get('Code'), error.get('Message'))
+                for error in errors]
+
+    async def get_full_revision(self, query_params, on_page=None):
         """
         Get all versions and delete markers of the requested object
         :param query_params: The query parameters to be used in the request
+        :param on_page: Optional coroutine function each page's versions and delete markers are
+            passed to as they are listed, instead of being collected
         :return: The dict of response content, list versions and delete_markers
         """
         versions = []
@@ -673,8 +726,11 @@ class S3Provider(provider.BaseProvider):
             if isinstance(current_delete_markers, dict):
                 current_delete_markers = [current_delete_markers]
 
-            versions.extend(current_versions)
-            delete_markers.extend(current_delete_markers)
+            if on_page is not None:
+                await on_page(current_versions, current_delete_markers)
+            else:
+                versions.extend(current_versions)
+                delete_markers.extend(current_delete_markers)
 
             # Check if more pages are available
             more_to_come = parsed.get('IsTruncated') == 'true'
@@ -835,6 +891,42 @@ class S3Provider(provider.BaseProvider):
             items.append(next_token_string)
         return items
 
+    async def folder_tree(self, path):
+        """List every key under the prefix ``path`` by leaving out the delimiter, a thousand keys
+        per request, instead of listing each "folder" on its own.
+        """
+        await self._check_region()
+
+        items = []
+        params = {'prefix': path.path, 'max-keys': '1000'}
+        while True:
+            resp = await self.make_request(
+                'GET',
+                functools.partial(self.bucket.generate_url, settings.TEMP_URL_SECS, 'GET',
+                                  query_parameters=params),
+                params=params,
+                expects=(200, ),
+                throws=exceptions.MetadataError,
+            )
+            contents = await resp.read()
+            parsed = xmltodict.parse(contents, strip_whitespace=False)['ListBucketResult']
+
+            keys = parsed.get('Contents', [])
+            if isinstance(keys, dict):
+                keys = [keys]
+
+            for key in keys:
+                if key['Key'].endswith('/'):
+                    items.append(S3FolderKeyMetadata(key))
+                else:
+                    items.append(S3FileMetadata(key))
+
+            if parsed.get('IsTruncated') != 'true' or not keys:
+                break
+            params = dict(params, marker=keys[-1]['Key'])
+
+        return self._folder_tree_entries(path, items)
+
     async def _check_region(self):
         """Lookup the region via bucket name, then update the host to match.
 
@@ -844,20 +936,42 @@ class S3Provider(provider.BaseProvider):
         require changing the host.  Ireland is represented by the string 'EU', with the host
         parameter 'eu-west-1'.  All other regions return the host parameter as the region name.
 
+        The region and host are kept in the process-wide ``bucket_regions`` cache, so only the
+        first provider for a bucket has to ask S3.
+
         Region Naming: http://docs.aws.amazon.com/general/latest/gr/rande.html#s3_region
         """
         if self.region is None:
-            self.region = await self._get_bucket_region()
-            if self.region == 'EU':
-                self.region = 'eu-west-1'
+            key = (self._default_host, self.bucket.name)
+            cached = bucket_regions.get(key)
+            if cached is None:
+                region = await self._get_bucket_region()
+                if region == 'EU':
+                    region = 'eu-west-1'
+                host = self._default_host
+                if region != '':
+                    host = host.replace('s3.', 's3-' + region + '.', 1)
+                bucket_regions.set(key, (region, host))
+            else:
+                region, host = cached
 
-            if self.region != '':
-                self.connection.host = self.connection.host.replace('s3.', 's3-' + self.region + '.', 1)
-                self.connection._auth_handler = get_auth_handler(
-                    self.connection.host, boto_config, self.connection.provider, self.connection._required_auth_capability())
+            self.region = region
+            if self.connection.host != host:
+                self.connection.host = host
+                self.connection._auth_handler = _auth_handler(self.connection)
 
         self.metrics.add('region', self.region)
 
+    def _forget_region(self):
+        """Drop the bucket's cached region and go back to the default host, so that the next
+        request looks the region up again.
+        """
+        bucket_regions.invalidate((self._default_host, self.bucket.name))
+        self.region = None
+        if self.connection.host != self._default_host:
+            self.connection.host = self._default_host
+            self.connection._auth_handler = _auth_handler(self.connection)
+
     async def _get_bucket_region(self):
         """Bucket names are unique across all regions.
 
@@ -10,3 +10,10 @@ CONTIGUOUS_UPLOAD_SIZE_LIMIT = int(config.get('CONTIGUOUS_UPLOAD_SIZE_LIMIT', 12
 CHUNK_SIZE = int(config.get('CHUNK_SIZE', 64000000))  # 64 MB
 
 CHUNKED_UPLOAD_MAX_ABORT_RETRIES = int(config.get('CHUNKED_UPLOAD_MAX_ABORT_RETRIES', 2))
+
+# Process-wide cache of the region and host of every bucket looked up, so that providers made for
+# later requests don't ask S3 for the bucket's location again.  Entries are dropped early when S3
+# answers 301 PermanentRedirect, i.e. the bucket isn't at the cached host any more.
+region_cache_config = config.child('REGION_CACHE')
+REGION_CACHE_TTL = float(region_cache_config.get('TTL', 3600))  # seconds
+REGION_CACHE_MAX_SIZE = int(region_cache_config.get('MAX_SIZE', 4096))
@@ -16,6 +16,7 @@ from boto.utils import compute_md5
 from waterbutler.core import streams, provider, exceptions
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.core.utils import make_disposition
+from waterbutler.providers.s3 import multipart
 from waterbutler.providers.s3compat import settings
 from waterbutler.providers.s3compat.metadata import (S3CompatRevision,
                                                      S3CompatFileMetadata,
@@ -166,6 +167,15 @@ class S3CompatProvider(provider.BaseProvider):
     def can_intra_move(self, dest_provider, path=None):
         return False
 
+    def can_download_ranges(self):
+        return True
+
+    def can_upload_parts(self):
+        return True
+
+    async def create_part_upload(self, path, size):
+        return await multipart.create_part_upload(self, path, size)
+
     async def intra_copy(self, dest_provider, source_path, dest_path):
         """Copy key from one S3 Compatible Storage bucket to another. The credentials specified in
         `dest_provider` must have read access to `source.bucket`.
@@ -415,19 +425,8 @@ class S3CompatProvider(provider.BaseProvider):
         return session_data['InitiateMultipartUploadResult']['UploadId']
 
     async def _upload_parts(self, stream, path, session_upload_id):
-        """Uploads all parts/chunks of the given stream to S3 one by one.
-        """
-
-        metadata = []
-        parts = [self.CHUNK_SIZE for i in range(0, stream.size // self.CHUNK_SIZE)]
-        if stream.size % self.CHUNK_SIZE:
-            parts.append(stream.size - (len(parts) * self.CHUNK_SIZE))
-        logger.debug('Multipart upload segment sizes: {}'.format(parts))
-        for chunk_number, chunk_size in enumerate(parts):
-            logger.debug('  uploading part {} with size {}'.format(chunk_number + 1, chunk_size))
-            metadata.append(await self._upload_part(stream, path, session_upload_id,
-                                                    chunk_number + 1, chunk_size))
-        return metadata
+        """Uploads all parts/chunks of the given stream to S3, several at once."""
+        return await multipart.upload_parts(self, stream, path, session_upload_id)
 
     async def _upload_part(self, stream, path, session_upload_id, chunk_number, chunk_size):
         """Uploads a single part/chunk of the given stream to S3.
@@ -15,9 +15,13 @@ import boto3
 from botocore.config import Config
 
 from waterbutler.core import streams, provider, exceptions
+from waterbutler.core.cache import LRUCache
 from waterbutler.core.path import WaterButlerPath
 from waterbutler.core.utils import make_disposition
+from waterbutler.providers.s3 import multipart
+from waterbutler.providers.s3 import bulk_delete
 from waterbutler.providers.s3compatsigv4 import settings
+from waterbutler.providers.s3compatsigv4.signing import SigV4Presigner
 from waterbutler.providers.s3compatsigv4.metadata import (
     S3CompatSigV4Revision,
     S3CompatSigV4FileMetadata,
@@ -28,6 +32,9 @@ from waterbutler.providers.s3compatsigv4.metadata import (
 
 logger = logging.getLogger(__name__)
 
+# Connections shared between providers, see get_connection
+connections = LRUCache('s3compatsigv4_connections', max_size=settings.CONNECTION_POOL_SIZE)
+
 
 def compute_md5(fp):
     """Compute MD5 hash for file-like object."""
@@ -39,6 +46,12 @@ def compute_md5(fp):
 
 
 class S3CompatSigV4Connection:
+    """A boto3 S3 resource for one endpoint and set of credentials, and a
+    :class:`.SigV4Presigner` that presigns the provider's requests without going through botocore.
+    Connections are expensive to make and are shared between providers, see
+    :func:`get_connection`.
+    """
+
     def __init__(self, aws_access_key_id=None, aws_secret_access_key=None,
                  endpoint_url=None, region_name=None, use_ssl=True,
                  verify_ssl=True, addressing_style='auto'):
@@ -64,11 +77,61 @@ class S3CompatSigV4Connection:
             use_ssl=use_ssl,
             verify=verify_ssl,
         )
+        client = self.s3.meta.client
+        self.presigner = SigV4Presigner(aws_access_key_id, aws_secret_access_key,
+                                        client.meta.region_name or 'us-east-1')
+        # The URL botocore addresses each bucket at, by name
+        self._bucket_urls = {}  # type: dict
+
+    def bucket_url(self, bucket_name):
+        """The URL of ``bucket_name`` with the connection's endpoint and addressing style, as
+        botocore builds it.
+        """
+        url = self._bucket_urls.get(bucket_name)
+        if url is None:
+            presigned = self.s3.meta.client.generate_presigned_url(
+                'list_objects_v2', Params={'Bucket': bucket_name}, HttpMethod='GET',
+            )
+            parts = parse.urlsplit(presigned)
+            url = parse.urlunsplit((parts.scheme, parts.netloc, parts.path, '', ''))
+            self._bucket_urls[bucket_name] = url
+        return url
 
     def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=settings.TEMP_URL_SECS, HttpMethod=None):
+        if HttpMethod is not None and Params and 'Bucket' in Params:
+            unsigned = SigV4Presigner.unsigned_url(self.bucket_url(Params['Bucket']),
+                                                   ClientMethod, Params)
+            if unsigned is not None:
+                url, query = unsigned
+                return self.presigner.presign(HttpMethod, url, query, ExpiresIn)
         return self.s3.meta.client.generate_presigned_url(ClientMethod, Params=Params, ExpiresIn=ExpiresIn, HttpMethod=HttpMethod)
 
 
+def get_connection(aws_access_key_id, aws_secret_access_key, endpoint_url, region_name=None,
+                   use_ssl=True, verify_ssl=True):
+    """The process's :class:`S3CompatSigV4Connection` for an endpoint, region and access key,
+    made on first use.  boto3 loads its endpoint and service models and sets up credential
+    resolution for every new resource, which costs more than the small requests most providers
+    are made for, so connections are shared by every provider with the same settings.
+    """
+    key = (
+        endpoint_url, region_name, aws_access_key_id,
+        hashlib.sha256(aws_secret_access_key.encode('utf-8')).hexdigest(), use_ssl, verify_ssl,
+    )
+    connection = connections.get(key)
+    if connection is None:
+        connection = S3CompatSigV4Connection(
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            endpoint_url=endpoint_url,
+            region_name=region_name,
+            use_ssl=use_ssl,
+            verify_ssl=verify_ssl
+        )
+        connections.set(key, connection)
+    return connection
+
+
 class S3CompatSigV4Provider(provider.BaseProvider):
     """Provider for S3 Compatible Storage (SigV4) service.
 
@@ -119,15 +182,24 @@ class S3CompatSigV4Provider(provider.BaseProvider):
         self.region = self.settings.get('region', None)
         self.prefix = self.settings.get('prefix', '')
 
-        self.connection = S3CompatSigV4Connection(
-            aws_access_key_id=credentials['access_key'],
-            aws_secret_access_key=credentials['secret_key'],
-            endpoint_url=endpoint_url,
+        self.connection = get_connection(
+            credentials['access_key'],
+            credentials['secret_key'],
+            endpoint_url,
             region_name=self.region,
             use_ssl=is_secure,
             verify_ssl=is_secure
         )
-        self.bucket = self.connection.s3.Bucket(self.bucket_name)
+        self._bucket = None
+
+    @property
+    def bucket(self):
+        """The boto3 ``Bucket`` resource, which is only needed for bulk deletes and costs more to
+        make than the rest of the provider, so is made on first use.
+        """
+        if self._bucket is None:
+            self._bucket = self.connection.s3.Bucket(self.bucket_name)
+        return self._bucket
 
     async def validate_v1_path(self, path, **kwargs):
         wbpath = WaterButlerPath(path, prepend=self.prefix)
@@ -187,6 +259,15 @@ class S3CompatSigV4Provider(provider.BaseProvider):
     def can_duplicate_names(self):
         return True
 
+    def can_download_ranges(self):
+        return True
+
+    def can_upload_parts(self):
+        return True
+
+    async def create_part_upload(self, path, size):
+        return await multipart.create_part_upload(self, path, size)
+
     @staticmethod
     def _check_for_200_error(
         response_body,
@@ -429,18 +510,8 @@ class S3CompatSigV4Provider(provider.BaseProvider):
         return session_data['InitiateMultipartUploadResult']['UploadId']
 
     async def _upload_parts(self, stream, path, session_upload_id):
-        """Uploads all parts/chunks of the given stream to S3 one by one."""
-
-        metadata = []
-        parts = [self.CHUNK_SIZE for i in range(0, stream.size // self.CHUNK_SIZE)]
-        if stream.size % self.CHUNK_SIZE:
-            parts.append(stream.size - (len(parts) * self.CHUNK_SIZE))
-        logger.debug('Multipart upload segment sizes: {}'.format(parts))
-        for chunk_number, chunk_size in enumerate(parts):
-            logger.debug('  uploading part {} with size {}'.format(chunk_number + 1, chunk_size))
-            metadata.append(await self._upload_part(stream, path, session_upload_id,
-                                                    chunk_number + 1, chunk_size))
-        return metadata
+        """Uploads all parts/chunks of the given stream to S3, several at once."""
+        return await multipart.upload_parts(self, stream, path, session_upload_id)
 
     async def _upload_part(self, stream, path, session_upload_id, chunk_number, chunk_size):
         """Uploads a single part/chunk of the given stream to S3.
@@ -640,11 +711,11 @@ class S3CompatSigV4Provider(provider.BaseProvider):
         await resp.release()
 
     async def move(self, dest_provider, src_path, dest_path,
-                  rename=None, conflict='replace', handle_naming=True):
+                  rename=None, conflict='replace', handle_naming=True, size=None):
         """Override move to clean up orphaned S3 folder prefix objects after move."""
         result = await super().move(
             dest_provider, src_path, dest_path,
-            rename=rename, conflict=conflict, handle_naming=handle_naming,
+            rename=rename, conflict=conflict, handle_naming=handle_naming, size=size,
         )
 
         # After moving a folder, clean up orphaned folder prefix object at source
@@ -812,12 +883,14 @@ class S3CompatSigV4Provider(provider.BaseProvider):
         return False
 
     async def _delete_folder(self, path, **kwargs):
-        """Query for recursive contents of folder and delete in batches of 1000
+        """Query for recursive contents of folder and delete in batches of 1000, several batches
+        at once while the rest of the folder is listed (see :class:`.bulk_delete.BatchDeleter`)
 
         Called from: func: delete if not path.is_file
 
-        Calls: func: self.make_request
-               func: self.connection.generate_presigned_url
+        Calls: func: self.get_full_revision
+               func: self._delete_listed_objects
+               func: self._delete_batch
 
         :param *ProviderPath path: Path to be deleted
 
@@ -832,121 +905,110 @@ class S3CompatSigV4Provider(provider.BaseProvider):
 
         prefix = path.full_path.lstrip('/')
         list_query_params = {'Prefix': prefix}
-        try:
-            parsed, versions, delete_markers = await self.get_full_revision(dict(list_query_params))
-        except exceptions.MetadataError:
-            # Versioning not supported (e.g., MinIO). Fall back to ListObjectsV2.
-            all_objects = []
-            continuation_token = None
-            while True:
-                query_params = {
-                    'Bucket': self.bucket_name,
-                    'Prefix': prefix,
-                    'MaxKeys': 1000,
-                }
-                if continuation_token:
-                    query_params['ContinuationToken'] = continuation_token
-                resp = await self.make_request(
-                    'GET',
-                    functools.partial(
-                        self.connection.generate_presigned_url,
-                        'list_objects_v2',
-                        Params=query_params,
-                        HttpMethod='GET',
-                    ),
-                    expects=(HTTPStatus.OK,),
-                    throws=exceptions.MetadataError,
-                )
-                contents = await resp.read()
-                parsed = xmltodict.parse(
-                    contents.decode('utf-8'),
-                    strip_whitespace=False,
-                )['ListBucketResult']
-                objects = parsed.get('Contents', [])
-                if isinstance(objects, dict):
-                    objects = [objects]
-                all_objects.extend({'Key': obj['Key']} for obj in objects if obj.get('Key'))
-
-                if parsed.get('IsTruncated') == 'true':
-                    continuation_token = parsed.get('NextContinuationToken')
-                else:
-                    break
+        deleter = bulk_delete.BatchDeleter(self._delete_batch, path)
+        found = False
+
+        async def delete_page(versions, delete_markers):
+            nonlocal found
+            found = found or bool(versions or delete_markers)
+            await deleter.add(
+                bulk_delete.versioned_objects(versions + delete_markers, unversioned=True)
+            )
 
-            if all_objects:
-                for i in range(0, len(all_objects), 1000):
-                    batch = all_objects[i:i + 1000]
-                    loop = asyncio.get_event_loop()
-                    response = await loop.run_in_executor(
-                        None,
-                        lambda d=batch: self.bucket.delete_objects(
-                            Delete={'Objects': d, 'Quiet': False}
-                        ),
-                    )
-                    if response.get('Errors'):
-                        error_count = len(response['Errors'])
-                        error_codes = [e.get('Code', 'Unknown') for e in response['Errors']]
-                        logger.error('_delete_folder fallback: %d delete error(s), codes=%s', error_count, error_codes)
-                        raise exceptions.DeleteError(
-                            'Failed to delete some objects: {} error(s)'.format(error_count)
-                        )
-            # Also clean up folder prefix
+        try:
             try:
-                await self._delete_folder_prefix(prefix)
-            except exceptions.DeleteError:
-                logger.warning('Failed to clean up folder prefix in _delete_folder fallback: %s', prefix)
-            return
-
-        if not versions and not delete_markers:
-            # No objects/versions -> treat as missing (parity with S3 provider)
-            raise exceptions.NotFoundError(str(path))
-
-        version_map = {}
-        keys_without_version = []
-        for item in versions + delete_markers:
-            key = item.get('Key')
-            if not key:
-                continue
-            version_id = item.get('VersionId')
-            if version_id:
-                version_map.setdefault(key, []).append(version_id)
-            else:
-                keys_without_version.append({'Key': key})
-
-        all_objects = [
-            {'Key': k, 'VersionId': v} for k, vids in version_map.items() for v in vids
-        ] + keys_without_version
-        # AWS allows max 1000 objects per delete_objects call
-        for i in range(0, len(all_objects), 1000):
-            batch = all_objects[i: i + 1000]
-            # Run synchronous boto3 call in executor to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda b=batch: self.bucket.delete_objects(
-                    Delete={'Objects': b, 'Quiet': False}
-                ),
-            )
-            # Check for errors in response
-            if 'Errors' in response and response['Errors']:
-                error_count = len(response['Errors'])
-                error_codes = [e.get('Code', 'Unknown') for e in response['Errors']]
-                logger.error(
-                    'Errors deleting folder objects: count=%d, codes=%s', error_count, error_codes
-                )
-                raise exceptions.DeleteError(
-                    'Failed to delete some objects: {} error(s)'.format(error_count)
-                )
-            deleted_count = len(response.get('Deleted', []))
-            logger.debug('Batch deleted %d objects from folder', deleted_count)
+                await self.get_full_revision(dict(list_query_params), on_page=delete_page)
+            except exceptions.MetadataError:
+                # Versioning not supported (e.g., MinIO). Fall back to ListObjectsV2.
+                await self._delete_listed_objects(prefix, deleter)
+                self.provider_metrics.add('delete.folder', await deleter.finish())
+                # Also clean up folder prefix
+                try:
+                    await self._delete_folder_prefix(prefix)
+                except exceptions.DeleteError:
+                    logger.warning('Failed to clean up folder prefix in _delete_folder fallback: %s', prefix)
+                return
+
+            if not found:
+                # No objects/versions -> treat as missing (parity with S3 provider)
+                raise exceptions.NotFoundError(str(path))
+            progress = await deleter.finish()
+        except BaseException:
+            await deleter.cancel()
+            raise
+        self.provider_metrics.add('delete.folder', progress)
 
         # Clean up folder prefix object if it still exists
         if await self._folder_prefix_exists(prefix):
             await self._delete_folder_prefix(prefix)
 
-    async def get_full_revision(self, query_params):
+    async def _delete_listed_objects(self, prefix, deleter):
+        """Hand every current object under ``prefix`` to ``deleter`` a ListObjectsV2 page at a time,
+        for storage that can't list versions.
+        """
+        continuation_token = None
+        while True:
+            query_params = {
+                'Bucket': self.bucket_name,
+                'Prefix': prefix,
+                'MaxKeys': 1000,
+            }
+            if continuation_token:
+                query_params['ContinuationToken'] = continuation_token
+            resp = await self.make_request(
+                'GET',
+                functools.partial(
+                    self.connection.generate_presigned_url,
+                    'list_objects_v2',
+                    Params=query_params,
+                    HttpMethod='GET',
+                ),
+                expects=(HTTPStatus.OK,),
+                throws=exceptions.MetadataError,
+            )
+            contents = await resp.read()
+            parsed = xmltodict.parse(
+                contents.decode('utf-8'),
+                strip_whitespace=False,
+            )['ListBucketResult']
+            objects = parsed.get('Contents', [])
+            if isinstance(objects, dict):
+                objects = [objects]
+            await deleter.add((obj['Key'], None) for obj in objects if obj.get('Key'))
+
+            if parsed.get('IsTruncated') == 'true':
+                continuation_token = parsed.get('NextContinuationToken')
+            else:
+                break
+
+    async def _delete_batch(self, objects):
+        """Delete ``objects`` (``(key, version_id)`` pairs) with one multi-object delete request.
+
+        :returns: the ``(key, version_id, code, message)`` of the objects that weren't deleted
+        """
+        delete_list = [
+            {'Key': key, 'VersionId': version_id} if version_id else {'Key': key}
+            for key, version_id in objects
+        ]
+        # Run synchronous boto3 call in executor to avoid blocking.  Quiet responses only list
+        # the objects that weren't deleted.
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            None,
+            lambda: self.bucket.delete_objects(Delete={'Objects': delete_list, 'Quiet': True}),
+        )
+        return [
+            (error.get('Key'), error.get('VersionId'), error.get('Code', 'Unknown'),
+             error.get('Message'))
+            for error in response.get('Errors') or []
+        ]
+
+    async def get_full_revision(self, query_params, on_page=None):
         """
         Get all versions and delete markers of the requested object
         :param query_params: The query parameters to be used in the request
+        :param on_page: Optional coroutine function each page's versions and delete markers are
+            passed to as they are listed, instead of being collected
         :return: The dict of response content, list versions and delete_markers
         """
         versions = []
@@ -992,8 +1054,11 @@ class S3CompatSigV4Provider(provider.BaseProvider):
                     if 'Key' in item:
                         item['Key'] = parse.unquote(item['Key'])
 
-            versions.extend(current_versions)
-            delete_markers.extend(current_delete_markers)
+            if on_page is not None:
+                await on_page(current_versions, current_delete_markers)
+            else:
+                versions.extend(current_versions)
+                delete_markers.extend(current_delete_markers)
 
             # Check if more pages are available
             more_to_come = parsed.get('IsTruncated') == 'true'
@@ -10,3 +10,6 @@ CONTIGUOUS_UPLOAD_SIZE_LIMIT = int(config.get('CONTIGUOUS_UPLOAD_SIZE_LIMIT', 12
 CHUNK_SIZE = int(config.get('CHUNK_SIZE', 64000000))  # 64 MB
 
 CHUNKED_UPLOAD_MAX_ABORT_RETRIES = int(config.get('CHUNKED_UPLOAD_MAX_ABORT_RETRIES', 2))
+
+# Most boto3 connections to keep for reuse, one per endpoint, region and set of credentials
+CONNECTION_POOL_SIZE = int(config.get('CONNECTION_POOL_SIZE', 256))
@@ -1,5 +1,4 @@
 import os
-import socket
 import asyncio
 from http import HTTPStatus
 
@@ -9,9 +8,10 @@ import tornado.platform.asyncio
 
 from waterbutler.core import mime_types
 from waterbutler.server import utils
+from waterbutler.server import settings
 from waterbutler.server.api.v0 import core
 from waterbutler.core.utils import make_disposition
-from waterbutler.core.streams import RequestStreamReader
+from waterbutler.core.streams import StreamPipe, RequestStreamReader
 
 TRUTH_MAP = {
     'true': True,
@@ -36,15 +36,13 @@ class CRUDHandler(core.BaseProviderHandler):
 
     async def prepare_stream(self):
         if self.request.method in self.STREAM_METHODS:
-            self.rsock, self.wsock = socket.socketpair()
+            self.writer = StreamPipe(settings.UPLOAD_PIPE_HIGH_WATER)
 
-            self.reader, _ = await asyncio.open_unix_connection(sock=self.rsock)
-            _, self.writer = await asyncio.open_unix_connection(sock=self.wsock)
-
-            self.stream = RequestStreamReader(self.request, self.reader)
+            self.stream = RequestStreamReader(self.request, self.writer)
 
             self.uploader = asyncio.ensure_future(self.provider.upload(self.stream,
                                                  **self.arguments))
+            self.uploader.add_done_callback(lambda _: self.writer.close())
         else:
             self.stream = None
 
@@ -120,7 +118,6 @@ class CRUDHandler(core.BaseProviderHandler):
         self.write(metadata.serialized())
 
         self.writer.close()
-        self.wsock.close()
 
         self._send_hook(
             'create' if created else 'update',
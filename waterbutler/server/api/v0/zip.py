@@ -20,5 +20,8 @@ class ZipHandler(core.BaseProviderHandler):
 
         result = await self.provider.zip(**self.arguments)
 
-        await self.write_stream(result)
+        try:
+            await self.write_stream(result)
+        finally:
+            result.close()
         self._send_hook('download_zip', path=self.path)
@@ -1,5 +1,4 @@
 import uuid
-import socket
 import asyncio
 import inspect  # noqa
 import logging
@@ -16,7 +15,7 @@ from waterbutler.server.api.v1 import core
 from waterbutler.core import remote_logging
 from waterbutler.server.auth import AuthHandler
 from waterbutler.core.log_payload import LogPayload
-from waterbutler.core.streams import RequestStreamReader
+from waterbutler.core.streams import StreamPipe, RequestStreamReader
 from waterbutler.server.api.v1.provider.create import CreateMixin
 from waterbutler.auth.osf.handler import EXPORT_DATA_FAKE_NODE_ID
 from waterbutler.server.api.v1.provider.metadata import MetadataMixin
@@ -152,16 +151,15 @@ class ProviderHandler(core.BaseHandler, CreateMixin, MetadataMixin, MoveCopyMixi
             self.body += chunk
 
     async def prepare_stream(self):
-        """Sets up an asyncio pipe from client to server
+        """Sets up an in-memory pipe from client to server
         Only called on PUT when path is to a file
         """
-        self.rsock, self.wsock = socket.socketpair()
+        self.writer = StreamPipe(settings.UPLOAD_PIPE_HIGH_WATER)
 
-        self.reader, _ = await asyncio.open_unix_connection(sock=self.rsock)
-        _, self.writer = await asyncio.open_unix_connection(sock=self.wsock)
-
-        self.stream = RequestStreamReader(self.request, self.reader)
+        self.stream = RequestStreamReader(self.request, self.writer)
         self.uploader = asyncio.ensure_future(self.provider.upload(self.stream, self.target_path))
+        # Stop waiting on a provider that is no longer reading, the error surfaces in the handler
+        self.uploader.add_done_callback(lambda _: self.writer.close())
 
     def on_finish(self):
         status, method = self.get_status(), self.request.method.upper()
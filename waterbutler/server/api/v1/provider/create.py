@@ -110,7 +110,6 @@ class CreateMixin:
 
         self.metadata, created = await self.uploader
         self.writer.close()
-        self.wsock.close()
         if created:
             self.set_status(201)
 
@@ -7,9 +7,10 @@ import pytz
 from dateutil.parser import parse as datetime_parser
 
 from waterbutler.server import utils
+from waterbutler.server import download_cache
 from waterbutler.core import mime_types
 from waterbutler.core.utils import make_disposition
-from waterbutler.core.streams import ResponseStreamReader
+from waterbutler.core.streams import ResponseStreamReader, StoredZipStreamReader
 
 logger = logging.getLogger(__name__)
 
@@ -77,14 +78,33 @@ class MetadataMixin:
             logger.debug('Range header parsed as: {}'.format(request_range))
 
         version = self.requested_version
-        stream = await self.provider.download(
-            self.path,
-            revision=version,
-            range=request_range,
-            accept_url='direct' not in self.request.query_arguments,
-            mode=self.get_query_argument('mode', default=None),
-            display_name=self.get_query_argument('displayName', default=None),
-        )
+        mode = self.get_query_argument('mode', default=None)
+        cache, location, stream = download_cache.get_download_cache(), None, None
+        cached_as = None
+        if cache is not None:
+            location = cache.location(self.provider, self.path, version, mode)
+            result, stream, metadata = await self._open_cached(cache, location, version,
+                                                               request_range)
+            self.provider.provider_metrics.add('download_cache', dict(cache.stats, result=result))
+            if stream is None and request_range is None:
+                # The version a copy is cached as is learned before the download starts, so that
+                # a file changed meanwhile can't be cached under its new etag
+                if metadata is None:
+                    metadata = await self._cache_metadata(version)
+                cached_as = cache.version(metadata)
+
+        if stream is None:
+            stream = await self.provider.download(
+                self.path,
+                revision=version,
+                range=request_range,
+                accept_url='direct' not in self.request.query_arguments,
+                mode=mode,
+                display_name=self.get_query_argument('displayName', default=None),
+            )
+        else:
+            # Served from the cache, nothing to fill it with
+            location = None
 
         if isinstance(stream, str):
             return self.redirect(stream)
@@ -117,13 +137,55 @@ class MetadataMixin:
         if ext in mime_types:
             self.set_header('Content-Type', mime_types[ext])
 
-        await self.write_stream(stream)
+        filling = None
+        if location is not None and request_range is None:
+            filling = cache.fill(location, stream, cached_as)
+        try:
+            await self.write_stream(stream)
+        finally:
+            # The copy is only kept if the whole file was read
+            if filling is not None:
+                filling.close()
 
         if getattr(stream, 'partial', False) and isinstance(stream, ResponseStreamReader):
             await stream.response.release()
 
         logger.debug('bytes received is: {}'.format(self.bytes_downloaded))
 
+    async def _open_cached(self, cache, location, version, request_range):
+        """Look the requested file up in the download cache.  Returns the result of the lookup
+        ('hit', 'miss' or 'uncacheable'), the file's cached copy or ``None``, and the file's
+        metadata if it was fetched.  Only files with a copy cached at their ``location`` take a
+        metadata request to tell if the copy is of the current version.  Cached files are sent
+        from the cache even if the provider would have redirected to them.
+        """
+        if not await cache.has(location):
+            return 'miss', None, None
+
+        metadata = await self.provider.metadata(self.path, revision=version)
+        cached_version = cache.version(metadata)
+        if cached_version is None:
+            return 'uncacheable', None, metadata
+
+        stream = await cache.open(location, cached_version, request_range)
+        if stream is None:
+            return 'miss', None, metadata
+        if getattr(metadata, 'content_type', None):
+            stream.content_type = metadata.content_type
+        return 'hit', stream, metadata
+
+    async def _cache_metadata(self, version):
+        """The metadata of the file about to be downloaded, to cache it by, or ``None`` if it
+        can't be had, in which case the download just isn't cached.
+        """
+        try:
+            return await self.provider.metadata(self.path, revision=version)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.debug('Not caching {}, no metadata: {!r}'.format(self.path, exc))
+            return None
+
     async def file_metadata(self):
         version = self.requested_version
         metadata = await self.provider.metadata(self.path, revision=version)
@@ -145,6 +207,28 @@ class MetadataMixin:
         self.set_header('Content-Type', 'application/zip')
         self.set_header('Content-Disposition', make_disposition(zipfile_name + '.zip'))
 
-        result = await self.provider.zip(self.path)
-
-        await self.write_stream(result)
+        store = self.get_query_argument('store', default='').lower() in ('1', 'true')
+        result = await self.provider.zip(self.path, store=store)
+
+        if isinstance(result, StoredZipStreamReader):
+            self.set_header('Accept-Ranges', 'bytes')
+            self.set_header('Etag', result.etag)
+
+            # Resume from the requested byte, unless the archive changed since the first part
+            if_range = self.request.headers.get('If-Range')
+            if 'Range' in self.request.headers and if_range in (None, result.etag):
+                request_range = utils.parse_request_range(self.request.headers['Range'])
+                if request_range is not None:
+                    result.select_range(request_range)
+
+            if result.partial:
+                self.set_status(206)
+                self.set_header('Content-Range', result.content_range)
+            self.set_header('Content-Length', str(result.size))
+
+        try:
+            await self.write_stream(result)
+        finally:
+            result.close()
+            if isinstance(result, StoredZipStreamReader):
+                self.provider.provider_metrics.add('zip_store', dict(result.stats))
@@ -1,4 +1,6 @@
 import json
+import time
+import asyncio
 from http import HTTPStatus
 
 from waterbutler import tasks
@@ -16,6 +18,19 @@ from waterbutler.tasks.settings import SYNCHRONOUS_TIMEOUT
 auth_handler = AuthHandler(settings.AUTH_HANDLERS)
 
 
+async def _gather_in_order(*coros):
+    """Run ``coros`` concurrently and wait for all of them to finish.  If any of them failed,
+    raise the exception of the first one in argument order, regardless of which failed first.
+    This keeps the error a client sees the same as when the steps ran one after another, e.g. a
+    source auth failure always wins over a destination validation failure.
+    """
+    results = await asyncio.gather(*coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
 class MoveCopyMixin:
 
     @property
@@ -53,6 +68,58 @@ class MoveCopyMixin:
             'provider': self.dest_provider.serialized()
         })
 
+    async def _authorize_source(self, provider, auth_action, location_id, timings):
+        started = time.monotonic()
+        self.auth = await auth_handler.get(
+            self.resource,
+            provider,
+            self.request,
+            action=auth_action,
+            auth_type=AuthType.SOURCE,
+            path=self.path,
+            version=self.requested_version,
+            location_id=location_id,
+        )
+        self.provider = make_provider(
+            provider,
+            self.auth['auth'],
+            self.auth['credentials'],
+            self.auth['settings']
+        )
+        timings['source_auth'] = time.monotonic() - started
+
+    async def _validate_source(self, timings):
+        started = time.monotonic()
+        self.path = await self.provider.validate_v1_path(self.path, **self.arguments)
+        timings['source_validate'] = time.monotonic() - started
+
+    async def _prepare_source(self, provider, auth_action, location_id, timings):
+        await self._authorize_source(provider, auth_action, location_id, timings)
+        await self._validate_source(timings)
+
+    async def _prepare_destination(self, provider, auth_action, path, timings):
+        started = time.monotonic()
+        self.dest_auth = await auth_handler.get(
+            self.dest_resource,
+            provider,
+            self.request,
+            action=auth_action,
+            auth_type=AuthType.DESTINATION,
+            path=path,
+            location_id=self.location_id,
+        )
+        self.dest_provider = make_provider(
+            provider,
+            self.dest_auth['auth'],
+            self.dest_auth['credentials'],
+            self.dest_auth['settings']
+        )
+        validated = time.monotonic()
+        timings['destination_auth'] = validated - started
+
+        self.dest_path = await self.dest_provider.validate_path(**self.json)
+        timings['destination_validate'] = time.monotonic() - validated
+
     async def move_or_copy(self):
         """Copy, move, and rename files and folders.
 
@@ -84,25 +151,15 @@ class MoveCopyMixin:
         if self.resource == EXPORT_DATA_FAKE_NODE_ID:
             self.location_id = self.get_query_argument('location_id', default=None)
 
-        self.auth = await auth_handler.get(
-            self.resource,
-            provider,
-            self.request,
-            action=auth_action,
-            auth_type=AuthType.SOURCE,
-            path=self.path,
-            version=self.requested_version,
-            location_id=self.location_id,
-        )
-        self.provider = make_provider(
-            provider,
-            self.auth['auth'],
-            self.auth['credentials'],
-            self.auth['settings']
-        )
-        self.path = await self.provider.validate_v1_path(self.path, **self.arguments)
+        # Auth and path validation for the source and the destination are independent remote
+        # round trips, so they are run concurrently.  See `_gather_in_order` for error precedence.
+        started = time.monotonic()
+        timings = {}  # type: dict
+        source_location_id = self.location_id
 
         if auth_action == 'rename':  # 'rename' implies the file/folder does not change location
+            await self._prepare_source(provider, auth_action, source_location_id, timings)
+
             self.dest_auth = self.auth
             self.dest_provider = self.provider
             self.dest_path = self.path.parent
@@ -118,32 +175,32 @@ class MoveCopyMixin:
 
             # TODO optimize for same provider and resource
 
-            # for copy action, `auth_action` is the same as `provider_action`
-            if auth_action == 'copy' and self.path.is_root and not self.json.get('rename'):
-                raise exceptions.InvalidParameters('"rename" field is required for copying root')
-
             # Note: attached to self so that _send_hook has access to these
             self.dest_resource = self.json.get('resource', self.resource)
 
             if self.dest_resource == EXPORT_DATA_FAKE_NODE_ID:
                 self.location_id = self.get_query_argument('location_id', default=None)
 
-            self.dest_auth = await auth_handler.get(
-                self.dest_resource,
-                self.json.get('provider', self.provider.NAME),
-                self.request,
-                action=auth_action,
-                auth_type=AuthType.DESTINATION,
-                path=path,
-                location_id=self.location_id,
-            )
-            self.dest_provider = make_provider(
-                self.json.get('provider', self.provider.NAME),
-                self.dest_auth['auth'],
-                self.dest_auth['credentials'],
-                self.dest_auth['settings']
-            )
-            self.dest_path = await self.dest_provider.validate_path(**self.json)
+            if 'provider' in self.json:
+                await _gather_in_order(
+                    self._prepare_source(provider, auth_action, source_location_id, timings),
+                    self._prepare_destination(self.json['provider'], auth_action, path, timings),
+                )
+            else:
+                # The destination defaults to the source provider, whose name is only known once
+                # the source provider has been built.  Only the validations can overlap.
+                await self._authorize_source(provider, auth_action, source_location_id, timings)
+                await _gather_in_order(
+                    self._validate_source(timings),
+                    self._prepare_destination(self.provider.NAME, auth_action, path, timings),
+                )
+
+            # for copy action, `auth_action` is the same as `provider_action`
+            if auth_action == 'copy' and self.path.is_root and not self.json.get('rename'):
+                raise exceptions.InvalidParameters('"rename" field is required for copying root')
+
+        timings['total'] = time.monotonic() - started
+        self.provider.provider_metrics.add('move_or_copy.timings', timings)
 
         if not getattr(self.provider, 'can_intra_' + provider_action)(self.dest_provider, self.path):
             # this weird signature syntax courtesy of py3.4 not liking trailing commas on kwargs
@@ -15,6 +15,8 @@ from waterbutler import settings
 from waterbutler.server.api import v0
 from waterbutler.server.api import v1
 from waterbutler.server import handlers
+from waterbutler.core import utils
+from waterbutler.core import connections
 from waterbutler.version import __version__
 from waterbutler.server import settings as server_settings
 
@@ -65,6 +67,9 @@ def make_app(debug):
 def serve():
     app = make_app(server_settings.DEBUG)
 
+    # Resolve provider plugins once up front instead of on the first request for each
+    logger.info('Loaded providers: {}'.format(', '.join(utils.load_provider_classes())))
+
     ssl_options = None
     if server_settings.SSL_CERT_FILE and server_settings.SSL_KEY_FILE:
         ssl_options = {
@@ -85,3 +90,7 @@ def serve():
     signal.signal(signal.SIGTERM, partial(sig_handler))
     asyncio.get_event_loop().set_debug(server_settings.DEBUG)
     asyncio.get_event_loop().run_forever()
+
+    # Close pooled upstream and service connections once the loop has drained
+    asyncio.get_event_loop().run_until_complete(connections.provider_pool.close())
+    asyncio.get_event_loop().run_until_complete(connections.service_pool.close())
@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import logging
+
+from waterbutler.server import settings
+from waterbutler.core.streams.pipe import TeeStream
+from waterbutler.core.streams.file import (FileStreamReader, PartialFileStreamReader,
+                                           run_file_io)
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the files a cache entry is written to before it is complete
+TEMP_PREFIX = '.tmp-'
+# Seconds after which an unfinished entry no process has written to is removed
+TEMP_MAX_AGE = 60 * 60
+# Seconds after which the cache is counted again, to notice the copies other processes added
+SCAN_INTERVAL = 60
+
+
+class DownloadCache:
+    """A read-through cache of downloaded files on local disk, so that files fetched again and
+    again (course datasets, files MFR renders for both preview and export) are only downloaded
+    from the provider once.
+
+    A file is cached in a directory named after its *location*: the provider's name and settings
+    (its storage root), the path and its identifier, and the requested version and mode.  Within
+    it, the copy is named after the etag from the file's metadata, so a changed file is never
+    served from an old copy; files without an etag aren't cached.  Only files with something
+    cached at their location are looked up, which takes a metadata request to learn the etag.
+    Other downloads go straight to the provider.
+
+    A file is copied into the cache through a :class:`.TeeStream` while it is being sent to the
+    first client that downloads it whole, and only kept if all of it arrived.  The etag it is
+    stored under must come from metadata fetched before the download started: if the file changes
+    in between, the copy is then named after the old etag and never matches again, where an etag
+    learned afterwards could name an old copy after the new version.  Downloads the provider
+    answers with a redirect have nothing to copy, so they only fill the cache if another request
+    for the file (e.g. with ``?direct``) does.  Ranges of cached files are served from the cached
+    copy.
+
+    The directory is the cache's only index, so every process started on the same directory
+    shares the cache, and it survives restarts.  Each process keeps count of the bytes it adds,
+    and once they take the cache over ``max_size`` bytes in total, or ``SCAN_INTERVAL`` seconds
+    after it last counted, it counts the directory again and removes the least recently used
+    copies, by modification time, which hits update.  Processes filling at the same time may
+    evict a little more than needed, or leave the cache over its size until they next count.
+    Files over ``max_file_size`` bytes are never cached.
+
+    :param str directory: where to keep the cached files
+    :param int max_size: bytes the cache may hold
+    :param int max_file_size: bytes a file may have to be cached
+    """
+
+    def __init__(self, directory: str, max_size: int, max_file_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+
+        # Locations this process is filling
+        self._filling = set()  # type: set
+        # The files and bytes in the cache as last counted, plus those this process added since
+        self.files = self.size = 0
+        self._scanned_at = 0.0
+        self.hits = self.misses = self.evictions = self.bytes_saved = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'files': self.files,
+            'size': self.size,
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else None,
+            'bytes_saved': self.bytes_saved,
+            'evictions': self.evictions,
+        }
+
+    @staticmethod
+    def location(provider, path, version=None, mode=None) -> str:
+        """The location a file is cached at.
+
+        :param provider: the provider the file is downloaded from
+        :param path: the file's :class:`.WaterButlerPath`
+        :param str version: the version being downloaded, if not the latest
+        :param str mode: the download mode, if any
+        :rtype: str
+        """
+        material = json.dumps(
+            [provider.NAME, provider.settings, path.identifier, path.path, version, mode],
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def version(metadata) -> str:
+        """What the copy of the file described by ``metadata`` is cached as, or ``None`` if it
+        has no etag to tell its versions apart.
+        """
+        try:
+            etag = metadata.etag
+        except (AttributeError, KeyError, TypeError, NotImplementedError):
+            etag = None
+        if not etag:
+            return None
+        return hashlib.sha256(str(etag).encode('utf-8')).hexdigest()
+
+    async def has(self, location: str) -> bool:
+        """Whether some version of the file at ``location`` is cached.  If not, the lookup counts
+        as a miss.
+        """
+        if await run_file_io(os.path.isdir, self._path(location)):
+            return True
+        self.misses += 1
+        return False
+
+    async def open(self, location: str, version: str, byte_range: tuple=None):
+        """Return a stream of the cached ``version`` of the file at ``location``, or of the
+        inclusive ``byte_range`` of it, or ``None`` if it isn't cached.
+        """
+        file_pointer, size = await run_file_io(self._open, self._path(location, version))
+        if file_pointer is None:
+            self.misses += 1
+            return None
+
+        if byte_range is not None:
+            start, end = byte_range
+            if start >= size:
+                # Let the provider decide what to make of it
+                file_pointer.close()
+                return None
+            end = size - 1 if end is None else min(end, size - 1)
+
+        self.hits += 1
+        if byte_range is None:
+            stream = FileStreamReader(file_pointer)
+        else:
+            stream = PartialFileStreamReader(file_pointer, (start, end))
+        self.bytes_saved += stream.size
+        return stream
+
+    def fill(self, location: str, stream, version: str) -> TeeStream:
+        """Copy ``stream`` into the cache as it is read.  Returns the branch the copy is read from,
+        which must be closed once ``stream`` has been read, or ``None`` if the stream isn't
+        cached: it has no version, is already local, partial, of unknown size, too large, or
+        already being cached.
+
+        :param str version: what the copy is cached as, from the file's metadata as fetched
+            before the download started (see :meth:`version`)
+        """
+        size = getattr(stream, 'size', None)
+        if (version is None or location in self._filling or isinstance(stream, FileStreamReader) or
+                getattr(stream, 'partial', False) or not hasattr(stream, 'add_writer') or
+                not isinstance(size, int) or size > min(self.max_file_size, self.max_size)):
+            return None
+
+        branch = TeeStream(stream, 'download_cache')
+        self._filling.add(location)
+        asyncio.ensure_future(self._fill(location, branch, size, version))
+        return branch
+
+    async def _fill(self, location, branch, size, version):
+        temp_path = self._path('{}{}'.format(TEMP_PREFIX, uuid.uuid4().hex))
+        written = 0
+        try:
+            file_pointer = await run_file_io(open, temp_path, 'wb')
+            try:
+                while True:
+                    chunk = await branch.read(settings.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    await run_file_io(file_pointer.write, chunk)
+                    written += len(chunk)
+            finally:
+                await run_file_io(file_pointer.close)
+
+            if written != size:
+                logger.debug('Not caching {}, got {} of {} bytes'.format(location, written, size))
+                await run_file_io(os.remove, temp_path)
+                return
+
+            await run_file_io(self._store, temp_path, location, version)
+            await run_file_io(self._evict)
+        except Exception as exc:
+            logger.warning('Failed to cache {}: {!r}'.format(location, exc))
+            try:
+                await run_file_io(os.remove, temp_path)
+            except OSError:
+                pass
+        finally:
+            branch.close()
+            self._filling.discard(location)
+
+    def _path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    @staticmethod
+    def _open(path):
+        try:
+            file_pointer = open(path, 'rb')
+        except OSError:
+            return None, None
+        try:
+            # Mark the copy as recently used
+            os.utime(file_pointer.fileno())
+        except OSError:
+            pass
+        return file_pointer, os.fstat(file_pointer.fileno()).st_size
+
+    def _store(self, temp_path, location, version):
+        """Move a finished copy into place, drop the location's other versions, and count the
+        difference.
+        """
+        directory = self._path(location)
+        os.makedirs(directory, exist_ok=True)
+        size = os.stat(temp_path).st_size
+        os.replace(temp_path, os.path.join(directory, version))
+        self.files += 1
+        self.size += size
+        for entry in os.scandir(directory):
+            if entry.name != version:
+                try:
+                    removed = entry.stat().st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                self.files -= 1
+                self.size -= removed
+
+    def _scan(self):
+        """List the cached copies, least recently used first, and remove unfinished entries that
+        were abandoned.  Returns ``(mtime, size, location, path)`` of every copy.
+        """
+        found = []
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.startswith(TEMP_PREFIX):
+                    if now - entry.stat().st_mtime > TEMP_MAX_AGE:
+                        os.remove(entry.path)
+                    continue
+                if not entry.is_dir():
+                    continue
+                for copy in os.scandir(entry.path):
+                    stat = copy.stat()
+                    found.append((stat.st_mtime, stat.st_size, entry.name, copy.path))
+            except OSError:
+                # Removed by another process meanwhile
+                continue
+
+        found.sort()
+        self.files = len(found)
+        self.size = sum(size for _, size, _, _ in found)
+        self._scanned_at = time.monotonic()
+        return found
+
+    def _evict(self):
+        if (self.size <= self.max_size and
+                time.monotonic() - self._scanned_at < SCAN_INTERVAL):
+            return
+        found = self._scan()
+        for _, size, location, path in found:
+            if self.size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            try:
+                os.rmdir(self._path(location))
+            except OSError:
+                pass
+            self.files -= 1
+            self.size -= size
+            self.evictions += 1
+
+
+_download_cache = None
+
+
+def get_download_cache():
+    """The process's :class:`DownloadCache`, or ``None`` unless ``SERVER_CONFIG.DOWNLOAD_CACHE``
+    is enabled.
+    """
+    global _download_cache
+    if _download_cache is None and settings.DOWNLOAD_CACHE_ENABLED:
+        _download_cache = DownloadCache(settings.DOWNLOAD_CACHE_DIR,
+                                        settings.DOWNLOAD_CACHE_MAX_SIZE,
+                                        settings.DOWNLOAD_CACHE_MAX_FILE_SIZE)
+    return _download_cache
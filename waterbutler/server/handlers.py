@@ -1,6 +1,8 @@
 import tornado.web
 
 from waterbutler.version import __version__
+from waterbutler.core.cache import cache_stats
+from waterbutler.core.circuitbreaker import breakers
 
 
 class StatusHandler(tornado.web.RequestHandler):
@@ -9,5 +11,7 @@ class StatusHandler(tornado.web.RequestHandler):
         """List information about waterbutler status"""
         self.write({
             'status': 'up',
-            'version': __version__
+            'version': __version__,
+            'caches': cache_stats(),
+            'circuit_breakers': breakers.stats(),
         })
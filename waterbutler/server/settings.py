@@ -1,4 +1,6 @@
+import os
 import hashlib
+import tempfile
 
 from waterbutler import settings
 
@@ -18,7 +20,25 @@ XHEADERS = config.get_bool('XHEADERS', False)
 CORS_ALLOW_ORIGIN = config.get('CORS_ALLOW_ORIGIN', '*')
 
 CHUNK_SIZE = int(config.get('CHUNK_SIZE', 65536))  # 64KB
+
+# Send downloads from the filesystem provider with os.sendfile when the connection allows it
+SENDFILE_ENABLED = config.get_bool('SENDFILE_ENABLED', True)
+SENDFILE_CHUNK_SIZE = int(config.get('SENDFILE_CHUNK_SIZE', 1024 * 1024))  # 1MB
+# Seconds to wait for a stalled client to accept more data before giving up on it
+SENDFILE_TIMEOUT = int(config.get('SENDFILE_TIMEOUT', 60))
 MAX_BODY_SIZE = int(config.get('MAX_BODY_SIZE', int(50 * (1024 ** 3))))  # 50 GB
+# Bytes of an upload buffered in memory before the server stops reading from the client and waits
+# for the provider to catch up
+UPLOAD_PIPE_HIGH_WATER = int(config.get('UPLOAD_PIPE_HIGH_WATER', 1024 * 1024))  # 1MB
+
+# Read-through cache of downloaded files on local disk, see waterbutler.server.download_cache
+download_cache_config = config.child('DOWNLOAD_CACHE')
+DOWNLOAD_CACHE_ENABLED = download_cache_config.get_bool('ENABLED', False)
+DOWNLOAD_CACHE_DIR = download_cache_config.get(
+    'DIR', os.path.join(tempfile.gettempdir(), 'waterbutler-download-cache')
+)
+DOWNLOAD_CACHE_MAX_SIZE = int(download_cache_config.get('MAX_SIZE', 10 * 1024 ** 3))  # 10GB
+DOWNLOAD_CACHE_MAX_FILE_SIZE = int(download_cache_config.get('MAX_FILE_SIZE', 1024 ** 3))  # 1GB
 
 AUTH_HANDLERS = config.get('AUTH_HANDLERS', [
     'osf',
@@ -1,6 +1,18 @@
+import os
+import ssl
+import asyncio
+
+import tornado
 import tornado.iostream
 
 from waterbutler.server import settings
+from waterbutler.core.streams import FileStreamReader
+
+# Bytes sent with ``os.sendfile`` bypass the connection's IOStream, so `UtilMixin._sendfile_stream`
+# has to check the handler's pending headers and transforms and keep the HTTP/1 connection's count
+# of body bytes left in step itself.  Those are tornado internals, only relied upon for the
+# versions they were checked against; other versions write files the usual way.
+SENDFILE_TORNADO_VERSIONS = ((6, 0), )
 
 CORS_ACCEPT_HEADERS = [
     'Range',
@@ -123,6 +135,8 @@ class UtilMixin:
 
     async def write_stream(self, stream):
         try:
+            if await self._sendfile_stream(stream):
+                return
             while True:
                 chunk = await stream.read(settings.CHUNK_SIZE)
                 if not chunk:
@@ -138,3 +152,74 @@ class UtilMixin:
             # Client has disconnected early.
             # No need for any exception to be raised
             return
+
+    async def _sendfile_stream(self, stream):
+        """Send a local file to the client with ``os.sendfile``, which copies it from the page cache
+        straight to the socket without it ever passing through python.  Only possible for a
+        :class:`.FileStreamReader` nobody else reads from, over a plain (non-TLS) connection, with
+        a ``Content-Length`` response whose body tornado doesn't transform.
+
+        Returns ``False``, without having sent anything but maybe the headers, if the stream must
+        be written the usual way.
+        """
+        if not settings.SENDFILE_ENABLED or not hasattr(os, 'sendfile'):
+            return False
+        if tornado.version_info[:2] not in SENDFILE_TORNADO_VERSIONS:
+            return False
+        if not isinstance(stream, FileStreamReader) or self.request.method == 'HEAD':
+            return False
+
+        file_range = stream.sendfile_range()
+        connection = self.request.connection
+        sock = getattr(getattr(connection, 'stream', None), 'socket', None)
+        if (file_range is None or sock is None or isinstance(sock, ssl.SSLSocket) or
+                self._transforms or self._headers.get('Content-Length') != str(file_range[2])):
+            return False
+
+        await self.flush()
+        if getattr(connection, '_expected_content_remaining', None) != file_range[2]:
+            return False
+
+        fileno, offset, count = file_range
+        end = offset + count
+        # Writability is watched on a duplicate of the socket's descriptor, which leaves the
+        # IOStream's own registration of the socket with the loop alone
+        watched = os.dup(sock.fileno())
+        try:
+            while offset < end:
+                if connection.stream.closed():
+                    raise tornado.iostream.StreamClosedError()
+                try:
+                    sent = os.sendfile(sock.fileno(), fileno, offset,
+                                       min(end - offset, settings.SENDFILE_CHUNK_SIZE))
+                except BlockingIOError:
+                    await self._wait_writable(watched)
+                    continue
+                except (BrokenPipeError, ConnectionResetError):
+                    raise tornado.iostream.StreamClosedError()
+                if not sent:  # The file was truncated underneath us
+                    break
+                offset += sent
+                self.bytes_downloaded += sent
+                connection._expected_content_remaining -= sent
+        finally:
+            os.close(watched)
+
+        return True
+
+    @staticmethod
+    async def _wait_writable(fileno):
+        loop = asyncio.get_event_loop()
+        writable = loop.create_future()
+
+        def on_writable():
+            if not writable.done():
+                writable.set_result(None)
+
+        loop.add_writer(fileno, on_writable)
+        try:
+            await asyncio.wait_for(writable, settings.SENDFILE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise tornado.iostream.StreamClosedError()
+        finally:
+            loop.remove_writer(fileno)
@@ -157,6 +157,33 @@ def child(key):
 DEBUG = config.get_bool('DEBUG', True)
 OP_CONCURRENCY = int(config.get('OP_CONCURRENCY', 5))
 
+# Files at least this large are copied between providers in parts that are downloaded and uploaded
+# concurrently, when the source can serve byte ranges and the destination can take parts
+PARALLEL_COPY_MIN_SIZE = int(config.get('PARALLEL_COPY_MIN_SIZE', 64 * 1024 * 1024))  # 64MB
+# Parts of one copy in flight at the same time
+PARALLEL_COPY_CONCURRENCY = int(config.get('PARALLEL_COPY_CONCURRENCY', 4))
+# Parts of one stream uploaded at the same time by providers that upload in parts
+PART_UPLOAD_CONCURRENCY = int(config.get('PART_UPLOAD_CONCURRENCY', 4))
+# Size of the parts transfers are expected to move, the S3 family's CHUNK_SIZE, and how many
+# parallel copies and part uploads are expected to run at once, for sizing TRANSFER_MEMORY
+TRANSFER_PART_SIZE = int(config.get('TRANSFER_PART_SIZE', 64000000))  # 64 MB
+TRANSFER_EXPECTED_COUNT = int(config.get('TRANSFER_EXPECTED_COUNT', 2))
+# Bytes of part data all parallel copies and part uploads in the process may hold in memory at
+# once, by default enough for every part in flight of the expected transfers (512MB).  Copied
+# parts wait for room, so large parts and many concurrent transfers lower the concurrency; part
+# uploads send parts that don't fit straight from the client instead.
+TRANSFER_MEMORY = int(config.get(
+    'TRANSFER_MEMORY',
+    TRANSFER_PART_SIZE * max(PARALLEL_COPY_CONCURRENCY, PART_UPLOAD_CONCURRENCY) *
+    TRANSFER_EXPECTED_COUNT,
+))
+# Times a failed part of a parallel copy or part upload is sent again before it is given up
+PART_RETRIES = int(config.get('PART_RETRIES', 3))
+# Multi-object delete requests sent at the same time while deleting a folder's keys
+DELETE_BATCH_CONCURRENCY = int(config.get('DELETE_BATCH_CONCURRENCY', 4))
+# Times keys a multi-object delete failed with a server-side error are sent again
+DELETE_BATCH_RETRIES = int(config.get('DELETE_BATCH_RETRIES', 3))
+
 logging_config = config.get('LOGGING', DEFAULT_LOGGING_CONFIG)
 logging.config.dictConfig(logging_config)
 
@@ -181,6 +208,50 @@ KEEN_PUBLIC_WRITE_KEY = keen_public_config.get_nullable('WRITE_KEY', None)
 WEBDAV_METHODS = {'PROPFIND', 'MKCOL', 'MOVE', 'COPY'}
 
 AIOHTTP_TIMEOUT = int(config.get('AIOHTTP_TIMEOUT', 3600))  # time in seconds
+# Time allowed to open a connection to an upstream, so unreachable hosts fail fast
+AIOHTTP_CONNECT_TIMEOUT = float(config.get('AIOHTTP_CONNECT_TIMEOUT', 30))  # time in seconds
+# Time an upstream may go without sending anything while answering a request, so hosts that
+# accept connections but stall fail fast too.  Not applied while a streamed upload is being sent,
+# as no answer comes until all of it is.
+AIOHTTP_READ_TIMEOUT = float(config.get('AIOHTTP_READ_TIMEOUT', 300))  # time in seconds
+
+# Exponential back-off with full jitter between retries of failed upstream requests
+RETRY_BACKOFF_BASE = float(config.get('RETRY_BACKOFF_BASE', 2))  # seconds
+RETRY_BACKOFF_CAP = float(config.get('RETRY_BACKOFF_CAP', 30))  # seconds
+
+# Per-upstream-host circuit breakers for `BaseProvider.make_request`.  See
+# `waterbutler.core.circuitbreaker`
+circuit_breaker_config = config.child('CIRCUIT_BREAKER')
+CIRCUIT_BREAKER_ENABLED = circuit_breaker_config.get_bool('ENABLED', True)
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(circuit_breaker_config.get('FAILURE_THRESHOLD', 5))
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = float(circuit_breaker_config.get('RECOVERY_TIMEOUT', 30))  # seconds
+CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS = int(circuit_breaker_config.get('HALF_OPEN_MAX_CALLS', 1))
+CIRCUIT_BREAKER_MAX_HOSTS = int(circuit_breaker_config.get('MAX_HOSTS', 4096))
+
+# Process-wide connection pool shared by all provider instances.  See `waterbutler.core.connections`
+aiohttp_pool_config = config.child('AIOHTTP_POOL')
+AIOHTTP_POOL_LIMIT = int(aiohttp_pool_config.get('LIMIT', 100))
+AIOHTTP_POOL_LIMIT_PER_HOST = int(aiohttp_pool_config.get('LIMIT_PER_HOST', 20))
+AIOHTTP_POOL_KEEPALIVE_TIMEOUT = float(aiohttp_pool_config.get('KEEPALIVE_TIMEOUT', 15))  # seconds
+AIOHTTP_POOL_DNS_CACHE_TTL = int(aiohttp_pool_config.get('DNS_CACHE_TTL', 300))  # seconds
+
+# Separate pool for service-to-service calls: OSF auth, callback logging and Keen
+service_pool_config = config.child('AIOHTTP_SERVICE_POOL')
+AIOHTTP_SERVICE_POOL_LIMIT = int(service_pool_config.get('LIMIT', 50))
+AIOHTTP_SERVICE_POOL_LIMIT_PER_HOST = int(service_pool_config.get('LIMIT_PER_HOST', 20))
+AIOHTTP_SERVICE_POOL_KEEPALIVE_TIMEOUT = float(service_pool_config.get('KEEPALIVE_TIMEOUT', 30))  # seconds
+AIOHTTP_SERVICE_POOL_DNS_CACHE_TTL = int(service_pool_config.get('DNS_CACHE_TTL', 300))  # seconds
+AIOHTTP_SERVICE_POOL_TIMEOUT = float(service_pool_config.get('TIMEOUT', 60))  # seconds
+AIOHTTP_SERVICE_POOL_CONNECT_TIMEOUT = float(service_pool_config.get('CONNECT_TIMEOUT', 10))  # seconds
+
+# Per-upstream token-bucket rate limiting of `BaseProvider.make_request`.  Providers with a known
+# API budget declare their own rate and burst.  See `waterbutler.core.ratelimit`
+rate_limit_config = config.child('RATE_LIMIT')
+RATE_LIMIT_ENABLED = rate_limit_config.get_bool('ENABLED', True)
+RATE_LIMIT_RATE = float(rate_limit_config.get('RATE', 10))  # requests per second
+RATE_LIMIT_BURST = int(rate_limit_config.get('BURST', 20))
+RATE_LIMIT_MAX_WAIT = float(rate_limit_config.get('MAX_WAIT', 60))  # seconds
+RATE_LIMIT_MAX_BUCKETS = int(rate_limit_config.get('MAX_BUCKETS', 4096))
 
 OSF_URL = config.get('OSF_URL', 'http://192.168.168.167:5000')
 FILENAME_NORMALIZATION_RULE = config.get('FILENAME_NORMALIZATION_RULE', 'NFC')